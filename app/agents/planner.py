@@ -1,9 +1,13 @@
+import hashlib
 import json
-from typing import Any, Dict, List, Optional, Set
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Set, Tuple
 
-from app.agents.text2sql.intents import Intent, normalize_query
+from app.agents.text2sql.intents import Intent, QueryLike, as_context
+from app.agents.text2sql.example_store import get_example_store
+from app.agents.text2sql.plan_skeleton import PlanSkeleton, build_plan_skeleton, merge_skeleton
 from app.agents.text2sql.plan_utils import normalize_plan, safe_json_loads
-from app.config import CLICKHOUSE_DATABASE
+from app.config import CLICKHOUSE_DATABASE, PLANNER_EXAMPLES_MODE, PLANNER_MODE
 from app.core.llm import LLMClient
 from app.core.schema_catalog import format_schema_for_prompt
 
@@ -18,7 +22,7 @@ CANONICAL_FACTS = {
 }
 
 
-def infer_business_domain(query: str) -> str:
+def infer_business_domain(query: QueryLike) -> str:
     if Intent.is_sales(query):
         return "sales"
     if Intent.is_inventory_query(query):
@@ -131,6 +135,27 @@ OUTPUT FORMAT:
 """.strip()
 
 
+def skeleton_system_prompt() -> str:
+    return """
+You complete a partially built ClickHouse SQL plan.
+
+Return ONLY valid JSON with exactly the keys listed in "missing".
+No markdown.
+No explanation.
+
+KEYS:
+- "metrics": [{"expr":"...", "as":"..."}] aggregate expressions the question asks for
+- "dimensions": [{"expr":"...", "as":"..."}] extra group-by columns, [] if the question does not group by them
+- "filters": ["..."] extra WHERE predicates, [] if the question has none
+
+RULES:
+- The fact table alias is f; joined tables keep the aliases given in "plan"
+- Use ONLY columns that appear in schema_text
+- Do NOT repeat anything already in "plan" (date, store, grouping, ordering)
+- ClickHouse expressions only, string literals in single quotes
+""".strip()
+
+
 def planning_examples() -> List[Dict[str, Any]]:
     return [
         {
@@ -301,6 +326,13 @@ def planning_examples() -> List[Dict[str, Any]]:
     ]
 
 
+def select_planning_examples(query: QueryLike, mode: str = PLANNER_EXAMPLES_MODE) -> List[Dict[str, Any]]:
+    """All static examples, or the few most similar to the question."""
+    if mode == "static":
+        return planning_examples()
+    return get_example_store(planning_examples()).select(as_context(query).normalized)
+
+
 def compact_table_summary(t: Any, registry: Any) -> str:
     highlights = registry.highlights(t)
     role = registry.infer_table_role(t)
@@ -329,7 +361,7 @@ def summarize_candidates(
         candidates: List[Any],
         rel_filtered: List[Dict[str, Any]],
         registry: Any,
-        query: str,
+        query: QueryLike,
 ) -> str:
     domain = infer_business_domain(query)
     lines: List[str] = [f"DETECTED_DOMAIN: {domain}", "CANDIDATE_TABLES:"]
@@ -354,7 +386,7 @@ def summarize_candidates(
     return "\n".join(lines)
 
 
-def select_candidate_names(query: str, candidates: List[Any]) -> List[str]:
+def select_candidate_names(query: QueryLike, candidates: List[Any]) -> List[str]:
     domain = infer_business_domain(query)
 
     prioritized: List[str] = []
@@ -399,29 +431,41 @@ def select_candidate_names(query: str, candidates: List[Any]) -> List[str]:
     return prioritized[:10]
 
 
+@lru_cache(maxsize=1)
+def planner_fingerprint() -> str:
+    """Changes whenever the planner prompt or examples do (plan cache version)."""
+    h = hashlib.sha1(planner_system_prompt().encode("utf-8"))
+    h.update(PLANNER_MODE.encode("utf-8"))
+    h.update(skeleton_system_prompt().encode("utf-8"))
+    h.update(json.dumps(planning_examples(), ensure_ascii=False, sort_keys=True).encode("utf-8"))
+    return h.hexdigest()
+
+
 def build_user_payload(
-        query: str,
+        query: QueryLike,
         candidates: List[Any],
         rel_filtered: List[Dict[str, Any]],
         allowed_tables: Set[str],
         registry: Any,
+        examples_mode: str = PLANNER_EXAMPLES_MODE,
 ) -> Dict[str, Any]:
-    normalized = normalize_query(query)
-    domain = infer_business_domain(query)
+    ctx = as_context(query)
+    normalized = ctx.normalized
+    domain = infer_business_domain(ctx)
 
-    candidate_names = select_candidate_names(query, candidates)
-    schema_text = format_schema_for_prompt(candidate_names)
-    candidate_summary = summarize_candidates(candidates, rel_filtered, registry, query)
+    candidate_names = select_candidate_names(ctx, candidates)
+    schema_text = format_schema_for_prompt(candidate_names, query=f"{ctx.raw} {normalized}")
+    candidate_summary = summarize_candidates(candidates, rel_filtered, registry, ctx)
 
-    return {
-        "question": query,
+    payload = {
+        "question": ctx.raw,
         "normalized_question": normalized,
         "detected_domain": domain,
         "candidate_summary": candidate_summary,
         "schema_text": schema_text,
         "allowed_tables": sorted(list(allowed_tables))[:100],
         "relationships": rel_filtered[:25],
-        "examples": planning_examples(),
+        "examples": select_planning_examples(ctx, examples_mode),
         "instructions": {
             "return_empty_plan_if_unrelated": True,
             "prefer_canonical_fact_by_domain": True,
@@ -430,6 +474,16 @@ def build_user_payload(
         },
     }
 
+    date_range = ctx.date_range
+    if date_range:
+        payload["date_range"] = {
+            **date_range.as_dict(),
+            "where": f"f.SalesDate >= toDate('{date_range.start}') AND f.SalesDate < toDate('{date_range.end}')",
+        }
+        payload["instructions"]["use_date_range_filter"] = True
+
+    return payload
+
 
 def is_empty_plan(plan: Dict[str, Any]) -> bool:
     return (
@@ -443,8 +497,76 @@ def is_empty_plan(plan: Dict[str, Any]) -> bool:
     )
 
 
+def build_skeleton_payload(query: QueryLike, skeleton: PlanSkeleton) -> Dict[str, Any]:
+    """Only the plan so far, the fact (and joined) tables' schema and the missing keys."""
+    ctx = as_context(query)
+    tables = [skeleton.plan["fact_table"]] + [j["table"] for j in skeleton.plan["joins"]]
+    return {
+        "question": ctx.raw,
+        "normalized_question": ctx.normalized,
+        "plan": skeleton.plan,
+        "missing": list(skeleton.missing),
+        "schema_text": format_schema_for_prompt(tables, query=f"{ctx.raw} {ctx.normalized}"),
+    }
+
+
+async def plan_with_skeleton(query: QueryLike, domain: str) -> Optional[Dict[str, Any]]:
+    """
+    Skeleton-first planning: the intents fill the plan, the LLM only the keys
+    they cannot. None when the question has no skeleton or the LLM answer
+    does not complete it.
+    """
+    skeleton = build_plan_skeleton(query, domain)
+    if skeleton is None:
+        return None
+
+    if not skeleton.complete:
+        out = await llm.chat(
+            [
+                {"role": "system", "content": skeleton_system_prompt()},
+                {"role": "user", "content": json.dumps(build_skeleton_payload(query, skeleton), ensure_ascii=False)},
+            ],
+            temperature=0.0,
+            max_tokens=200,
+            stop_at_json=True,
+        )
+        filled = safe_json_loads(out)
+        if not isinstance(filled, dict):
+            return None
+        skeleton = merge_skeleton(skeleton, filled)
+        if skeleton is None:
+            return None
+
+    return normalize_plan(skeleton.plan)
+
+
+async def plan_query(
+        query: QueryLike,
+        domain: str,
+        candidates: List[Any],
+        rel_filtered: List[Dict[str, Any]],
+        allowed_tables: Set[str],
+        registry: Any,
+        mode: str = PLANNER_MODE,
+) -> Tuple[Optional[Dict[str, Any]], str]:
+    """(plan, planner used): the skeleton planner first in skeleton mode, full planning otherwise."""
+    if mode == "skeleton":
+        plan = await plan_with_skeleton(query, domain)
+        if plan is not None:
+            return plan, "skeleton"
+
+    plan = await plan_with_llm(
+        query=query,
+        candidates=candidates,
+        rel_filtered=rel_filtered,
+        allowed_tables=allowed_tables,
+        registry=registry,
+    )
+    return plan, "full"
+
+
 async def plan_with_llm(
-        query: str,
+        query: QueryLike,
         candidates: List[Any],
         rel_filtered: List[Dict[str, Any]],
         allowed_tables: Set[str],
@@ -465,6 +587,7 @@ async def plan_with_llm(
         ],
         temperature=0.0,
         max_tokens=1400,
+        stop_at_json=True,
     )
 
     plan = safe_json_loads(out)
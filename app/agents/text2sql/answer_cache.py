@@ -0,0 +1,284 @@
+"""
+Near-duplicate question cache in front of retrieval / planning.
+
+"2025 оны борлуулалт нийт" and "нийт борлуулалт 2025 он" should not each
+pay for candidate search, an LLM plan and validation. Answered questions are
+stored with their SQL under
+
+    signature  literals (years, numbers, store code, quarter / month, date
+               range) + the normalized keyword feature mask
+    canonical  sorted set of stemmed normalized tokens without filler words
+
+An exact (signature, canonical) match is a hit. With
+ANSWER_CACHE_SIMILAR_ENABLED (off by default) entries with the same signature
+are also compared by cosine similarity of hashed n-gram vectors, and the best
+one above ANSWER_CACHE_MIN_SIMILARITY is a hit, but only when the two
+canonical forms differ in stem variants alone ("sale" / "sales"). The
+signature keeps "хамгийн их" / "хамгийн бага" or 2024 / 2025 apart; the
+stem check keeps filters, entities and negations apart ("excluding" /
+"including returns", "кока кола" / "пепси"), which the signature does not
+see.
+
+Hits re-run the stored SQL (through the executor's result cache), so the
+answer is never older than the data. Similar-match hits are always logged
+for false-hit audits, exact hits at ANSWER_CACHE_AUDIT_RATE.
+"""
+import logging
+import os
+import random
+import re
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, Hashable, NamedTuple, Optional, Set, Tuple
+
+from app.agents.text2sql.intents import QueryContext
+from app.agents.text2sql.spelling import fold
+from app.config import (
+    ANSWER_CACHE_AUDIT_RATE,
+    ANSWER_CACHE_ENABLED,
+    ANSWER_CACHE_MAX_ENTRIES,
+    ANSWER_CACHE_MIN_SIMILARITY,
+    ANSWER_CACHE_SIMILAR_ENABLED,
+    ANSWER_CACHE_TTL_SECONDS,
+)
+from app.core.intent_classifier import text_features
+
+logger = logging.getLogger(__name__)
+
+VECTOR_DIM = 1 << 18
+STEM_CHARS = 5
+# shortest stem that may stand for a longer one ("sale" / "sales")
+MIN_VARIANT_CHARS = 3
+STATS_LOG_EVERY = 200
+
+FILLER_WORDS = {
+    "он", "оны", "онд", "оноос", "жил", "жилийн", "жилд",
+    "вэ", "бэ", "уу", "үү", "юу", "нь", "гэж", "байна", "байгаа",
+    "харуул", "харуулна", "харуулаач", "өг", "өгөөч", "гарга", "гаргаж", "гаргаад", "хэлээч",
+    "the", "of", "in", "for", "show", "me", "please", "what", "is", "give",
+}
+
+LITERAL_RE = re.compile(r"\d+")
+TOKEN_RE = re.compile(r"\w+")
+
+
+class AnswerHit(NamedTuple):
+    key: Tuple[Hashable, str]
+    sql: str
+    rule: str
+    matched: str
+    match: str
+    similarity: float
+
+    def meta(self) -> Dict[str, Any]:
+        return {
+            "match": self.match,
+            "matched_question": self.matched,
+            "similarity": round(self.similarity, 4),
+            "original_rule": self.rule,
+        }
+
+
+# =========================================================
+# Canonical form
+# =========================================================
+
+def signature(ctx: QueryContext) -> Hashable:
+    r = ctx.date_range
+    return (
+        tuple(sorted(set(LITERAL_RE.findall(ctx.normalized)))),
+        ctx.store_code,
+        ctx.quarter,
+        ctx.month,
+        (r.start, r.end) if r else None,
+        ctx.features,
+    )
+
+
+def canonical_tokens(text: str) -> str:
+    stems: Set[str] = set()
+    for tok in TOKEN_RE.findall(text):
+        if tok in FILLER_WORDS:
+            continue
+        stems.add(tok if tok.isdigit() else fold(tok)[:STEM_CHARS])
+    return " ".join(sorted(stems))
+
+
+def stem_variants(a: str, b: str) -> bool:
+    """True when two canonical forms differ only in stems that prefix one another."""
+    sa, sb = set(a.split()), set(b.split())
+
+    def covered(extra: Set[str], other: Set[str]) -> bool:
+        return all(
+            any(
+                min(len(x), len(y)) >= MIN_VARIANT_CHARS and (x.startswith(y) or y.startswith(x))
+                for y in other
+            )
+            for x in extra
+        )
+
+    return covered(sa - sb, sb) and covered(sb - sa, sa)
+
+
+def _vector(text: str) -> Dict[int, float]:
+    idx, val = text_features(text, VECTOR_DIM)
+    return dict(zip(idx.tolist(), val.tolist()))
+
+
+def cosine(a: Dict[int, float], b: Dict[int, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(k, 0.0) for k, v in a.items())
+
+
+# =========================================================
+# Cache
+# =========================================================
+
+@dataclass
+class AnswerEntry:
+    question: str
+    sql: str
+    rule: str
+    vector: Dict[int, float]
+    version: Hashable
+    created_at: float
+    hits: int = 0
+
+
+@dataclass
+class AnswerCache:
+    max_entries: int = ANSWER_CACHE_MAX_ENTRIES
+    ttl_seconds: float = ANSWER_CACHE_TTL_SECONDS
+    min_similarity: float = ANSWER_CACHE_MIN_SIMILARITY
+    similar: bool = ANSWER_CACHE_SIMILAR_ENABLED
+    audit_rate: float = ANSWER_CACHE_AUDIT_RATE
+    enabled: bool = ANSWER_CACHE_ENABLED
+    _entries: "OrderedDict[Tuple[Hashable, str], AnswerEntry]" = field(default_factory=OrderedDict)
+    _by_signature: Dict[Hashable, Set[str]] = field(default_factory=dict)
+    _audit: Deque[Dict[str, Any]] = field(default_factory=lambda: deque(maxlen=50))
+    _stats: Dict[str, int] = field(
+        default_factory=lambda: {
+            "lookups": 0, "exact_hits": 0, "similar_hits": 0, "misses": 0,
+            "stale": 0, "stores": 0, "discarded": 0,
+        }
+    )
+
+    def lookup(self, ctx: QueryContext, version: Hashable) -> Optional[AnswerHit]:
+        if not self.enabled:
+            return None
+        self._stats["lookups"] += 1
+        if self._stats["lookups"] % STATS_LOG_EVERY == 0:
+            s = self.stats()
+            logger.info("answer cache: lookups=%d hit_rate=%.3f entries=%d", s["lookups"], s["hit_rate"], s["entries"])
+
+        sig = signature(ctx)
+        canonical = canonical_tokens(ctx.normalized)
+
+        hit = self._live((sig, canonical), version)
+        if hit is not None:
+            return self._hit((sig, canonical), hit, ctx, "exact", 1.0)
+
+        candidates = self._by_signature.get(sig) if self.similar else None
+        if candidates:
+            vec = _vector(ctx.normalized)
+            best: Optional[Tuple[float, str]] = None
+            for other in list(candidates):
+                if not stem_variants(canonical, other):
+                    continue
+                entry = self._live((sig, other), version)
+                if entry is None:
+                    continue
+                sim = cosine(vec, entry.vector)
+                if sim >= self.min_similarity and (best is None or sim > best[0]):
+                    best = (sim, other)
+            if best is not None:
+                key = (sig, best[1])
+                return self._hit(key, self._entries[key], ctx, "similar", best[0])
+
+        self._stats["misses"] += 1
+        return None
+
+    def store(self, ctx: QueryContext, sql: str, rule: str, version: Hashable) -> None:
+        if not self.enabled or not sql:
+            return
+        sig = signature(ctx)
+        canonical = canonical_tokens(ctx.normalized)
+        key = (sig, canonical)
+
+        self._entries[key] = AnswerEntry(
+            question=ctx.raw,
+            sql=sql,
+            rule=rule,
+            vector=_vector(ctx.normalized),
+            version=version,
+            created_at=time.time(),
+        )
+        self._entries.move_to_end(key)
+        self._by_signature.setdefault(sig, set()).add(canonical)
+        self._stats["stores"] += 1
+
+        while len(self._entries) > self.max_entries:
+            old, _ = self._entries.popitem(last=False)
+            self._forget(old)
+
+    def discard(self, key: Tuple[Hashable, str]) -> None:
+        """Drop an entry whose SQL failed when re-run."""
+        if self._entries.pop(key, None) is not None:
+            self._forget(key)
+            self._stats["discarded"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._stats["lookups"]
+        hits = self._stats["exact_hits"] + self._stats["similar_hits"]
+        return {
+            "pid": os.getpid(),
+            "enabled": self.enabled,
+            "similar": self.similar,
+            "entries": len(self._entries),
+            **self._stats,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "audit_samples": list(self._audit),
+        }
+
+    # ---------------- internals ----------------
+
+    def _live(self, key: Tuple[Hashable, str], version: Hashable) -> Optional[AnswerEntry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expired = self.ttl_seconds > 0 and time.time() - entry.created_at > self.ttl_seconds
+        if entry.version != version or expired:
+            self._stats["stale"] += 1
+            del self._entries[key]
+            self._forget(key)
+            return None
+        return entry
+
+    def _forget(self, key: Tuple[Hashable, str]) -> None:
+        sig, canonical = key
+        bucket = self._by_signature.get(sig)
+        if bucket is not None:
+            bucket.discard(canonical)
+            if not bucket:
+                del self._by_signature[sig]
+
+    def _hit(self, key: Tuple[Hashable, str], entry: AnswerEntry, ctx: QueryContext, match: str, sim: float) -> AnswerHit:
+        entry.hits += 1
+        self._entries.move_to_end(key)
+        self._stats["exact_hits" if match == "exact" else "similar_hits"] += 1
+
+        if match == "similar" or random.random() < self.audit_rate:
+            sample = {"query": ctx.raw, "matched": entry.question, "match": match, "similarity": round(sim, 4)}
+            self._audit.append(sample)
+            logger.info("answer cache audit: %r -> %r (%s %.3f)", ctx.raw, entry.question, match, sim)
+
+        return AnswerHit(key=key, sql=entry.sql, rule=entry.rule, matched=entry.question, match=match, similarity=sim)
+
+
+ANSWER_CACHE = AnswerCache()
+
+
+def answer_cache_stats() -> Dict[str, Any]:
+    return ANSWER_CACHE.stats()
@@ -0,0 +1,285 @@
+"""
+Approximate answers for exploratory questions (ChatRequest.approx).
+
+Exact sums and distinct counts over the whole fact are the slow part of
+"which products sell most" style questions. With approx the executor
+rewrites the SQL it runs:
+
+    functions   count(DISTINCT x) / uniqExact -> uniq,
+                quantile / quantileExact / median -> quantileTDigest / medianTDigest
+    SAMPLE      single SELECTs over a table with a sampling key (system.tables)
+                read APPROX_SAMPLE_RATIO of it; sum / count / sumIf / countIf are
+                scaled back by 1 / ratio, avg needs no scaling. Only when every
+                aggregate can be estimated that way (no min / max / distinct).
+
+A sampled query also returns count() AS __approx_rows, the sampled rows
+behind each output row; finish_approx() drops that column and turns the
+smallest count into a 95% relative error bound. The bound assumes the summed
+values have a coefficient of variation of about 1 (sqrt(2 (1 - r) / n));
+uniq and the t-digest functions add their own typical error.
+
+Every approx answer carries meta["approx"], also when nothing could be
+rewritten (applied = False).
+"""
+import logging
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.agents.text2sql.sql_expr import (
+    Call,
+    Expr,
+    Group,
+    Literal,
+    Node,
+    SqlExprError,
+    Token,
+    Word,
+    parse_expr,
+    render,
+    select_clauses,
+    split_top_level,
+    tokenize,
+)
+from app.config import APPROX_SAMPLE_RATIO, CLICKHOUSE_DATABASE
+
+logger = logging.getLogger(__name__)
+
+ROWS_COLUMN = "__approx_rows"
+
+# exact function -> approximate one (same arguments)
+APPROX_FUNCTIONS = {
+    "uniqexact": "uniq",
+    "quantile": "quantileTDigest",
+    "quantileexact": "quantileTDigest",
+    "quantiles": "quantilesTDigest",
+    "quantilesexact": "quantilesTDigest",
+    "median": "medianTDigest",
+    "medianexact": "medianTDigest",
+}
+
+# typical relative error of the approximate functions
+FUNCTION_ERROR = {"uniq": 0.02, "quantileTDigest": 0.01, "quantilesTDigest": 0.01, "medianTDigest": 0.01}
+
+# aggregates a sample estimates: scaled by 1 / ratio, or a ratio already
+SCALED_AGGREGATES = {"sum", "count", "sumif", "countif"}
+RATIO_AGGREGATES = {"avg", "avgif"}
+# any other aggregate keeps the query off SAMPLE
+OTHER_AGGREGATE_PREFIXES = ("min", "max", "any", "arg", "uniq", "group", "quantile", "median", "topk")
+
+Z_95 = 1.96
+SAMPLING_KEYS_REFRESH_SECONDS = 3600.0
+
+_sampling_keys: Dict[str, str] = {}
+_sampling_keys_loaded_at = 0.0
+_stats = {"requests": 0, "sampled": 0, "functions_only": 0, "not_applied": 0}
+
+
+@dataclass
+class ApproxPlan:
+    sample: Optional[float] = None
+    functions: List[str] = field(default_factory=list)
+    reason: str = ""
+
+    @property
+    def applied(self) -> bool:
+        return self.sample is not None or bool(self.functions)
+
+    def meta(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"applied": self.applied, "sample": self.sample, "functions": self.functions}
+        if self.reason:
+            out["reason"] = self.reason
+        return out
+
+
+# =========================================================
+# Sampling keys
+# =========================================================
+
+def sampling_keys() -> Dict[str, str]:
+    """db.table -> sampling key of the tables that accept SAMPLE; re-read hourly."""
+    global _sampling_keys, _sampling_keys_loaded_at
+    from app.agents.text2sql.executor import run_query
+
+    now = time.monotonic()
+    if _sampling_keys_loaded_at and now - _sampling_keys_loaded_at < SAMPLING_KEYS_REFRESH_SECONDS:
+        return _sampling_keys
+    # failures wait for the next refresh as well, so a broken lookup costs one query per hour
+    _sampling_keys_loaded_at = now
+    try:
+        data = run_query("SELECT database, name, sampling_key FROM system.tables WHERE sampling_key != ''")
+        _sampling_keys = {f"{db}.{table}": key for db, table, key in data["rows"]}
+    except Exception as e:
+        logger.warning("Sampling keys not loaded: %s", e)
+    return _sampling_keys
+
+
+# =========================================================
+# Rewrite
+# =========================================================
+
+def _distinct(call: Call) -> bool:
+    return any(a.nodes and isinstance(a.nodes[0], Word) and a.nodes[0].text.lower() == "distinct" for a in call.args)
+
+
+def _approx_functions(sql: str) -> Tuple[str, List[str]]:
+    """sql with the exact functions renamed (formatting kept) and the approximate ones now used."""
+    try:
+        tokens = tokenize(sql)
+    except SqlExprError:
+        return sql, []
+
+    words = [i for i, t in enumerate(tokens) if t.kind != "ws"]
+    out = list(tokens)
+    used: List[str] = []
+    for n, i in enumerate(words[:-1]):
+        tok = tokens[i]
+        if tok.kind != "ident" or tokens[words[n + 1]].text != "(":
+            continue
+        name = tok.text.lower()
+        approx = APPROX_FUNCTIONS.get(name)
+        if name == "count" and n + 2 < len(words) and tokens[words[n + 2]].text.lower() == "distinct":
+            approx = "uniq"
+            # DISTINCT and the space after it
+            for j in range(words[n + 2], words[n + 3] if n + 3 < len(words) else words[n + 2] + 1):
+                out[j] = Token("ws", "")
+        if approx is None:
+            continue
+        out[i] = Token("ident", approx)
+        if approx not in used:
+            used.append(approx)
+    return "".join(t.text for t in out), used
+
+
+def _aggregates(expr: Expr) -> List[Call]:
+    out: List[Call] = []
+    for node in expr.nodes:
+        if isinstance(node, Call):
+            name = node.name.lower()
+            if name in SCALED_AGGREGATES or name in RATIO_AGGREGATES or name.startswith(OTHER_AGGREGATE_PREFIXES):
+                out.append(node)
+                continue
+            for arg in node.args:
+                out.extend(_aggregates(arg))
+        elif isinstance(node, Group):
+            for item in node.items:
+                out.extend(_aggregates(item))
+    return out
+
+
+def _scaled(expr: Expr, factor: str) -> Expr:
+    """sum(x) -> (sum(x) * factor) for the aggregates a sample undercounts."""
+    out: List[Node] = []
+    for node in expr.nodes:
+        if isinstance(node, Call) and node.name.lower() in SCALED_AGGREGATES:
+            node = Group("(", (Expr((node, Word("*"), Literal(factor))),))
+        elif isinstance(node, Call):
+            node = Call(node.name, tuple(_scaled(a, factor) for a in node.args))
+        elif isinstance(node, Group):
+            node = Group(node.open, tuple(_scaled(i, factor) for i in node.items))
+        out.append(node)
+    return Expr(tuple(out))
+
+
+def _with_sample(sql: str, ratio: float, keys: Dict[str, str]) -> Optional[str]:
+    """The single-SELECT statement reading a sample of its FROM table, None when it cannot."""
+    c = select_clauses(sql)
+    if not c or "select" not in c or "from" not in c:
+        return None
+
+    from_words = [t.text for t in tokenize(c["from"]) if t.kind != "ws"]
+    if len(from_words) == 3 and from_words[1].lower() == "as":
+        from_words = [from_words[0], from_words[2]]
+    if not 1 <= len(from_words) <= 2 or from_words[-1].lower() == "final":
+        return None
+    table = from_words[0] if "." in from_words[0] else f"{CLICKHOUSE_DATABASE}.{from_words[0]}"
+    if table not in keys:
+        return None
+
+    items = split_top_level(c["select"])
+    parsed = [parse_expr(x) for x in items]
+    if not items or any(p is None for p in parsed):
+        return None
+    first = parsed[0].nodes[0]
+    if isinstance(first, Word) and first.text.lower() == "distinct":
+        return None
+
+    aggregates = [a for p in parsed for a in _aggregates(p)]
+    if not aggregates or any(
+            a.name.lower() not in SCALED_AGGREGATES | RATIO_AGGREGATES or _distinct(a)
+            for a in aggregates
+    ):
+        return None
+
+    factor = f"{1 / ratio:g}"
+    select = [render(_scaled(p, factor)) if any(a.name.lower() in SCALED_AGGREGATES for a in _aggregates(p)) else x
+              for x, p in zip(items, parsed)]
+    select.append(f"count() AS {ROWS_COLUMN}")
+
+    out = "SELECT\n  " + ",\n  ".join(select) + f"\nFROM {' '.join(from_words)} SAMPLE {ratio:g}"
+    for clause, head in (("join", "LEFT JOIN"), ("where", "WHERE"), ("group", "GROUP BY"),
+                         ("order", "ORDER BY"), ("limit", "LIMIT")):
+        if clause in c:
+            out += f"\n{head} {c[clause]}"
+    return out
+
+
+def rewrite_approx(sql: str, ratio: float = APPROX_SAMPLE_RATIO) -> Tuple[str, ApproxPlan]:
+    """Approximate form of sql and what was changed; unrewritable SQL comes back as is."""
+    _stats["requests"] += 1
+    plan = ApproxPlan()
+
+    sql, plan.functions = _approx_functions(sql)
+
+    if 0 < ratio < 1:
+        sampled = _with_sample(sql, ratio, sampling_keys())
+        if sampled is not None:
+            sql = sampled
+            plan.sample = ratio
+
+    if plan.sample is not None:
+        _stats["sampled"] += 1
+    elif plan.functions:
+        _stats["functions_only"] += 1
+    else:
+        _stats["not_applied"] += 1
+        plan.reason = "no sampling key or aggregate to approximate"
+    return sql, plan
+
+
+# =========================================================
+# Results
+# =========================================================
+
+def finish_approx(data: Dict[str, Any], plan: ApproxPlan) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """(data without the sampled-rows column, meta["approx"] with the error bound)."""
+    meta = plan.meta()
+    bound = max((FUNCTION_ERROR[f] for f in plan.functions), default=0.0)
+
+    columns = data.get("columns") or []
+    if plan.sample is not None and ROWS_COLUMN in columns:
+        pos = columns.index(ROWS_COLUMN)
+        rows = data.get("rows") or []
+        counts = [int(r[pos]) for r in rows if r[pos]]
+        data = {
+            **data,
+            "columns": columns[:pos] + columns[pos + 1:],
+            "rows": [tuple(r[:pos]) + tuple(r[pos + 1:]) for r in rows],
+        }
+        if counts:
+            smallest = min(counts)
+            bound += Z_95 * math.sqrt(2 * (1 - plan.sample) / smallest)
+            meta["sampled_rows_min"] = smallest
+
+    if plan.applied:
+        meta["error_bound"] = {"relative": round(bound, 4), "confidence": 0.95}
+    return data, meta
+
+
+def approx_stats() -> Dict[str, Any]:
+    return {
+        "sample_ratio": APPROX_SAMPLE_RATIO,
+        "sampled_tables": sorted(_sampling_keys),
+        **_stats,
+    }
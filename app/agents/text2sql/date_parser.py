@@ -0,0 +1,435 @@
+"""
+Relative / absolute date expressions -> concrete half-open [start, end) ranges.
+
+Works on the normalized question (Latin tokens already transliterated), so
+"өнгөрсөн сар", "ungursun sar" and "last month" parse alike. Mongolian and
+English number words are turned into digits first ("гучин хоног" -> "30 хоног").
+
+Rolling windows end today inclusive, like the last-7-days hard rule
+(`SalesDate >= today() - 6`): "сүүлийн 30 хоног" is [today - 29, today + 1).
+"this/last <period>" are calendar periods; "...эхнээс" / YTD / MTD run to today.
+"""
+import re
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Callable, List, Optional, Tuple
+
+from app.agents.text2sql.keyword_automaton import KEYWORDS, register_vocabularies
+
+
+@dataclass(frozen=True)
+class DateRange:
+    start: date
+    end: date  # exclusive
+    grain: str  # day | week | month | quarter | year | custom
+    expression: str
+
+    @property
+    def days(self) -> int:
+        return (self.end - self.start).days
+
+    def as_dict(self) -> dict:
+        return {
+            "start": self.start.isoformat(),
+            "end": self.end.isoformat(),
+            "grain": self.grain,
+            "expression": self.expression,
+        }
+
+
+# =========================================================
+# Calendar helpers
+# =========================================================
+
+def add_months(d: date, months: int) -> date:
+    m = d.month - 1 + months
+    year = d.year + m // 12
+    month = m % 12 + 1
+    days_in_month = (_month_start(year + (month == 12), month % 12 + 1) - timedelta(days=1)).day
+    return date(year, month, min(d.day, days_in_month))
+
+
+def _month_start(year: int, month: int) -> date:
+    return date(year, month, 1)
+
+
+def month_range(year: int, month: int) -> Tuple[date, date]:
+    start = _month_start(year, month)
+    return start, add_months(start, 1)
+
+
+def quarter_range(year: int, quarter: int) -> Tuple[date, date]:
+    start = _month_start(year, (quarter - 1) * 3 + 1)
+    return start, add_months(start, 3)
+
+
+def year_range(year: int) -> Tuple[date, date]:
+    return date(year, 1, 1), date(year + 1, 1, 1)
+
+
+def week_start(d: date) -> date:
+    return d - timedelta(days=d.weekday())
+
+
+# =========================================================
+# Number words
+# =========================================================
+
+UNIT_WORDS = {
+    "нэг": 1, "хоёр": 2, "гурав": 3, "гурван": 3, "дөрөв": 4, "дөрвөн": 4,
+    "тав": 5, "таван": 5, "зургаа": 6, "зургаан": 6, "долоо": 7, "долоон": 7,
+    "найм": 8, "найман": 8, "ес": 9, "есөн": 9,
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+    "seven": 7, "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12,
+    "fourteen": 14, "fifteen": 15, "twenty": 20, "thirty": 30, "sixty": 60, "ninety": 90,
+}
+TENS_WORDS = {
+    "арав": 10, "арван": 10, "хорь": 20, "хорин": 20, "гуч": 30, "гучин": 30,
+    "дөч": 40, "дөчин": 40, "тавь": 50, "тавин": 50, "жар": 60, "жаран": 60,
+    "ная": 70, "наян": 70, "ер": 80, "ерэн": 80,
+}
+HUNDRED_WORDS = {"зуу": 100, "зуун": 100, "hundred": 100}
+
+# "гуравдугаар", "хоёрдугаар", "есдүгээр" -> "3-р", "2-р", "9-р"
+ORDINAL_RE = re.compile(r"^(\w+?)(?:дугаар|дүгээр|дахь|дэх|дох|дөх)$")
+
+
+def _number_value(word: str) -> Optional[int]:
+    for table in (UNIT_WORDS, TENS_WORDS, HUNDRED_WORDS):
+        if word in table:
+            return table[word]
+    return None
+
+
+def replace_number_words(text: str) -> str:
+    out: List[str] = []
+    total: Optional[int] = None
+
+    def flush() -> None:
+        nonlocal total
+        if total is not None:
+            out.append(str(total))
+            total = None
+
+    tokens = text.split()
+    for i, tok in enumerate(tokens):
+        # "долоо хоног" is the word for week, not "7 хоног"
+        if tok == "долоо" and i + 1 < len(tokens) and tokens[i + 1].startswith("хоног"):
+            flush()
+            out.append(tok)
+            continue
+
+        ordinal = False
+        m = ORDINAL_RE.match(tok)
+        if m and _number_value(m.group(1)) is not None:
+            tok, ordinal = m.group(1), True
+
+        value = _number_value(tok)
+        if value is None:
+            flush()
+            out.append(tok)
+            continue
+
+        if value == 100:
+            total = (total or 1) * 100
+        elif total is not None and (total % 100 == 0 or (total % 10 == 0 and value < 10)):
+            total += value
+        else:
+            flush()
+            total = value
+
+        if ordinal:
+            out.append(f"{total}-р")
+            total = None
+
+    flush()
+    return " ".join(out)
+
+
+# =========================================================
+# Vocabulary
+# =========================================================
+
+MONTH_NAMES = {
+    "january": 1, "jan": 1, "february": 2, "feb": 2, "march": 3, "mar": 3,
+    "april": 4, "apr": 4, "may": 5, "june": 6, "jun": 6, "july": 7, "jul": 7,
+    "august": 8, "aug": 8, "september": 9, "sep": 9, "sept": 9, "october": 10, "oct": 10,
+    "november": 11, "nov": 11, "december": 12, "dec": 12,
+}
+MONTH_NAME_RE = "|".join(sorted(MONTH_NAMES, key=len, reverse=True))
+# without a year only full names after "in" / "for" or before "month": "may" and
+# "dec" / "jan" are ordinary words ("may i see the sales")
+BARE_MONTH_NAMES = [
+    "january", "february", "march", "april", "june", "july",
+    "august", "september", "october", "november", "december",
+]
+BARE_MONTH_NAME_RE = "|".join(sorted(BARE_MONTH_NAMES, key=len, reverse=True))
+
+THIS = r"(?:энэ|this|current|одоогийн)"
+LAST = r"(?:өнгөрсөн|last|previous|prev|өмнөх)"
+RECENT = r"(?:сүүлийн|last|past|сүүлд)"
+
+DAY = r"(?:хоног\w*|өдөр\w*|өдр\w*|days?)"
+WEEK = r"(?:долоо хоног\w*|7 хоног\w*|weeks?)"
+MONTH = r"(?:сар\w*|months?)"
+QUARTER = r"(?:улирал\w*|улирл\w*|quarters?)"
+YEAR = r"(?:жил\w*|он\b|оны|онд|years?)"
+
+MONTH_NUM = r"(1[0-2]|0?[1-9])"
+YEAR_NUM = r"(20\d{2})"
+
+
+# =========================================================
+# Expression patterns, most specific first
+# =========================================================
+
+Builder = Callable[[re.Match, date], Optional[Tuple[date, date, str]]]
+
+
+def _iso(y: str, m: str, d: str) -> Optional[date]:
+    try:
+        return date(int(y), int(m), int(d))
+    except ValueError:
+        return None
+
+
+def _explicit_span(m: re.Match, today: date):
+    a = _iso(m.group(1), m.group(2), m.group(3))
+    b = _iso(m.group(4), m.group(5), m.group(6))
+    if not a or not b or b < a:
+        return None
+    return a, b + timedelta(days=1), "custom"
+
+
+def _explicit_day(m: re.Match, today: date):
+    d = _iso(m.group(1), m.group(2), m.group(3))
+    return (d, d + timedelta(days=1), "day") if d else None
+
+
+def _recent(unit: str) -> Builder:
+    def build(m: re.Match, today: date):
+        n = int(m.group(1))
+        if not 1 <= n <= 3660:
+            return None
+        end = today + timedelta(days=1)
+        if unit == "day":
+            start = end - timedelta(days=n)
+        elif unit == "week":
+            start = end - timedelta(days=7 * n)
+        elif unit == "month":
+            start = add_months(today, -n) + timedelta(days=1)
+        else:
+            start = add_months(today, -12 * n) + timedelta(days=1)
+        return start, end, "custom"
+
+    return build
+
+
+def _year_month_span(m: re.Match, today: date):
+    year, a, b = int(m.group(1)), int(m.group(2)), int(m.group(3))
+    if b < a:
+        return None
+    return _month_start(year, a), month_range(year, b)[1], "custom"
+
+
+def _year_month_day(m: re.Match, today: date):
+    d = _iso(m.group(1), m.group(2), m.group(3))
+    return (d, d + timedelta(days=1), "day") if d else None
+
+
+def _year_month(m: re.Match, today: date):
+    start, end = month_range(int(m.group(1)), int(m.group(2)))
+    return start, end, "month"
+
+
+def _month_year(m: re.Match, today: date):
+    start, end = month_range(int(m.group(2)), int(m.group(1)))
+    return start, end, "month"
+
+
+def _month_name_year(m: re.Match, today: date):
+    start, end = month_range(int(m.group(2)), MONTH_NAMES[m.group(1)])
+    return start, end, "month"
+
+
+def _year_month_name(m: re.Match, today: date):
+    start, end = month_range(int(m.group(1)), MONTH_NAMES[m.group(2)])
+    return start, end, "month"
+
+
+def _year_quarter(m: re.Match, today: date):
+    # "2024 q2" / "2024 оны 2-р улирал"
+    start, end = quarter_range(int(m.group(1)), int(m.group(2) or m.group(3)))
+    return start, end, "quarter"
+
+
+def _quarter_year(m: re.Match, today: date):
+    # "q2 2024" / "2-р улирал 2024"
+    start, end = quarter_range(int(m.group(3)), int(m.group(1) or m.group(2)))
+    return start, end, "quarter"
+
+
+def _recent_month(month: int, today: date) -> Tuple[date, date, str]:
+    year = today.year if month <= today.month else today.year - 1
+    start, end = month_range(year, month)
+    return start, end, "month"
+
+
+def _bare_month(m: re.Match, today: date):
+    return _recent_month(int(m.group(1)), today)
+
+
+def _bare_month_name(m: re.Match, today: date):
+    return _recent_month(MONTH_NAMES[m.group(1) or m.group(2)], today)
+
+
+def _fixed(fn: Callable[[date], Tuple[date, date]], grain: str) -> Builder:
+    def build(m: re.Match, today: date):
+        start, end = fn(today)
+        return start, end, grain
+
+    return build
+
+
+def _days_back(n: int) -> Callable[[date], Tuple[date, date]]:
+    return lambda today: (today - timedelta(days=n), today - timedelta(days=n - 1))
+
+
+def _this_week(today: date) -> Tuple[date, date]:
+    start = week_start(today)
+    return start, start + timedelta(days=7)
+
+
+def _last_week(today: date) -> Tuple[date, date]:
+    start = week_start(today) - timedelta(days=7)
+    return start, start + timedelta(days=7)
+
+
+def _this_month(today: date) -> Tuple[date, date]:
+    return month_range(today.year, today.month)
+
+
+def _last_month(today: date) -> Tuple[date, date]:
+    prev = add_months(_month_start(today.year, today.month), -1)
+    return month_range(prev.year, prev.month)
+
+
+def _this_quarter(today: date) -> Tuple[date, date]:
+    return quarter_range(today.year, (today.month - 1) // 3 + 1)
+
+
+def _last_quarter(today: date) -> Tuple[date, date]:
+    start = add_months(_this_quarter(today)[0], -3)
+    return start, add_months(start, 3)
+
+
+def _ytd(today: date) -> Tuple[date, date]:
+    return date(today.year, 1, 1), today + timedelta(days=1)
+
+
+def _mtd(today: date) -> Tuple[date, date]:
+    return _month_start(today.year, today.month), today + timedelta(days=1)
+
+
+def _year(m: re.Match, today: date):
+    start, end = year_range(int(m.group(1)))
+    return start, end, "year"
+
+
+ISO_DATE = r"(20\d{2})[-./](\d{1,2})[-./](\d{1,2})"
+
+# each pattern is only tried when one of its trigger words occurs (one automaton scan)
+YEAR_NUM_WORDS = ["20"]
+MTD_WORDS = ["эхнээс", "эхлэлээс", "mtd", "month to date"]
+YTD_WORDS = ["эхнээс", "эхлэлээс", "ytd", "year to date"]
+RECENT_WORDS = ["сүүлийн", "сүүлд", "last", "past"]
+MONTH_WORDS = ["сар", "month"]
+MONTH_NAME_WORDS = list(MONTH_NAMES)
+BARE_MONTH_NAME_WORDS = list(BARE_MONTH_NAMES)
+QUARTER_WORDS = ["q", "улир", "quarter"]
+THIS_WORDS = ["энэ", "this", "current", "одоогийн"]
+LAST_WORDS = ["өнгөрсөн", "өмнөх", "last", "prev"]
+DAY_BEFORE_WORDS = ["уржигдар", "day before"]
+YESTERDAY_WORDS = ["өчигд", "yesterday"]
+TODAY_WORDS = ["өнөөд", "today"]
+BARE_MONTH_WORDS = ["сар"]
+
+PATTERNS: List[Tuple[re.Pattern, Builder, List[str]]] = [
+    (re.compile(ISO_DATE + r"\D+?" + ISO_DATE), _explicit_span, YEAR_NUM_WORDS),
+    (re.compile(ISO_DATE), _explicit_day, YEAR_NUM_WORDS),
+    (re.compile(r"\bсарын\s+(?:эхнээс|эхлэлээс)|\bmtd\b|month to date"), _fixed(_mtd, "custom"), MTD_WORDS),
+    (re.compile(r"\b(?:оны|жилийн)\s+(?:эхнээс|эхлэлээс)|\bytd\b|year to date"), _fixed(_ytd, "custom"), YTD_WORDS),
+    (re.compile(rf"\b{RECENT}\s+(\d{{1,4}})\s*{WEEK}"), _recent("week"), RECENT_WORDS),
+    (re.compile(rf"\b{RECENT}\s+(\d{{1,4}})\s*{DAY}"), _recent("day"), RECENT_WORDS),
+    (re.compile(rf"\b{RECENT}\s+(\d{{1,3}})\s*{MONTH}"), _recent("month"), RECENT_WORDS),
+    (re.compile(rf"\b{RECENT}\s+(\d{{1,2}})\s*{YEAR}"), _recent("year"), RECENT_WORDS),
+    (re.compile(rf"\b{YEAR_NUM}\s*(?:оны|онд|он)?\s*{MONTH_NUM}\s*-\s*{MONTH_NUM}\s*(?:-р\s*)?{MONTH}"), _year_month_span, MONTH_WORDS),
+    (re.compile(rf"\b{YEAR_NUM}\s*(?:оны|онд|он)?\s*{MONTH_NUM}\s*(?:-р\s*)?сарын\s*(\d{{1,2}})\b"), _year_month_day, MONTH_WORDS),
+    (re.compile(rf"\b{YEAR_NUM}\s*(?:оны|онд|он)?\s*{MONTH_NUM}\s*(?:-р\s*)?{MONTH}"), _year_month, MONTH_WORDS),
+    (re.compile(rf"\b{MONTH_NUM}\s*(?:-р\s*)?{MONTH}\s+{YEAR_NUM}\b"), _month_year, MONTH_WORDS),
+    (re.compile(rf"\b({MONTH_NAME_RE})\s+{YEAR_NUM}\b"), _month_name_year, MONTH_NAME_WORDS),
+    (re.compile(rf"\b{YEAR_NUM}\s+({MONTH_NAME_RE})\b"), _year_month_name, MONTH_NAME_WORDS),
+    (re.compile(rf"\b{YEAR_NUM}\s*(?:оны|онд|он)?\s*(?:q([1-4])\b|([1-4])\s*(?:-р)?\s*{QUARTER})"), _year_quarter, QUARTER_WORDS),
+    (re.compile(rf"\b(?:q([1-4])|([1-4])\s*(?:-р)?\s*{QUARTER})\s*{YEAR_NUM}\b"), _quarter_year, QUARTER_WORDS),
+    (re.compile(r"\b(?:уржигдар|day before yesterday)"), _fixed(_days_back(2), "day"), DAY_BEFORE_WORDS),
+    (re.compile(r"\b(?:өчигдөр\w*|өчигдр\w*|yesterday)"), _fixed(_days_back(1), "day"), YESTERDAY_WORDS),
+    (re.compile(r"\b(?:өнөөдөр\w*|өнөөдр\w*|today)"), _fixed(_days_back(0), "day"), TODAY_WORDS),
+    (re.compile(rf"\b{THIS}\s+{WEEK}"), _fixed(_this_week, "week"), THIS_WORDS),
+    (re.compile(rf"\b{LAST}\s+{WEEK}"), _fixed(_last_week, "week"), LAST_WORDS),
+    (re.compile(rf"\b{THIS}\s+{MONTH}"), _fixed(_this_month, "month"), THIS_WORDS),
+    (re.compile(rf"\b{LAST}\s+{MONTH}"), _fixed(_last_month, "month"), LAST_WORDS),
+    (re.compile(rf"\b{THIS}\s+{QUARTER}"), _fixed(_this_quarter, "quarter"), THIS_WORDS),
+    (re.compile(rf"\b{LAST}\s+{QUARTER}"), _fixed(_last_quarter, "quarter"), LAST_WORDS),
+    (re.compile(rf"\b{THIS}\s+{YEAR}"), _fixed(lambda t: year_range(t.year), "year"), THIS_WORDS),
+    (re.compile(rf"\b{LAST}\s+{YEAR}"), _fixed(lambda t: year_range(t.year - 1), "year"), LAST_WORDS),
+    (
+        re.compile(rf"\b(?:in|for|during|month of)\s+({BARE_MONTH_NAME_RE})\b|\b({BARE_MONTH_NAME_RE})\s+{MONTH}"),
+        _bare_month_name,
+        BARE_MONTH_NAME_WORDS,
+    ),
+    (re.compile(rf"\b{MONTH_NUM}\s*(?:-р\s*)?сар"), _bare_month, BARE_MONTH_WORDS),
+    (re.compile(rf"\b{YEAR_NUM}\b"), _year, YEAR_NUM_WORDS),
+]
+
+
+EXPLICIT_BUILDERS = (_explicit_span, _explicit_day)
+
+register_vocabularies("date", globals())
+
+
+def parse_date_range(text: str, today: Optional[date] = None, raw: str = "") -> Optional[DateRange]:
+    """
+    First (most specific) date expression in `text` as a DateRange, or None.
+    `raw` (the lowercased question) is searched for explicit dates like
+    2024.03.15, whose punctuation normalization drops. Questions naming two
+    different years (comparisons) return None unless an explicit span covers them.
+    """
+    if not text and not raw:
+        return None
+    today = today or date.today()
+
+    for pattern, build, _ in PATTERNS[:len(EXPLICIT_BUILDERS)]:
+        m = pattern.search(raw) if "20" in raw else None
+        if m:
+            built = build(m, today)
+            if built:
+                return DateRange(built[0], built[1], built[2], m.group(0).strip())
+
+    text = replace_number_words((text or "").lower())
+
+    years = set(re.findall(r"\b(20\d{2})\b", text))
+    present = KEYWORDS.scan(text)
+    for pattern, build, triggers in PATTERNS:
+        if not present & KEYWORDS.bit_of(triggers):
+            continue
+        m = pattern.search(text)
+        if not m:
+            continue
+        if len(years) > 1 and build is not _explicit_span:
+            return None
+        built = build(m, today)
+        if built is None:
+            continue
+        start, end, grain = built
+        return DateRange(start, end, grain, m.group(0).strip())
+    return None
@@ -0,0 +1,250 @@
+"""
+In-process name cache of the small dimensions (DIMENSION_CACHE_ENABLED).
+
+Top-N answers need names for 10-50 codes, yet a name join makes ClickHouse
+hash the whole dimension per query. The cache keeps code -> name for
+
+    Dimension_SM   BIZLOC_CD -> BIZLOC_NM
+    Dimension_IM   GDS_CD    -> GDS_NM
+    Dimension_LEM  EVT_CD    -> EVT_NM
+
+as one string blob with an offsets array and a code -> index dict, loaded at
+startup and refreshed every DIMENSION_CACHE_REFRESH_SECONDS in a daemon
+thread. The executor then runs name joins code-only:
+
+    SELECT d1.GDS_NM AS product_name ...           SELECT f.GDS_CD AS product_name ...
+    LEFT JOIN Dimension_IM d1 ON f.GDS_CD = ...     (join dropped)
+    GROUP BY d1.GDS_NM                              GROUP BY f.GDS_CD
+
+and attach_names() swaps the codes of product_name for names afterwards
+(unknown codes give '' like the LEFT JOIN). A join is only rewritten when
+its alias is read as `<name> AS <column>` in SELECT, in GROUP BY, or as
+the key; a name in WHERE / ORDER BY keeps the join. Grouping by code
+instead of name keeps two products with the same name apart.
+
+Plans built in this mode select the code directly (`f.GDS_CD AS
+product_name`, see ensure_product_name_join); such columns are named too.
+"""
+import logging
+import threading
+import time
+from array import array
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.agents.text2sql.name_dictionaries import drop_span, find_lookup_join, word_positions
+from app.agents.text2sql.sql_expr import SqlExprError, Token, tokenize
+from app.config import (
+    CLICKHOUSE_DATABASE,
+    DIMENSION_CACHE_ENABLED,
+    DIMENSION_CACHE_REFRESH_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+CLAUSES = {"select", "from", "where", "prewhere", "group", "order", "having", "limit", "settings"}
+
+
+@dataclass(frozen=True)
+class DimensionSpec:
+    table: str
+    key: str
+    name: str
+
+
+# output columns that hold names: a bare `<x>.<key> AS <column>` is named as well
+NAME_COLUMNS: Dict[str, Tuple[str, ...]] = {
+    "Dimension_SM": ("store_name", "branch_name"),
+    "Dimension_IM": ("product_name", "item_name"),
+    "Dimension_LEM": ("event_name",),
+}
+
+DIMENSIONS: Dict[str, DimensionSpec] = {
+    s.table: s
+    for s in (
+        DimensionSpec("Dimension_SM", "BIZLOC_CD", "BIZLOC_NM"),
+        DimensionSpec("Dimension_IM", "GDS_CD", "GDS_NM"),
+        DimensionSpec("Dimension_LEM", "EVT_CD", "EVT_NM"),
+    )
+}
+
+
+class DimensionNames:
+    """code -> name without a Python str object per name."""
+
+    def __init__(self, rows: List[Tuple[Any, Any]]):
+        self.index: Dict[str, int] = {}
+        self.offsets = array("L", [0])
+        parts: List[str] = []
+        pos = 0
+        for code, name in rows:
+            code = str(code)
+            if code in self.index:
+                continue
+            name = "" if name is None else str(name)
+            self.index[code] = len(self.offsets) - 1
+            parts.append(name)
+            pos += len(name)
+            self.offsets.append(pos)
+        self.blob = "".join(parts)
+        self.loaded_at = time.time()
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def name(self, code: Any) -> Optional[str]:
+        i = self.index.get(str(code))
+        if i is None:
+            return None
+        return self.blob[self.offsets[i]:self.offsets[i + 1]]
+
+
+class DimensionCache:
+    def __init__(self, specs: Dict[str, DimensionSpec]):
+        self.specs = specs
+        self.tables: Dict[str, DimensionNames] = {}
+        self.stats = {"refreshes": 0, "refresh_errors": 0, "rewrites": 0, "names": 0, "misses": 0}
+        self._thread: Optional[threading.Thread] = None
+
+    # ---------------- loading ----------------
+
+    def refresh(self) -> None:
+        from app.agents.text2sql.executor import run_query
+
+        for spec in self.specs.values():
+            try:
+                data = run_query(
+                    f"SELECT toString({spec.key}), {spec.name} FROM {CLICKHOUSE_DATABASE}.{spec.table}"
+                )
+                # swapped whole: readers see the old or the new table, never a partial one
+                self.tables[spec.table] = DimensionNames(data["rows"])
+            except Exception as e:
+                self.stats["refresh_errors"] += 1
+                logger.warning("Dimension cache refresh of %s failed: %s", spec.table, e)
+        self.stats["refreshes"] += 1
+
+    def _refresh_loop(self) -> None:
+        while True:
+            self.refresh()
+            time.sleep(DIMENSION_CACHE_REFRESH_SECONDS)
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._refresh_loop, name="dimension-cache", daemon=True)
+            self._thread.start()
+
+    # ---------------- SQL ----------------
+
+    def rewrite(self, sql: str) -> Tuple[str, Dict[str, str]]:
+        """Code-only SQL for loaded dimensions and {output column: dimension table} to name afterwards."""
+        try:
+            tokens = tokenize(sql)
+        except SqlExprError:
+            return sql, {}
+
+        keys = {table: self.specs[table].key for table in list(self.tables)}
+        enrich: Dict[str, str] = {}
+        start = 0
+        while True:
+            words = word_positions(tokens)
+            found = find_lookup_join(tokens, words, start, keys)
+            if found is None:
+                enrich.update(self._code_columns(tokens, words, keys))
+                return "".join(t.text for t in tokens), enrich
+            first, last, table, alias, fact_key = found
+
+            rewritten = self._code_only(drop_span(tokens, words, first, last), alias, self.specs[table], fact_key)
+            if rewritten is None:
+                start = first + 1
+                continue
+            tokens, columns = rewritten
+            enrich.update({col: table for col in columns})
+            self.stats["rewrites"] += 1
+            start = 0
+
+    @staticmethod
+    def _code_columns(tokens: List[Token], words: List[int], keys: Dict[str, str]) -> Dict[str, str]:
+        """{column: dimension table} of `<x>.<key> AS <name column>` selected without a join."""
+        out: Dict[str, str] = {}
+        for n in range(len(words) - 2):
+            tok, kw, col = (tokens[words[n + k]] for k in range(3))
+            if tok.kind != "ident" or kw.text.lower() != "as" or col.kind != "ident":
+                continue
+            key = tok.text.rsplit(".", 1)[-1]
+            for table, dim_key in keys.items():
+                if key == dim_key and col.text in NAME_COLUMNS.get(table, ()):
+                    out[col.text] = table
+        return out
+
+    @staticmethod
+    def _code_only(
+            tokens: List[Token],
+            alias: str,
+            spec: DimensionSpec,
+            fact_key: str,
+    ) -> Optional[Tuple[List[Token], List[str]]]:
+        words = word_positions(tokens)
+        out = list(tokens)
+        columns: List[str] = []
+        clause = ""
+        for n, i in enumerate(words):
+            tok = tokens[i]
+            if tok.kind == "ident" and tok.text.lower() in CLAUSES:
+                clause = tok.text.lower()
+            if tok.kind != "ident" or not (tok.text == alias or tok.text.startswith(f"{alias}.")):
+                continue
+            col = tok.text[len(alias) + 1:]
+            if col == spec.key:
+                out[i] = Token("expr", fact_key)
+            elif col == spec.name and clause == "group":
+                out[i] = Token("expr", fact_key)
+            elif col == spec.name and clause == "select" and n + 2 < len(words) and tokens[words[n + 1]].text.lower() == "as":
+                out[i] = Token("expr", fact_key)
+                columns.append(tokens[words[n + 2]].text)
+            else:
+                return None
+        return out, columns
+
+    def attach_names(self, data: Dict[str, Any], enrich: Dict[str, str]) -> Dict[str, Any]:
+        """Copy of data with the code columns in enrich replaced by names."""
+        positions = [
+            (data["columns"].index(col), self.tables[table])
+            for col, table in enrich.items()
+            if col in data["columns"] and table in self.tables
+        ]
+        if not positions:
+            return data
+
+        rows = []
+        for row in data["rows"]:
+            row = list(row)
+            for pos, names in positions:
+                name = names.name(row[pos])
+                if name is None:
+                    self.stats["misses"] += 1
+                    name = ""
+                row[pos] = name
+            rows.append(tuple(row))
+        self.stats["names"] += len(rows) * len(positions)
+        return {**data, "rows": rows}
+
+
+DIMENSION_CACHE = DimensionCache(DIMENSIONS)
+
+
+def start_dimension_cache() -> None:
+    if DIMENSION_CACHE_ENABLED:
+        DIMENSION_CACHE.start()
+
+
+def dimension_cache_stats() -> Dict[str, Any]:
+    now = time.time()
+    return {
+        "enabled": DIMENSION_CACHE_ENABLED,
+        "refresh_seconds": DIMENSION_CACHE_REFRESH_SECONDS,
+        "tables": {
+            table: {"codes": len(names), "blob_chars": len(names.blob), "age_s": round(now - names.loaded_at)}
+            for table, names in DIMENSION_CACHE.tables.items()
+        },
+        **DIMENSION_CACHE.stats,
+    }
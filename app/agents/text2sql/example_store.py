@@ -0,0 +1,194 @@
+"""
+Few-shot planner examples picked per question.
+
+The store is seeded with the hand-written planning_examples() and extended by
+EXAMPLE_STORE_PATH, built offline from successful llm_plan history rows by
+scripts/build_example_store.py. It does not grow while serving: a plan that
+ran without error can still be wrong, and reusing it as a few-shot example
+would spread the mistake.
+
+Questions are indexed as hashed char / word n-gram vectors (the intent
+classifier's features) in a CSR matrix; select() returns the most similar
+examples up to top_k and a prompt token budget.
+"""
+import json
+import logging
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.agents.text2sql.intents import normalize_query
+from app.config import (
+    EXAMPLE_STORE_MAX_ENTRIES,
+    EXAMPLE_STORE_PATH,
+    PLANNER_EXAMPLES_TOKEN_BUDGET,
+    PLANNER_EXAMPLES_TOP_K,
+)
+from app.core.intent_classifier import text_features
+from app.core.tokens import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+VECTOR_DIM = 1 << 16
+# two examples this close are the same question with other literals
+DUPLICATE_SIMILARITY = 0.97
+
+
+@dataclass
+class PlanExample:
+    question: str
+    plan: Dict[str, Any]
+    source: str
+    tokens: int
+
+    def as_prompt(self) -> Dict[str, Any]:
+        return {"question": self.question, "plan": self.plan}
+
+
+class ExampleStore:
+    def __init__(self, max_entries: int = EXAMPLE_STORE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.examples: List[PlanExample] = []
+        self._keys: Dict[str, int] = {}
+        self._vectors: List[Tuple[np.ndarray, np.ndarray]] = []
+        self._csr: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None
+
+    def __len__(self) -> int:
+        return len(self.examples)
+
+    # ---------------- building ----------------
+
+    def add(self, question: str, plan: Dict[str, Any], source: str = "history") -> bool:
+        """Add (or refresh) an example; the oldest non-seed example goes when full."""
+        key = normalize_query(question)
+        if not key or not isinstance(plan, dict):
+            return False
+
+        example = PlanExample(
+            question=question.strip(),
+            plan=plan,
+            source=source,
+            tokens=estimate_tokens(json.dumps({"question": question, "plan": plan}, ensure_ascii=False)),
+        )
+        pos = self._keys.get(key)
+        if pos is not None:
+            if self.examples[pos].source == "seed":
+                return False
+            self.examples[pos] = example
+            return True
+
+        if len(self.examples) >= self.max_entries and not self._evict():
+            return False
+
+        self._keys[key] = len(self.examples)
+        self.examples.append(example)
+        self._vectors.append(text_features(key, VECTOR_DIM))
+        self._csr = None
+        return True
+
+    def load(self, path: str = EXAMPLE_STORE_PATH) -> int:
+        if not path or not os.path.exists(path):
+            return 0
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                rows = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Planner examples %s not loaded: %s", path, e)
+            return 0
+
+        added = sum(
+            1 for row in rows
+            if isinstance(row, dict) and self.add(row.get("question") or "", row.get("plan"), source="history")
+        )
+        logger.info("Loaded %d planner examples from %s", added, path)
+        return added
+
+    def save(self, path: str = EXAMPLE_STORE_PATH, sources: Tuple[str, ...] = ("history",)) -> int:
+        rows = [e.as_prompt() for e in self.examples if e.source in sources]
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(rows, f, ensure_ascii=False, indent=1)
+        return len(rows)
+
+    def _evict(self) -> bool:
+        for i, e in enumerate(self.examples):
+            if e.source != "seed":
+                del self.examples[i]
+                del self._vectors[i]
+                self._keys = {normalize_query(x.question): j for j, x in enumerate(self.examples)}
+                self._csr = None
+                return True
+        return False
+
+    # ---------------- selection ----------------
+
+    def _matrix(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        if self._csr is None:
+            indptr = np.zeros(len(self._vectors) + 1, dtype=np.int64)
+            indptr[1:] = np.cumsum([len(idx) for idx, _ in self._vectors])
+            indices = np.concatenate([idx for idx, _ in self._vectors]) if self._vectors else np.empty(0, np.int64)
+            data = np.concatenate([val for _, val in self._vectors]) if self._vectors else np.empty(0, np.float32)
+            self._csr = (indptr, indices, data)
+        return self._csr
+
+    def similarities(self, question: str) -> np.ndarray:
+        if not self.examples:
+            return np.empty(0, dtype=np.float32)
+        idx, val = text_features(question, VECTOR_DIM)
+        q = np.zeros(VECTOR_DIM, dtype=np.float32)
+        q[idx] = val
+
+        indptr, indices, data = self._matrix()
+        products = np.append(data * q[indices], np.float32(0.0))
+        scores = np.add.reduceat(products, indptr[:-1])
+        scores[indptr[1:] == indptr[:-1]] = 0.0
+        return scores
+
+    def select(
+            self,
+            question: str,
+            top_k: int = PLANNER_EXAMPLES_TOP_K,
+            token_budget: int = PLANNER_EXAMPLES_TOKEN_BUDGET,
+    ) -> List[Dict[str, Any]]:
+        """Most similar examples, skipping near-duplicates, within top_k and token_budget."""
+        scores = self.similarities(question)
+        if not len(scores):
+            return []
+
+        picked: List[int] = []
+        used = 0
+        for i in np.argsort(-scores, kind="stable"):
+            if len(picked) >= top_k:
+                break
+            e = self.examples[int(i)]
+            if picked and used + e.tokens > token_budget:
+                continue
+            if any(_cosine(self._vectors[int(i)], self._vectors[j]) >= DUPLICATE_SIMILARITY for j in picked):
+                continue
+            picked.append(int(i))
+            used += e.tokens
+        return [self.examples[i].as_prompt() for i in picked]
+
+
+def _cosine(a: Tuple[np.ndarray, np.ndarray], b: Tuple[np.ndarray, np.ndarray]) -> float:
+    common, ia, ib = np.intersect1d(a[0], b[0], assume_unique=True, return_indices=True)
+    return float(np.dot(a[1][ia], b[1][ib])) if len(common) else 0.0
+
+
+_store: Optional[ExampleStore] = None
+
+
+def get_example_store(seed: List[Dict[str, Any]]) -> ExampleStore:
+    """Shared store: seed examples first, then the offline-built file."""
+    global _store
+    if _store is None:
+        store = ExampleStore()
+        for ex in seed:
+            store.add(ex["question"], ex["plan"], source="seed")
+        store.load(EXAMPLE_STORE_PATH)
+        _store = store
+    return _store
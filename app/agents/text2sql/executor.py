@@ -1,16 +1,48 @@
-from typing import Any, Dict, Optional
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
 import re
+import threading
 import time
 
 import clickhouse_connect
 
+from app.agents.text2sql.approx import finish_approx, rewrite_approx
+from app.agents.text2sql.dimension_cache import DIMENSION_CACHE
+from app.agents.text2sql.name_dictionaries import rewrite_name_joins
+from app.agents.text2sql.sql_expr import SqlExprError, Token, tokenize
+from app.agents.text2sql.sql_params import closed_period, sql_params
+from app.agents.text2sql.topn_rewrite import rewrite_topn_before_join
 from app.config import (
     CLICKHOUSE_HOST,
     CLICKHOUSE_PORT,
     CLICKHOUSE_USER,
     CLICKHOUSE_PASSWORD,
     CLICKHOUSE_DATABASE,
+    DIMENSION_CACHE_ENABLED,
+    NAME_DICTIONARIES_ENABLED,
+    RESULT_CACHE_MAX_ENTRIES,
+    RESULT_CACHE_TTL_SECONDS,
+    SQL_PREFLIGHT,
+    SQL_PREFLIGHT_CACHE_MAX_ENTRIES,
+    SQL_QUERY_CACHE_ENABLED,
+    SQL_QUERY_CACHE_TTL_SECONDS,
+    TOPN_REWRITE_ENABLED,
 )
+from app.core.schema_sync import registry_version
+
+# (executed SQL, parameters) -> (stored_at, result); short-lived, per worker
+_result_cache: "OrderedDict[Tuple[str, Tuple[Tuple[str, Any], ...]], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+_result_stats = {"lookups": 0, "hits": 0, "query_cache_requests": 0}
+# previews also run in worker threads (speculative fallback)
+_result_lock = threading.Lock()
+
+# SQL fingerprint -> EXPLAIN error (None: known good); per worker, per registry version
+_preflight_cache: "OrderedDict[str, Optional[str]]" = OrderedDict()
+_preflight_version = 0
+_preflight_stats = {
+    "checks": 0, "cached_ok": 0, "cached_bad": 0, "rejected": 0, "repaired": 0, "unavailable": 0,
+    "schema_resets": 0,
+}
 
 
 # ======================================================
@@ -31,24 +63,39 @@ def ch_client():
 # SQL safety / normalization
 # ======================================================
 
+FORBIDDEN_STATEMENTS = {"INSERT", "UPDATE", "DELETE", "DROP", "ALTER", "TRUNCATE"}
+
+
 def normalize_sql(sql: str) -> str:
     if not sql:
         return sql
 
     s = sql.strip().rstrip(";")
 
-    # CURRENT_DATE -> today()
-    s = re.sub(r"\bCURRENT_DATE\b", "today()", s, flags=re.IGNORECASE)
-
-    # NOW() normalization (ClickHouse ok, but ensure format)
-    s = re.sub(r"\bNOW\(\)\b", "now()", s, flags=re.IGNORECASE)
+    try:
+        tokens = tokenize(s)
+    except SqlExprError:
+        # not a plain expression stream (comments, ';' inside): substring checks
+        s = re.sub(r"\bCURRENT_DATE\b", "today()", s, flags=re.IGNORECASE)
+        s = re.sub(r"\bNOW\(\)", "now()", s, flags=re.IGNORECASE)
+        if any(f in s.upper() for f in FORBIDDEN_STATEMENTS):
+            raise ValueError("Only SELECT queries are allowed.")
+        return s
 
-    # Remove dangerous statements
-    forbidden = ["INSERT", "UPDATE", "DELETE", "DROP", "ALTER", "TRUNCATE"]
-    if any(f in s.upper() for f in forbidden):
-        raise ValueError("Only SELECT queries are allowed.")
+    # word tokens only: 'DROP' in a string literal or a LastUpdated column is fine
+    out = []
+    for i, tok in enumerate(tokens):
+        text = tok.text
+        if tok.kind == "ident":
+            if any(part.upper() in FORBIDDEN_STATEMENTS for part in text.split(".")):
+                raise ValueError("Only SELECT queries are allowed.")
+            if text.upper() == "CURRENT_DATE":
+                text = "today()"
+            elif text.upper() == "NOW" and tokens[i + 1:i + 2] == [Token("op", "(")]:
+                text = "now"
+        out.append(text)
 
-    return s
+    return "".join(out)
 
 
 def ensure_limit(sql: str, max_rows: int = 50) -> str:
@@ -90,9 +137,16 @@ def fix_common_errors(sql: str, error: str) -> Optional[str]:
 # Query execution
 # ======================================================
 
-def run_query(sql: str) -> Dict[str, Any]:
+def run_query(
+        sql: str,
+        params: Optional[Dict[str, Any]] = None,
+        settings: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """`{name:Type}` placeholders in sql are bound server-side from params."""
+    if settings and settings.get("use_query_cache"):
+        _result_stats["query_cache_requests"] += 1
     client = ch_client()
-    result = client.query(sql)
+    result = client.query(sql, parameters=params or None, settings=settings or None)
 
     return {
         "columns": result.column_names or [],
@@ -100,15 +154,162 @@ def run_query(sql: str) -> Dict[str, Any]:
     }
 
 
+def query_settings(sql: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """use_query_cache for parameterized SQL over finished periods (SQL_QUERY_CACHE_ENABLED)."""
+    if not SQL_QUERY_CACHE_ENABLED or not closed_period(sql, params):
+        return {}
+    return {"use_query_cache": 1, "query_cache_ttl": SQL_QUERY_CACHE_TTL_SECONDS}
+
+
+def cached_run_query(
+        sql: str,
+        params: Optional[Dict[str, Any]] = None,
+        settings: Optional[Dict[str, Any]] = None,
+) -> Tuple[Dict[str, Any], bool]:
+    """run_query with a TTL cache keyed on the exact SQL and parameters; returns (data, hit)."""
+    if RESULT_CACHE_TTL_SECONDS <= 0:
+        return run_query(sql, params, settings), False
+
+    key = (sql, tuple(sorted((params or {}).items())))
+    now = time.monotonic()
+    with _result_lock:
+        _result_stats["lookups"] += 1
+        hit = _result_cache.get(key)
+        if hit is not None and now - hit[0] <= RESULT_CACHE_TTL_SECONDS:
+            _result_stats["hits"] += 1
+            _result_cache.move_to_end(key)
+            return hit[1], True
+
+    data = run_query(sql, params, settings)
+    with _result_lock:
+        _result_cache[key] = (now, data)
+        _result_cache.move_to_end(key)
+        while len(_result_cache) > RESULT_CACHE_MAX_ENTRIES:
+            _result_cache.popitem(last=False)
+    return data, False
+
+
+def result_cache_stats() -> Dict[str, Any]:
+    lookups = _result_stats["lookups"]
+    return {
+        "entries": len(_result_cache),
+        **_result_stats,
+        "hit_rate": round(_result_stats["hits"] / lookups, 4) if lookups else 0.0,
+    }
+
+
+# ======================================================
+# Pre-flight EXPLAIN
+# ======================================================
+
+# errors that hold for every query of the same shape (until the schema changes)
+STRUCTURAL_ERRORS = {
+    "SYNTAX_ERROR", "UNKNOWN_IDENTIFIER", "UNKNOWN_FUNCTION", "UNKNOWN_TABLE",
+    "UNKNOWN_DATABASE", "UNKNOWN_TYPE", "NOT_AN_AGGREGATE", "ILLEGAL_AGGREGATION",
+    "NUMBER_OF_ARGUMENTS_DOESNT_MATCH", "AMBIGUOUS_COLUMN_NAME",
+}
+# bad queries whose error depends on the literals (a string compared with a
+# number ...): rejected, but not remembered for the shape
+LITERAL_ERRORS = {"ILLEGAL_TYPE_OF_ARGUMENT", "NO_COMMON_TYPE", "TYPE_MISMATCH"}
+
+ERROR_NAME_RE = re.compile(r"\(([A-Z][A-Z_]{2,})\)")
+
+
+# literal kind -> its place in a fingerprint; `{name:Type}` parameters stay as written
+LITERAL_MARKS = {"string": "?s", "number": "?n"}
+
+
+def sql_fingerprint(sql: str) -> str:
+    """
+    SQL shape: string / number literals as ?s / ?n, whitespace collapsed.
+    Untokenizable SQL is its own shape.
+    """
+    try:
+        tokens = tokenize(sql)
+    except SqlExprError:
+        return sql
+    parts = []
+    for tok in tokens:
+        if tok.kind == "ws":
+            continue
+        parts.append(LITERAL_MARKS.get(tok.kind, tok.text))
+    return " ".join(parts)
+
+
+def preflight_sql(sql: str, params: Optional[Dict[str, Any]] = None) -> Optional[str]:
+    """
+    EXPLAIN SYNTAX / EXPLAIN PLAN (SQL_PREFLIGHT) without reading data.
+    Returns the ClickHouse error of a bad query, None when it is good,
+    preflight is off, or the check itself could not run.
+    """
+    global _preflight_version
+    if SQL_PREFLIGHT not in ("syntax", "plan"):
+        return None
+
+    fp = sql_fingerprint(sql)
+    version = registry_version()
+    with _result_lock:
+        if version != _preflight_version:
+            # a schema sync can add the column an UNKNOWN_IDENTIFIER verdict was about
+            if _preflight_cache:
+                _preflight_stats["schema_resets"] += 1
+            _preflight_cache.clear()
+            _preflight_version = version
+        if fp in _preflight_cache:
+            _preflight_cache.move_to_end(fp)
+            error = _preflight_cache[fp]
+            _preflight_stats["cached_bad" if error else "cached_ok"] += 1
+            return error
+
+    _preflight_stats["checks"] += 1
+    try:
+        ch_client().query(f"EXPLAIN {SQL_PREFLIGHT.upper()} {sql}", parameters=params or None)
+        error = None
+    except Exception as e:
+        error = str(e)
+        name = ERROR_NAME_RE.search(error)
+        code = name.group(1) if "Code:" in error and name else None
+        if code in LITERAL_ERRORS:
+            return error
+        if code not in STRUCTURAL_ERRORS:
+            # connection, load or permission errors (TIMEOUT_EXCEEDED, ACCESS_DENIED ...)
+            # say nothing about the query: let the real query decide
+            _preflight_stats["unavailable"] += 1
+            return None
+
+    with _result_lock:
+        _preflight_cache[fp] = error
+        _preflight_cache.move_to_end(fp)
+        while len(_preflight_cache) > SQL_PREFLIGHT_CACHE_MAX_ENTRIES:
+            _preflight_cache.popitem(last=False)
+    return error
+
+
+def preflight_stats() -> Dict[str, Any]:
+    bad = sum(1 for error in _preflight_cache.values() if error)
+    return {
+        "mode": SQL_PREFLIGHT,
+        "shapes_ok": len(_preflight_cache) - bad,
+        "shapes_bad": bad,
+        **_preflight_stats,
+    }
+
+
 # ======================================================
 # Main preview executor
 # ======================================================
 
-def run_sql_preview(sql: str, max_rows: int = 50) -> Dict[str, Any]:
+def run_sql_preview(sql: str, max_rows: int = 50, approx: bool = False) -> Dict[str, Any]:
     """
     Execute SQL safely with:
     - normalization
+    - SAMPLE / approximate aggregates when approx is asked for
+    - `{name:Type}` values bound server-side (BoundSQL.params)
+    - name joins code-only + cached names (DIMENSION_CACHE_ENABLED)
+    - top-N / aggregation before the name join (TOPN_REWRITE_ENABLED)
+    - name joins as dictGet (NAME_DICTIONARIES_ENABLED)
     - limit enforcement
+    - EXPLAIN pre-flight (SQL_PREFLIGHT)
     - auto-fix retry
     """
 
@@ -120,8 +321,19 @@ def run_sql_preview(sql: str, max_rows: int = 50) -> Dict[str, Any]:
             "executed_sql": "",
         }
 
+    params = sql_params(sql)
     try:
         safe_sql = normalize_sql(sql)
+        approx_plan = None
+        if approx:
+            safe_sql, approx_plan = rewrite_approx(safe_sql)
+        enrich = {}
+        if DIMENSION_CACHE_ENABLED:
+            safe_sql, enrich = DIMENSION_CACHE.rewrite(safe_sql)
+        if TOPN_REWRITE_ENABLED:
+            safe_sql = rewrite_topn_before_join(safe_sql)
+        if NAME_DICTIONARIES_ENABLED:
+            safe_sql = rewrite_name_joins(safe_sql)
         safe_sql = ensure_limit(safe_sql, max_rows)
 
     except Exception as e:
@@ -132,15 +344,46 @@ def run_sql_preview(sql: str, max_rows: int = 50) -> Dict[str, Any]:
             "executed_sql": sql,
         }
 
+    # Pre-flight: repair or reject a bad query before it scans anything
+    preflight_error = preflight_sql(safe_sql, params)
+    if preflight_error:
+        fixed_sql = fix_common_errors(safe_sql, preflight_error)
+        if fixed_sql and fixed_sql != safe_sql:
+            fixed_sql = ensure_limit(fixed_sql, max_rows)
+        if not fixed_sql or fixed_sql == safe_sql or preflight_sql(fixed_sql, params):
+            _preflight_stats["rejected"] += 1
+            return {
+                "columns": [],
+                "rows": [],
+                "error": preflight_error,
+                "executed_sql": safe_sql,
+                "preflight": "rejected",
+            }
+        _preflight_stats["repaired"] += 1
+        safe_sql = fixed_sql
+
+    settings = query_settings(safe_sql, params)
+
     # First attempt
     try:
-        data = run_query(safe_sql)
+        data, cached = cached_run_query(safe_sql, params, settings)
+        if enrich:
+            data = DIMENSION_CACHE.attach_names(data, enrich)
+        if approx_plan:
+            data, approx_meta = finish_approx(data, approx_plan)
 
-        return {
+        out = {
             "columns": data["columns"],
             "rows": data["rows"][:max_rows],
             "executed_sql": safe_sql,
         }
+        if approx_plan:
+            out["approx"] = approx_meta
+        if cached:
+            out["result_cache"] = "hit"
+        if preflight_error:
+            out.update(auto_fixed=True, original_error=preflight_error, preflight="repaired")
+        return out
 
     except Exception as e:
         error_msg = str(e)
@@ -151,15 +394,22 @@ def run_sql_preview(sql: str, max_rows: int = 50) -> Dict[str, Any]:
         if fixed_sql and fixed_sql != safe_sql:
             try:
                 fixed_sql = ensure_limit(fixed_sql, max_rows)
-                data = run_query(fixed_sql)
+                data = run_query(fixed_sql, params, settings)
+                if enrich:
+                    data = DIMENSION_CACHE.attach_names(data, enrich)
+                if approx_plan:
+                    data, approx_meta = finish_approx(data, approx_plan)
 
-                return {
+                out = {
                     "columns": data["columns"],
                     "rows": data["rows"][:max_rows],
                     "executed_sql": fixed_sql,
                     "auto_fixed": True,
                     "original_error": error_msg,
                 }
+                if approx_plan:
+                    out["approx"] = approx_meta
+                return out
 
             except Exception as e2:
                 return {
@@ -1,13 +1,26 @@
+import logging
+import os
 import re
-from typing import Any, Optional
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
-from app.config import CLICKHOUSE_DATABASE
+from app.config import CLICKHOUSE_DATABASE, SQL_RULES_PATH, SQL_RULES_RELOAD_SECONDS
 from app.agents.text2sql.intents import (
     Intent,
+    QueryLike,
+    as_context,
     extract_year,
     extract_years,
     extract_quarter,
+    extract_top_n,
 )
+from app.agents.text2sql.keyword_automaton import KEYWORDS, register_vocabularies
+from app.agents.text2sql.rule_templates import TemplateRuleSet
+from app.agents.text2sql.sql_params import bind
+
+logger = logging.getLogger(__name__)
 
 # =========================================================
 # Canonical tables
@@ -37,53 +50,103 @@ def inventory_fact() -> str:
     return INVENTORY_FACT
 
 
+# =========================================================
+# Keyword vocabularies (matched on the lowercased raw question)
+# =========================================================
+
+WHERE_TABLE_WORDS = [
+    "хаана", "ямар table", "аль table", "ямар хүснэгт", "аль хүснэгт",
+    "where", "which table", "table name"
+]
+WHERE_INVENTORY_WORDS = ["хаана", "ямар table", "аль table", "ямар хүснэгт", "which table"]
+ABOUT_WORDS = [
+    "ямар дата", "ямар мэдээлэл", "юу байдаг", "ямар багана",
+    "тайлбар", "about", "what data", "what is in", "columns"
+]
+TABLE_LIST_WORDS = ["ямар table", "аль table", "хүснэгтүүд", "tables", "table list"]
+UNRELATED_WORDS = [
+    "hello", "hi", "hey", "сайн уу", "юу байна", "чи хэн бэ",
+    "how are you", "who are you", "weather", "цаг агаар",
+    "кино", "дуу", "music", "game", "тоглоом"
+]
+
+SALES_HELP_WORDS = ["sales", "борлуул", "орлого", "netsale", "grosssale", "soldqty"]
+SALES_RELATED_WORDS = ["sales", "борлуул", "product", "бараа", "store", "салбар"]
+SALES_STEM_WORDS = ["борлуул", "sales", "орлого", "netsale", "grosssale"]
+SALES_TREND_WORDS = ["борлуул", "sales", "орлого", "trend", "тренд"]
+SALES_CORE_WORDS = ["борлуул", "sales", "орлого"]
+SALES_TOTAL_WORDS = ["борлуул", "sales", "netsale", "grosssale", "orlogo", "орлого"]
+INVENTORY_WORDS = ["stock", "inventory", "үлдэгдэл", "агуулах", "on hand"]
+
+TODAY_WORDS = ["өнөөдөр", "today"]
+YESTERDAY_WORDS = ["өчигдөр", "yesterday"]
+LAST_7_DAYS_WORDS = ["7 хоног", "7 day", "last 7", "сүүлийн 7"]
+DAILY_WORDS = ["өдөр бүр", "өдрийн", "daily", "per day"]
+MONTH_WORDS = ["сар", "monthly", "month"]
+AVERAGE_WORDS = ["дундаж", "average", "avg"]
+TOTAL_WORDS = ["нийт", "total", "sum", "niit"]
+
+STORE_WORDS = ["дэлгүүр", "салбар", "store", "branch"]
+NAME_WORDS = ["нэр", "name"]
+PRODUCT_NAME_WORDS = ["нэр", "name", "product name", "барааны нэр"]
+TOP_WORDS = ["хамгийн их", "top", "топ", "highest", "most"]
+TOP_10_WORDS = ["10", "топ 10", "top 10"]
+TOP_PRODUCT_WORDS = ["хамгийн их", "top", "их"]
+BOTTOM_WORDS = ["хамгийн бага", "bottom", "lowest", "worst", "бага"]
+TOP_GROWTH_WORDS = ["хамгийн их өссөн", "most increased", "most growth", "их өссөн"]
+SOLD_WORDS = ["зарагдсан"]
+WHICH_WORDS = ["юу", "аль"]
+COMPARE_WORDS = ["харьцуул", "compare", "vs", "ялгаа"]
+COMPARE_SHORT_WORDS = ["харьцуул", "compare", "vs"]
+# a breakdown the single-total period rules (sql_rules.json) cannot answer
+DIMENSION_WORDS = [
+    "бараа", "product", "item", "sku", "brand", "брэнд", "category", "ангилал", "ангилл", "төрөл",
+    "supplier", "vendor", "нийлүүлэгч", "region", "channel",
+]
+GROUPING_WORDS = ["by ", "per ", "each ", "тус бүр", "бүрийн", "бүрээр", "ээр", "аар", "оор", "өөр"]
+GRAIN_WORDS = ["сар бүр", "monthly", "weekly", "daily", "өдөр бүр", "долоо хоног бүр", "сараар", "өдрөөр"]
+# measures other than sum(NetSale)
+QTY_WORDS = ["ширхэг", "тоо", "quantity", "qty", "soldqty", "units", "count"]
+GROSS_WORDS = ["gross", "бохир"]
+DISCOUNT_WORDS = ["хямдрал", "discount", "урамшуул", "promo"]
+
+PRODUCT_LIST_WORDS = ["product list", "item master", "барааны жагсаалт", "product master"]
+STORE_LIST_WORDS = ["store list", "branch master", "салбарын мэдээлэл", "дэлгүүрийн жагсаалт"]
+CATEGORY_LIST_WORDS = ["product category list", "category list", "ангиллын жагсаалт"]
+BRAND_LIST_WORDS = ["brand list", "брэндийн жагсаалт"]
+SUPPLIER_LIST_WORDS = ["supplier list", "vendor list", "нийлүүлэгчдийн жагсаалт"]
+
+register_vocabularies("rules", globals())
+
+
 # =========================================================
 # Small helpers
 # =========================================================
 
-def _ql(query: str) -> str:
-    return (query or "").strip().lower()
+def _ql(query: QueryLike) -> str:
+    return as_context(query).lowered
 
 
-def _has_any(text: str, words: list[str]) -> bool:
-    return any(w in text for w in words)
+def _hit(query: QueryLike, words: list[str]) -> bool:
+    """Keyword-list test on the lowercased raw question (one automaton scan per request)."""
+    return bool(as_context(query).raw_features & KEYWORDS.bit_of(words))
 
 
-def _extract_top_n(query: str, default: int = 10) -> int:
-    nums = re.findall(r"\b(\d{1,3})\b", query or "")
-    if not nums:
-        return default
-    try:
-        n = int(nums[0])
-        return max(1, min(n, 100))
-    except Exception:
-        return default
+def _extract_top_n(query: QueryLike, default: int = 10) -> int:
+    return extract_top_n(query, default=default)
 
 
-def _looks_unrelated(query: str) -> bool:
-    q = _ql(query)
-    unrelated = [
-        "hello", "hi", "hey", "сайн уу", "юу байна", "чи хэн бэ",
-        "how are you", "who are you", "weather", "цаг агаар",
-        "кино", "дуу", "music", "game", "тоглоом"
-    ]
-    return any(x in q for x in unrelated)
+def _looks_unrelated(query: QueryLike) -> bool:
+    return _hit(query, UNRELATED_WORDS)
 
 
 # =========================================================
 # Help / schema text rules
 # =========================================================
 
-def hard_rule_dataset_help_text(query: str) -> Optional[str]:
-    q = _ql(query)
-
-    asks_where = any(k in q for k in [
-        "хаана", "ямар table", "аль table", "ямар хүснэгт", "аль хүснэгт",
-        "where", "which table", "table name"
-    ])
-    asks_sales = any(k in q for k in [
-        "sales", "борлуул", "орлого", "netsale", "grosssale", "soldqty"
-    ])
+def hard_rule_dataset_help_text(query: QueryLike) -> Optional[str]:
+    asks_where = _hit(query, WHERE_TABLE_WORDS)
+    asks_sales = _hit(query, SALES_HELP_WORDS)
 
     if not (asks_where and asks_sales):
         return None
@@ -101,15 +164,9 @@ def hard_rule_dataset_help_text(query: str) -> Optional[str]:
     )
 
 
-def hard_rule_inventory_dataset_help_text(query: str) -> Optional[str]:
-    q = _ql(query)
-
-    asks_where = any(k in q for k in [
-        "хаана", "ямар table", "аль table", "ямар хүснэгт", "which table"
-    ])
-    asks_inventory = any(k in q for k in [
-        "stock", "inventory", "үлдэгдэл", "агуулах", "on hand"
-    ])
+def hard_rule_inventory_dataset_help_text(query: QueryLike) -> Optional[str]:
+    asks_where = _hit(query, WHERE_INVENTORY_WORDS)
+    asks_inventory = _hit(query, INVENTORY_WORDS)
 
     if not (asks_where and asks_inventory):
         return None
@@ -123,14 +180,10 @@ def hard_rule_inventory_dataset_help_text(query: str) -> Optional[str]:
     )
 
 
-def hard_rule_table_about_text(query: str, registry: Any) -> Optional[str]:
-    q = (query or "").strip()
-    ql = q.lower()
+def hard_rule_table_about_text(query: QueryLike, registry: Any) -> Optional[str]:
+    q = as_context(query).raw.strip()
 
-    asks_about = any(k in ql for k in [
-        "ямар дата", "ямар мэдээлэл", "юу байдаг", "ямар багана",
-        "тайлбар", "about", "what data", "what is in", "columns"
-    ])
+    asks_about = _hit(query, ABOUT_WORDS)
     if not asks_about:
         return None
 
@@ -165,13 +218,11 @@ def hard_rule_table_about_text(query: str, registry: Any) -> Optional[str]:
         return None
 
 
-def hard_rule_sales_related_tables_text(query: str, registry: Any) -> Optional[str]:
-    ql = _ql(query)
-
-    if not any(k in ql for k in ["ямар table", "аль table", "хүснэгтүүд", "tables", "table list"]):
+def hard_rule_sales_related_tables_text(query: QueryLike, registry: Any) -> Optional[str]:
+    if not _hit(query, TABLE_LIST_WORDS):
         return None
 
-    if not any(k in ql for k in ["sales", "борлуул", "product", "бараа", "store", "салбар"]):
+    if not _hit(query, SALES_RELATED_WORDS):
         return None
 
     lines = [
@@ -184,7 +235,7 @@ def hard_rule_sales_related_tables_text(query: str, registry: Any) -> Optional[s
     return "Холбоотой хүснэгтүүд:\n" + "\n".join(lines)
 
 
-def hard_rule_out_of_domain_text(query: str) -> Optional[str]:
+def hard_rule_out_of_domain_text(query: QueryLike) -> Optional[str]:
     if _looks_unrelated(query):
         return (
             "Энэ асуулт нь text2sql domain-д хамаарахгүй байна. "
@@ -197,12 +248,10 @@ def hard_rule_out_of_domain_text(query: str) -> Optional[str]:
 # Sales SQL rules
 # =========================================================
 
-def hard_rule_today_sales_sql(query: str) -> Optional[str]:
-    q = _ql(query)
-
-    if not _has_any(q, ["өнөөдөр", "today"]):
+def hard_rule_today_sales_sql(query: QueryLike) -> Optional[str]:
+    if not _hit(query, TODAY_WORDS):
         return None
-    if not _has_any(q, ["борлуул", "sales", "орлого", "netsale", "grosssale"]):
+    if not _hit(query, SALES_STEM_WORDS):
         return None
 
     return f"""
@@ -213,12 +262,10 @@ WHERE toDate(f.SalesDate) = today()
 """.strip()
 
 
-def hard_rule_yesterday_sales_sql(query: str) -> Optional[str]:
-    q = _ql(query)
-
-    if not _has_any(q, ["өчигдөр", "yesterday"]):
+def hard_rule_yesterday_sales_sql(query: QueryLike) -> Optional[str]:
+    if not _hit(query, YESTERDAY_WORDS):
         return None
-    if not _has_any(q, ["борлуул", "sales", "орлого", "netsale", "grosssale"]):
+    if not _hit(query, SALES_STEM_WORDS):
         return None
 
     return f"""
@@ -229,12 +276,10 @@ WHERE toDate(f.SalesDate) = today() - 1
 """.strip()
 
 
-def hard_rule_last_7_days_sales_trend_sql(query: str) -> Optional[str]:
-    q = _ql(query)
-
-    if not _has_any(q, ["7 хоног", "7 day", "last 7", "сүүлийн 7"]):
+def hard_rule_last_7_days_sales_trend_sql(query: QueryLike) -> Optional[str]:
+    if not _hit(query, LAST_7_DAYS_WORDS):
         return None
-    if not _has_any(q, ["борлуул", "sales", "орлого", "trend", "тренд"]):
+    if not _hit(query, SALES_TREND_WORDS):
         return None
 
     return f"""
@@ -249,19 +294,18 @@ LIMIT 50
 """.strip()
 
 
-def hard_rule_daily_average_sales_sql(query: str) -> Optional[str]:
-    q = _ql(query)
+def hard_rule_daily_average_sales_sql(query: QueryLike) -> Optional[str]:
     year = extract_year(query)
 
-    if not _has_any(q, ["дундаж", "average", "avg"]):
+    if not _hit(query, AVERAGE_WORDS):
         return None
-    if not _has_any(q, ["өдөр бүр", "өдрийн", "daily", "per day"]):
+    if not _hit(query, DAILY_WORDS):
         return None
-    if not _has_any(q, ["борлуул", "sales", "орлого"]):
+    if not _hit(query, SALES_CORE_WORDS):
         return None
 
     if year:
-        return f"""
+        return bind(f"""
 SELECT
   round(avg(daily_sales), 2) AS avg_daily_net_sales
 FROM
@@ -270,10 +314,10 @@ FROM
     toDate(f.SalesDate) AS dt,
     sum(f.NetSale) AS daily_sales
   FROM {sales_fact()} f
-  WHERE toYear(f.SalesDate) = {year}
+  WHERE toYear(f.SalesDate) = {{year:UInt16}}
   GROUP BY dt
 )
-""".strip()
+""", year=year)
 
     return f"""
 SELECT
@@ -289,29 +333,25 @@ FROM
 """.strip()
 
 
-def hard_rule_total_sales_year_only_sql(query: str) -> Optional[str]:
-    q = _ql(query)
+def hard_rule_total_sales_year_only_sql(query: QueryLike) -> Optional[str]:
     year = extract_year(query)
     if not year:
         return None
 
-    sales_words = ["борлуул", "sales", "netsale", "grosssale", "orlogo", "орлого"]
-    total_words = ["нийт", "total", "sum", "niit"]
-
-    if not any(k in q for k in sales_words):
+    if not _hit(query, SALES_TOTAL_WORDS):
         return None
-    if not any(k in q for k in total_words):
+    if not _hit(query, TOTAL_WORDS):
         return None
 
-    return f"""
+    return bind(f"""
 SELECT
   sum(f.NetSale) AS total_net_sales
 FROM {sales_fact()} f
-WHERE toYear(f.SalesDate) = {year}
-""".strip()
+WHERE toYear(f.SalesDate) = {{year:UInt16}}
+""", year=year)
 
 
-def hard_rule_total_sales_sql(query: str) -> Optional[str]:
+def hard_rule_total_sales_sql(query: QueryLike) -> Optional[str]:
     year = extract_year(query)
     if not year:
         return None
@@ -320,50 +360,50 @@ def hard_rule_total_sales_sql(query: str) -> Optional[str]:
         return None
 
     if Intent.wants_group_store(query):
-        return f"""
+        return bind(f"""
 SELECT
   f.StoreID AS store_id,
   sum(f.NetSale) AS total_net_sales
 FROM {sales_fact()} f
-WHERE toYear(f.SalesDate) = {year}
+WHERE toYear(f.SalesDate) = {{year:UInt16}}
 GROUP BY f.StoreID
 ORDER BY total_net_sales DESC
 LIMIT 50
-""".strip()
+""", year=year)
 
     if Intent.is_top_store(query):
-        return f"""
+        return bind(f"""
 SELECT
   f.StoreID AS store_id,
   sum(f.NetSale) AS total_net_sales
 FROM {sales_fact()} f
-WHERE toYear(f.SalesDate) = {year}
+WHERE toYear(f.SalesDate) = {{year:UInt16}}
 GROUP BY f.StoreID
 ORDER BY total_net_sales DESC
 LIMIT 1
-""".strip()
+""", year=year)
 
     if Intent.is_bottom_store(query):
-        return f"""
+        return bind(f"""
 SELECT
   f.StoreID AS store_id,
   sum(f.NetSale) AS total_net_sales
 FROM {sales_fact()} f
-WHERE toYear(f.SalesDate) = {year}
+WHERE toYear(f.SalesDate) = {{year:UInt16}}
 GROUP BY f.StoreID
 ORDER BY total_net_sales ASC
 LIMIT 1
-""".strip()
+""", year=year)
 
-    return f"""
+    return bind(f"""
 SELECT
   sum(f.NetSale) AS total_net_sales
 FROM {sales_fact()} f
-WHERE toYear(f.SalesDate) = {year}
-""".strip()
+WHERE toYear(f.SalesDate) = {{year:UInt16}}
+""", year=year)
 
 
-def hard_rule_top_store_sales_sql(query: str) -> Optional[str]:
+def hard_rule_top_store_sales_sql(query: QueryLike) -> Optional[str]:
     year = extract_year(query)
     if not year:
         return None
@@ -371,91 +411,87 @@ def hard_rule_top_store_sales_sql(query: str) -> Optional[str]:
     if not (Intent.is_sales(query) and Intent.is_top_store(query)):
         return None
 
-    q = _ql(query)
-    if _has_any(q, ["10", "топ 10", "top 10"]):
+    if _hit(query, TOP_10_WORDS):
         return None
 
-    return f"""
+    return bind(f"""
 SELECT
   f.StoreID AS store_id,
   sum(f.NetSale) AS total_net_sales
 FROM {sales_fact()} f
-WHERE toYear(f.SalesDate) = {year}
+WHERE toYear(f.SalesDate) = {{year:UInt16}}
 GROUP BY f.StoreID
 ORDER BY total_net_sales DESC
 LIMIT 1
-""".strip()
+""", year=year)
 
 
-def hard_rule_bottom_store_sales_sql(query: str) -> Optional[str]:
+def hard_rule_bottom_store_sales_sql(query: QueryLike) -> Optional[str]:
     year = extract_year(query)
     if not year:
         return None
 
-    q = _ql(query)
-    if not _has_any(q, ["хамгийн бага", "bottom", "lowest", "worst", "бага"]):
+    if not _hit(query, BOTTOM_WORDS):
         return None
-    if not _has_any(q, ["дэлгүүр", "салбар", "store", "branch"]):
+    if not _hit(query, STORE_WORDS):
         return None
     if not Intent.is_sales(query):
         return None
 
-    return f"""
+    return bind(f"""
 SELECT
   f.StoreID AS store_id,
   sum(f.NetSale) AS total_net_sales
 FROM {sales_fact()} f
-WHERE toYear(f.SalesDate) = {year}
+WHERE toYear(f.SalesDate) = {{year:UInt16}}
 GROUP BY f.StoreID
 ORDER BY total_net_sales ASC
 LIMIT 1
-""".strip()
+""", year=year)
 
 
-def hard_rule_top_n_sales_store_sql(query: str) -> Optional[str]:
-    q = _ql(query)
+def hard_rule_top_n_sales_store_sql(query: QueryLike) -> Optional[str]:
     year = extract_year(query)
 
     if not year:
         return None
 
-    is_store = any(k in q for k in ["салбар", "дэлгүүр", "store", "branch"])
+    is_store = _hit(query, STORE_WORDS)
     wants_sales = Intent.is_sales(query)
-    wants_top = any(k in q for k in ["хамгийн их", "top", "топ", "highest", "most"])
+    wants_top = _hit(query, TOP_WORDS)
     n = _extract_top_n(query, default=10)
 
     if not (is_store and wants_sales and wants_top and n >= 2):
         return None
 
-    return f"""
+    return bind(f"""
 SELECT
   f.StoreID AS store_id,
   sum(f.NetSale) AS total_net_sales
 FROM {sales_fact()} f
-WHERE toYear(f.SalesDate) = {year}
+WHERE toYear(f.SalesDate) = {{year:UInt16}}
 GROUP BY f.StoreID
 ORDER BY total_net_sales DESC
 LIMIT {n}
-""".strip()
+""", year=year)
 
 
-def hard_rule_top_n_sales_store_with_name_sql(query: str) -> Optional[str]:
-    q = _ql(query)
+def hard_rule_top_n_sales_store_with_name_sql(query: QueryLike) -> Optional[str]:
     year = extract_year(query)
 
     if not year:
         return None
 
-    is_store = any(k in q for k in ["салбар", "дэлгүүр", "store", "branch"])
+    is_store = _hit(query, STORE_WORDS)
     wants_sales = Intent.is_sales(query)
-    wants_top = any(k in q for k in ["хамгийн их", "top", "топ", "highest", "most"])
-    wants_name = any(k in q for k in ["нэр", "name"])
+    wants_top = _hit(query, TOP_WORDS)
+    wants_name = _hit(query, NAME_WORDS)
     n = _extract_top_n(query, default=10)
 
     if not (is_store and wants_sales and wants_top and wants_name):
         return None
 
-    return f"""
+    return bind(f"""
 SELECT
   s.BIZLOC_CD AS store_id,
   s.BIZLOC_NM AS store_name,
@@ -463,14 +499,14 @@ SELECT
 FROM {sales_fact()} f
 LEFT JOIN {store_dim()} s
   ON f.StoreID = s.BIZLOC_CD
-WHERE toYear(f.SalesDate) = {year}
+WHERE toYear(f.SalesDate) = {{year:UInt16}}
 GROUP BY s.BIZLOC_CD, s.BIZLOC_NM
 ORDER BY total_net_sales DESC
 LIMIT {n}
-""".strip()
+""", year=year)
 
 
-def hard_rule_monthly_sales_sql(query: str) -> Optional[str]:
+def hard_rule_monthly_sales_sql(query: QueryLike) -> Optional[str]:
     year = extract_year(query)
     if not year:
         return None
@@ -478,19 +514,19 @@ def hard_rule_monthly_sales_sql(query: str) -> Optional[str]:
     if not (Intent.is_sales(query) and Intent.is_monthly(query)):
         return None
 
-    return f"""
+    return bind(f"""
 SELECT
   toYYYYMM(f.SalesDate) AS ym,
   sum(f.NetSale) AS total_net_sales
 FROM {sales_fact()} f
-WHERE toYear(f.SalesDate) = {year}
+WHERE toYear(f.SalesDate) = {{year:UInt16}}
 GROUP BY ym
 ORDER BY ym ASC
 LIMIT 50
-""".strip()
+""", year=year)
 
 
-def hard_rule_quarter_sales_sql(query: str) -> Optional[str]:
+def hard_rule_quarter_sales_sql(query: QueryLike) -> Optional[str]:
     year = extract_year(query)
     quarter = extract_quarter(query)
 
@@ -503,22 +539,22 @@ def hard_rule_quarter_sales_sql(query: str) -> Optional[str]:
     start_month = (quarter - 1) * 3 + 1
     end_month = start_month + 2
 
-    return f"""
+    return bind(f"""
 SELECT
   sum(f.NetSale) AS total_net_sales
 FROM {sales_fact()} f
-WHERE toYear(f.SalesDate) = {year}
-  AND toMonth(f.SalesDate) BETWEEN {start_month} AND {end_month}
-""".strip()
+WHERE toYear(f.SalesDate) = {{year:UInt16}}
+  AND toMonth(f.SalesDate) BETWEEN {{start_month:UInt8}} AND {{end_month:UInt8}}
+""", year=year, start_month=start_month, end_month=end_month)
 
 
-def hard_rule_same_year_quarter_compare_sql(query: str) -> Optional[str]:
+def hard_rule_same_year_quarter_compare_sql(query: QueryLike) -> Optional[str]:
     q = _ql(query)
     year = extract_year(query)
     if not year:
         return None
 
-    if not any(k in q for k in ["харьцуул", "compare", "vs", "ялгаа"]):
+    if not _hit(query, COMPARE_WORDS):
         return None
 
     quarters = re.findall(r"\bq([1-4])\b", q)
@@ -539,20 +575,20 @@ def hard_rule_same_year_quarter_compare_sql(query: str) -> Optional[str]:
     q2_start = (q2 - 1) * 3 + 1
     q2_end = q2_start + 2
 
-    return f"""
+    return bind(f"""
 SELECT
-  sumIf(f.NetSale, toYear(f.SalesDate) = {year} AND toMonth(f.SalesDate) BETWEEN {q1_start} AND {q1_end}) AS q{q1}_sales,
-  sumIf(f.NetSale, toYear(f.SalesDate) = {year} AND toMonth(f.SalesDate) BETWEEN {q2_start} AND {q2_end}) AS q{q2}_sales,
+  sumIf(f.NetSale, toYear(f.SalesDate) = {{year:UInt16}} AND toMonth(f.SalesDate) BETWEEN {{q1_start:UInt8}} AND {{q1_end:UInt8}}) AS q{q1}_sales,
+  sumIf(f.NetSale, toYear(f.SalesDate) = {{year:UInt16}} AND toMonth(f.SalesDate) BETWEEN {{q2_start:UInt8}} AND {{q2_end:UInt8}}) AS q{q2}_sales,
   (q{q2}_sales - q{q1}_sales) AS diff_amount,
   if(q{q1}_sales = 0, NULL, round((q{q2}_sales - q{q1}_sales) / q{q1}_sales * 100, 2)) AS diff_pct
 FROM {sales_fact()} f
-""".strip()
+""", year=year, q1_start=q1_start, q1_end=q1_end, q2_start=q2_start, q2_end=q2_end)
 
 
-def hard_rule_cross_year_quarter_compare_sql(query: str) -> Optional[str]:
+def hard_rule_cross_year_quarter_compare_sql(query: QueryLike) -> Optional[str]:
     q = _ql(query)
 
-    if not any(k in q for k in ["харьцуул", "compare", "vs", "ялгаа"]):
+    if not _hit(query, COMPARE_WORDS):
         return None
 
     pairs = re.findall(r"(20\d{2}).*?q([1-4])", q)
@@ -567,70 +603,68 @@ def hard_rule_cross_year_quarter_compare_sql(query: str) -> Optional[str]:
     q2_start = (q2 - 1) * 3 + 1
     q2_end = q2_start + 2
 
-    return f"""
+    return bind(f"""
 SELECT
-  sumIf(f.NetSale, toYear(f.SalesDate) = {y1} AND toMonth(f.SalesDate) BETWEEN {q1_start} AND {q1_end}) AS y{y1}_q{q1}_sales,
-  sumIf(f.NetSale, toYear(f.SalesDate) = {y2} AND toMonth(f.SalesDate) BETWEEN {q2_start} AND {q2_end}) AS y{y2}_q{q2}_sales,
+  sumIf(f.NetSale, toYear(f.SalesDate) = {{y1:UInt16}} AND toMonth(f.SalesDate) BETWEEN {{q1_start:UInt8}} AND {{q1_end:UInt8}}) AS y{y1}_q{q1}_sales,
+  sumIf(f.NetSale, toYear(f.SalesDate) = {{y2:UInt16}} AND toMonth(f.SalesDate) BETWEEN {{q2_start:UInt8}} AND {{q2_end:UInt8}}) AS y{y2}_q{q2}_sales,
   (y{y2}_q{q2}_sales - y{y1}_q{q1}_sales) AS diff_amount,
   if(y{y1}_q{q1}_sales = 0, NULL, round((y{y2}_q{q2}_sales - y{y1}_q{q1}_sales) / y{y1}_q{q1}_sales * 100, 2)) AS diff_pct
 FROM {sales_fact()} f
-""".strip()
+""", y1=y1, q1_start=q1_start, q1_end=q1_end, y2=y2, q2_start=q2_start, q2_end=q2_end)
 
 
-def hard_rule_same_quarter_two_years_sql(query: str) -> Optional[str]:
-    q = _ql(query)
+def hard_rule_same_quarter_two_years_sql(query: QueryLike) -> Optional[str]:
     years = extract_years(query)
     quarter = extract_quarter(query)
 
     if len(years) < 2 or not quarter:
         return None
 
-    if not any(k in q for k in ["харьцуул", "compare", "vs", "ялгаа"]):
+    if not _hit(query, COMPARE_WORDS):
         return None
 
     y1, y2 = years[0], years[1]
     start_month = (quarter - 1) * 3 + 1
     end_month = start_month + 2
 
-    return f"""
+    return bind(f"""
 SELECT
-  sumIf(f.NetSale, toYear(f.SalesDate) = {y1} AND toMonth(f.SalesDate) BETWEEN {start_month} AND {end_month}) AS y{y1}_q{quarter}_sales,
-  sumIf(f.NetSale, toYear(f.SalesDate) = {y2} AND toMonth(f.SalesDate) BETWEEN {start_month} AND {end_month}) AS y{y2}_q{quarter}_sales,
+  sumIf(f.NetSale, toYear(f.SalesDate) = {{y1:UInt16}} AND toMonth(f.SalesDate) BETWEEN {{start_month:UInt8}} AND {{end_month:UInt8}}) AS y{y1}_q{quarter}_sales,
+  sumIf(f.NetSale, toYear(f.SalesDate) = {{y2:UInt16}} AND toMonth(f.SalesDate) BETWEEN {{start_month:UInt8}} AND {{end_month:UInt8}}) AS y{y2}_q{quarter}_sales,
   (y{y2}_q{quarter}_sales - y{y1}_q{quarter}_sales) AS diff_amount,
   if(y{y1}_q{quarter}_sales = 0, NULL, round((y{y2}_q{quarter}_sales - y{y1}_q{quarter}_sales) / y{y1}_q{quarter}_sales * 100, 2)) AS diff_pct
 FROM {sales_fact()} f
-""".strip()
+""", y1=y1, start_month=start_month, end_month=end_month, y2=y2)
 
 
-def hard_rule_monthly_compare_two_years_sql(query: str) -> Optional[str]:
-    q = _ql(query)
+def hard_rule_monthly_compare_two_years_sql(query: QueryLike) -> Optional[str]:
     years = extract_years(query)
     if len(years) < 2:
         return None
 
-    if not any(k in q for k in ["сар", "monthly", "month"]):
+    if not _hit(query, MONTH_WORDS):
         return None
-    if not any(k in q for k in ["харьцуул", "compare", "vs"]):
+    if not _hit(query, COMPARE_SHORT_WORDS):
         return None
 
     y1, y2 = years[0], years[1]
 
-    return f"""
+    return bind(f"""
 SELECT
   toMonth(f.SalesDate) AS month_no,
-  sumIf(f.NetSale, toYear(f.SalesDate) = {y1}) AS sales_{y1},
-  sumIf(f.NetSale, toYear(f.SalesDate) = {y2}) AS sales_{y2},
+  sumIf(f.NetSale, toYear(f.SalesDate) = {{y1:UInt16}}) AS sales_{y1},
+  sumIf(f.NetSale, toYear(f.SalesDate) = {{y2:UInt16}}) AS sales_{y2},
   (sales_{y2} - sales_{y1}) AS diff_amount,
   if(sales_{y1} = 0, NULL, round((sales_{y2} - sales_{y1}) / sales_{y1} * 100, 2)) AS diff_pct
 FROM {sales_fact()} f
-WHERE toYear(f.SalesDate) IN ({y1}, {y2})
+WHERE toYear(f.SalesDate) IN ({{y1:UInt16}}, {{y2:UInt16}})
 GROUP BY month_no
 ORDER BY month_no ASC
 LIMIT 50
-""".strip()
+""", y1=y1, y2=y2)
 
 
-def hard_rule_yoy_growth_sql(query: str) -> Optional[str]:
+def hard_rule_yoy_growth_sql(query: QueryLike) -> Optional[str]:
     if not Intent.wants_yoy_growth(query):
         return None
 
@@ -644,18 +678,17 @@ def hard_rule_yoy_growth_sql(query: str) -> Optional[str]:
         y2 = year
         y1 = year - 1
 
-    return f"""
+    return bind(f"""
 SELECT
-  sumIf(f.NetSale, toYear(f.SalesDate) = {y2}) AS net_{y2},
-  sumIf(f.NetSale, toYear(f.SalesDate) = {y1}) AS net_{y1},
+  sumIf(f.NetSale, toYear(f.SalesDate) = {{y2:UInt16}}) AS net_{y2},
+  sumIf(f.NetSale, toYear(f.SalesDate) = {{y1:UInt16}}) AS net_{y1},
   if(net_{y1} = 0, NULL, round((net_{y2} - net_{y1}) / net_{y1} * 100, 2)) AS growth_pct
 FROM {sales_fact()} f
-WHERE toYear(f.SalesDate) IN ({y1}, {y2})
-""".strip()
+WHERE toYear(f.SalesDate) IN ({{y1:UInt16}}, {{y2:UInt16}})
+""", y2=y2, y1=y1)
 
 
-def hard_rule_top_growth_store_yoy_sql(query: str) -> Optional[str]:
-    q = _ql(query)
+def hard_rule_top_growth_store_yoy_sql(query: QueryLike) -> Optional[str]:
     years = extract_years(query)
 
     if len(years) >= 2:
@@ -666,46 +699,45 @@ def hard_rule_top_growth_store_yoy_sql(query: str) -> Optional[str]:
             return None
         y1 = y2 - 1
 
-    if not any(k in q for k in ["салбар", "дэлгүүр", "store", "branch"]):
+    if not _hit(query, STORE_WORDS):
         return None
-    if not any(k in q for k in ["хамгийн их өссөн", "most increased", "most growth", "их өссөн"]):
+    if not _hit(query, TOP_GROWTH_WORDS):
         return None
     if not Intent.is_sales(query):
         return None
 
-    return f"""
+    return bind(f"""
 SELECT
   f.StoreID AS store_id,
-  sumIf(f.NetSale, toYear(f.SalesDate) = {y1}) AS sales_{y1},
-  sumIf(f.NetSale, toYear(f.SalesDate) = {y2}) AS sales_{y2},
+  sumIf(f.NetSale, toYear(f.SalesDate) = {{y1:UInt16}}) AS sales_{y1},
+  sumIf(f.NetSale, toYear(f.SalesDate) = {{y2:UInt16}}) AS sales_{y2},
   (sales_{y2} - sales_{y1}) AS growth_amount,
   if(sales_{y1} = 0, NULL, round((sales_{y2} - sales_{y1}) / sales_{y1} * 100, 2)) AS growth_pct
 FROM {sales_fact()} f
-WHERE toYear(f.SalesDate) IN ({y1}, {y2})
+WHERE toYear(f.SalesDate) IN ({{y1:UInt16}}, {{y2:UInt16}})
 GROUP BY f.StoreID
 ORDER BY growth_amount DESC
 LIMIT 1
-""".strip()
+""", y1=y1, y2=y2)
 
 
 # =========================================================
 # Product SQL rules
 # =========================================================
 
-def hard_rule_top_product_sales_sql(query: str) -> Optional[str]:
+def hard_rule_top_product_sales_sql(query: QueryLike) -> Optional[str]:
     year = extract_year(query)
     if not year:
         return None
 
-    q = _ql(query)
-    wants_top_product = Intent.is_product_query(query) and any(k in q for k in ["хамгийн их", "top", "их"])
-    wants_sales_or_qty = Intent.is_sales(query) or Intent.wants_qty(query) or "зарагдсан" in q
+    wants_top_product = Intent.is_product_query(query) and _hit(query, TOP_PRODUCT_WORDS)
+    wants_sales_or_qty = Intent.is_sales(query) or Intent.wants_qty(query) or _hit(query, SOLD_WORDS)
 
     if not (wants_top_product and wants_sales_or_qty):
         return None
 
-    if Intent.wants_name(query) or "юу" in q or "аль" in q:
-        return f"""
+    if Intent.wants_name(query) or _hit(query, WHICH_WORDS):
+        return bind(f"""
 SELECT
   d1.GDS_NM AS product_name,
   sum(f.SoldQty) AS total_qty,
@@ -713,26 +745,26 @@ SELECT
 FROM {sales_fact()} f
 LEFT JOIN {product_dim()} d1
   ON f.GDS_CD = d1.GDS_CD
-WHERE toYear(f.SalesDate) = {year}
+WHERE toYear(f.SalesDate) = {{year:UInt16}}
 GROUP BY d1.GDS_NM
 ORDER BY total_qty DESC, total_net_sales DESC
 LIMIT 1
-""".strip()
+""", year=year)
 
-    return f"""
+    return bind(f"""
 SELECT
   f.GDS_CD AS product_code,
   sum(f.SoldQty) AS total_qty,
   sum(f.NetSale) AS total_net_sales
 FROM {sales_fact()} f
-WHERE toYear(f.SalesDate) = {year}
+WHERE toYear(f.SalesDate) = {{year:UInt16}}
 GROUP BY f.GDS_CD
 ORDER BY total_qty DESC, total_net_sales DESC
 LIMIT 1
-""".strip()
+""", year=year)
 
 
-def hard_rule_top_sold_product_name_sql(query: str) -> Optional[str]:
+def hard_rule_top_sold_product_name_sql(query: QueryLike) -> Optional[str]:
     year = extract_year(query)
     if not year:
         return None
@@ -740,21 +772,21 @@ def hard_rule_top_sold_product_name_sql(query: str) -> Optional[str]:
     if not (Intent.wants_name(query) and Intent.is_most_sold(query)):
         return None
 
-    return f"""
+    return bind(f"""
 SELECT
   d1.GDS_NM AS product_name,
   sum(f.SoldQty) AS total_qty
 FROM {sales_fact()} f
 LEFT JOIN {product_dim()} d1
   ON f.GDS_CD = d1.GDS_CD
-WHERE toYear(f.SalesDate) = {year}
+WHERE toYear(f.SalesDate) = {{year:UInt16}}
 GROUP BY d1.GDS_NM
 ORDER BY total_qty DESC
 LIMIT 1
-""".strip()
+""", year=year)
 
 
-def hard_rule_total_qty_sql(query: str) -> Optional[str]:
+def hard_rule_total_qty_sql(query: QueryLike) -> Optional[str]:
     year = extract_year(query)
     if not year:
         return None
@@ -762,25 +794,23 @@ def hard_rule_total_qty_sql(query: str) -> Optional[str]:
     if not (Intent.wants_total(query) and Intent.wants_qty(query)):
         return None
 
-    return f"""
+    return bind(f"""
 SELECT
   sum(f.SoldQty) AS total_qty
 FROM {sales_fact()} f
-WHERE toYear(f.SalesDate) = {year}
-""".strip()
+WHERE toYear(f.SalesDate) = {{year:UInt16}}
+""", year=year)
 
 
 # =========================================================
 # Inventory / master data SQL rules
 # =========================================================
 
-def hard_rule_inventory_total_sql(query: str) -> Optional[str]:
-    q = _ql(query)
-
-    if not any(k in q for k in ["stock", "inventory", "үлдэгдэл", "агуулах", "on hand"]):
+def hard_rule_inventory_total_sql(query: QueryLike) -> Optional[str]:
+    if not _hit(query, INVENTORY_WORDS):
         return None
 
-    if any(k in q for k in ["нэр", "name", "product name", "барааны нэр"]):
+    if _hit(query, PRODUCT_NAME_WORDS):
         return None
 
     return f"""
@@ -791,13 +821,11 @@ LIMIT 50
 """.strip()
 
 
-def hard_rule_inventory_with_product_name_sql(query: str) -> Optional[str]:
-    q = _ql(query)
-
-    if not any(k in q for k in ["stock", "inventory", "үлдэгдэл", "агуулах", "on hand"]):
+def hard_rule_inventory_with_product_name_sql(query: QueryLike) -> Optional[str]:
+    if not _hit(query, INVENTORY_WORDS):
         return None
 
-    if not any(k in q for k in ["нэр", "name", "product name", "барааны нэр"]):
+    if not _hit(query, PRODUCT_NAME_WORDS):
         return None
 
     return f"""
@@ -813,10 +841,8 @@ LIMIT 50
 """.strip()
 
 
-def hard_rule_product_list_sql(query: str) -> Optional[str]:
-    q = _ql(query)
-
-    if not any(k in q for k in ["product list", "item master", "барааны жагсаалт", "product master"]):
+def hard_rule_product_list_sql(query: QueryLike) -> Optional[str]:
+    if not _hit(query, PRODUCT_LIST_WORDS):
         return None
 
     return f"""
@@ -828,10 +854,8 @@ LIMIT 50
 """.strip()
 
 
-def hard_rule_store_list_sql(query: str) -> Optional[str]:
-    q = _ql(query)
-
-    if not any(k in q for k in ["store list", "branch master", "салбарын мэдээлэл", "дэлгүүрийн жагсаалт"]):
+def hard_rule_store_list_sql(query: QueryLike) -> Optional[str]:
+    if not _hit(query, STORE_LIST_WORDS):
         return None
 
     return f"""
@@ -843,10 +867,8 @@ LIMIT 50
 """.strip()
 
 
-def hard_rule_category_list_sql(query: str) -> Optional[str]:
-    q = _ql(query)
-
-    if not any(k in q for k in ["product category list", "category list", "ангиллын жагсаалт"]):
+def hard_rule_category_list_sql(query: QueryLike) -> Optional[str]:
+    if not _hit(query, CATEGORY_LIST_WORDS):
         return None
 
     return f"""
@@ -859,10 +881,8 @@ LIMIT 100
 """.strip()
 
 
-def hard_rule_brand_list_sql(query: str) -> Optional[str]:
-    q = _ql(query)
-
-    if not any(k in q for k in ["brand list", "брэндийн жагсаалт"]):
+def hard_rule_brand_list_sql(query: QueryLike) -> Optional[str]:
+    if not _hit(query, BRAND_LIST_WORDS):
         return None
 
     return f"""
@@ -875,10 +895,8 @@ LIMIT 100
 """.strip()
 
 
-def hard_rule_supplier_list_sql(query: str) -> Optional[str]:
-    q = _ql(query)
-
-    if not any(k in q for k in ["supplier list", "vendor list", "нийлүүлэгчдийн жагсаалт"]):
+def hard_rule_supplier_list_sql(query: QueryLike) -> Optional[str]:
+    if not _hit(query, SUPPLIER_LIST_WORDS):
         return None
 
     return f"""
@@ -895,38 +913,229 @@ LIMIT 100
 # Ordered rule registry
 # =========================================================
 
-HARD_SQL_RULES = [
+@dataclass
+class HardRule:
+    """
+    One SQL fast path. `raw` / `norm` are keyword lists that must ALL match
+    (on the lowercased raw / normalized question) for the rule to possibly
+    fire; they only gate evaluation and never change a rule's result.
+    `source` is "python" for the rules below, "template" for JSON rules.
+    """
+    name: str
+    fn: Callable[[QueryLike], Optional[str]]
+    raw: Tuple[List[str], ...] = ()
+    norm: Tuple[List[str], ...] = ()
+    raw_mask: int = 0
+    norm_mask: int = 0
+    source: str = "python"
+
+
+HARD_SQL_RULES: List[HardRule] = [
     # recent/date-based sales first
-    ("today_sales", hard_rule_today_sales_sql),
-    ("yesterday_sales", hard_rule_yesterday_sales_sql),
-    ("last_7_days_sales_trend", hard_rule_last_7_days_sales_trend_sql),
-    ("daily_average_sales", hard_rule_daily_average_sales_sql),
+    HardRule("today_sales", hard_rule_today_sales_sql, raw=(TODAY_WORDS, SALES_STEM_WORDS)),
+    HardRule("yesterday_sales", hard_rule_yesterday_sales_sql, raw=(YESTERDAY_WORDS, SALES_STEM_WORDS)),
+    HardRule(
+        "last_7_days_sales_trend", hard_rule_last_7_days_sales_trend_sql,
+        raw=(LAST_7_DAYS_WORDS, SALES_TREND_WORDS),
+    ),
+    HardRule(
+        "daily_average_sales", hard_rule_daily_average_sales_sql,
+        raw=(AVERAGE_WORDS, DAILY_WORDS, SALES_CORE_WORDS),
+    ),
 
     # inventory / master data
-    ("inventory_total", hard_rule_inventory_total_sql),
-    ("inventory_with_product_name", hard_rule_inventory_with_product_name_sql),
-    ("product_list", hard_rule_product_list_sql),
-    ("store_list", hard_rule_store_list_sql),
-    ("category_list", hard_rule_category_list_sql),
-    ("brand_list", hard_rule_brand_list_sql),
-    ("supplier_list", hard_rule_supplier_list_sql),
+    HardRule("inventory_total", hard_rule_inventory_total_sql, raw=(INVENTORY_WORDS,)),
+    HardRule(
+        "inventory_with_product_name", hard_rule_inventory_with_product_name_sql,
+        raw=(INVENTORY_WORDS, PRODUCT_NAME_WORDS),
+    ),
+    HardRule("product_list", hard_rule_product_list_sql, raw=(PRODUCT_LIST_WORDS,)),
+    HardRule("store_list", hard_rule_store_list_sql, raw=(STORE_LIST_WORDS,)),
+    HardRule("category_list", hard_rule_category_list_sql, raw=(CATEGORY_LIST_WORDS,)),
+    HardRule("brand_list", hard_rule_brand_list_sql, raw=(BRAND_LIST_WORDS,)),
+    HardRule("supplier_list", hard_rule_supplier_list_sql, raw=(SUPPLIER_LIST_WORDS,)),
 
     # sales
-    ("total_sales_year_only", hard_rule_total_sales_year_only_sql),
-    ("yoy_sales_growth_pct", hard_rule_yoy_growth_sql),
-    ("top_store_sales", hard_rule_top_store_sales_sql),
-    ("bottom_store_sales", hard_rule_bottom_store_sales_sql),
-    ("top_store_sales_with_name", hard_rule_top_n_sales_store_with_name_sql),
-    ("top_product_sales", hard_rule_top_product_sales_sql),
-    ("same_year_quarter_compare", hard_rule_same_year_quarter_compare_sql),
-    ("cross_year_quarter_compare", hard_rule_cross_year_quarter_compare_sql),
-    ("same_quarter_two_years_compare", hard_rule_same_quarter_two_years_sql),
-    ("monthly_compare_two_years", hard_rule_monthly_compare_two_years_sql),
-    ("top_growth_store_yoy", hard_rule_top_growth_store_yoy_sql),
-    ("top_sold_product_name", hard_rule_top_sold_product_name_sql),
-    ("total_qty", hard_rule_total_qty_sql),
-    ("monthly_sales_trend", hard_rule_monthly_sales_sql),
-    ("quarter_sales_total", hard_rule_quarter_sales_sql),
-    ("top_n_store_sales", hard_rule_top_n_sales_store_sql),
-    ("total_sales", hard_rule_total_sales_sql),
+    HardRule(
+        "total_sales_year_only", hard_rule_total_sales_year_only_sql,
+        raw=(SALES_TOTAL_WORDS, TOTAL_WORDS),
+    ),
+    HardRule(
+        "yoy_sales_growth_pct", hard_rule_yoy_growth_sql,
+        norm=(Intent.YOY_COMPARE_WORDS, Intent.PERCENT_WORDS, Intent.SALES_WORDS),
+    ),
+    HardRule(
+        "top_store_sales", hard_rule_top_store_sales_sql,
+        norm=(Intent.SALES_WORDS, Intent.STORE_WORDS, Intent.TOP_WORDS),
+    ),
+    HardRule(
+        "bottom_store_sales", hard_rule_bottom_store_sales_sql,
+        raw=(BOTTOM_WORDS, STORE_WORDS), norm=(Intent.SALES_WORDS,),
+    ),
+    HardRule(
+        "top_store_sales_with_name", hard_rule_top_n_sales_store_with_name_sql,
+        raw=(STORE_WORDS, TOP_WORDS, NAME_WORDS), norm=(Intent.SALES_WORDS,),
+    ),
+    HardRule(
+        "top_product_sales", hard_rule_top_product_sales_sql,
+        raw=(TOP_PRODUCT_WORDS,), norm=(Intent.PRODUCT_WORDS,),
+    ),
+    HardRule("same_year_quarter_compare", hard_rule_same_year_quarter_compare_sql, raw=(COMPARE_WORDS,)),
+    HardRule("cross_year_quarter_compare", hard_rule_cross_year_quarter_compare_sql, raw=(COMPARE_WORDS,)),
+    HardRule("same_quarter_two_years_compare", hard_rule_same_quarter_two_years_sql, raw=(COMPARE_WORDS,)),
+    HardRule(
+        "monthly_compare_two_years", hard_rule_monthly_compare_two_years_sql,
+        raw=(MONTH_WORDS, COMPARE_SHORT_WORDS),
+    ),
+    HardRule(
+        "top_growth_store_yoy", hard_rule_top_growth_store_yoy_sql,
+        raw=(STORE_WORDS, TOP_GROWTH_WORDS), norm=(Intent.SALES_WORDS,),
+    ),
+    HardRule(
+        "top_sold_product_name", hard_rule_top_sold_product_name_sql,
+        norm=(Intent.NAME_WORDS, Intent.MOST_SOLD_WORDS),
+    ),
+    HardRule("total_qty", hard_rule_total_qty_sql, norm=(Intent.TOTAL_WORDS, Intent.QTY_WORDS)),
+    HardRule("monthly_sales_trend", hard_rule_monthly_sales_sql, norm=(Intent.SALES_WORDS, Intent.MONTH_WORDS)),
+    HardRule("quarter_sales_total", hard_rule_quarter_sales_sql, norm=(Intent.SALES_WORDS, Intent.QUARTER_WORDS)),
+    HardRule(
+        "top_n_store_sales", hard_rule_top_n_sales_store_sql,
+        raw=(STORE_WORDS, TOP_WORDS), norm=(Intent.SALES_WORDS,),
+    ),
+    HardRule("total_sales", hard_rule_total_sales_sql, norm=(Intent.TOTAL_WORDS, Intent.SALES_WORDS)),
 ]
+
+
+# =========================================================
+# Indexed dispatch + per-rule counters
+# =========================================================
+
+_rule_stats: Dict[str, Dict[str, int]] = {}
+_dispatch_stats = {"requests": 0}
+
+# built-in rules plus JSON template rules, rebuilt when the template file changes
+_active_rules: List[HardRule] = []
+_RAW_BITS = 0
+_NORM_BITS = 0
+
+CANONICAL_TABLES = {
+    "sales_fact": SALES_FACT,
+    "product_dim": PRODUCT_DIM,
+    "store_dim": STORE_DIM,
+    "event_dim": EVENT_DIM,
+    "event_goods_dim": EVENT_GOODS_DIM,
+    "inventory_fact": INVENTORY_FACT,
+}
+
+TEMPLATE_RULES = TemplateRuleSet(SQL_RULES_PATH, CANONICAL_TABLES, reload_seconds=SQL_RULES_RELOAD_SECONDS)
+
+
+def _merge_template_rules(rules: List[HardRule]) -> List[HardRule]:
+    for t in TEMPLATE_RULES.rules:
+        rule = HardRule(t.name, t, raw=t.raw, norm=t.norm, source="template")
+        names = [r.name for r in rules]
+
+        if rule.name in names:
+            logger.warning("SQL rule template %s shadows a built-in rule; skipped", rule.name)
+            continue
+
+        if t.before and t.before in names:
+            rules.insert(names.index(t.before), rule)
+        elif t.after and t.after in names:
+            rules.insert(names.index(t.after) + 1, rule)
+        else:
+            if t.before or t.after:
+                logger.warning("SQL rule template %s: anchor %s not found", rule.name, t.before or t.after)
+            rules.append(rule)
+    return rules
+
+
+def _rebuild_rules() -> None:
+    global _active_rules, _RAW_BITS, _NORM_BITS
+
+    rules = _merge_template_rules(list(HARD_SQL_RULES))
+    raw_bits = 0
+    norm_bits = 0
+    for r in rules:
+        r.raw_mask = 0
+        for words in r.raw:
+            r.raw_mask |= KEYWORDS.bit_of(words)
+        r.norm_mask = 0
+        for words in r.norm:
+            r.norm_mask |= KEYWORDS.bit_of(words)
+        raw_bits |= r.raw_mask
+        norm_bits |= r.norm_mask
+        _rule_stats.setdefault(r.name, {"evals": 0, "hits": 0, "errors": 0, "ns": 0})
+
+    _applicable_rules.cache_clear()
+    _active_rules, _RAW_BITS, _NORM_BITS = rules, raw_bits, norm_bits
+
+
+@lru_cache(maxsize=1024)
+def _applicable_rules(raw_key: int, norm_key: int) -> Tuple[HardRule, ...]:
+    """Rules whose required features are all present, in registry order."""
+    return tuple(
+        [
+            r for r in _active_rules
+            if (raw_key & r.raw_mask) == r.raw_mask and (norm_key & r.norm_mask) == r.norm_mask
+        ]
+    )
+
+
+def active_hard_rules() -> List[HardRule]:
+    if TEMPLATE_RULES.maybe_reload() or not _active_rules:
+        _rebuild_rules()
+    return _active_rules
+
+
+def run_hard_sql_rules(query: QueryLike) -> Optional[Tuple[str, str]]:
+    """
+    First matching hard rule as (rule_name, sql), or None. Only rules whose
+    feature requirements are met get evaluated; precedence is list order.
+    """
+    ctx = as_context(query)
+    active_hard_rules()
+    rules = _applicable_rules(ctx.raw_features & _RAW_BITS, ctx.features & _NORM_BITS)
+    _dispatch_stats["requests"] += 1
+
+    for r in rules:
+        stats = _rule_stats[r.name]
+        stats["evals"] += 1
+        t0 = time.perf_counter_ns()
+        try:
+            sql = r.fn(ctx)
+        except Exception:
+            stats["errors"] += 1
+            sql = None
+        stats["ns"] += time.perf_counter_ns() - t0
+
+        if sql:
+            stats["hits"] += 1
+            return r.name, sql
+
+    return None
+
+
+def hard_rule_stats() -> Dict[str, Any]:
+    requests = _dispatch_stats["requests"]
+    rules = []
+    for r in active_hard_rules():
+        st = _rule_stats[r.name]
+        rules.append(
+            {
+                "rule": r.name,
+                "source": r.source,
+                "evals": st["evals"],
+                "hits": st["hits"],
+                "errors": st["errors"],
+                "hit_rate": round(st["hits"] / requests, 4) if requests else 0.0,
+                "hit_per_eval": round(st["hits"] / st["evals"], 4) if st["evals"] else 0.0,
+                "avg_us": round(st["ns"] / st["evals"] / 1000, 2) if st["evals"] else 0.0,
+            }
+        )
+    return {
+        "pid": os.getpid(),
+        "requests": requests,
+        "avg_rules_evaluated": round(sum(r["evals"] for r in rules) / requests, 2) if requests else 0.0,
+        "rules": rules,
+    }
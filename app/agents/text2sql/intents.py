@@ -1,5 +1,12 @@
 import re
-from typing import List, Optional
+from datetime import date
+from dataclasses import dataclass, field
+from functools import lru_cache, wraps
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+
+from app.agents.text2sql.date_parser import DateRange, parse_date_range
+from app.agents.text2sql.keyword_automaton import KEYWORDS, register_vocabularies
+from app.agents.text2sql.spelling import SymSpellIndex, is_cyrillic, split_letter_digits
 
 MIXED_WORD_MAP = {
     # ----------------------------
@@ -29,6 +36,16 @@ MIXED_WORD_MAP = {
     "sar": "сар",
     "sariin": "сарын",
     "uliral": "улирал",
+    "ulirliin": "улирлын",
+    "ene": "энэ",
+    "ungursun": "өнгөрсөн",
+    "ungarsan": "өнгөрсөн",
+    "suuliin": "сүүлийн",
+    "honog": "хоног",
+    "honogiin": "хоногийн",
+    "ehnees": "эхнээс",
+    "uchigdur": "өчигдөр",
+    "urjigdar": "уржигдар",
     "quarter": "quarter",
     "q1": "q1",
     "q2": "q2",
@@ -197,7 +214,71 @@ MIXED_WORD_MAP = {
 }
 
 
-def normalize_query(query: str) -> str:
+# Inflected domain words the spelling index should correct towards; they win
+# ties against words that only appear in MIXED_WORD_MAP / Intent vocabularies.
+DOMAIN_WORDS = [
+    "борлуулалт", "борлуулалтын", "борлуулалттай", "орлого", "орлогын",
+    "салбар", "салбарын", "салбараар", "дэлгүүр", "дэлгүүрийн", "дэлгүүрээр",
+    "бараа", "барааны", "бүтээгдэхүүн", "бүтээгдэхүүний", "үлдэгдэл", "үлдэгдлийн",
+    "нийт", "оны", "онд", "сарын", "улирал", "улирлын", "хамгийн",
+    "өнөөдөр", "өнөөдрийн", "өчигдөр", "өчигдрийн", "хоног", "хоногийн",
+    "харьцуулах", "жагсаалт", "нэрээр", "дундаж", "өссөн", "хувь",
+    "ширхэг", "зарагдсан", "ангилал", "брэнд", "нийлүүлэгч", "хямдрал", "агуулах",
+]
+
+
+class Correction(NamedTuple):
+    source: str
+    target: str
+    kind: str  # split | transliteration | spelling
+    distance: int
+
+
+@lru_cache(maxsize=1)
+def spelling_index() -> SymSpellIndex:
+    words: List[str] = list(DOMAIN_WORDS)
+    phrases = list(MIXED_WORD_MAP.values())
+    for name, value in vars(Intent).items():
+        if name.endswith("_WORDS"):
+            phrases.extend(value)
+    for phrase in phrases:
+        words.extend(w for w in phrase.split() if w.isalpha() and len(w) >= 3)
+    return SymSpellIndex(words)
+
+
+def _correct_word(word: str, index: SymSpellIndex) -> Optional[Correction]:
+    # mapped words are known; MIXED_WORD_MAP handles them as before
+    if word in MIXED_WORD_MAP:
+        return None
+
+    hit = index.correct(word)
+    if not hit:
+        return None
+    target, distance = hit
+    kind = "transliteration" if is_cyrillic(target) and not is_cyrillic(word) else "spelling"
+    return Correction(word, target, kind, distance)
+
+
+def _normalize_token(tok: str, index: SymSpellIndex, corrections: List[Correction]) -> str:
+    if tok in MIXED_WORD_MAP:
+        parts = [tok]
+    else:
+        parts = split_letter_digits(tok)
+        if len(parts) > 1:
+            corrections.append(Correction(tok, " ".join(parts), "split", 0))
+
+    out = []
+    for part in parts:
+        fix = _correct_word(part, index)
+        if fix:
+            corrections.append(fix)
+            out.append(fix.target)
+        else:
+            out.append(MIXED_WORD_MAP.get(part, part))
+    return " ".join(out)
+
+
+def normalize_query_with_corrections(query: str) -> Tuple[str, Tuple[Correction, ...]]:
     text = (query or "").strip().lower()
 
     # punctuation цэвэрлэхдээ % болон _ болон - хадгална
@@ -205,10 +286,11 @@ def normalize_query(query: str) -> str:
     text = re.sub(r"\s+", " ", text).strip()
 
     if not text:
-        return text
+        return text, ()
 
-    tokens = text.split()
-    normalized_tokens = [MIXED_WORD_MAP.get(tok, tok) for tok in tokens]
+    index = spelling_index()
+    corrections: List[Correction] = []
+    normalized_tokens = [_normalize_token(tok, index, corrections) for tok in text.split()]
     normalized = " ".join(normalized_tokens)
 
     # common phrase normalization
@@ -222,34 +304,131 @@ def normalize_query(query: str) -> str:
     normalized = normalized.replace("хамгийн их борлуулалттай", "хамгийн их борлуулалттай")
     normalized = normalized.replace("хамгийн бага борлуулалттай", "хамгийн бага борлуулалттай")
 
-    return normalized.strip()
+    return normalized.strip(), tuple(corrections)
+
+
+def normalize_query(query: str) -> str:
+    return normalize_query_with_corrections(query)[0]
+
+
+def apply_corrections(text: str, corrections: Tuple[Correction, ...]) -> str:
+    """Replay token corrections on text, e.g. the letter-digit splits for year / top-N parsing."""
+    for c in corrections:
+        text = re.sub(rf"(?<!\w){re.escape(c.source)}(?!\w)", c.target, text)
+    return text
+
+
+# =========================================================
+# Per-request query context
+# =========================================================
+
+@dataclass(frozen=True)
+class QueryContext:
+    """
+    Everything derived from one question, computed once per request.
+    Keyword feature masks and Intent flags are memoized lazily in `_memo`.
+    """
+    raw: str
+    lowered: str
+    normalized: str
+    tokens: Tuple[str, ...]
+    years: Tuple[int, ...]
+    quarter: Optional[int]
+    month: Optional[int]
+    top_n: Optional[int]
+    store_code: Optional[str]
+    corrections: Tuple[Correction, ...]
+    _memo: Dict[str, Any] = field(default_factory=dict, compare=False, repr=False)
+
+    @classmethod
+    def build(cls, query: str) -> "QueryContext":
+        raw = query or ""
+        normalized, corrections = normalize_query_with_corrections(raw)
+        # raw keyword rules match the question as typed; only the number
+        # parsers see "borluulalt2025" split into "borluulalt 2025"
+        lowered = raw.strip().lower()
+        split = apply_corrections(lowered, tuple(c for c in corrections if c.kind == "split"))
+        return cls(
+            raw=raw,
+            lowered=lowered,
+            normalized=normalized,
+            tokens=tuple(normalized.split()),
+            years=tuple(_parse_years(split)),
+            quarter=_parse_quarter(normalized),
+            month=_parse_month(normalized),
+            top_n=_parse_top_n(split),
+            store_code=_parse_store_code(lowered),
+            corrections=corrections,
+        )
+
+    @property
+    def features(self) -> int:
+        """Keyword vocabulary bits matched in the normalized text."""
+        return self._mask("__features__", self.normalized)
+
+    @property
+    def raw_features(self) -> int:
+        """Keyword vocabulary bits matched in the lowercased raw text."""
+        return self._mask("__raw_features__", self.lowered)
+
+    @property
+    def date_range(self) -> Optional[DateRange]:
+        """Date expression of the question as a [start, end) range, relative to today."""
+        today = date.today()
+        hit = self._memo.get("__date_range__")
+        if hit is None or hit[0] != today:
+            hit = self._memo["__date_range__"] = (today, parse_date_range(self.normalized, today, raw=self.lowered))
+        return hit[1]
+
+    def _mask(self, key: str, text: str) -> int:
+        hit = self._memo.get(key)
+        if hit is None or hit[0] != KEYWORDS.generation:
+            mask = KEYWORDS.scan(text)
+            hit = self._memo[key] = (KEYWORDS.generation, mask)
+        return hit[1]
+
+    def __str__(self) -> str:
+        return self.raw
+
+
+QueryLike = Union[str, QueryContext]
+
+
+@lru_cache(maxsize=512)
+def _context_for(query: str) -> QueryContext:
+    return QueryContext.build(query)
+
 
+def as_context(query: QueryLike) -> QueryContext:
+    if isinstance(query, QueryContext):
+        return query
+    return _context_for(query or "")
 
-def ql(query: str) -> str:
-    return normalize_query(query)
+
+def ql(query: QueryLike) -> str:
+    return as_context(query).normalized
 
 
 def has_any(text: str, keywords: List[str]) -> bool:
     return any(k in text for k in keywords)
 
 
-def extract_years(query: str) -> List[int]:
-    years = re.findall(r"\b(20\d{2})\b", query or "")
-    return sorted({int(y) for y in years})
+def matches(query: QueryLike, words: List[str]) -> bool:
+    """`has_any(ql(query), words)` for a registered vocabulary, as a bit test."""
+    return bool(as_context(query).features & KEYWORDS.bit_of(words))
 
 
-def extract_year(query: str) -> Optional[int]:
-    years = extract_years(query)
-    return years[0] if years else None
+def _parse_years(text: str) -> List[int]:
+    years = re.findall(r"\b(20\d{2})\b", text or "")
+    return sorted({int(y) for y in years})
 
 
-def extract_quarter(query: str) -> Optional[int]:
-    text = ql(query)
+def _parse_quarter(text: str) -> Optional[int]:
     patterns = [
-        r"(\d)\s*[-]?\s*р\s*улирал",
+        # улирал / улирлын / улиралд ...
+        r"(\d)\s*[-]?\s*р\s*улир(?:ал|л)",
         r"\bq([1-4])\b",
-        r"\b([1-4])\b\s*улирал",
-        r"\b([1-4])-р\s*улирал\b",
+        r"\b([1-4])\b\s*улир(?:ал|л)",
     ]
 
     for pattern in patterns:
@@ -261,25 +440,24 @@ def extract_quarter(query: str) -> Optional[int]:
     return None
 
 
-def extract_month(query: str) -> Optional[int]:
-    text = ql(query)
-
-    month_name_map = {
-        "1 сар": 1, "01 сар": 1, "january": 1, "jan": 1,
-        "2 сар": 2, "02 сар": 2, "february": 2, "feb": 2,
-        "3 сар": 3, "03 сар": 3, "march": 3, "mar": 3,
-        "4 сар": 4, "04 сар": 4, "april": 4, "apr": 4,
-        "5 сар": 5, "05 сар": 5, "may": 5,
-        "6 сар": 6, "06 сар": 6, "june": 6, "jun": 6,
-        "7 сар": 7, "07 сар": 7, "july": 7, "jul": 7,
-        "8 сар": 8, "08 сар": 8, "august": 8, "aug": 8,
-        "9 сар": 9, "09 сар": 9, "september": 9, "sep": 9,
-        "10 сар": 10, "october": 10, "oct": 10,
-        "11 сар": 11, "november": 11, "nov": 11,
-        "12 сар": 12, "december": 12, "dec": 12,
-    }
-
-    for k, v in month_name_map.items():
+MONTH_NAME_MAP = {
+    "1 сар": 1, "01 сар": 1, "january": 1, "jan": 1,
+    "2 сар": 2, "02 сар": 2, "february": 2, "feb": 2,
+    "3 сар": 3, "03 сар": 3, "march": 3, "mar": 3,
+    "4 сар": 4, "04 сар": 4, "april": 4, "apr": 4,
+    "5 сар": 5, "05 сар": 5, "may": 5,
+    "6 сар": 6, "06 сар": 6, "june": 6, "jun": 6,
+    "7 сар": 7, "07 сар": 7, "july": 7, "jul": 7,
+    "8 сар": 8, "08 сар": 8, "august": 8, "aug": 8,
+    "9 сар": 9, "09 сар": 9, "september": 9, "sep": 9,
+    "10 сар": 10, "october": 10, "oct": 10,
+    "11 сар": 11, "november": 11, "nov": 11,
+    "12 сар": 12, "december": 12, "dec": 12,
+}
+
+
+def _parse_month(text: str) -> Optional[int]:
+    for k, v in MONTH_NAME_MAP.items():
         if k in text:
             return v
 
@@ -290,15 +468,83 @@ def extract_month(query: str) -> Optional[int]:
     return None
 
 
-def extract_top_n(query: str, default: int = 10) -> int:
-    nums = re.findall(r"\b(\d{1,3})\b", query or "")
+def _parse_top_n(text: str) -> Optional[int]:
+    nums = re.findall(r"\b(\d{1,3})\b", text or "")
     if not nums:
-        return default
+        return None
     try:
         n = int(nums[0])
         return max(1, min(n, 100))
     except Exception:
-        return default
+        return None
+
+
+STORE_CODE_PATTERNS = [
+    re.compile(
+        r"(?:store|branch|салбар|дэлгүүр)\w*\s*(?:id|code|код|дугаар|№|#)?\s*[:=#№]?\s*"
+        r"([a-z]{0,3}\d{3,6})\b"
+    ),
+    re.compile(r"\b([a-z]{0,3}\d{3,6})\s*(?:-р|дугаар|тоот)?\s*(?:салбар|дэлгүүр|store|branch)"),
+]
+
+
+def _parse_store_code(text: str) -> Optional[str]:
+    """Store code written next to a store word: "1234 салбар", "store CU012", "салбар #105"."""
+    for pattern in STORE_CODE_PATTERNS:
+        m = pattern.search(text or "")
+        if not m:
+            continue
+        code = m.group(1)
+        # "2024 онд" style years are never store codes
+        if re.fullmatch(r"20\d{2}", code):
+            continue
+        return code.upper()
+    return None
+
+
+def extract_years(query: QueryLike) -> List[int]:
+    return list(as_context(query).years)
+
+
+def extract_year(query: QueryLike) -> Optional[int]:
+    years = as_context(query).years
+    return years[0] if years else None
+
+
+def extract_quarter(query: QueryLike) -> Optional[int]:
+    return as_context(query).quarter
+
+
+def extract_month(query: QueryLike) -> Optional[int]:
+    return as_context(query).month
+
+
+def extract_top_n(query: QueryLike, default: int = 10) -> int:
+    n = as_context(query).top_n
+    return default if n is None else n
+
+
+def extract_store_code(query: QueryLike) -> Optional[str]:
+    return as_context(query).store_code
+
+
+def extract_date_range(query: QueryLike) -> Optional[DateRange]:
+    return as_context(query).date_range
+
+
+def _flag(fn: Callable[[QueryContext], bool]) -> Callable[[QueryLike], bool]:
+    """Memoize a single-argument Intent predicate on the query context."""
+    name = fn.__name__
+
+    @wraps(fn)
+    def wrapper(query: QueryLike) -> bool:
+        ctx = as_context(query)
+        value = ctx._memo.get(name)
+        if value is None:
+            value = ctx._memo[name] = fn(ctx)
+        return value
+
+    return wrapper
 
 
 class Intent:
@@ -413,207 +659,257 @@ class Intent:
         "дундаж", "average", "avg"
     ]
 
+    GROUP_STORE_WORDS = [
+        "дэлгүүрээр", "салбараар", "салбар тус бүр", "store by", "per store", "by store", "branch by"
+    ]
+
+    GROUP_PRODUCT_WORDS = [
+        "бараагаар", "product by", "per product", "by product", "item by", "sku by"
+    ]
+
+    COMPARE_WORDS = [
+        "харьцуулах", "харьцуул", "compare", "vs", "ялгаа", "difference"
+    ]
+
+    GROWTH_WORDS = [
+        "өсөлт", "өссөн", "growth", "increase", "yoy", "mom"
+    ]
+
+    TOP_N_WORDS = [
+        "top", "топ", "хамгийн их", "хамгийн бага"
+    ]
+
+    RECENT_TREND_WORDS = [
+        "trend", "тренд", "daily", "өдөр бүр", "7 хоног", "last 7"
+    ]
+
     @staticmethod
-    def wants_group_store(query: str) -> bool:
-        return has_any(
-            ql(query),
-            ["дэлгүүрээр", "салбараар", "салбар тус бүр", "store by", "per store", "by store", "branch by"]
-        )
+    @_flag
+    def wants_group_store(query: QueryLike) -> bool:
+        return matches(query, Intent.GROUP_STORE_WORDS)
 
     @staticmethod
-    def wants_group_product(query: str) -> bool:
-        return has_any(
-            ql(query),
-            ["бараагаар", "product by", "per product", "by product", "item by", "sku by"]
-        )
+    @_flag
+    def wants_group_product(query: QueryLike) -> bool:
+        return matches(query, Intent.GROUP_PRODUCT_WORDS)
 
     @staticmethod
-    def wants_name(query: str) -> bool:
-        return has_any(ql(query), Intent.NAME_WORDS)
+    @_flag
+    def wants_name(query: QueryLike) -> bool:
+        return matches(query, Intent.NAME_WORDS)
 
     @staticmethod
-    def wants_total(query: str) -> bool:
-        return has_any(ql(query), Intent.TOTAL_WORDS)
+    @_flag
+    def wants_total(query: QueryLike) -> bool:
+        return matches(query, Intent.TOTAL_WORDS)
 
     @staticmethod
-    def wants_qty(query: str) -> bool:
-        return has_any(ql(query), Intent.QTY_WORDS)
+    @_flag
+    def wants_qty(query: QueryLike) -> bool:
+        return matches(query, Intent.QTY_WORDS)
 
     @staticmethod
-    def wants_percentage(query: str) -> bool:
-        return has_any(ql(query), Intent.PERCENT_WORDS)
+    @_flag
+    def wants_percentage(query: QueryLike) -> bool:
+        return matches(query, Intent.PERCENT_WORDS)
 
     @staticmethod
-    def wants_compare(query: str) -> bool:
-        return has_any(ql(query), ["харьцуулах", "харьцуул", "compare", "vs", "ялгаа", "difference"])
+    @_flag
+    def wants_compare(query: QueryLike) -> bool:
+        return matches(query, Intent.COMPARE_WORDS)
 
     @staticmethod
-    def wants_growth(query: str) -> bool:
-        return has_any(ql(query), ["өсөлт", "өссөн", "growth", "increase", "yoy", "mom"])
+    @_flag
+    def wants_growth(query: QueryLike) -> bool:
+        return matches(query, Intent.GROWTH_WORDS)
 
     @staticmethod
-    def wants_average(query: str) -> bool:
-        return has_any(ql(query), Intent.AVERAGE_WORDS)
+    @_flag
+    def wants_average(query: QueryLike) -> bool:
+        return matches(query, Intent.AVERAGE_WORDS)
 
     @staticmethod
-    def wants_today(query: str) -> bool:
-        return has_any(ql(query), Intent.TODAY_WORDS)
+    @_flag
+    def wants_today(query: QueryLike) -> bool:
+        return matches(query, Intent.TODAY_WORDS)
 
     @staticmethod
-    def wants_yesterday(query: str) -> bool:
-        return has_any(ql(query), Intent.YESTERDAY_WORDS)
+    @_flag
+    def wants_yesterday(query: QueryLike) -> bool:
+        return matches(query, Intent.YESTERDAY_WORDS)
 
     @staticmethod
-    def wants_last_7_days(query: str) -> bool:
-        return has_any(ql(query), Intent.LAST_7_DAYS_WORDS)
+    @_flag
+    def wants_last_7_days(query: QueryLike) -> bool:
+        return matches(query, Intent.LAST_7_DAYS_WORDS)
 
     @staticmethod
-    def is_sales(query: str) -> bool:
-        return has_any(ql(query), Intent.SALES_WORDS)
+    @_flag
+    def is_sales(query: QueryLike) -> bool:
+        return matches(query, Intent.SALES_WORDS)
 
     @staticmethod
-    def is_monthly(query: str) -> bool:
-        return has_any(ql(query), Intent.MONTH_WORDS)
+    @_flag
+    def is_monthly(query: QueryLike) -> bool:
+        return matches(query, Intent.MONTH_WORDS)
 
     @staticmethod
-    def is_daily(query: str) -> bool:
-        return has_any(ql(query), Intent.DAILY_WORDS)
+    @_flag
+    def is_daily(query: QueryLike) -> bool:
+        return matches(query, Intent.DAILY_WORDS)
 
     @staticmethod
-    def is_quarter(query: str) -> bool:
-        return has_any(ql(query), Intent.QUARTER_WORDS)
+    @_flag
+    def is_quarter(query: QueryLike) -> bool:
+        return matches(query, Intent.QUARTER_WORDS)
 
     @staticmethod
-    def is_store_query(query: str) -> bool:
-        return has_any(ql(query), Intent.STORE_WORDS)
+    @_flag
+    def is_store_query(query: QueryLike) -> bool:
+        return matches(query, Intent.STORE_WORDS)
 
     @staticmethod
-    def is_product_query(query: str) -> bool:
-        return has_any(ql(query), Intent.PRODUCT_WORDS)
+    @_flag
+    def is_product_query(query: QueryLike) -> bool:
+        return matches(query, Intent.PRODUCT_WORDS)
 
     @staticmethod
-    def is_inventory_query(query: str) -> bool:
-        return has_any(ql(query), Intent.INVENTORY_WORDS)
+    @_flag
+    def is_inventory_query(query: QueryLike) -> bool:
+        return matches(query, Intent.INVENTORY_WORDS)
 
     @staticmethod
-    def is_promotion_query(query: str) -> bool:
-        return has_any(ql(query), Intent.PROMOTION_WORDS)
+    @_flag
+    def is_promotion_query(query: QueryLike) -> bool:
+        return matches(query, Intent.PROMOTION_WORDS)
 
     @staticmethod
-    def is_category_query(query: str) -> bool:
-        return has_any(ql(query), Intent.CATEGORY_WORDS)
+    @_flag
+    def is_category_query(query: QueryLike) -> bool:
+        return matches(query, Intent.CATEGORY_WORDS)
 
     @staticmethod
-    def is_brand_query(query: str) -> bool:
-        return has_any(ql(query), Intent.BRAND_WORDS)
+    @_flag
+    def is_brand_query(query: QueryLike) -> bool:
+        return matches(query, Intent.BRAND_WORDS)
 
     @staticmethod
-    def is_supplier_query(query: str) -> bool:
-        return has_any(ql(query), Intent.SUPPLIER_WORDS)
+    @_flag
+    def is_supplier_query(query: QueryLike) -> bool:
+        return matches(query, Intent.SUPPLIER_WORDS)
 
     @staticmethod
-    def is_table_question(query: str) -> bool:
-        return has_any(ql(query), Intent.TABLE_WORDS)
+    @_flag
+    def is_table_question(query: QueryLike) -> bool:
+        return matches(query, Intent.TABLE_WORDS)
 
     @staticmethod
-    def is_about_question(query: str) -> bool:
-        return has_any(ql(query), Intent.ABOUT_WORDS)
+    @_flag
+    def is_about_question(query: QueryLike) -> bool:
+        return matches(query, Intent.ABOUT_WORDS)
 
     @staticmethod
-    def is_top_store(query: str) -> bool:
-        q = ql(query)
-        return has_any(q, Intent.STORE_WORDS) and has_any(q, Intent.TOP_WORDS)
+    @_flag
+    def is_top_store(query: QueryLike) -> bool:
+        return matches(query, Intent.STORE_WORDS) and matches(query, Intent.TOP_WORDS)
 
     @staticmethod
-    def is_bottom_store(query: str) -> bool:
-        q = ql(query)
-        return has_any(q, Intent.STORE_WORDS) and has_any(q, Intent.BOTTOM_WORDS)
+    @_flag
+    def is_bottom_store(query: QueryLike) -> bool:
+        return matches(query, Intent.STORE_WORDS) and matches(query, Intent.BOTTOM_WORDS)
 
     @staticmethod
-    def is_top_product(query: str) -> bool:
-        q = ql(query)
-        return has_any(q, Intent.PRODUCT_WORDS) and has_any(q, Intent.TOP_WORDS)
+    @_flag
+    def is_top_product(query: QueryLike) -> bool:
+        return matches(query, Intent.PRODUCT_WORDS) and matches(query, Intent.TOP_WORDS)
 
     @staticmethod
-    def is_bottom_product(query: str) -> bool:
-        q = ql(query)
-        return has_any(q, Intent.PRODUCT_WORDS) and has_any(q, Intent.BOTTOM_WORDS)
+    @_flag
+    def is_bottom_product(query: QueryLike) -> bool:
+        return matches(query, Intent.PRODUCT_WORDS) and matches(query, Intent.BOTTOM_WORDS)
 
     @staticmethod
-    def is_most_sold(query: str) -> bool:
-        return has_any(ql(query), Intent.MOST_SOLD_WORDS)
+    @_flag
+    def is_most_sold(query: QueryLike) -> bool:
+        return matches(query, Intent.MOST_SOLD_WORDS)
 
     @staticmethod
-    def wants_yoy_growth(query: str) -> bool:
-        q = ql(query)
+    @_flag
+    def wants_yoy_growth(query: QueryLike) -> bool:
         return (
-                has_any(q, Intent.YOY_COMPARE_WORDS)
-                and has_any(q, Intent.PERCENT_WORDS)
+                matches(query, Intent.YOY_COMPARE_WORDS)
+                and matches(query, Intent.PERCENT_WORDS)
                 and Intent.is_sales(query)
         )
 
     @staticmethod
-    def wants_month_filter(query: str) -> bool:
+    @_flag
+    def wants_month_filter(query: QueryLike) -> bool:
         return extract_month(query) is not None
 
     @staticmethod
-    def wants_year_filter(query: str) -> bool:
+    @_flag
+    def wants_year_filter(query: QueryLike) -> bool:
         return extract_year(query) is not None
 
     @staticmethod
-    def wants_quarter_filter(query: str) -> bool:
+    @_flag
+    def wants_quarter_filter(query: QueryLike) -> bool:
         return extract_quarter(query) is not None
 
     @staticmethod
-    def wants_top_n(query: str) -> bool:
-        q = ql(query)
-        return has_any(q, ["top", "топ", "хамгийн их", "хамгийн бага"]) and len(re.findall(r"\b\d{1,3}\b", q)) > 0
+    def has_date_range(query: QueryLike) -> bool:
+        return as_context(query).date_range is not None
+
+    @staticmethod
+    @_flag
+    def wants_top_n(query: QueryLike) -> bool:
+        return matches(query, Intent.TOP_N_WORDS) and len(re.findall(r"\b\d{1,3}\b", ql(query))) > 0
 
     @staticmethod
-    def get_top_n(query: str, default: int = 10) -> int:
+    def get_top_n(query: QueryLike, default: int = 10) -> int:
         return extract_top_n(query, default=default)
 
     @staticmethod
-    def is_recent_trend_query(query: str) -> bool:
-        q = ql(query)
-        return (
-                Intent.is_sales(query)
-                and has_any(q, ["trend", "тренд", "daily", "өдөр бүр", "7 хоног", "last 7"])
-        )
+    @_flag
+    def is_recent_trend_query(query: QueryLike) -> bool:
+        return Intent.is_sales(query) and matches(query, Intent.RECENT_TREND_WORDS)
 
     @staticmethod
-    def is_master_data_query(query: str) -> bool:
-        q = ql(query)
+    @_flag
+    def is_master_data_query(query: QueryLike) -> bool:
         return (
-                Intent.is_store_query(q)
-                or Intent.is_product_query(q)
-                or Intent.is_category_query(q)
-                or Intent.is_brand_query(q)
-                or Intent.is_supplier_query(q)
+                Intent.is_store_query(query)
+                or Intent.is_product_query(query)
+                or Intent.is_category_query(query)
+                or Intent.is_brand_query(query)
+                or Intent.is_supplier_query(query)
         ) and not Intent.is_sales(query)
 
     @staticmethod
-    def is_out_of_domain(query: str) -> bool:
-        return has_any(ql(query), Intent.OUT_OF_DOMAIN_WORDS)
+    @_flag
+    def is_out_of_domain(query: QueryLike) -> bool:
+        return matches(query, Intent.OUT_OF_DOMAIN_WORDS)
 
     @staticmethod
-    def infer_domain(query: str) -> str:
-        q = ql(query)
-
-        if Intent.is_sales(q):
+    def infer_domain(query: QueryLike) -> str:
+        if Intent.is_sales(query):
             return "sales"
-        if Intent.is_inventory_query(q):
+        if Intent.is_inventory_query(query):
             return "inventory"
-        if Intent.is_promotion_query(q):
+        if Intent.is_promotion_query(query):
             return "promotion"
-        if Intent.is_supplier_query(q):
+        if Intent.is_supplier_query(query):
             return "supplier"
-        if Intent.is_brand_query(q):
+        if Intent.is_brand_query(query):
             return "brand"
-        if Intent.is_category_query(q):
+        if Intent.is_category_query(query):
             return "category"
-        if Intent.is_product_query(q) and not Intent.is_sales(q):
+        if Intent.is_product_query(query) and not Intent.is_sales(query):
             return "product_master"
-        if Intent.is_store_query(q) and not Intent.is_sales(q):
+        if Intent.is_store_query(query) and not Intent.is_sales(query):
             return "store_master"
         return "unknown"
+
+
+register_vocabularies("intent", vars(Intent))
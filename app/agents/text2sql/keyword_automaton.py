@@ -0,0 +1,135 @@
+from collections import deque
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class KeywordAutomaton:
+    """
+    Aho–Corasick automaton over every keyword vocabulary.
+
+    Each vocabulary gets one bit; scan() walks the text once and returns the
+    OR of the bits of all vocabularies with at least one keyword occurring as
+    a substring, which is exactly `any(k in text for k in words)` per list.
+    """
+
+    def __init__(self):
+        self._vocab_bits: Dict[str, int] = {}
+        self._words: Dict[str, Tuple[str, ...]] = {}
+        self._bit_by_list: Dict[int, int] = {}
+        self._lists: Dict[str, List[str]] = {}
+        self._compiled = False
+        # bumped on every compile so cached masks can be re-scanned
+        self.generation = 0
+
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[int] = [0]
+
+    # ---------------- vocabularies ----------------
+
+    def register(self, name: str, words: Iterable[str]) -> int:
+        """Register (or replace) a vocabulary and return its bit."""
+        words = tuple([w for w in words if w])
+        bit = self._vocab_bits.get(name)
+        if bit is None:
+            bit = 1 << len(self._vocab_bits)
+            self._vocab_bits[name] = bit
+        self._words[name] = words
+        self._compiled = False
+        return bit
+
+    def register_list(self, name: str, words: List[str]) -> int:
+        """Register a module-level keyword list so bit_of(words) finds it."""
+        bit = self.register(name, words)
+        self._bit_by_list[id(words)] = bit
+        self._lists[name] = words
+        return bit
+
+    def registered_list(self, name: str) -> Optional[List[str]]:
+        return self._lists.get(name)
+
+    def bit(self, name: str) -> int:
+        return self._vocab_bits[name]
+
+    def bit_of(self, words: List[str]) -> int:
+        return self._bit_by_list[id(words)]
+
+    def names(self, mask: int) -> List[str]:
+        return [name for name, bit in self._vocab_bits.items() if mask & bit]
+
+    # ---------------- compile ----------------
+
+    def compile(self) -> None:
+        goto: List[Dict[str, int]] = [{}]
+        out: List[int] = [0]
+
+        for name, words in self._words.items():
+            bit = self._vocab_bits[name]
+            for word in words:
+                state = 0
+                for ch in word:
+                    nxt = goto[state].get(ch)
+                    if nxt is None:
+                        nxt = len(goto)
+                        goto[state][ch] = nxt
+                        goto.append({})
+                        out.append(0)
+                    state = nxt
+                out[state] |= bit
+
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                out[nxt] |= out[fail[nxt]]
+
+        self._goto = goto
+        self._fail = fail
+        self._out = out
+        self._compiled = True
+        self.generation += 1
+        _scan_cached.cache_clear()
+
+    # ---------------- scan ----------------
+
+    def scan(self, text: str) -> int:
+        if not self._compiled:
+            self.compile()
+        return _scan_cached(text or "")
+
+    def _scan(self, text: str) -> int:
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        mask = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            mask |= out[state]
+        return mask
+
+
+KEYWORDS = KeywordAutomaton()
+
+
+@lru_cache(maxsize=2048)
+def _scan_cached(text: str) -> int:
+    return KEYWORDS._scan(text)
+
+
+def text_has(text: str, words: List[str]) -> bool:
+    """`any(k in text for k in words)` for a registered list, via one scan of text."""
+    return bool(KEYWORDS.scan(text) & KEYWORDS.bit_of(words))
+
+
+def register_vocabularies(prefix: str, namespace: Dict[str, object]) -> None:
+    """Register every `*_WORDS` list in a module/class namespace."""
+    for name, value in list(namespace.items()):
+        if name.endswith("_WORDS") and isinstance(value, list):
+            KEYWORDS.register_list(f"{prefix}.{name.lower()}", value)
@@ -0,0 +1,176 @@
+"""
+Name lookups through ClickHouse dictionaries instead of LEFT JOINs.
+
+Hard rules, ensure_product_name_join and inject_name_join_from_registry all
+produce the same shape:
+
+    LEFT JOIN BI_DB.Dimension_IM d1
+      ON f.GDS_CD = d1.GDS_CD
+
+which makes ClickHouse build a hash table of the whole dimension for every
+query. With NAME_DICTIONARIES_ENABLED the executor rewrites such joins when
+the joined alias is only read for attributes of a configured dictionary:
+
+    d1.GDS_NM     -> dictGet('BI_DB.dict_product_name', 'GDS_NM', tuple(toString(f.GDS_CD)))
+    d1.GDS_CD     -> if(dictHas(...), toString(f.GDS_CD), '')
+
+Unmatched keys give '' like the LEFT JOIN does with join_use_nulls = 0.
+Joins with other conditions, INNER joins and aliases used for anything else
+are left alone. The dictionaries are created with dictionary_ddl()
+(scripts/create_name_dictionaries.py).
+"""
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from app.agents.text2sql.sql_expr import SqlExprError, Token, tokenize
+from app.config import CLICKHOUSE_DATABASE, NAME_DICTIONARY_DATABASE
+
+# tokens that end a JOIN ... ON a = b clause
+CLAUSE_WORDS = {
+    "where", "group", "order", "limit", "having", "settings", "left", "right",
+    "inner", "full", "cross", "join", "any", "all", "array", "union", "prewhere",
+}
+
+
+@dataclass(frozen=True)
+class NameDictionary:
+    table: str
+    name: str
+    key: str
+    attributes: Tuple[str, ...]
+
+    @property
+    def qualified(self) -> str:
+        return f"{NAME_DICTIONARY_DATABASE}.{self.name}"
+
+
+NAME_DICTIONARIES: Dict[str, NameDictionary] = {
+    d.table: d
+    for d in (
+        NameDictionary(
+            "Dimension_IM", "dict_product_name", "GDS_CD",
+            ("GDS_NM", "CATE_CD", "BrandName", "CategoryName", "SupplierName"),
+        ),
+        NameDictionary("Dimension_SM", "dict_store_name", "BIZLOC_CD", ("BIZLOC_NM",)),
+    )
+}
+
+
+# =========================================================
+# DDL
+# =========================================================
+
+def dictionary_ddl(source_db: str = CLICKHOUSE_DATABASE, lifetime: Tuple[int, int] = (300, 900)) -> List[str]:
+    """CREATE DICTIONARY statements; String keys need the complex-key layout."""
+    out = []
+    for d in NAME_DICTIONARIES.values():
+        columns = ",\n".join(f"  {col} String" for col in (d.key,) + d.attributes)
+        out.append(
+            f"CREATE DICTIONARY IF NOT EXISTS {d.qualified}\n"
+            f"(\n{columns}\n)\n"
+            f"PRIMARY KEY {d.key}\n"
+            f"SOURCE(CLICKHOUSE(DB '{source_db}' TABLE '{d.table}'))\n"
+            f"LIFETIME(MIN {lifetime[0]} MAX {lifetime[1]})\n"
+            f"LAYOUT(COMPLEX_KEY_HASHED())"
+        )
+    return out
+
+
+# =========================================================
+# Rewrite
+# =========================================================
+
+def word_positions(tokens: List[Token]) -> List[int]:
+    return [i for i, t in enumerate(tokens) if t.kind != "ws"]
+
+
+def find_lookup_join(
+        tokens: List[Token],
+        words: List[int],
+        start: int,
+        keys: Dict[str, str],
+) -> Optional[Tuple[int, int, str, str, str]]:
+    """
+    (first word, last word, dimension table, alias, fact-side key) of the next
+    `LEFT [OUTER] JOIN <dim> <alias> ON a = <alias>.<key>` at or after
+    words[start], for dimensions in keys (table -> key column).
+    """
+    for w in range(start, len(words)):
+        if tokens[words[w]].text.lower() != "left":
+            continue
+        j = w + 1
+        if j < len(words) and tokens[words[j]].text.lower() == "outer":
+            j += 1
+        seq = [tokens[i] for i in words[j:j + 7]]
+        if len(seq) < 7 or seq[0].text.lower() != "join" or seq[3].text.lower() != "on" or seq[5].text != "=":
+            continue
+        table, alias, lhs, rhs = seq[1].text.split(".")[-1], seq[2].text, seq[4].text, seq[6].text
+        if table not in keys or seq[2].kind != "ident" or "." in alias:
+            continue
+        if seq[4].kind != "ident" or seq[6].kind != "ident":
+            continue
+        after = words[j + 7] if j + 7 < len(words) else None
+        if after is not None and tokens[after].text.lower() not in CLAUSE_WORDS and tokens[after].text != ")":
+            continue
+        key_ref = f"{alias}.{keys[table]}"
+        if rhs == key_ref and not lhs.startswith(f"{alias}."):
+            return w, j + 6, table, alias, lhs
+        if lhs == key_ref and not rhs.startswith(f"{alias}."):
+            return w, j + 6, table, alias, rhs
+    return None
+
+
+def drop_span(tokens: List[Token], words: List[int], first: int, last: int) -> List[Token]:
+    """Tokens without words[first..last]; the whitespace around the gap collapses to one token (none at the end)."""
+    span = range(words[first], words[last] + 1)
+    out: List[Token] = []
+    for i, tok in enumerate(tokens):
+        if i in span or (tok.kind == "ws" and out and out[-1].kind == "ws"):
+            continue
+        out.append(tok)
+    if last == len(words) - 1 and out and out[-1].kind == "ws":
+        out.pop()
+    return out
+
+
+def _replacement(ref: str, alias: str, d: NameDictionary, fact_key: str) -> Optional[str]:
+    """dictGet text for alias.<col>, None when the column is not in the dictionary."""
+    col = ref[len(alias) + 1:]
+    key = f"tuple(toString({fact_key}))"
+    if col == d.key:
+        return f"if(dictHas('{d.qualified}', {key}), toString({fact_key}), '')"
+    if col in d.attributes:
+        return f"dictGet('{d.qualified}', '{col}', {key})"
+    return None
+
+
+def rewrite_name_joins(sql: str) -> str:
+    """Replace dictionary-backed name-only LEFT JOINs with dictGet; other SQL is returned unchanged."""
+    try:
+        tokens = tokenize(sql)
+    except SqlExprError:
+        return sql
+
+    keys = {table: d.key for table, d in NAME_DICTIONARIES.items()}
+    start = 0
+    while True:
+        words = word_positions(tokens)
+        found = find_lookup_join(tokens, words, start, keys)
+        if found is None:
+            return "".join(t.text for t in tokens)
+        first, last, table, alias, fact_key = found
+        d = NAME_DICTIONARIES[table]
+
+        out: List[Token] = []
+        for tok in drop_span(tokens, words, first, last):
+            if tok.kind == "ident" and (tok.text == alias or tok.text.startswith(f"{alias}.")):
+                text = _replacement(tok.text, alias, d, fact_key) if tok.text != alias else None
+                if text is None:
+                    break
+                tok = Token("expr", text)
+            out.append(tok)
+        else:
+            tokens = out
+            start = 0
+            continue
+        start = first + 1
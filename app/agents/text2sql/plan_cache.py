@@ -0,0 +1,246 @@
+"""
+Template-level cache of validated LLM plans.
+
+Questions that differ only in literals ("2024 оны топ 10 дэлгүүр" /
+"2025 оны топ 5 дэлгүүр") share one entry. The key is the normalized question
+with every literal replaced by a slot:
+
+    y0, y1 ...   years           2024
+    n0, n1 ...   other numbers   10, 3 (month), 2 (quarter)
+    c0 ...       store codes     cu520
+
+The stored plan is the JSON of the validated plan with the same literals
+replaced by slot marks, plus the parsed date range (date_from / date_to /
+date_last) so relative periods ("өнгөрсөн сар") roll forward with today.
+
+A plan is only cached when every literal it shares with the question was
+abstracted: a digit run from the question left in the plan (a date written
+some other way, the digits of a store code, a small number in an unexpected
+position) means the plan cannot be re-instantiated safely.
+
+Entries are dropped after PLAN_CACHE_TTL_SECONDS and whenever the version
+(registry version + planner prompt fingerprint) changes.
+"""
+import json
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from app.agents.text2sql.intents import QueryContext
+from app.config import PLAN_CACHE_ENABLED, PLAN_CACHE_MAX_ENTRIES, PLAN_CACHE_TTL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+LITERAL_RE = re.compile(r"(?<![\w.])(?:[a-z]{1,3}\d{3,6}|\d+)(?![\w.])")
+YEAR_RE = re.compile(r"(?:19|20)\d{2}")
+# whole digit runs that are not part of an identifier such as the d1 / d2 aliases
+DIGITS_RE = re.compile(r"(?<![A-Za-z_\d])\d+")
+MARK_RE = re.compile(r"§(\w+?)(:U)?§")
+
+# small numbers are only abstracted where they are clearly a filter value / limit
+SMALL_NUMBER_CONTEXT = r"(?:[=<>]\s*|\"limit\":\s*|\blimit\s+|\bin\s*\(\s*|\bbetween\s+|\band\s+)"
+
+
+def _mark(name: str, upper: bool = False) -> str:
+    return f"§{name}{':U' if upper else ''}§"
+
+
+# =========================================================
+# Templates
+# =========================================================
+
+def question_template(text: str) -> Tuple[str, Dict[str, str]]:
+    """("{y0} оны топ {n1} дэлгүүр", {"y0": "2024", "n1": "10"})."""
+    slots: Dict[str, str] = {}
+    names: Dict[str, str] = {}
+
+    def sub(m: "re.Match[str]") -> str:
+        literal = m.group(0)
+        name = names.get(literal)
+        if name is None:
+            if literal[0].isalpha():
+                kind = "c"
+            elif YEAR_RE.fullmatch(literal):
+                kind = "y"
+            else:
+                kind = "n"
+            name = f"{kind}{len(names)}"
+            names[literal] = name
+            slots[name] = literal
+        return "{" + name + "}"
+
+    return LITERAL_RE.sub(sub, text), slots
+
+
+def derived_slots(ctx: QueryContext) -> Dict[str, str]:
+    r = ctx.date_range
+    if not r:
+        return {}
+    return {
+        "date_from": r.start.isoformat(),
+        "date_to": r.end.isoformat(),
+        "date_last": (r.end - timedelta(days=1)).isoformat(),
+    }
+
+
+def plan_template(plan: Dict[str, Any], slots: Dict[str, str], derived: Dict[str, str]) -> Optional[str]:
+    """Plan JSON with slot marks, or None when it cannot be abstracted safely."""
+    out = json.dumps(plan, ensure_ascii=False, sort_keys=True)
+
+    for name, value in derived.items():
+        out = out.replace(value, _mark(name))
+
+    for name, literal in slots.items():
+        if name[0] == "c":
+            out = re.sub(
+                rf"(?<![\w§]){re.escape(literal)}(?![\w§])",
+                lambda m, n=name: _mark(n, m.group(0).isupper()),
+                out,
+                flags=re.IGNORECASE,
+            )
+            continue
+
+        if name[0] == "y" or len(literal) > 2:
+            out = re.sub(rf"(?<![\w.\-§]){literal}(?![\w.\-§])", _mark(name), out)
+        else:
+            out = re.sub(
+                rf"({SMALL_NUMBER_CONTEXT}){literal}(?![\w.\-§])",
+                lambda m, n=name: m.group(1) + _mark(n),
+                out,
+                flags=re.IGNORECASE,
+            )
+
+    # any question literal still in the plan, also inside a longer number
+    # (toYYYYMM = 202403, '2024-03-31'), would be replayed for other values
+    literals = {re.sub(r"\D", "", v) for v in slots.values()}
+    for run in DIGITS_RE.findall(MARK_RE.sub(" ", out)):
+        if run in literals or any(len(lit) > 2 and lit in run for lit in literals):
+            return None
+    return out
+
+
+def instantiate(template: str, slots: Dict[str, str], derived: Dict[str, str]) -> Optional[Dict[str, Any]]:
+    missing = []
+
+    def sub(m: "re.Match[str]") -> str:
+        value = slots.get(m.group(1), derived.get(m.group(1)))
+        if value is None:
+            missing.append(m.group(1))
+            return ""
+        return value.upper() if m.group(2) else value
+
+    text = MARK_RE.sub(sub, template)
+    if missing:
+        return None
+    try:
+        plan = json.loads(text)
+    except ValueError:
+        return None
+    return plan if isinstance(plan, dict) else None
+
+
+# =========================================================
+# Cache
+# =========================================================
+
+@dataclass
+class CachedPlan:
+    template: str
+    version: Hashable
+    created_at: float
+    hits: int = 0
+
+
+@dataclass
+class PlanCache:
+    max_entries: int = PLAN_CACHE_MAX_ENTRIES
+    ttl_seconds: float = PLAN_CACHE_TTL_SECONDS
+    enabled: bool = PLAN_CACHE_ENABLED
+    _entries: "OrderedDict[str, CachedPlan]" = field(default_factory=OrderedDict)
+    _stats: Dict[str, int] = field(
+        default_factory=lambda: {
+            "lookups": 0, "hits": 0, "misses": 0, "stale": 0, "expired": 0,
+            "unbound": 0, "stores": 0, "rejected": 0,
+        }
+    )
+
+    def lookup(self, ctx: QueryContext, version: Hashable) -> Optional[Dict[str, Any]]:
+        """A re-instantiated plan for ctx, or None."""
+        if not self.enabled:
+            return None
+        self._stats["lookups"] += 1
+
+        key, slots = question_template(ctx.normalized)
+        entry = self._entries.get(key)
+        if entry is None:
+            self._stats["misses"] += 1
+            return None
+
+        if entry.version != version:
+            self._stats["stale"] += 1
+            del self._entries[key]
+            return None
+        if self.ttl_seconds > 0 and time.time() - entry.created_at > self.ttl_seconds:
+            self._stats["expired"] += 1
+            del self._entries[key]
+            return None
+
+        plan = instantiate(entry.template, slots, derived_slots(ctx))
+        if plan is None:
+            # e.g. the cached plan used a date range this question does not have
+            self._stats["unbound"] += 1
+            return None
+
+        entry.hits += 1
+        self._stats["hits"] += 1
+        self._entries.move_to_end(key)
+        return plan
+
+    def store(self, ctx: QueryContext, plan: Dict[str, Any], version: Hashable) -> bool:
+        if not self.enabled or not isinstance(plan, dict):
+            return False
+
+        key, slots = question_template(ctx.normalized)
+        template = plan_template(plan, slots, derived_slots(ctx))
+        if template is None:
+            self._stats["rejected"] += 1
+            logger.debug("Plan not cacheable for %r", ctx.normalized)
+            return False
+
+        self._entries[key] = CachedPlan(template=template, version=version, created_at=time.time())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        self._stats["stores"] += 1
+        return True
+
+    def discard(self, ctx: QueryContext) -> None:
+        """Forget the entry ctx maps to (its re-instantiated plan failed)."""
+        self._entries.pop(question_template(ctx.normalized)[0], None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._stats["lookups"]
+        top = sorted(self._entries.items(), key=lambda kv: kv[1].hits, reverse=True)[:20]
+        return {
+            "pid": os.getpid(),
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            **self._stats,
+            "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+            "top_templates": [{"template": k, "hits": e.hits} for k, e in top],
+        }
+
+
+PLAN_CACHE = PlanCache()
+
+
+def plan_cache_stats() -> Dict[str, Any]:
+    return PLAN_CACHE.stats()
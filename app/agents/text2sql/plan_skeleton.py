@@ -0,0 +1,240 @@
+"""
+Deterministic plan skeleton for the skeleton-first planner (PLANNER_MODE=skeleton).
+
+For sales questions most of the plan follows from the QueryContext alone:
+
+    fact_table  canonical fact of the domain (force_fact_table_by_domain would
+                override the LLM's choice anyway)
+    where       parsed date range, store code
+    select /    time grain (toYYYYMM / toDate), store / product dimension and
+    group_by    the Dimension_SM / Dimension_IM name join when names are asked
+    order_by /  top / bottom direction, top_n
+    limit
+
+What the intents cannot decide is left to the LLM under `missing`:
+
+    metrics     the question names a measure other than net sales / qty
+                (discount, VAT, cost, receipts ...)
+    dimensions  category / brand / supplier questions: grouping by the
+    filters     attribute or filtering on a value of it (Dimension_IM joined)
+
+Questions outside this shape (compare / growth / percentage, several years,
+non-sales domains) get no skeleton and are planned in full.
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.agents.text2sql.intents import Intent, QueryLike, as_context, matches
+from app.agents.text2sql.keyword_automaton import register_vocabularies
+from app.config import CLICKHOUSE_DATABASE
+
+SALES_FACT = f"{CLICKHOUSE_DATABASE}.Cluster_Main_Sales"
+PRODUCT_DIM = f"{CLICKHOUSE_DATABASE}.Dimension_IM"
+STORE_DIM = f"{CLICKHOUSE_DATABASE}.Dimension_SM"
+
+# measures the skeleton does not map to NetSale / SoldQty
+OTHER_MEASURE_WORDS = [
+    "gross", "discount", "хөнгөлөлт", "vat", "нөат", "татвар", "tax",
+    "cost", "өртөг", "ашиг", "profit", "margin",
+    "receipt", "баримт", "transaction", "гүйлгээ", "үнэ", "price",
+]
+
+# "most sold" ranked by quantity rather than amount
+SOLD_WORDS = ["зарагдсан", "зарагдах", "sold", "selling"]
+
+register_vocabularies("skeleton", globals())
+
+
+@dataclass
+class PlanSkeleton:
+    plan: Dict[str, Any]
+    missing: Tuple[str, ...] = ()
+    # "DESC" / "ASC" on the first metric once metrics are known
+    rank: Optional[str] = None
+
+    @property
+    def complete(self) -> bool:
+        return not self.missing
+
+
+# =========================================================
+# Building
+# =========================================================
+
+def _date_filter(query: QueryLike) -> Optional[str]:
+    r = as_context(query).date_range
+    if not r:
+        return None
+    if r.grain == "year" and r.start.month == 1 and r.start.day == 1 and r.end.year == r.start.year + 1:
+        return f"toYear(f.SalesDate) = {r.start.year}"
+    return f"f.SalesDate >= toDate('{r.start.isoformat()}') AND f.SalesDate < toDate('{r.end.isoformat()}')"
+
+
+def _metrics(query: QueryLike) -> List[Dict[str, str]]:
+    qty = Intent.wants_qty(query) or matches(query, SOLD_WORDS)
+    if Intent.wants_average(query):
+        return [{"expr": "avg(f.SoldQty)", "as": "avg_qty"} if qty else {"expr": "avg(f.NetSale)", "as": "avg_net_sales"}]
+    if qty:
+        return [
+            {"expr": "sum(f.SoldQty)", "as": "total_qty"},
+            {"expr": "sum(f.NetSale)", "as": "total_net_sales"},
+        ]
+    return [{"expr": "sum(f.NetSale)", "as": "total_net_sales"}]
+
+
+def _join(plan: Dict[str, Any], table: str, on: str) -> str:
+    alias = f"d{len(plan['joins']) + 1}"
+    plan["joins"].append({"type": "LEFT", "table": table, "alias": alias, "on": on.format(alias=alias)})
+    return alias
+
+
+def _add_dimension(plan: Dict[str, Any], expr: str, alias: str) -> None:
+    plan["select"].append({"expr": expr, "as": alias})
+    plan["group_by"].append(expr)
+
+
+def build_plan_skeleton(query: QueryLike, domain: str) -> Optional[PlanSkeleton]:
+    """The part of the plan the intents determine, or None when they do not fit."""
+    ctx = as_context(query)
+
+    if domain != "sales":
+        return None
+    if Intent.wants_compare(ctx) or Intent.wants_growth(ctx) or Intent.wants_percentage(ctx):
+        return None
+    if len(ctx.years) > 1 or Intent.is_promotion_query(ctx) or Intent.is_inventory_query(ctx):
+        return None
+
+    plan: Dict[str, Any] = {
+        "fact_table": SALES_FACT,
+        "select": [],
+        "joins": [],
+        "where": [],
+        "group_by": [],
+        "order_by": [],
+        "limit": 50,
+    }
+    skeleton = PlanSkeleton(plan=plan)
+    missing: List[str] = []
+
+    # ---------------- where ----------------
+    date_filter = _date_filter(ctx)
+    if date_filter:
+        plan["where"].append(date_filter)
+    if ctx.store_code:
+        plan["where"].append(f"toString(f.StoreID) = '{ctx.store_code}'")
+
+    # ---------------- dimensions ----------------
+    wants_name = Intent.wants_name(ctx)
+    by_product = (
+            Intent.wants_group_product(ctx)
+            or Intent.is_top_product(ctx)
+            or Intent.is_bottom_product(ctx)
+            or (Intent.is_product_query(ctx) and (Intent.is_most_sold(ctx) or wants_name))
+    )
+    by_store = not by_product and (
+            Intent.wants_group_store(ctx)
+            or Intent.is_top_store(ctx)
+            or Intent.is_bottom_store(ctx)
+            or (Intent.is_store_query(ctx) and wants_name)
+    )
+    time_grain = False
+
+    # a grain only when the period spans several of them; "тренд" over a
+    # week or a month is daily, over a year monthly
+    r = ctx.date_range
+    if (Intent.is_daily(ctx) and (r is None or r.days > 1)) or (
+            Intent.is_recent_trend_query(ctx) and r is not None and 1 < r.days <= 31
+    ):
+        _add_dimension(plan, "toDate(f.SalesDate)", "dt")
+        time_grain = True
+    elif Intent.is_monthly(ctx) and (r is None or r.days > 31):
+        _add_dimension(plan, "toYYYYMM(f.SalesDate)", "ym")
+        time_grain = True
+
+    if by_product:
+        if wants_name:
+            alias = _join(plan, PRODUCT_DIM, "f.GDS_CD = {alias}.GDS_CD")
+            _add_dimension(plan, f"{alias}.GDS_NM", "product_name")
+        else:
+            _add_dimension(plan, "f.GDS_CD", "product_code")
+    elif by_store:
+        if wants_name:
+            alias = _join(plan, STORE_DIM, "f.StoreID = {alias}.BIZLOC_CD")
+            _add_dimension(plan, f"{alias}.BIZLOC_NM", "store_name")
+        else:
+            _add_dimension(plan, "f.StoreID", "store_id")
+
+    if Intent.is_category_query(ctx) or Intent.is_brand_query(ctx) or Intent.is_supplier_query(ctx):
+        if not any(j["table"] == PRODUCT_DIM for j in plan["joins"]):
+            _join(plan, PRODUCT_DIM, "f.GDS_CD = {alias}.GDS_CD")
+        missing.extend(["dimensions", "filters"])
+
+    # ---------------- metrics ----------------
+    if matches(ctx, OTHER_MEASURE_WORDS):
+        missing.insert(0, "metrics")
+    else:
+        plan["select"].extend(_metrics(ctx))
+
+    # ---------------- order / limit ----------------
+    top = Intent.is_top_store(ctx) or Intent.is_top_product(ctx) or Intent.is_most_sold(ctx)
+    bottom = Intent.is_bottom_store(ctx) or Intent.is_bottom_product(ctx)
+    if (by_store or by_product) and (top or bottom):
+        skeleton.rank = "ASC" if bottom and not top else "DESC"
+        plan["limit"] = ctx.top_n or 1
+    elif time_grain:
+        plan["order_by"].append(f"{plan['select'][0]['as']} ASC")
+
+    skeleton.missing = tuple(missing)
+    if skeleton.complete:
+        return finish_skeleton(skeleton)
+    return skeleton
+
+
+# =========================================================
+# Merging the LLM's answer
+# =========================================================
+
+def _items(value: Any) -> List[Dict[str, str]]:
+    out = []
+    for item in value if isinstance(value, list) else []:
+        if isinstance(item, dict) and isinstance(item.get("expr"), str) and item["expr"].strip():
+            out.append({"expr": item["expr"].strip(), "as": str(item.get("as") or "").strip()})
+    return out
+
+
+def merge_skeleton(skeleton: PlanSkeleton, filled: Dict[str, Any]) -> Optional[PlanSkeleton]:
+    """Add the LLM's metrics / dimensions / filters; None when a required key is empty."""
+    plan = skeleton.plan
+
+    if "dimensions" in skeleton.missing:
+        for item in _items(filled.get("dimensions")):
+            # dimensions go before the metrics, next to the skeleton's own
+            pos = len(plan["group_by"])
+            plan["select"].insert(pos, item)
+            plan["group_by"].append(item["expr"])
+
+    if "filters" in skeleton.missing:
+        filters = filled.get("filters")
+        if isinstance(filters, list):
+            plan["where"].extend(x.strip() for x in filters if isinstance(x, str) and x.strip())
+
+    if "metrics" in skeleton.missing:
+        metrics = _items(filled.get("metrics"))
+        if not metrics:
+            return None
+        plan["select"].extend(metrics)
+
+    if not any(x["expr"] not in plan["group_by"] for x in plan["select"]):
+        return None
+
+    skeleton.missing = ()
+    return finish_skeleton(skeleton)
+
+
+def finish_skeleton(skeleton: PlanSkeleton) -> PlanSkeleton:
+    plan = skeleton.plan
+    if skeleton.rank and not plan["order_by"]:
+        metric = next((x for x in plan["select"] if x["expr"] not in plan["group_by"]), None)
+        if metric:
+            plan["order_by"].append(f"{metric['as'] or metric['expr']} {skeleton.rank}")
+    return skeleton
@@ -1,8 +1,9 @@
 from typing import Any, Dict, List
 
-from app.agents.text2sql.intents import Intent
+from app.agents.text2sql.intents import Intent, QueryLike
 from app.agents.text2sql.registry_utils import normalize_table_ref
-from app.config import CLICKHOUSE_DATABASE
+from app.agents.text2sql.sql_expr import Ident, Node, parse_expr, render, rewrite
+from app.config import CLICKHOUSE_DATABASE, DIMENSION_CACHE_ENABLED
 
 CANONICAL_REPLACEMENTS = {
     "f.Store": "f.StoreID",
@@ -19,11 +20,31 @@ CANONICAL_REPLACEMENTS = {
 }
 
 
+_CANONICAL_NODES = {old: parse_expr(new).nodes[0] for old, new in CANONICAL_REPLACEMENTS.items()}
+
+
+def _canonical_ident(ident: Ident) -> Node:
+    node = _CANONICAL_NODES.get(ident.text)
+    if node is not None:
+        return node
+    # bare names also match as the column part: d1.Amount -> d1.NetSale
+    node = _CANONICAL_NODES.get(ident.parts[-1])
+    if isinstance(node, Ident) and len(ident.parts) > 1:
+        return Ident(ident.parts[:-1] + node.parts)
+    return ident
+
+
 def _replace_expr(expr: str) -> str:
-    out = expr or ""
-    for old, new in CANONICAL_REPLACEMENTS.items():
-        out = out.replace(old, new)
-    return out
+    """
+    Canonical column names on the parsed expression: whole identifiers only
+    (f.Store never touches f.StoreID), never inside string literals.
+    Unchanged or unparseable expressions are returned as written.
+    """
+    parsed = parse_expr((expr or "").strip())
+    if parsed is None:
+        return expr or ""
+    repaired = rewrite(parsed, _canonical_ident)
+    return render(repaired) if repaired != parsed else expr
 
 
 def repair_canonical_columns(plan: Dict[str, Any]) -> Dict[str, Any]:
@@ -49,7 +70,7 @@ def repair_canonical_columns(plan: Dict[str, Any]) -> Dict[str, Any]:
 
 def force_fact_table_by_domain(
         plan: Dict[str, Any],
-        query: str,
+        query: QueryLike,
         domain: str,
         candidates: List[Any],
 ) -> Dict[str, Any]:
@@ -71,7 +92,7 @@ def force_fact_table_by_domain(
     return plan
 
 
-def drop_suspicious_joins(plan: Dict[str, Any], query: str) -> Dict[str, Any]:
+def drop_suspicious_joins(plan: Dict[str, Any], query: QueryLike) -> Dict[str, Any]:
     safe_joins = []
 
     for j in plan.get("joins", []):
@@ -101,7 +122,7 @@ def find_join(plan: Dict[str, Any], table_name_target: str) -> Dict[str, Any] |
     return None
 
 
-def ensure_product_name_join(plan: Dict[str, Any], query: str) -> Dict[str, Any]:
+def ensure_product_name_join(plan: Dict[str, Any], query: QueryLike) -> Dict[str, Any]:
     if not Intent.wants_name(query):
         return plan
 
@@ -115,6 +136,15 @@ def ensure_product_name_join(plan: Dict[str, Any], query: str) -> Dict[str, Any]
     plan.setdefault("limit", 50)
 
     dim_join = find_join(plan, "Dimension_IM")
+    if DIMENSION_CACHE_ENABLED and not dim_join:
+        # no join: the executor names the product codes from the dimension cache
+        has_name = any(isinstance(x, dict) and x.get("as") in ("product_name", "item_name") for x in plan["select"])
+        if not has_name:
+            plan["select"].insert(0, {"expr": "f.GDS_CD", "as": "product_name"})
+            if "f.GDS_CD" not in plan["group_by"]:
+                plan["group_by"].insert(0, "f.GDS_CD")
+        return plan
+
     if not dim_join:
         alias = f"d{len(plan['joins']) + 1}"
         dim_join = {
@@ -145,7 +175,7 @@ def inject_name_join_from_registry(
         plan: Dict[str, Any],
         candidates: List[Any],
         rel_filtered: List[Dict[str, Any]],
-        query: str,
+        query: QueryLike,
 ) -> Dict[str, Any]:
     if not Intent.wants_name(query):
         return plan
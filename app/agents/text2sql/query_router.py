@@ -1,10 +1,33 @@
-from typing import Dict
+from typing import Any, Dict
 
-from app.agents.text2sql.intents import Intent, ql
+from app.agents.text2sql.intents import Intent, QueryLike, as_context, matches
+from app.agents.text2sql.keyword_automaton import register_vocabularies
+from app.core.intent_classifier import predict_intent
 
+# soft domain guesses for schema / table questions (normalized text)
+SCHEMA_SALES_WORDS = ["борлуул", "sales", "netsale", "grosssale", "soldqty"]
+SCHEMA_INVENTORY_WORDS = ["stock", "inventory", "үлдэгдэл", "агуулах"]
+SCHEMA_PRODUCT_WORDS = ["product", "item", "бараа", "бүтээгдэхүүн"]
+SCHEMA_STORE_WORDS = ["store", "branch", "дэлгүүр", "салбар"]
+SCHEMA_PROMOTION_WORDS = ["promotion", "campaign", "event", "хямдрал"]
 
-def classify_query_domain(query: str) -> Dict[str, str]:
-    text = ql(query)
+register_vocabularies("router", globals())
+
+
+def classify_query_domain(query: QueryLike) -> Dict[str, Any]:
+    """Trained domain head when it is confident, otherwise the keyword cascade."""
+    ctx = as_context(query)
+    pred = predict_intent("domain", ctx.normalized)
+    if pred:
+        return {
+            "domain": pred[0],
+            "reason": "intent_model",
+            "confidence": round(pred[1], 4),
+        }
+    return classify_query_domain_by_rules(ctx)
+
+
+def classify_query_domain_by_rules(query: QueryLike) -> Dict[str, str]:
 
     # ---------------------------------
     # out of domain
@@ -92,27 +115,27 @@ def classify_query_domain(query: str) -> Dict[str, str]:
     # ---------------------------------
     if Intent.is_table_question(query) or Intent.is_about_question(query):
         # soft guess using normalized text
-        if any(k in text for k in ["борлуул", "sales", "netsale", "grosssale", "soldqty"]):
+        if matches(query, SCHEMA_SALES_WORDS):
             return {
                 "domain": "sales",
                 "reason": "schema_question_about_sales",
             }
-        if any(k in text for k in ["stock", "inventory", "үлдэгдэл", "агуулах"]):
+        if matches(query, SCHEMA_INVENTORY_WORDS):
             return {
                 "domain": "inventory",
                 "reason": "schema_question_about_inventory",
             }
-        if any(k in text for k in ["product", "item", "бараа", "бүтээгдэхүүн"]):
+        if matches(query, SCHEMA_PRODUCT_WORDS):
             return {
                 "domain": "product_master",
                 "reason": "schema_question_about_product_master",
             }
-        if any(k in text for k in ["store", "branch", "дэлгүүр", "салбар"]):
+        if matches(query, SCHEMA_STORE_WORDS):
             return {
                 "domain": "store_master",
                 "reason": "schema_question_about_store_master",
             }
-        if any(k in text for k in ["promotion", "campaign", "event", "хямдрал"]):
+        if matches(query, SCHEMA_PROMOTION_WORDS):
             return {
                 "domain": "promotion",
                 "reason": "schema_question_about_promotion",
@@ -1,10 +1,11 @@
 from typing import Any, Dict, List, Set
 
-from app.config import CLICKHOUSE_DATABASE, SCHEMA_DICT_PATH
-from app.core.schema_registry import SchemaRegistry, TableInfo
+from app.config import CLICKHOUSE_DATABASE, SEMANTIC_MIN_SCORE
+from app.core.schema_registry import TableInfo
+from app.core.schema_sync import get_registry
+from app.core.semantic_index import get_semantic_index
 
-registry = SchemaRegistry(SCHEMA_DICT_PATH)
-registry.load()
+registry = get_registry()
 
 CORE_TABLES = {
     "Cluster_Main_Sales",
@@ -62,6 +63,35 @@ def rerank_candidates(candidates: List[Any], domain: str) -> List[Any]:
     return sorted(candidates, key=score_table)
 
 
+def semantic_candidates(query: str, top_k: int = 8, min_score: float = SEMANTIC_MIN_SCORE) -> List[TableInfo]:
+    index = get_semantic_index(registry)
+    by_key = {f"{t.db}.{t.table}": t for t in registry.tables}
+
+    # wide tables dilute the table-level vector, so a strong column hit counts too
+    best: Dict[str, float] = {}
+    for key, score in index.search_tables(query, top_k=top_k):
+        best[key] = max(best.get(key, 0.0), score)
+    for key, score in index.search_columns(query, top_k=top_k * 3):
+        table_key = key.rsplit(".", 1)[0]
+        best[table_key] = max(best.get(table_key, 0.0), score)
+
+    ranked = sorted(best.items(), key=lambda x: x[1], reverse=True)
+    return [by_key[k] for k, score in ranked if score >= min_score and k in by_key][:top_k]
+
+
+def merge_candidates(lexical: List[TableInfo], semantic: List[TableInfo], top_k: int = 20) -> List[TableInfo]:
+    out = list(lexical)
+    seen = {(t.db, t.table) for t in out}
+
+    for t in semantic:
+        if (t.db, t.table) in seen:
+            continue
+        seen.add((t.db, t.table))
+        out.append(t)
+
+    return out[:top_k]
+
+
 def normalize_table_ref(table_name: str, default_db: str = CLICKHOUSE_DATABASE) -> str:
     t = (table_name or "").strip()
     if not t:
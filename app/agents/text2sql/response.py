@@ -100,9 +100,20 @@ def sql_response(
         "preview": preview,
     }
 
+    params = getattr(sql, "params", None)
+    if params:
+        meta["sql_params"] = dict(params)
+
     if auto_fixed:
         meta["auto_fixed"] = True
 
+    approx = data.get("approx")
+    if approx:
+        meta["approx"] = approx
+        bound = (approx.get("error_bound") or {}).get("relative")
+        if not error_text and bound is not None:
+            answer_text += f" Ойролцоо утга (±{bound * 100:.1f}%, 95% итгэлтэй)."
+
     if original_error:
         meta["original_error"] = original_error
 
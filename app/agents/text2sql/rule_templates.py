@@ -0,0 +1,392 @@
+"""
+Declarative SQL fast paths loaded from a JSON file.
+
+    {
+      "rules": [
+        {
+          "name": "store_sales_year_by_code",
+          "before": "total_sales_year_only",
+          "when": ["rules.sales_core_words", ["салбар", "store"]],
+          "when_normalized": [],
+          "unless": ["rules.top_words"],
+          "slots": {"year": {"min": 2000}, "store_code": {}},
+          "sql": "SELECT sum(f.NetSale) FROM {table:sales_fact} f WHERE toYear(f.SalesDate) = {year:UInt16} ..."
+        }
+      ]
+    }
+
+`when` / `when_normalized` / `unless` are keyword groups matched on the raw /
+normalized / raw question. A group is either the name of a registered
+vocabulary ("rules.store_words", "intent.sales_words") or an inline keyword
+list. Every `when` group must match and no `unless` group may match.
+
+Slots come from the QueryContext (see SLOT_EXTRACTORS). A slot without a
+default is required; `min` / `max` bound it. Placeholders use ClickHouse's
+query parameter syntax `{name:Type}` and stay in the SQL: a rule returns a
+BoundSQL whose values the executor binds on the server. `{table:<alias>}`
+names a canonical table and is written in at compile time.
+
+Rules are compiled once per file version; inline keyword lists are registered
+only after the whole file compiled. `before` / `after` place a rule relative
+to a Python rule (or an earlier template rule); otherwise it is appended after
+the built-in rules.
+"""
+import json
+import logging
+import os
+import re
+import time
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.agents.text2sql.intents import QueryContext, QueryLike, as_context
+from app.agents.text2sql.keyword_automaton import KEYWORDS
+from app.agents.text2sql.sql_params import PLACEHOLDER_RE, BoundSQL
+
+logger = logging.getLogger(__name__)
+
+_UNSEEN = object()
+
+
+class RuleTemplateError(ValueError):
+    pass
+
+
+# =========================================================
+# Slots
+# =========================================================
+
+def _second_year(ctx: QueryContext) -> Optional[int]:
+    return ctx.years[1] if len(ctx.years) > 1 else None
+
+
+def _prev_year(ctx: QueryContext) -> Optional[int]:
+    return ctx.years[0] - 1 if ctx.years else None
+
+
+# bare calendar years / quarters already have the year / quarter slots
+PERIOD_GRAINS = ("day", "week", "month", "custom")
+
+
+def _date_from(ctx: QueryContext) -> Optional[date]:
+    r = ctx.date_range
+    return r.start if r and r.grain in PERIOD_GRAINS else None
+
+
+def _date_to(ctx: QueryContext) -> Optional[date]:
+    r = ctx.date_range
+    return r.end if r and r.grain in PERIOD_GRAINS else None
+
+
+SLOT_EXTRACTORS: Dict[str, Callable[[QueryContext], Any]] = {
+    "year": lambda ctx: ctx.years[0] if ctx.years else None,
+    "year2": _second_year,
+    "prev_year": _prev_year,
+    "quarter": lambda ctx: ctx.quarter,
+    "month": lambda ctx: ctx.month,
+    "top_n": lambda ctx: ctx.top_n,
+    "store_code": lambda ctx: ctx.store_code,
+    # [date_from, date_to) of a parsed date expression (date_parser)
+    "date_from": _date_from,
+    "date_to": _date_to,
+}
+
+INT_TYPES = {
+    "UInt8": (0, 2 ** 8 - 1),
+    "UInt16": (0, 2 ** 16 - 1),
+    "UInt32": (0, 2 ** 32 - 1),
+    "UInt64": (0, 2 ** 64 - 1),
+    "Int32": (-2 ** 31, 2 ** 31 - 1),
+    "Int64": (-2 ** 63, 2 ** 63 - 1),
+}
+
+
+def _int_value(lo: int, hi: int) -> Callable[[Any], Optional[int]]:
+    def check(value: Any) -> Optional[int]:
+        try:
+            n = int(value)
+        except (TypeError, ValueError):
+            return None
+        return n if lo <= n <= hi else None
+
+    return check
+
+
+def _string_value(value: Any) -> Optional[str]:
+    return None if value is None else str(value)
+
+
+def _date_value(value: Any) -> Optional[str]:
+    iso = getattr(value, "isoformat", None)
+    if iso is None:
+        return None
+    return iso()[:10]
+
+
+# placeholder type -> checked / converted parameter value (None: rule does not apply)
+VALUE_TYPES: Dict[str, Callable[[Any], Any]] = {
+    **{t: _int_value(lo, hi) for t, (lo, hi) in INT_TYPES.items()},
+    "String": _string_value,
+    "Date": _date_value,
+}
+
+
+# =========================================================
+# Compiled rule
+# =========================================================
+
+@dataclass
+class SlotSpec:
+    name: str
+    extract: Callable[[QueryContext], Any]
+    default: Any = None
+    required: bool = True
+    min: Optional[int] = None
+    max: Optional[int] = None
+
+    def value(self, ctx: QueryContext) -> Any:
+        v = self.extract(ctx)
+        if v is None:
+            v = self.default
+        if v is None:
+            return None
+        if self.min is not None and v < self.min:
+            return None
+        if self.max is not None and v > self.max:
+            return None
+        return v
+
+
+@dataclass
+class TemplateRule:
+    name: str
+    before: Optional[str]
+    after: Optional[str]
+    raw: Tuple[List[str], ...]
+    norm: Tuple[List[str], ...]
+    unless: Tuple[List[str], ...]
+    slots: Tuple[SlotSpec, ...]
+    # tables resolved, value placeholders kept for server-side binding
+    sql: str
+    # (slot, value check) per placeholder name
+    params: Tuple[Tuple[str, Callable[[Any], Any]], ...]
+    # set by activate() once the rule's vocabularies are registered
+    unless_mask: int = 0
+
+    def activate(self) -> None:
+        self.unless_mask = 0
+        for words in self.unless:
+            self.unless_mask |= KEYWORDS.bit_of(words)
+
+    def __call__(self, query: QueryLike) -> Optional[BoundSQL]:
+        ctx = as_context(query)
+        if self.unless_mask and ctx.raw_features & self.unless_mask:
+            return None
+
+        values: Dict[str, Any] = {}
+        for slot in self.slots:
+            v = slot.value(ctx)
+            if v is None and slot.required:
+                return None
+            values[slot.name] = v
+
+        bound: Dict[str, Any] = {}
+        for name, check in self.params:
+            v = check(values.get(name))
+            if v is None:
+                return None
+            bound[name] = v
+        return BoundSQL(self.sql, bound)
+
+
+def _keyword_groups(
+        rule_name: str,
+        key: str,
+        groups: Any,
+        staged: Dict[str, List[str]],
+) -> Tuple[List[str], ...]:
+    """
+    Resolve vocabulary names / inline lists to keyword lists. Inline lists are
+    only collected in `staged`; the caller registers them once the whole file
+    compiled, so a broken file leaves the live vocabularies alone.
+    """
+    if not isinstance(groups, list):
+        raise RuleTemplateError(f"{rule_name}: '{key}' must be a list")
+
+    resolved: List[List[str]] = []
+    for i, group in enumerate(groups):
+        if isinstance(group, str):
+            words = KEYWORDS.registered_list(group)
+            if words is None:
+                raise RuleTemplateError(f"{rule_name}: unknown vocabulary '{group}'")
+        elif isinstance(group, list) and group and all(isinstance(w, str) for w in group):
+            words = [w.lower() for w in group]
+            staged[f"json.{rule_name}.{key}.{i}"] = words
+        else:
+            raise RuleTemplateError(f"{rule_name}: bad keyword group in '{key}'")
+        resolved.append(words)
+    return tuple(resolved)
+
+
+def _compile_slots(rule_name: str, spec: Any) -> Tuple[SlotSpec, ...]:
+    if not isinstance(spec, dict):
+        raise RuleTemplateError(f"{rule_name}: 'slots' must be an object")
+
+    slots = []
+    for name, opts in spec.items():
+        extract = SLOT_EXTRACTORS.get(name)
+        if extract is None:
+            raise RuleTemplateError(f"{rule_name}: unknown slot '{name}'")
+        opts = opts or {}
+        slots.append(
+            SlotSpec(
+                name=name,
+                extract=extract,
+                default=opts.get("default"),
+                required=opts.get("default") is None,
+                min=opts.get("min"),
+                max=opts.get("max"),
+            )
+        )
+    return tuple(slots)
+
+
+def _compile_sql(
+        rule_name: str,
+        sql: Any,
+        slot_names: List[str],
+        tables: Dict[str, str],
+) -> Tuple[str, Tuple[Tuple[str, Callable[[Any], Any]], ...]]:
+    if isinstance(sql, list):
+        sql = "\n".join(sql)
+    if not isinstance(sql, str) or not sql.strip():
+        raise RuleTemplateError(f"{rule_name}: 'sql' is empty")
+
+    params: Dict[str, Tuple[str, Callable[[Any], Any]]] = {}
+
+    def resolve(m: "re.Match[str]") -> str:
+        name, typ = m.group(1), m.group(2)
+        if name == "table":
+            table = tables.get(typ)
+            if table is None:
+                raise RuleTemplateError(f"{rule_name}: unknown table alias '{typ}'")
+            return table
+
+        if name not in slot_names:
+            raise RuleTemplateError(f"{rule_name}: placeholder '{name}' is not a declared slot")
+        check = VALUE_TYPES.get(typ)
+        if check is None:
+            raise RuleTemplateError(f"{rule_name}: unsupported type '{typ}'")
+        if params.setdefault(name, (typ, check))[0] != typ:
+            raise RuleTemplateError(f"{rule_name}: placeholder '{name}' used with two types")
+        return m.group(0)
+
+    text = PLACEHOLDER_RE.sub(resolve, sql).strip()
+    return text, tuple((name, check) for name, (_, check) in params.items())
+
+
+def compile_rule(
+        spec: Dict[str, Any],
+        tables: Dict[str, str],
+        staged: Dict[str, List[str]],
+) -> TemplateRule:
+    """Compile one rule; its inline keyword lists go to `staged` (see activate_rules)."""
+    name = spec.get("name")
+    if not isinstance(name, str) or not re.fullmatch(r"\w+", name):
+        raise RuleTemplateError(f"bad rule name: {name!r}")
+
+    slots = _compile_slots(name, spec.get("slots", {}))
+    sql, params = _compile_sql(name, spec.get("sql"), [s.name for s in slots], tables)
+
+    return TemplateRule(
+        name=name,
+        before=spec.get("before"),
+        after=spec.get("after"),
+        raw=_keyword_groups(name, "when", spec.get("when", []), staged),
+        norm=_keyword_groups(name, "when_normalized", spec.get("when_normalized", []), staged),
+        unless=_keyword_groups(name, "unless", spec.get("unless", []), staged),
+        slots=slots,
+        sql=sql,
+        params=params,
+    )
+
+
+def activate_rules(rules: List[TemplateRule], staged: Dict[str, List[str]]) -> None:
+    """Register the staged inline vocabularies and resolve the rules' keyword bits."""
+    for vocab, words in staged.items():
+        KEYWORDS.register_list(vocab, words)
+    for rule in rules:
+        rule.activate()
+
+
+# =========================================================
+# File loading / hot reload
+# =========================================================
+
+class TemplateRuleSet:
+    """Compiled rules of one JSON file, reloaded when its mtime changes."""
+
+    def __init__(self, path: str, tables: Dict[str, str], reload_seconds: float = 2.0):
+        self.path = path
+        self.tables = tables
+        self.reload_seconds = reload_seconds
+        self.rules: List[TemplateRule] = []
+        # bumped on every successful (re)load
+        self.version = 0
+        self._mtime: Any = _UNSEEN
+        self._checked_at = 0.0
+
+    def load(self) -> bool:
+        """(Re)compile the file. Keeps the previous rules if it is broken."""
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            self._mtime = None
+            if self.rules:
+                logger.warning("SQL rule file disappeared: %s", self.path)
+                self.rules = []
+                self.version += 1
+                return True
+            return False
+
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            specs = data.get("rules", []) if isinstance(data, dict) else data
+
+            rules: List[TemplateRule] = []
+            staged: Dict[str, List[str]] = {}
+            seen = set()
+            for spec in specs:
+                rule = compile_rule(spec, self.tables, staged)
+                if rule.name in seen:
+                    raise RuleTemplateError(f"duplicate rule name: {rule.name}")
+                seen.add(rule.name)
+                rules.append(rule)
+        except (OSError, ValueError, AttributeError, TypeError) as e:
+            logger.warning("SQL rule file %s not loaded: %s", self.path, e)
+            self._mtime = mtime
+            return False
+
+        activate_rules(rules, staged)
+        self.rules = rules
+        self._mtime = mtime
+        self.version += 1
+        logger.info("Loaded %d SQL rule templates from %s", len(rules), self.path)
+        return True
+
+    def maybe_reload(self) -> bool:
+        """Cheap per-request check; stats the file at most every reload_seconds."""
+        now = time.monotonic()
+        if self._checked_at and (self.reload_seconds <= 0 or now - self._checked_at < self.reload_seconds):
+            return False
+        self._checked_at = now
+
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            mtime = None
+        if mtime == self._mtime:
+            return False
+        return self.load()
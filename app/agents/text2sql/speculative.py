@@ -0,0 +1,128 @@
+"""
+Speculative domain fallback while the LLM plans.
+
+When the planner times out or fails, text2sql_answer answers with
+fallback_sql_by_domain anyway; waiting for the LLM first puts the full LLM
+timeout on top of the fallback query. With SPECULATIVE_FALLBACK_ENABLED the
+fallback SQL is started in a worker thread next to planning, when its cost
+class is within SPECULATIVE_FALLBACK_MAX_COST:
+
+    master    dimension / master tables only
+    filtered  fact table with a year / date filter
+    scan      fact table without a filter
+
+Planning then gets PLANNER_LATENCY_BUDGET_SECONDS. A plan inside the budget
+wins and the fallback result is dropped; otherwise planning is cancelled and
+the (usually already finished) fallback result is returned.
+"""
+import asyncio
+import logging
+import os
+import re
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+from app.agents.text2sql.executor import run_sql_preview
+from app.agents.text2sql.response import sql_response
+from app.config import (
+    PLANNER_LATENCY_BUDGET_SECONDS,
+    SPECULATIVE_FALLBACK_ENABLED,
+    SPECULATIVE_FALLBACK_MAX_COST,
+)
+
+logger = logging.getLogger(__name__)
+
+COST_CLASSES = ("master", "filtered", "scan")
+
+FACT_RE = re.compile(r"\bFROM\s+\S*(?:Cluster_Main_Sales|war_stock_\w+)\b", re.IGNORECASE)
+DATE_FILTER_RE = re.compile(r"\bWHERE\b[^;]*\b(?:toYear|toDate|SalesDate)\b", re.IGNORECASE | re.DOTALL)
+
+T = TypeVar("T")
+
+_stats: Dict[str, int] = {
+    "started": 0, "skipped_cost": 0, "planner_won": 0,
+    "used_timeout": 0, "used_failure": 0,
+}
+
+
+def fallback_cost_class(sql: str) -> str:
+    if not FACT_RE.search(sql or ""):
+        return "master"
+    return "filtered" if DATE_FILTER_RE.search(sql) else "scan"
+
+
+class Speculation:
+    """A fallback SQL preview running in a worker thread."""
+
+    def __init__(self, sql: str, cost: str, runner: Callable[[str], Dict[str, Any]] = run_sql_preview):
+        self.sql = sql
+        self.cost = cost
+        self.started = time.perf_counter()
+        self.task: "asyncio.Task[Dict[str, Any]]" = asyncio.ensure_future(
+            asyncio.to_thread(sql_response, sql, "domain_fallback", runner)
+        )
+
+    async def result(self, reason: str) -> Dict[str, Any]:
+        """The fallback answer, awaiting the query if it is still running."""
+        waited = time.perf_counter()
+        result = await self.task
+        done = time.perf_counter()
+        _stats[f"used_{reason}"] += 1
+        result["meta"]["speculative_fallback"] = {
+            "reason": reason,
+            "cost": self.cost,
+            "head_start_ms": round((waited - self.started) * 1000, 1),
+            "waited_ms": round((done - waited) * 1000, 1),
+        }
+        return result
+
+    def discard(self) -> None:
+        """The plan won; the thread cannot be interrupted, so only silence its outcome."""
+        _stats["planner_won"] += 1
+        self.task.add_done_callback(_drop_outcome)
+
+
+def _drop_outcome(task: "asyncio.Task[Any]") -> None:
+    if not task.cancelled() and task.exception() is not None:
+        logger.debug("Discarded speculative fallback failed: %s", task.exception())
+
+
+def start_speculation(
+        sql: Optional[str],
+        runner: Callable[[str], Dict[str, Any]] = run_sql_preview,
+) -> Optional[Speculation]:
+    if not SPECULATIVE_FALLBACK_ENABLED or not sql:
+        return None
+    cost = fallback_cost_class(sql)
+    if COST_CLASSES.index(cost) > COST_CLASSES.index(SPECULATIVE_FALLBACK_MAX_COST):
+        _stats["skipped_cost"] += 1
+        return None
+    _stats["started"] += 1
+    return Speculation(sql, cost, runner)
+
+
+async def within_budget(
+        planning: Awaitable[T],
+        speculation: Optional[Speculation],
+        budget: float = PLANNER_LATENCY_BUDGET_SECONDS,
+) -> T:
+    """
+    Await planning; with a speculation running, give up after the budget
+    (TimeoutError) and cancel the LLM call.
+    """
+    if speculation is None:
+        return await planning
+    try:
+        return await asyncio.wait_for(planning, timeout=budget)
+    except asyncio.TimeoutError:
+        raise TimeoutError(f"planner exceeded the {budget:g}s latency budget") from None
+
+
+def speculative_stats() -> Dict[str, Any]:
+    return {
+        "pid": os.getpid(),
+        "enabled": SPECULATIVE_FALLBACK_ENABLED,
+        "max_cost": SPECULATIVE_FALLBACK_MAX_COST,
+        "budget_seconds": PLANNER_LATENCY_BUDGET_SECONDS,
+        **_stats,
+    }
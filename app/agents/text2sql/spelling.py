@@ -0,0 +1,197 @@
+"""
+Latin→Cyrillic transliteration and near-miss correction for query tokens.
+
+Domain words are indexed by a folded Latin key (Cyrillic is romanized, then
+ambiguous letters and doubled letters are collapsed), so "borluulaltiin",
+"borluulaltin" and "борлулалтын" all land on the key of "борлуулалтын".
+Lookups use a SymSpell-style deletion index: every vocabulary key is stored
+with all its deletes up to MAX_DISTANCE, and a token only has to generate its
+own deletes to find every candidate within that edit distance.
+
+Only unknown tokens are corrected. A correction that changes letters (distance
+> 0) needs both the token and the word to have MIN_CORRECTION_LENGTH letters,
+and the word has to be FREQUENCY_MARGIN times as frequent in the vocabulary
+as any other word at the same distance; otherwise the token is left alone.
+"""
+import re
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+MAX_DISTANCE = 2
+MIN_CORRECTION_LENGTH = 5
+FREQUENCY_MARGIN = 2
+CORRECTION_CACHE_SIZE = 4096
+
+CYRILLIC_TO_LATIN = {
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "yo", "ж": "j",
+    "з": "z", "и": "i", "й": "i", "к": "k", "л": "l", "м": "m", "н": "n", "о": "o",
+    "ө": "o", "п": "p", "р": "r", "с": "s", "т": "t", "у": "u", "ү": "u", "ф": "f",
+    "х": "h", "ц": "ts", "ч": "ch", "ш": "sh", "щ": "sh", "ъ": "", "ы": "i", "ь": "i",
+    "э": "e", "ю": "yu", "я": "ya",
+}
+
+# applied in order on romanized text; both sides of a lookup are folded alike
+LATIN_FOLDS = [
+    ("kh", "h"),
+    ("ts", "c"),
+    ("x", "h"),
+    ("w", "v"),
+    ("q", "k"),
+    ("y", "i"),
+    ("ö", "o"),
+    ("ü", "u"),
+]
+
+CYRILLIC_RE = re.compile(r"[а-яөүё]")
+LETTER_DIGIT_RE = re.compile(r"(?<=[^\W\d_]{3})(?=\d)|(?<=\d)(?=[^\W\d_]{3})")
+
+
+def is_cyrillic(token: str) -> bool:
+    return bool(CYRILLIC_RE.search(token))
+
+
+def romanize(token: str) -> str:
+    return "".join(CYRILLIC_TO_LATIN.get(ch, ch) for ch in token)
+
+
+def fold(token: str) -> str:
+    """Lookup key: romanized, ambiguous letters merged, doubled letters collapsed."""
+    key = romanize(token.lower())
+    for src, dst in LATIN_FOLDS:
+        key = key.replace(src, dst)
+    return re.sub(r"(.)\1+", r"\1", key)
+
+
+def split_letter_digits(token: str) -> List[str]:
+    """"borluulalt2025" -> ["borluulalt", "2025"]; short prefixes like "q1", "cu012" stay."""
+    return LETTER_DIGIT_RE.sub(" ", token).split()
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal-string-alignment distance, or limit + 1 once it is exceeded."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+
+    prev2: List[int] = []
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        row_min = cur[0]
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            v = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                v = min(v, prev2[j - 2] + 1)
+            cur[j] = v
+            row_min = min(row_min, v)
+        if row_min > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+def _deletes(key: str, distance: int) -> Set[str]:
+    out = {key}
+    frontier = {key}
+    for _ in range(distance):
+        nxt = set()
+        for word in frontier:
+            for i in range(len(word)):
+                nxt.add(word[:i] + word[i + 1:])
+        out |= nxt
+        frontier = nxt
+    return out
+
+
+class SymSpellIndex:
+    """
+    Deletion index over a domain vocabulary. A word listed several times is
+    that much more frequent; among words with the same key the first one wins.
+    """
+
+    def __init__(self, words: Iterable[str], max_distance: int = MAX_DISTANCE):
+        self.max_distance = max_distance
+        self.words: List[str] = []
+        self.known: Set[str] = set()
+        self._key_words: Dict[str, List[int]] = {}
+        self._key_counts: Dict[str, int] = {}
+        self._deletes: Dict[str, Set[str]] = {}
+        self._corrections: Dict[str, Optional[Tuple[str, int]]] = {}
+
+        for word in words:
+            if not word:
+                continue
+            key = fold(word)
+            self._key_counts[key] = self._key_counts.get(key, 0) + 1
+            if word in self.known:
+                continue
+            self.known.add(word)
+            self.words.append(word)
+            self._key_words.setdefault(key, []).append(len(self.words) - 1)
+
+        for key in self._key_words:
+            for d in _deletes(key, max_distance):
+                self._deletes.setdefault(d, set()).add(key)
+
+    def lookup(self, token: str, max_distance: int) -> Optional[Tuple[str, int]]:
+        """
+        Closest vocabulary word within max_distance of token, as (word, distance);
+        None when another word is about as close and as frequent.
+        """
+        key = fold(token)
+        max_distance = min(max_distance, self.max_distance)
+
+        by_distance: Dict[int, List[str]] = {}
+        for d in _deletes(key, max_distance):
+            for cand in self._deletes.get(d, ()):
+                dist = edit_distance(key, cand, max_distance)
+                if dist <= max_distance:
+                    by_distance.setdefault(dist, []).append(cand)
+        if not by_distance:
+            return None
+
+        dist = min(by_distance)
+        ranked = sorted(set(by_distance[dist]), key=lambda k: (-self._key_counts[k], self._key_words[k][0]))
+        if len(ranked) > 1 and self._key_counts[ranked[0]] < FREQUENCY_MARGIN * self._key_counts[ranked[1]]:
+            return None
+        word = self.words[self._key_words[ranked[0]][0]]
+        if dist and min(len(token), len(word)) < MIN_CORRECTION_LENGTH:
+            return None
+        return word, dist
+
+    def correct(self, token: str) -> Optional[Tuple[str, int]]:
+        """(replacement, distance) for an unknown near-miss token, else None."""
+        if token in self._corrections:
+            return self._corrections[token]
+
+        hit = None
+        if token not in self.known and token.isalpha():
+            budget = cyrillic_budget(token) if is_cyrillic(token) else latin_budget(token)
+            if budget >= 0:
+                hit = self.lookup(token, budget)
+                if hit and hit[0] == token:
+                    hit = None
+
+        if len(self._corrections) >= CORRECTION_CACHE_SIZE:
+            self._corrections.clear()
+        self._corrections[token] = hit
+        return hit
+
+
+def latin_budget(token: str) -> int:
+    n = len(token)
+    if n <= 3:
+        return -1
+    if n == 4:
+        return 0
+    if n <= 7:
+        return 1
+    return 2
+
+
+def cyrillic_budget(token: str) -> int:
+    n = len(token)
+    if n <= 3:
+        return -1
+    if n <= 5:
+        return 0
+    return 1
@@ -2,6 +2,15 @@
 from typing import Any, Dict, List, Set
 
 from app.agents.text2sql.registry_utils import normalize_table_ref, safe_table
+from app.agents.text2sql.sql_expr import Word, parse_expr, render_text
+
+
+def _where_part(text: str) -> str:
+    """One plan filter; a top-level OR is parenthesised before the AND join."""
+    parsed = parse_expr(text)
+    if parsed and any(isinstance(n, Word) and n.text.lower() == "or" for n in parsed.nodes):
+        return f"({render_text(text)})"
+    return render_text(text)
 
 
 def build_select_clause(select_items: List[Dict[str, Any]]) -> str:
@@ -10,7 +19,7 @@ def build_select_clause(select_items: List[Dict[str, Any]]) -> str:
         if not isinstance(item, dict):
             continue
 
-        expr = (item.get("expr") or "").strip()
+        expr = render_text(item.get("expr") or "")
         alias = (item.get("as") or "").strip()
 
         if not expr:
@@ -43,7 +52,7 @@ def build_sql_from_plan(
         join_type = (j.get("type") or "LEFT").upper()
         table_name = normalize_table_ref(j.get("table") or "", default_db)
         alias = (j.get("alias") or "").strip() or "d1"
-        on = (j.get("on") or "").strip()
+        on = render_text(j.get("on") or "")
 
         if not table_name or not on:
             continue
@@ -52,15 +61,15 @@ def build_sql_from_plan(
 
         sql += f"\n{join_type} JOIN {table_name} {alias} ON {on}"
 
-    where_parts = [x.strip() for x in plan.get("where", []) if isinstance(x, str) and x.strip()]
+    where_parts = [_where_part(x) for x in plan.get("where", []) if isinstance(x, str) and x.strip()]
     if where_parts:
         sql += "\nWHERE " + " AND ".join(where_parts)
 
-    group_parts = [x.strip() for x in plan.get("group_by", []) if isinstance(x, str) and x.strip()]
+    group_parts = [render_text(x) for x in plan.get("group_by", []) if isinstance(x, str) and x.strip()]
     if group_parts:
         sql += "\nGROUP BY " + ", ".join(group_parts)
 
-    order_parts = [x.strip() for x in plan.get("order_by", []) if isinstance(x, str) and x.strip()]
+    order_parts = [render_text(x) for x in plan.get("order_by", []) if isinstance(x, str) and x.strip()]
     if order_parts:
         sql += "\nORDER BY " + ", ".join(order_parts)
 
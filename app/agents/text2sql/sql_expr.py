@@ -0,0 +1,364 @@
+"""
+Small ClickHouse expression tokenizer / parser shared by the plan pipeline.
+
+Plan strings (select exprs, join ON, where, group_by, order_by) are parsed
+once into an immutable tree, cached by text:
+
+    Ident    f.StoreID / NetSale / total_net_sales      (dotted parts)
+    Call     sum(f.NetSale), toYear(f.SalesDate)          (name + arg sequences)
+    Group    ( ... ), [ ... ]                             (comma separated sequences)
+    Literal  'CU520', 2024, {year:UInt16}
+    Word     AND / DESC / INTERVAL ...                    (keywords, operators; kept as written)
+
+The validator reads column refs and bare identifiers from the tree, canonical
+column repair rewrites Ident nodes (never text inside string literals or
+longer identifiers), and the SQL builder renders the tree. Unparseable text
+(unbalanced parentheses, stray characters) gives None.
+
+tokenize() is lossless (whitespace tokens kept) so whole statements can be
+checked and rewritten token by token as well (executor.normalize_sql).
+"""
+import re
+from functools import lru_cache
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+TOKEN_RE = re.compile(
+    r"""
+    (?P<ws>\s+)
+    |(?P<string>'(?:[^'\\]|\\.|'')*')
+    |(?P<quoted>`[^`]*`|"[^"]*")
+    |(?P<param>\{[A-Za-z_][A-Za-z0-9_]*:[^{}]+\})
+    |(?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+    |(?P<ident>[A-Za-z_][A-Za-z0-9_]*(?:\.[A-Za-z_][A-Za-z0-9_]*)*)
+    |(?P<op>::|->|<=|>=|<>|!=|==|\|\||[-+*/%=<>(),\[\]?:])
+    """,
+    re.VERBOSE,
+)
+
+KEYWORDS = frozenset({
+    "and", "or", "not", "in", "is", "null", "like", "ilike", "between",
+    "asc", "desc", "as", "on", "if", "then", "else", "end", "case", "when",
+    "distinct", "interval", "nulls", "first", "last", "true", "false", "global",
+    "second", "minute", "hour", "day", "week", "month", "quarter", "year",
+})
+
+# keywords that never start a function call
+OPERATOR_WORDS = frozenset({
+    "and", "or", "not", "in", "is", "like", "ilike", "between", "as", "on",
+    "then", "else", "when", "case", "distinct", "interval", "global",
+})
+
+ORDER_WORDS = frozenset({"asc", "desc"})
+
+
+class Token(NamedTuple):
+    kind: str  # ws | string | quoted | param | number | ident | op
+    text: str
+
+
+class SqlExprError(ValueError):
+    pass
+
+
+# =========================================================
+# Tree
+# =========================================================
+
+class Ident(NamedTuple):
+    parts: Tuple[str, ...]
+
+    @property
+    def text(self) -> str:
+        return ".".join(self.parts)
+
+
+class Literal(NamedTuple):
+    text: str
+
+
+class Word(NamedTuple):
+    text: str
+
+
+class Call(NamedTuple):
+    name: str
+    args: Tuple["Expr", ...]
+
+
+class Group(NamedTuple):
+    open: str
+    items: Tuple["Expr", ...]
+
+
+Node = Union[Ident, Literal, Word, Call, Group]
+
+
+class Expr(NamedTuple):
+    nodes: Tuple[Node, ...]
+
+
+CLOSING = {"(": ")", "[": "]"}
+
+
+# =========================================================
+# Tokenizer / parser
+# =========================================================
+
+def tokenize(text: str) -> List[Token]:
+    tokens: List[Token] = []
+    pos = 0
+    while pos < len(text):
+        m = TOKEN_RE.match(text, pos)
+        if m is None:
+            raise SqlExprError(f"unexpected character {text[pos]!r} at {pos}")
+        tokens.append(Token(m.lastgroup or "op", m.group(0)))
+        pos = m.end()
+    return tokens
+
+
+class _Parser:
+    def __init__(self, tokens: Sequence[Token]):
+        self.tokens = [t for t in tokens if t.kind != "ws"]
+        self.pos = 0
+
+    def peek(self) -> Optional[Token]:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def take(self) -> Token:
+        tok = self.tokens[self.pos]
+        self.pos += 1
+        return tok
+
+    def sequence(self, closer: Optional[str]) -> Expr:
+        nodes: List[Node] = []
+        while True:
+            tok = self.peek()
+            if tok is None:
+                if closer:
+                    raise SqlExprError(f"missing {closer!r}")
+                break
+            if tok.kind == "op" and tok.text in (")", "]", ","):
+                if tok.text == "," and closer:
+                    break
+                if tok.text == closer:
+                    break
+                raise SqlExprError(f"unexpected {tok.text!r}")
+            nodes.append(self.node())
+        return Expr(tuple(nodes))
+
+    def items(self, closer: str) -> Tuple[Expr, ...]:
+        out: List[Expr] = []
+        if self.peek() is not None and self.peek().text == closer:
+            self.take()
+            return ()
+        while True:
+            out.append(self.sequence(closer))
+            tok = self.take()
+            if tok.text == closer:
+                return tuple(out)
+
+    def node(self) -> Node:
+        tok = self.take()
+        if tok.kind == "ident":
+            word = tok.text.lower() if "." not in tok.text else ""
+            nxt = self.peek()
+            # IN (...) / AND (...) stay keywords; if(...) / year(...) are functions
+            if nxt is not None and nxt.text == "(" and word and word not in OPERATOR_WORDS:
+                self.take()
+                return Call(tok.text, self.items(")"))
+            if word in KEYWORDS:
+                return Word(tok.text)
+            return Ident(tuple(tok.text.split(".")))
+        if tok.kind == "quoted":
+            return Ident((tok.text,))
+        if tok.kind in ("string", "number", "param"):
+            return Literal(tok.text)
+        if tok.text in CLOSING:
+            return Group(tok.text, self.items(CLOSING[tok.text]))
+        return Word(tok.text)
+
+
+@lru_cache(maxsize=4096)
+def parse_expr(text: str) -> Optional[Expr]:
+    """Cached tree of one plan expression, None when it does not parse."""
+    try:
+        parser = _Parser(tokenize(text or ""))
+        expr = parser.sequence(None)
+    except (SqlExprError, IndexError):
+        return None
+    return expr if expr.nodes else None
+
+
+def split_top_level(text: str) -> List[str]:
+    """Comma separated list (SELECT items, GROUP BY) split outside parentheses / brackets."""
+    parts: List[str] = []
+    depth = 0
+    current: List[str] = []
+    for tok in tokenize(text):
+        if tok.kind == "op" and tok.text in CLOSING:
+            depth += 1
+        elif tok.kind == "op" and tok.text in (")", "]"):
+            depth -= 1
+        elif tok.kind == "op" and tok.text == "," and depth == 0:
+            parts.append("".join(current).strip())
+            current = []
+            continue
+        current.append(tok.text)
+    parts.append("".join(current).strip())
+    return [p for p in parts if p]
+
+
+# single SELECT shapes select_clauses() takes apart (topn_rewrite, approx)
+SIMPLE_CLAUSES = {"select", "from", "where", "limit"}
+UNSUPPORTED_CLAUSES = {
+    "having", "settings", "union", "inner", "right", "full", "cross", "join",
+    "array", "prewhere", "with", "offset", "qualify", "window", "format", "sample",
+}
+CLAUSE_ORDER = ["select", "from", "join", "where", "group", "order", "limit"]
+
+
+def select_clauses(sql: str) -> Optional[Dict[str, str]]:
+    """Top-level clause texts of a single SELECT, None for any other shape."""
+    try:
+        tokens = tokenize(sql)
+    except SqlExprError:
+        return None
+
+    words = [i for i, t in enumerate(tokens) if t.kind != "ws"]
+    marks: List[Tuple[str, int, int]] = []  # clause, keyword start, content start
+    depth = 0
+    n = 0
+    while n < len(words):
+        tok = tokens[words[n]]
+        low = tok.text.lower() if tok.kind == "ident" else ""
+        if tok.text == "(":
+            depth += 1
+        elif tok.text == ")":
+            depth -= 1
+        elif depth == 0 and low:
+            nxt = tokens[words[n + 1]].text.lower() if n + 1 < len(words) else ""
+            if low in SIMPLE_CLAUSES:
+                marks.append((low, words[n], words[n] + 1))
+            elif low in ("group", "order") and nxt == "by":
+                marks.append((low, words[n], words[n + 1] + 1))
+                n += 1
+            elif low == "left" and nxt == "join":
+                marks.append(("join", words[n], words[n + 1] + 1))
+                n += 1
+            elif low in UNSUPPORTED_CLAUSES:
+                return None
+        n += 1
+
+    names = [m[0] for m in marks]
+    if len(set(names)) != len(names) or names != [c for c in CLAUSE_ORDER if c in names]:
+        return None
+
+    out: Dict[str, str] = {}
+    for k, (name, _, content) in enumerate(marks):
+        end = marks[k + 1][1] if k + 1 < len(marks) else len(tokens)
+        out[name] = "".join(t.text for t in tokens[content:end]).strip()
+    return out
+
+
+# =========================================================
+# Reading
+# =========================================================
+
+def walk(expr: Expr) -> Iterator[Node]:
+    for node in expr.nodes:
+        yield node
+        if isinstance(node, Call):
+            for arg in node.args:
+                yield from walk(arg)
+        elif isinstance(node, Group):
+            for item in node.items:
+                yield from walk(item)
+
+
+def column_refs(expr: Expr) -> List[Tuple[str, str]]:
+    """alias.column references (f.StoreID, d1.GDS_NM)."""
+    return [(n.parts[-2], n.parts[-1]) for n in walk(expr) if isinstance(n, Ident) and len(n.parts) > 1]
+
+
+def bare_identifiers(expr: Expr) -> List[str]:
+    """
+    Unqualified identifiers: columns or output aliases. Function names,
+    keywords, quoted identifiers and the type / alias after AS or :: are not.
+    """
+    out: List[str] = []
+    prev: Optional[Node] = None
+    for node in expr.nodes:
+        if isinstance(node, Ident):
+            type_name = isinstance(prev, Word) and prev.text.lower() in ("as", "::")
+            if len(node.parts) == 1 and node.parts[0][0] not in "`\"" and not type_name:
+                out.append(node.parts[0])
+        elif isinstance(node, Call):
+            for arg in node.args:
+                out.extend(bare_identifiers(arg))
+        elif isinstance(node, Group):
+            for item in node.items:
+                out.extend(bare_identifiers(item))
+        prev = node
+    return out
+
+
+def head_call(expr: Expr) -> Optional[str]:
+    """Function name when the expression starts with a call (sum(...) / toYear(...) = 2024)."""
+    first = expr.nodes[0] if expr.nodes else None
+    return first.name if isinstance(first, Call) else None
+
+
+def strip_ordering(expr: Expr) -> Tuple[Expr, Optional[str]]:
+    """(expr without a trailing ASC / DESC [NULLS FIRST|LAST], direction)."""
+    nodes = list(expr.nodes)
+    if len(nodes) >= 2 and isinstance(nodes[-2], Word) and nodes[-2].text.lower() == "nulls":
+        nodes = nodes[:-2]
+    if nodes and isinstance(nodes[-1], Word) and nodes[-1].text.lower() in ORDER_WORDS:
+        return Expr(tuple(nodes[:-1])), nodes[-1].text
+    return Expr(tuple(nodes)), None
+
+
+# =========================================================
+# Rewriting / rendering
+# =========================================================
+
+def rewrite(expr: Expr, fn: Callable[[Ident], Node]) -> Expr:
+    """Replace every Ident node by fn(ident)."""
+    out: List[Node] = []
+    for node in expr.nodes:
+        if isinstance(node, Ident):
+            node = fn(node)
+        elif isinstance(node, Call):
+            node = Call(node.name, tuple(rewrite(a, fn) for a in node.args))
+        elif isinstance(node, Group):
+            node = Group(node.open, tuple(rewrite(i, fn) for i in node.items))
+        out.append(node)
+    return Expr(tuple(out))
+
+
+def _render_node(node: Node) -> str:
+    if isinstance(node, Ident):
+        return node.text
+    if isinstance(node, Call):
+        return f"{node.name}({', '.join(render(a) for a in node.args)})"
+    if isinstance(node, Group):
+        return node.open + ", ".join(render(i) for i in node.items) + CLOSING[node.open]
+    return node.text
+
+
+def render(expr: Expr) -> str:
+    parts: List[str] = []
+    for node in expr.nodes:
+        text = _render_node(node)
+        # x::Int32 casts stay glued
+        if parts and (text == "::" or parts[-1].endswith("::")):
+            parts[-1] += text
+            continue
+        parts.append(text)
+    return " ".join(parts)
+
+
+def render_text(text: str) -> str:
+    """Canonical rendering of a plan string; unparseable text is kept as written."""
+    expr = parse_expr((text or "").strip())
+    return render(expr) if expr is not None else (text or "").strip()
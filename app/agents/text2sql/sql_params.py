@@ -0,0 +1,114 @@
+"""
+SQL with ClickHouse query parameters.
+
+Hard rules, JSON rule templates and the domain fallbacks write values as
+typed placeholders instead of interpolating them:
+
+    WHERE toYear(f.SalesDate) = {year:UInt16}
+
+and return a BoundSQL, the SQL text with its values attached. BoundSQL is
+a str, so routing, logging and meta["sql"] keep working; run_sql_preview
+reads .params and hands them to clickhouse-connect, which binds them on
+the server (param_year=2024). One rule gives one SQL text for every year,
+and a question cannot put text into the SQL.
+
+Identifiers cannot be parameters: output aliases that carry a year
+(sales_2024) stay in the text, as do LIMIT counts (Python ints).
+"""
+import re
+from datetime import date
+from typing import Any, Dict, Optional
+
+from app.agents.text2sql.sql_expr import SqlExprError, tokenize
+
+PLACEHOLDER_RE = re.compile(r"\{(\w+):(\w+)\}")
+
+# parameters holding a calendar year
+YEAR_PARAMS = {"year", "year2", "prev_year", "y1", "y2"}
+# reading any of these makes a query depend on when it runs
+MOVING_FUNCTIONS = {"today", "now", "yesterday", "currentdate"}
+
+
+class BoundSQL(str):
+    """SQL text with `{name:Type}` placeholders and their values in .params."""
+
+    params: Dict[str, Any]
+
+    def __new__(cls, sql: str, params: Optional[Dict[str, Any]] = None):
+        obj = super().__new__(cls, sql)
+        obj.params = dict(params or {})
+        return obj
+
+
+def bind(sql: str, **params: Any) -> BoundSQL:
+    """BoundSQL of a rule; every placeholder needs a value and every value a placeholder."""
+    sql = sql.strip()
+    names = {m.group(1) for m in PLACEHOLDER_RE.finditer(sql)}
+    if names != set(params):
+        raise ValueError(f"placeholders {sorted(names)} do not match parameters {sorted(params)}")
+    return BoundSQL(sql, params)
+
+
+def sql_params(sql: Any) -> Dict[str, Any]:
+    return dict(getattr(sql, "params", None) or {})
+
+
+def placeholder_types(sql: str) -> Dict[str, str]:
+    return {m.group(1): m.group(2) for m in PLACEHOLDER_RE.finditer(sql)}
+
+
+def _literal(value: Any, typ: str) -> str:
+    if typ == "Date":
+        return f"toDate('{value}')"
+    if typ == "String":
+        s = str(value).replace("\\", "\\\\").replace("'", "\\'")
+        return f"'{s}'"
+    return str(value)
+
+
+def inline_params(sql: str, params: Optional[Dict[str, Any]] = None) -> str:
+    """The SQL with values written in, for display and comparisons; never executed."""
+    params = sql_params(sql) if params is None else params
+    if not params:
+        return str(sql)
+
+    def sub(m: "re.Match[str]") -> str:
+        name, typ = m.group(1), m.group(2)
+        return _literal(params[name], typ) if name in params else m.group(0)
+
+    return PLACEHOLDER_RE.sub(sub, str(sql))
+
+
+def closed_period(sql: str, params: Dict[str, Any], today: Optional[date] = None) -> bool:
+    """
+    True when the query only reads finished periods: it has a year or Date
+    parameter, every year is before the current one, every Date is not after
+    today (date_to bounds are exclusive), and nothing reads the clock.
+    """
+    if not params:
+        return False
+    today = today or date.today()
+
+    try:
+        tokens = tokenize(sql)
+    except SqlExprError:
+        return False
+    if any(t.kind == "ident" and t.text.lower() in MOVING_FUNCTIONS for t in tokens):
+        return False
+
+    periods = 0
+    for name, typ in placeholder_types(sql).items():
+        value = params.get(name)
+        if typ == "Date":
+            try:
+                day = value if isinstance(value, date) else date.fromisoformat(str(value))
+            except ValueError:
+                return False
+            if day > today:
+                return False
+            periods += 1
+        elif name in YEAR_PARAMS:
+            if int(value) >= today.year:
+                return False
+            periods += 1
+    return periods > 0
@@ -0,0 +1,208 @@
+"""
+Aggregate before the name join (TOPN_REWRITE_ENABLED).
+
+Top-N answers with names, from hard rules and from plans, look like
+
+    SELECT d1.GDS_NM AS product_name, sum(f.SoldQty) AS total_qty
+    FROM BI_DB.Cluster_Main_Sales f
+    LEFT JOIN BI_DB.Dimension_IM d1 ON f.GDS_CD = d1.GDS_CD
+    WHERE ...
+    GROUP BY d1.GDS_NM
+    ORDER BY total_qty DESC
+    LIMIT 10
+
+and join every fact row to the dimension before aggregating. The rewrite
+aggregates the fact by the join key first:
+
+    top    GROUP BY holds the fact key (f.StoreID): the inner query orders
+           and limits by key, only the N winning keys are joined
+    reagg  GROUP BY dimension columns only (d1.GDS_NM, s.BIZLOC_CD): two
+           keys can share a name and unmatched keys all fall into the ''
+           group, so the inner query keeps every key and the outer one
+           re-aggregates (sum / count -> sum, min, max); the join reads one
+           row per key instead of one per fact row
+
+Only the exact shape is rewritten: one LEFT JOIN on the dimension key whose
+alias is read in SELECT / GROUP BY only, aggregates with an alias over the
+fact alone, ORDER BY on those aggregates and a plain LIMIT. Dimension keys
+are assumed unique, as the name joins already do. Anything else is
+returned unchanged.
+"""
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from app.agents.text2sql.dimension_cache import DIMENSIONS
+from app.agents.text2sql.sql_expr import (
+    Call,
+    Expr,
+    Ident,
+    SqlExprError,
+    Word,
+    column_refs,
+    parse_expr,
+    render,
+    select_clauses,
+    split_top_level,
+    strip_ordering,
+    tokenize,
+)
+
+AGGREGATES = {"sum", "count", "min", "max", "avg", "uniq", "uniqexact", "any"}
+
+# outer aggregate over the per-key partial results; None: not decomposable
+REAGGREGATE = {"sum": "sum", "count": "sum", "min": "min", "max": "max"}
+
+
+@dataclass
+class SelectItem:
+    text: str
+    expr: Expr
+    alias: str
+    kind: str  # dim | key | agg
+    agg: str = ""
+
+
+# =========================================================
+# Statement shape
+# =========================================================
+
+def _select_item(text: str, fact: str, dim: str, dim_key: str, fact_key: str) -> Optional[SelectItem]:
+    parsed = parse_expr(text)
+    if parsed is None:
+        return None
+    nodes = parsed.nodes
+    alias = ""
+    if len(nodes) >= 3 and isinstance(nodes[-2], Word) and nodes[-2].text.lower() == "as" and isinstance(nodes[-1], Ident):
+        alias, nodes = nodes[-1].text, nodes[:-2]
+    expr = Expr(tuple(nodes))
+    refs = {a for a, _ in column_refs(expr)}
+
+    if len(nodes) == 1 and isinstance(nodes[0], Ident):
+        ident = nodes[0].text
+        if ident in (fact_key, f"{dim}.{dim_key}"):
+            return SelectItem(text, expr, alias, "key")
+        if refs == {dim}:
+            return SelectItem(text, expr, alias, "dim")
+        return None
+
+    if len(nodes) == 1 and isinstance(nodes[0], Call) and nodes[0].name.lower() in AGGREGATES and refs <= {fact}:
+        call = nodes[0]
+        distinct = any(a.nodes and isinstance(a.nodes[0], Word) and a.nodes[0].text.lower() == "distinct" for a in call.args)
+        agg = "" if distinct else call.name.lower()
+        return SelectItem(text, expr, alias, "agg", agg)
+
+    return None
+
+
+# =========================================================
+# Rewrite
+# =========================================================
+
+def rewrite_topn_before_join(sql: str) -> str:
+    """Aggregate-before-join form of a top-N name-join query; other SQL is returned unchanged."""
+    c = select_clauses(sql)
+    if not c or not all(k in c for k in ("select", "from", "join", "group", "order", "limit")):
+        return sql
+
+    # FROM <fact> <alias> / LEFT JOIN <dim> <alias> ON a = b
+    from_words = [t.text for t in tokenize(c["from"]) if t.kind != "ws"]
+    join_words = [t.text for t in tokenize(c["join"]) if t.kind != "ws"]
+    if len(from_words) != 2 or len(join_words) != 6 or join_words[2].lower() != "on" or join_words[4] != "=":
+        return sql
+    fact_table, fact = from_words
+    dim_table, dim = join_words[0], join_words[1]
+    spec = DIMENSIONS.get(dim_table.split(".")[-1])
+    if spec is None or dim == fact:
+        return sql
+    key_ref = f"{dim}.{spec.key}"
+    sides = {join_words[3], join_words[5]}
+    if key_ref not in sides or len(sides) != 2:
+        return sql
+    fact_key = (sides - {key_ref}).pop()
+    if not fact_key.startswith(f"{fact}.") or fact_key.count(".") != 1:
+        return sql
+
+    if not c["limit"].isdigit():
+        return sql
+    limit = int(c["limit"])
+
+    try:
+        items = [_select_item(x, fact, dim, spec.key, fact_key) for x in split_top_level(c["select"])]
+        group = split_top_level(c["group"])
+        order = split_top_level(c["order"])
+    except SqlExprError:
+        return sql
+    if not items or any(x is None for x in items):
+        return sql
+    aggs = [x for x in items if x.kind == "agg"]
+    if not aggs or any(not x.alias for x in aggs) or any(x.kind == "key" and not x.alias for x in items):
+        return sql
+
+    # the dimension only feeds names: never filtered on
+    where = c.get("where", "")
+    if where:
+        parsed = parse_expr(where)
+        if parsed is None or any(a == dim for a, _ in column_refs(parsed)):
+            return sql
+
+    group_keys = False
+    for g in group:
+        parsed = parse_expr(g)
+        if parsed is None or len(parsed.nodes) != 1 or not isinstance(parsed.nodes[0], Ident):
+            return sql
+        ident = parsed.nodes[0]
+        if ident.text == fact_key:
+            group_keys = True
+        elif len(ident.parts) != 2 or ident.parts[0] != dim:
+            return sql
+
+    by_alias = {x.alias: i for i, x in enumerate(aggs)}
+    by_expr = {render(x.expr): i for i, x in enumerate(aggs)}
+    ordering: List[Tuple[int, str]] = []
+    for o in order:
+        parsed = parse_expr(o)
+        if parsed is None:
+            return sql
+        expr, direction = strip_ordering(parsed)
+        text = render(expr)
+        i = by_alias.get(text, by_expr.get(text))
+        if i is None:
+            return sql
+        ordering.append((i, f" {direction}" if direction else ""))
+
+    mode = "top" if group_keys else "reagg"
+    fact_key_items = any(x.kind == "key" and render(x.expr) == fact_key for x in items)
+    if mode == "reagg" and (fact_key_items or any(x.agg not in REAGGREGATE for x in aggs)):
+        return sql
+
+    sub = "agg" if "agg" not in (fact, dim) else "agg_t"
+    inner = [f"{fact_key} AS __key"] + [f"{render(x.expr)} AS __a{i}" for i, x in enumerate(aggs)]
+    inner_sql = f"SELECT {', '.join(inner)}\n  FROM {fact_table} {fact}"
+    if where:
+        inner_sql += f"\n  WHERE {where}"
+    inner_sql += f"\n  GROUP BY {fact_key}"
+    if mode == "top":
+        inner_sql += "\n  ORDER BY " + ", ".join(f"__a{i}{d}" for i, d in ordering) + f"\n  LIMIT {limit}"
+
+    outer: List[str] = []
+    agg_index = {id(x): i for i, x in enumerate(aggs)}
+    for x in items:
+        if x.kind == "dim" or (x.kind == "key" and render(x.expr) == key_ref):
+            outer.append(x.text)
+        elif x.kind == "key":
+            outer.append(f"{sub}.__key AS {x.alias}")
+        else:
+            i = agg_index[id(x)]
+            value = f"{sub}.__a{i}" if mode == "top" else f"{REAGGREGATE[x.agg]}({sub}.__a{i})"
+            outer.append(f"{value} AS {x.alias}")
+
+    out = (
+        f"SELECT {', '.join(outer)}\n"
+        f"FROM (\n  {inner_sql}\n) {sub}\n"
+        f"LEFT JOIN {dim_table} {dim} ON {sub}.__key = {key_ref}"
+    )
+    if mode == "reagg":
+        out += f"\nGROUP BY {', '.join(group)}"
+    out += "\nORDER BY " + ", ".join(f"{aggs[i].alias}{d}" for i, d in ordering)
+    out += f"\nLIMIT {limit}"
+    return out
@@ -1,6 +1,14 @@
-import re
 from typing import Any, Dict, List, Set
 
+from app.agents.text2sql.intents import QueryLike
+from app.agents.text2sql.sql_expr import (
+    bare_identifiers,
+    column_refs,
+    head_call,
+    parse_expr,
+    strip_ordering,
+)
+
 ALLOWED_FUNCTION_PREFIXES = (
     "sum(",
     "count(",
@@ -27,11 +35,7 @@ ALLOWED_FUNCTION_PREFIXES = (
     "multiif(",
 )
 
-SQL_KEYWORDS = {
-    "and", "or", "not", "in", "is", "null", "like", "between",
-    "asc", "desc", "as", "on", "if", "then", "else", "end",
-    "case", "when", "distinct",
-}
+ALLOWED_FUNCTIONS = frozenset(p.rstrip("(") for p in ALLOWED_FUNCTION_PREFIXES)
 
 
 def _safe_list(value: Any) -> List[Any]:
@@ -101,8 +105,9 @@ def get_known_alias_map(plan: Dict[str, Any]) -> Dict[str, str]:
 
 
 def is_function_expr(expr: str) -> bool:
-    e = _safe_str(expr).lower()
-    return e.startswith(ALLOWED_FUNCTION_PREFIXES)
+    parsed = parse_expr(_safe_str(expr))
+    name = head_call(parsed) if parsed else None
+    return bool(name) and name.lower() in ALLOWED_FUNCTIONS
 
 
 def extract_alias_column_refs(expr: str) -> List[tuple[str, str]]:
@@ -110,34 +115,17 @@ def extract_alias_column_refs(expr: str) -> List[tuple[str, str]]:
     Extract alias.column style refs like:
     f.StoreID, d1.GDS_NM
     """
-    if not isinstance(expr, str):
-        return []
-    return re.findall(r"\b([A-Za-z_][A-Za-z0-9_]*)\.([A-Za-z_][A-Za-z0-9_]*)\b", expr)
+    parsed = parse_expr(expr) if isinstance(expr, str) else None
+    return column_refs(parsed) if parsed else []
 
 
 def extract_bare_identifiers(expr: str) -> List[str]:
     """
     Extract possible bare column identifiers.
-    Excludes numeric literals and common SQL keywords.
+    Excludes literals, function names and SQL keywords.
     """
-    if not isinstance(expr, str):
-        return []
-
-    tokens = re.findall(r"\b[A-Za-z_][A-Za-z0-9_]*\b", expr)
-    out: List[str] = []
-
-    for t in tokens:
-        tl = t.lower()
-        if tl in SQL_KEYWORDS:
-            continue
-        if tl in {"today", "now", "sum", "count", "avg", "min", "max", "round",
-                  "sumif", "countif", "avgif", "toyear", "tomonth", "toyyyymm",
-                  "todate", "coalesce", "nullif", "upper", "lower", "substring",
-                  "concat", "multiif"}:
-            continue
-        out.append(t)
-
-    return out
+    parsed = parse_expr(expr) if isinstance(expr, str) else None
+    return bare_identifiers(parsed) if parsed else []
 
 
 def is_valid_column_ref(
@@ -164,50 +152,28 @@ def is_valid_expr(
         alias_map: Dict[str, str],
         valid_columns: Set[str],
         table_columns: Dict[str, Set[str]],
+        output_aliases: Set[str] = frozenset(),
 ) -> bool:
-    expr = _safe_str(expr)
-    if not expr:
+    """
+    Every alias.column ref and every bare identifier must resolve. Bare
+    identifiers may also name a select output alias (total_net_sales DESC)
+    where output_aliases is given. Unparseable text is invalid.
+    """
+    parsed = parse_expr(_safe_str(expr))
+    if parsed is None:
         return False
 
-    # direct function expressions are generally allowed, but referenced cols must still be sane
-    refs = extract_alias_column_refs(expr)
-    if refs:
-        for alias, col in refs:
-            if not is_valid_column_ref(alias, col, alias_map, valid_columns, table_columns):
-                return False
-
-    # if it's a simple function and all alias refs are fine -> allow
-    if is_function_expr(expr):
-        return True
-
-    # simple alias.col
-    if re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*\.[A-Za-z_][A-Za-z0-9_]*", expr):
-        alias, col = expr.split(".", 1)
-        return is_valid_column_ref(alias, col, alias_map, valid_columns, table_columns)
-
-    # simple bare column / alias
-    if re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", expr):
-        return expr in valid_columns or expr.lower() in valid_columns
-
-    # Expressions like:
-    # total_net_sales DESC
-    # toYYYYMM(f.SalesDate) ASC
-    ordering_expr = re.sub(r"\s+(ASC|DESC)\s*$", "", expr, flags=re.IGNORECASE).strip()
-    if ordering_expr != expr:
-        return is_valid_expr(ordering_expr, alias_map, valid_columns, table_columns)
-
-    # If expression has quoted strings / operators, validate alias refs at least
-    if refs:
-        return True
+    # total_net_sales DESC / toYYYYMM(f.SalesDate) ASC
+    parsed, _ = strip_ordering(parsed)
+    if not parsed.nodes:
+        return False
 
-    # bare identifiers fallback
-    bare_tokens = extract_bare_identifiers(expr)
-    if not bare_tokens:
-        return True
+    for alias, col in column_refs(parsed):
+        if not is_valid_column_ref(alias, col, alias_map, valid_columns, table_columns):
+            return False
 
-    # if all bare identifiers are valid columns, allow
-    for tok in bare_tokens:
-        if tok in valid_columns or tok.lower() in valid_columns:
+    for tok in bare_identifiers(parsed):
+        if tok in valid_columns or tok.lower() in valid_columns or tok in output_aliases:
             continue
         return False
 
@@ -243,6 +209,7 @@ def clean_str_expr_list(
         alias_map: Dict[str, str],
         valid_columns: Set[str],
         table_columns: Dict[str, Set[str]],
+        output_aliases: Set[str] = frozenset(),
 ) -> List[str]:
     cleaned: List[str] = []
 
@@ -251,7 +218,7 @@ def clean_str_expr_list(
         if not expr:
             continue
 
-        if is_valid_expr(expr, alias_map, valid_columns, table_columns):
+        if is_valid_expr(expr, alias_map, valid_columns, table_columns, output_aliases):
             cleaned.append(expr)
 
     return cleaned
@@ -341,7 +308,7 @@ def validate_and_repair_plan(
         plan: Dict[str, Any],
         candidates: List[Any],
         allowed_tables: Set[str],
-        query: str,
+        query: QueryLike,
 ) -> Dict[str, Any]:
     plan = _safe_dict(plan).copy()
 
@@ -380,6 +347,9 @@ def validate_and_repair_plan(
         valid_columns=valid_columns,
         table_columns=table_columns,
     )
+    # ClickHouse resolves select aliases in GROUP BY / ORDER BY
+    output_aliases = {_safe_str(x.get("as")) for x in cleaned_select if _safe_str(x.get("as"))}
+
     cleaned_where = clean_str_expr_list(
         values=_safe_list(plan.get("where")),
         alias_map=alias_map,
@@ -391,12 +361,14 @@ def validate_and_repair_plan(
         alias_map=alias_map,
         valid_columns=valid_columns,
         table_columns=table_columns,
+        output_aliases=output_aliases,
     )
     cleaned_order_by = clean_str_expr_list(
         values=_safe_list(plan.get("order_by")),
         alias_map=alias_map,
         valid_columns=valid_columns,
         table_columns=table_columns,
+        output_aliases=output_aliases,
     )
 
     plan["select"] = deduplicate_select(cleaned_select)
@@ -1,3 +1,4 @@
+from functools import partial
 from typing import Any, Dict, Optional
 
 from app.agents.text2sql.executor import run_sql_preview
@@ -7,9 +8,9 @@ from app.agents.text2sql.hard_rules import (
     hard_rule_table_about_text,
     hard_rule_sales_related_tables_text,
     hard_rule_out_of_domain_text,
-    HARD_SQL_RULES,
+    run_hard_sql_rules,
 )
-from app.agents.planner import plan_with_llm
+from app.agents.planner import plan_query, planner_fingerprint
 from app.agents.text2sql.postprocess import (
     force_fact_table_by_domain,
     inject_name_join_from_registry,
@@ -22,18 +23,25 @@ from app.agents.text2sql.registry_utils import (
     filter_relationships,
     build_allowed_tables,
     rerank_candidates,
+    semantic_candidates,
+    merge_candidates,
 )
 from app.agents.text2sql.sql_builder import build_sql_from_plan
+from app.agents.text2sql.sql_params import bind
 from app.agents.text2sql.response import text_response, sql_response, error_response
+from app.agents.text2sql.answer_cache import ANSWER_CACHE
 from app.agents.text2sql.history import persist_result
+from app.agents.text2sql.plan_cache import PLAN_CACHE
+from app.agents.text2sql.speculative import start_speculation, within_budget
 from app.agents.text2sql.intents import (
-    normalize_query,
     Intent,
+    QueryContext,
+    QueryLike,
     extract_year,
     extract_quarter,
 )
 from app.agents.text2sql.validator import validate_and_repair_plan
-from app.config import CLICKHOUSE_DATABASE
+from app.config import CLICKHOUSE_DATABASE, PLANNER_MODE
 from app.agents.text2sql.query_router import classify_query_domain
 
 
@@ -56,7 +64,7 @@ def is_empty_plan(plan: Dict[str, Any]) -> bool:
     )
 
 
-def fallback_sql_by_domain(query: str) -> Optional[str]:
+def fallback_sql_by_domain(query: QueryLike) -> Optional[str]:
     year = extract_year(query)
 
     # ---------------- inventory ----------------
@@ -119,62 +127,61 @@ LIMIT 50
             if quarter:
                 start_month = (quarter - 1) * 3 + 1
                 end_month = start_month + 2
-                return f"""
+                return bind(f"""
 SELECT
   sum(f.NetSale) AS total_net_sales
 FROM {CLICKHOUSE_DATABASE}.Cluster_Main_Sales f
-WHERE toYear(f.SalesDate) = {year}
-  AND toMonth(f.SalesDate) BETWEEN {start_month} AND {end_month}
+WHERE toYear(f.SalesDate) = {{year:UInt16}}
+  AND toMonth(f.SalesDate) BETWEEN {{start_month:UInt8}} AND {{end_month:UInt8}}
 LIMIT 50
-""".strip()
+""", year=year, start_month=start_month, end_month=end_month)
 
             # top/bottom store
-            ql = normalize_query(query)
             if Intent.is_top_store(query):
-                return f"""
+                return bind(f"""
 SELECT
   f.StoreID AS store_id,
   sum(f.NetSale) AS total_net_sales
 FROM {CLICKHOUSE_DATABASE}.Cluster_Main_Sales f
-WHERE toYear(f.SalesDate) = {year}
+WHERE toYear(f.SalesDate) = {{year:UInt16}}
 GROUP BY f.StoreID
 ORDER BY total_net_sales DESC
 LIMIT 10
-""".strip()
+""", year=year)
 
             if Intent.is_bottom_store(query):
-                return f"""
+                return bind(f"""
 SELECT
   f.StoreID AS store_id,
   sum(f.NetSale) AS total_net_sales
 FROM {CLICKHOUSE_DATABASE}.Cluster_Main_Sales f
-WHERE toYear(f.SalesDate) = {year}
+WHERE toYear(f.SalesDate) = {{year:UInt16}}
 GROUP BY f.StoreID
 ORDER BY total_net_sales ASC
 LIMIT 10
-""".strip()
+""", year=year)
 
             # monthly trend
             if Intent.is_monthly(query):
-                return f"""
+                return bind(f"""
 SELECT
   toYYYYMM(f.SalesDate) AS ym,
   sum(f.NetSale) AS total_net_sales
 FROM {CLICKHOUSE_DATABASE}.Cluster_Main_Sales f
-WHERE toYear(f.SalesDate) = {year}
+WHERE toYear(f.SalesDate) = {{year:UInt16}}
 GROUP BY ym
 ORDER BY ym ASC
 LIMIT 50
-""".strip()
+""", year=year)
 
             # total sales
-            return f"""
+            return bind(f"""
 SELECT
   sum(f.NetSale) AS total_net_sales
 FROM {CLICKHOUSE_DATABASE}.Cluster_Main_Sales f
-WHERE toYear(f.SalesDate) = {year}
+WHERE toYear(f.SalesDate) = {{year:UInt16}}
 LIMIT 50
-""".strip()
+""", year=year)
 
         # no year but sales question
         return f"""
@@ -187,107 +194,166 @@ LIMIT 50
     return None
 
 
+def _finalize(
+        result: Dict[str, Any],
+        ctx: QueryContext,
+        session_id: Optional[str],
+        domain_info: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    if ctx.corrections:
+        result.setdefault("meta", {})["normalization"] = {
+            "normalized": ctx.normalized,
+            "corrections": [c._asdict() for c in ctx.corrections],
+        }
+    if ctx.date_range:
+        result.setdefault("meta", {})["date_range"] = ctx.date_range.as_dict()
+    if domain_info:
+        result.setdefault("meta", {})["domain"] = domain_info
+    persist_result(query=ctx.raw, result=result, session_id=session_id)
+    return result
+
+
 # =========================================================
 # Main entry
 # =========================================================
 
-async def text2sql_answer(query: str, session_id: Optional[str] = None) -> Dict[str, Any]:
+async def text2sql_answer(query: str, session_id: Optional[str] = None, approx: bool = False) -> Dict[str, Any]:
     result: Dict[str, Any]
-    normalized_query = normalize_query(query)
+    # approx: sampled / approximate aggregates, see text2sql/approx.py
+    runner = partial(run_sql_preview, approx=True) if approx else run_sql_preview
+    # normalized once; every rule / intent check below reads from ctx
+    ctx = QueryContext.build(query)
 
     # -----------------------------------------------------
     # 0) Out-of-domain text
     # -----------------------------------------------------
-    out_of_domain_txt = hard_rule_out_of_domain_text(query)
+    out_of_domain_txt = hard_rule_out_of_domain_text(ctx)
     if out_of_domain_txt:
         result = text_response(out_of_domain_txt, "out_of_domain")
-        persist_result(query=query, result=result, session_id=session_id)
-        return result
+        return _finalize(result, ctx, session_id)
 
     # -----------------------------------------------------
     # 1) Help / schema text rules
     # -----------------------------------------------------
-    about_txt = hard_rule_table_about_text(query, registry)
+    about_txt = hard_rule_table_about_text(ctx, registry)
     if about_txt:
         result = text_response(about_txt, "table_about")
-        persist_result(query=query, result=result, session_id=session_id)
-        return result
+        return _finalize(result, ctx, session_id)
 
-    sales_tables_txt = hard_rule_sales_related_tables_text(query, registry)
+    sales_tables_txt = hard_rule_sales_related_tables_text(ctx, registry)
     if sales_tables_txt:
         result = text_response(sales_tables_txt, "sales_related_tables")
-        persist_result(query=query, result=result, session_id=session_id)
-        return result
+        return _finalize(result, ctx, session_id)
 
-    dataset_help = hard_rule_dataset_help_text(query)
+    dataset_help = hard_rule_dataset_help_text(ctx)
     if dataset_help:
         result = text_response(dataset_help, "sales_dataset_help")
-        persist_result(query=query, result=result, session_id=session_id)
-        return result
+        return _finalize(result, ctx, session_id)
 
-    inventory_help = hard_rule_inventory_dataset_help_text(query)
+    inventory_help = hard_rule_inventory_dataset_help_text(ctx)
     if inventory_help:
         result = text_response(inventory_help, "inventory_dataset_help")
-        persist_result(query=query, result=result, session_id=session_id)
-        return result
+        return _finalize(result, ctx, session_id)
 
     # -----------------------------------------------------
     # 2) Hard SQL rules
     # -----------------------------------------------------
-    for rule_name, rule_fn in HARD_SQL_RULES:
-        try:
-            sql = rule_fn(query)
-        except Exception:
-            sql = None
+    matched = run_hard_sql_rules(ctx)
+    if matched:
+        rule_name, sql = matched
+        result = sql_response(sql, rule_name, runner)
+        return _finalize(result, ctx, session_id)
 
-        if sql:
-            result = sql_response(sql, rule_name, run_sql_preview)
-            persist_result(query=query, result=result, session_id=session_id)
-            return result
+    # -----------------------------------------------------
+    # 3) Near-duplicate answer cache
+    # -----------------------------------------------------
+    cache_version = getattr(registry, "version", 0)
+    hit = ANSWER_CACHE.lookup(ctx, cache_version)
+    if hit:
+        result = sql_response(hit.sql, "answer_cache", runner)
+        if not result["meta"].get("error"):
+            result["meta"]["answer_cache"] = hit.meta()
+            return _finalize(result, ctx, session_id)
+        ANSWER_CACHE.discard(hit.key)
 
     # -----------------------------------------------------
-    # 3) Domain & candidate discovery
+    # 4) Domain & candidate discovery
     # -----------------------------------------------------
-    domain_info = classify_query_domain(query)
+    domain_info = classify_query_domain(ctx)
     domain = domain_info.get("domain", "unknown")
 
-    candidates = registry.search(normalized_query, top_k=20) or registry.search(query, top_k=20)
+    candidates = registry.search(ctx.normalized, top_k=20) or registry.search(query, top_k=20)
+    candidates = merge_candidates(candidates, semantic_candidates(query, top_k=8), top_k=20)
 
     if not candidates:
-        fallback_sql = fallback_sql_by_domain(query)
+        fallback_sql = fallback_sql_by_domain(ctx)
         if fallback_sql:
-            result = sql_response(fallback_sql, "fallback_no_candidates", run_sql_preview)
-            persist_result(query=query, result=result, session_id=session_id)
-            return result
+            result = sql_response(fallback_sql, "fallback_no_candidates", runner)
+            return _finalize(result, ctx, session_id, domain_info)
 
         result = text_response(
             "Таны асуултад тохирох table эсвэл schema олдсонгүй. "
             "Борлуулалт, салбар, бараа, үлдэгдэлтэй холбоотой асуугаарай.",
             "schema_not_found_text",
         )
-        persist_result(query=query, result=result, session_id=session_id)
-        return result
+        return _finalize(result, ctx, session_id, domain_info)
 
     candidates = rerank_candidates(candidates, domain)
     rel_filtered = filter_relationships(candidates, registry.build_relationships())
     allowed_tables = build_allowed_tables(candidates)
 
     # -----------------------------------------------------
-    # 4) Planner
+    # 5) Planner (template plan cache first)
     # -----------------------------------------------------
+    plan_version = (cache_version, planner_fingerprint())
+    cached_plan = PLAN_CACHE.lookup(ctx, plan_version)
+    if cached_plan:
+        # stored after post-processing / validation, so it goes straight to the builder
+        built = build_sql_from_plan(
+            plan=cached_plan,
+            allowed_tables=allowed_tables,
+            fallback_fact=f"{candidates[0].db}.{candidates[0].table}",
+            default_db=CLICKHOUSE_DATABASE,
+        )
+        if not built.get("error"):
+            result = sql_response(built["sql"], "llm_plan_cached", runner)
+            if not result["meta"].get("error"):
+                result["meta"]["plan_cache"] = "hit"
+                ANSWER_CACHE.store(ctx, built["sql"], "llm_plan_cached", cache_version)
+                return _finalize(result, ctx, session_id, domain_info)
+        # the cached plan no longer works for this question -> plan again
+        PLAN_CACHE.discard(ctx)
+
+    # the domain fallback may already run while the LLM plans
+    fallback_sql = fallback_sql_by_domain(ctx)
+    speculation = start_speculation(fallback_sql, runner)
+
     llm_error: Optional[str] = None
+    fallback_reason = "failure"
+    planner_mode = PLANNER_MODE
     try:
-        plan = await plan_with_llm(
-            query=query,
-            candidates=candidates,
-            rel_filtered=rel_filtered,
-            allowed_tables=allowed_tables,
-            registry=registry,
+        plan, planner_mode = await within_budget(
+            plan_query(
+                query=ctx,
+                domain=domain,
+                candidates=candidates,
+                rel_filtered=rel_filtered,
+                allowed_tables=allowed_tables,
+                registry=registry,
+            ),
+            speculation,
         )
+    except TimeoutError as e:
+        plan = None
+        llm_error = str(e)
+        fallback_reason = "timeout"
     except Exception as e:
         plan = None
         llm_error = str(e)
 
+    if plan and speculation is not None:
+        speculation.discard()
+
     # Planner decided unrelated / empty
     if plan and is_empty_plan(plan):
         result = text_response(
@@ -295,16 +361,19 @@ async def text2sql_answer(query: str, session_id: Optional[str] = None) -> Dict[
             "Борлуулалт, дэлгүүр, бүтээгдэхүүн, үлдэгдэлтэй холбоотой асуулт асууна уу.",
             "planner_out_of_domain",
         )
-        persist_result(query=query, result=result, session_id=session_id)
-        return result
+        return _finalize(result, ctx, session_id, domain_info)
 
     # Planner failed -> fallback
     if not plan:
-        fallback_sql = fallback_sql_by_domain(query)
+        if speculation is not None:
+            result = await speculation.result(fallback_reason)
+            if llm_error:
+                result["meta"]["planner_error"] = llm_error
+            return _finalize(result, ctx, session_id, domain_info)
+
         if fallback_sql:
-            result = sql_response(fallback_sql, "domain_fallback", run_sql_preview)
-            persist_result(query=query, result=result, session_id=session_id)
-            return result
+            result = sql_response(fallback_sql, "domain_fallback", runner)
+            return _finalize(result, ctx, session_id, domain_info)
 
         result = text_response(
             "Таны асуултыг SQL болгон найдвартай хөрвүүлж чадсангүй. "
@@ -314,22 +383,27 @@ async def text2sql_answer(query: str, session_id: Optional[str] = None) -> Dict[
         )
         if llm_error:
             result["meta"]["planner_error"] = llm_error
-        persist_result(query=query, result=result, session_id=session_id)
-        return result
+        return _finalize(result, ctx, session_id, domain_info)
 
     # -----------------------------------------------------
-    # 5) Post-process plan
+    # 6) Post-process plan
     # -----------------------------------------------------
-    plan = force_fact_table_by_domain(plan, query, domain, candidates)
+    if planner_mode == "skeleton":
+        # skeleton tables come from the domain, not from candidate search
+        plan_tables = [registry.find_table(plan["fact_table"])]
+        plan_tables += [registry.find_table(j["table"]) for j in plan["joins"]]
+        candidates = merge_candidates([t for t in plan_tables if t], candidates, top_k=len(candidates) + 4)
+
+    plan = force_fact_table_by_domain(plan, ctx, domain, candidates)
+    plan = drop_suspicious_joins(plan, ctx)
+    plan = inject_name_join_from_registry(plan, candidates, rel_filtered, ctx)
+    plan = ensure_product_name_join(plan, ctx)
+    # once, after the injected joins: the rewrite is token-accurate and idempotent
     plan = repair_canonical_columns(plan)
-    plan = drop_suspicious_joins(plan, query)
-    plan = inject_name_join_from_registry(plan, candidates, rel_filtered, query)
-    plan = ensure_product_name_join(plan, query)
-    plan = repair_canonical_columns(plan)
-    plan = validate_and_repair_plan(plan, candidates, allowed_tables, query)
+    plan = validate_and_repair_plan(plan, candidates, allowed_tables, ctx)
 
     # -----------------------------------------------------
-    # 6) Build SQL
+    # 7) Build SQL
     # -----------------------------------------------------
     fallback_fact = f"{candidates[0].db}.{candidates[0].table}"
     built = build_sql_from_plan(
@@ -340,21 +414,24 @@ async def text2sql_answer(query: str, session_id: Optional[str] = None) -> Dict[
     )
 
     if built.get("error"):
-        fallback_sql = fallback_sql_by_domain(query)
+        fallback_sql = fallback_sql_by_domain(ctx)
         if fallback_sql:
-            result = sql_response(fallback_sql, "build_sql_fallback", run_sql_preview)
-            persist_result(query=query, result=result, session_id=session_id)
-            return result
+            result = sql_response(fallback_sql, "build_sql_fallback", runner)
+            return _finalize(result, ctx, session_id, domain_info)
 
         result = error_response(built["error"], built["error"])
-        persist_result(query=query, result=result, session_id=session_id)
-        return result
+        return _finalize(result, ctx, session_id, domain_info)
 
     sql = built["sql"]
 
     # -----------------------------------------------------
-    # 7) Execute preview
+    # 8) Execute preview
     # -----------------------------------------------------
-    result = sql_response(sql, "llm_plan", run_sql_preview)
-    persist_result(query=query, result=result, session_id=session_id)
-    return result
+    result = sql_response(sql, "llm_plan", runner)
+    result["meta"]["plan"] = plan
+    result["meta"]["planner"] = planner_mode
+    if not result["meta"].get("error"):
+        ANSWER_CACHE.store(ctx, sql, "llm_plan", cache_version)
+        if PLAN_CACHE.store(ctx, plan, plan_version):
+            result["meta"]["plan_cache"] = "stored"
+    return _finalize(result, ctx, session_id, domain_info)
@@ -6,6 +6,14 @@ from app.core.schemas import ChatRequest, ChatResponse, OrchestratorState
 from app.graph.orchestrator import build_graph
 
 from app.agents.text2sql_agent import text2sql_answer
+from app.agents.text2sql.answer_cache import answer_cache_stats
+from app.agents.text2sql.approx import approx_stats
+from app.agents.text2sql.dimension_cache import dimension_cache_stats
+from app.agents.text2sql.executor import preflight_stats, result_cache_stats
+from app.agents.text2sql.hard_rules import hard_rule_stats
+from app.agents.text2sql.plan_cache import plan_cache_stats
+from app.agents.text2sql.speculative import speculative_stats
+from app.core.llm_client import json_stream_stats
 
 router = APIRouter()
 log = logging.getLogger("cu-orchestrator")
@@ -37,6 +45,7 @@ async def chat(req: ChatRequest):
             result = await text2sql_answer(
                 query=req.message,
                 session_id=session_id,
+                approx=req.approx,
             )
 
             meta = (result.get("meta") or {}) if isinstance(result, dict) else {}
@@ -99,3 +108,51 @@ async def chat(req: ChatRequest):
         answer = f"Хариу үүсээгүй байна. meta={meta}"
 
     return ChatResponse(answer=answer, meta=meta)
+
+
+@router.get("/metrics/rules")
+async def rule_metrics():
+    """Per-rule evaluation / hit / latency counters of the hard SQL fast paths (this worker only)."""
+    return hard_rule_stats()
+
+
+@router.get("/metrics/plan-cache")
+async def plan_cache_metrics():
+    """Template plan cache hit / store / rejection counters (this worker only)."""
+    return plan_cache_stats()
+
+
+@router.get("/metrics/answer-cache")
+async def answer_cache_metrics():
+    """Near-duplicate answer cache hit ratios, recent audit samples and SQL result cache counters."""
+    return {**answer_cache_stats(), "result_cache": result_cache_stats()}
+
+
+@router.get("/metrics/speculative-fallback")
+async def speculative_fallback_metrics():
+    """How often the speculative domain fallback was started, beaten by the planner or returned."""
+    return speculative_stats()
+
+
+@router.get("/metrics/dimension-cache")
+async def dimension_cache_metrics():
+    """Cached dimension sizes and age, rewritten name joins and names attached in Python (this worker only)."""
+    return dimension_cache_stats()
+
+
+@router.get("/metrics/sql-preflight")
+async def sql_preflight_metrics():
+    """EXPLAIN pre-flight checks, cached good / bad query shapes, rejected and repaired queries."""
+    return preflight_stats()
+
+
+@router.get("/metrics/llm-stream")
+async def llm_stream_metrics():
+    """Streamed planner completions: how often the stream was closed after the first JSON object."""
+    return json_stream_stats()
+
+
+@router.get("/metrics/approx")
+async def approx_metrics():
+    """Approximate-answer requests: sampled, function-only and unchanged queries, tables with a sampling key."""
+    return approx_stats()
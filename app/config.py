@@ -6,6 +6,14 @@ load_dotenv(override=True)
 def env(key: str, default: str = "") -> str:
     return os.getenv(key, default)
 
+
+def env_bool(key: str, default: bool = False) -> bool:
+    return env(key, "1" if default else "0").strip().lower() in ("1", "true", "yes", "on")
+
+
+# files shipped with the package (rules, examples) default to paths inside it
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
 APP_ENV = env("APP_ENV", "dev")
 APP_NAME = env("APP_NAME", "CU Orchestrator")
 LOG_LEVEL = env("LOG_LEVEL", "INFO")
@@ -28,6 +36,66 @@ CLICKHOUSE_USER = env("CLICKHOUSE_USER", "default")
 CLICKHOUSE_PASSWORD = env("CLICKHOUSE_PASSWORD", "")
 CLICKHOUSE_DATABASE = env("CLICKHOUSE_DATABASE", "")
 
+SCHEMA_SYNC_ENABLED = env_bool("SCHEMA_SYNC_ENABLED", False)
+SCHEMA_SNAPSHOT_PATH = env("SCHEMA_SNAPSHOT_PATH", "/app/app/data/dict/schema_snapshot.json")
+SEMANTIC_INDEX_PATH = env("SEMANTIC_INDEX_PATH", "/app/app/data/dict/semantic_index.npz")
+SEMANTIC_INDEX_DIM = int(env("SEMANTIC_INDEX_DIM", "131072"))
+SEMANTIC_MIN_SCORE = float(env("SEMANTIC_MIN_SCORE", "0.25"))
+
+SCHEMA_PRUNE_ENABLED = env_bool("SCHEMA_PRUNE_ENABLED", True)
+SCHEMA_PRUNE_TOP_K = int(env("SCHEMA_PRUNE_TOP_K", "12"))
+SCHEMA_PRUNE_MIN_COLS = int(env("SCHEMA_PRUNE_MIN_COLS", "20"))
+
+SQL_RULES_PATH = env("SQL_RULES_PATH", os.path.join(DATA_DIR, "rules", "sql_rules.json"))
+SQL_RULES_RELOAD_SECONDS = float(env("SQL_RULES_RELOAD_SECONDS", "2"))
+
+INTENT_CLASSIFIER_ENABLED = env_bool("INTENT_CLASSIFIER_ENABLED", True)
+INTENT_MODEL_PATH = env("INTENT_MODEL_PATH", "/app/app/data/dict/intent_classifier.npz")
+INTENT_MIN_CONFIDENCE = float(env("INTENT_MIN_CONFIDENCE", "0.8"))
+
+PLAN_CACHE_ENABLED = env_bool("PLAN_CACHE_ENABLED", True)
+PLAN_CACHE_TTL_SECONDS = float(env("PLAN_CACHE_TTL_SECONDS", "86400"))
+PLAN_CACHE_MAX_ENTRIES = int(env("PLAN_CACHE_MAX_ENTRIES", "2000"))
+
+ANSWER_CACHE_ENABLED = env_bool("ANSWER_CACHE_ENABLED", True)
+ANSWER_CACHE_TTL_SECONDS = float(env("ANSWER_CACHE_TTL_SECONDS", "3600"))
+ANSWER_CACHE_MAX_ENTRIES = int(env("ANSWER_CACHE_MAX_ENTRIES", "2000"))
+ANSWER_CACHE_MIN_SIMILARITY = float(env("ANSWER_CACHE_MIN_SIMILARITY", "0.93"))
+ANSWER_CACHE_SIMILAR_ENABLED = env_bool("ANSWER_CACHE_SIMILAR_ENABLED", False)
+ANSWER_CACHE_AUDIT_RATE = float(env("ANSWER_CACHE_AUDIT_RATE", "0.05"))
+
+PLANNER_MODE = env("PLANNER_MODE", "full")  # full | skeleton
+PLANNER_EXAMPLES_MODE = env("PLANNER_EXAMPLES_MODE", "retrieved")  # retrieved | static
+PLANNER_EXAMPLES_TOP_K = int(env("PLANNER_EXAMPLES_TOP_K", "3"))
+PLANNER_EXAMPLES_TOKEN_BUDGET = int(env("PLANNER_EXAMPLES_TOKEN_BUDGET", "700"))
+EXAMPLE_STORE_PATH = env("EXAMPLE_STORE_PATH", os.path.join(DATA_DIR, "dict", "planner_examples.json"))
+EXAMPLE_STORE_MAX_ENTRIES = int(env("EXAMPLE_STORE_MAX_ENTRIES", "2000"))
+
+SPECULATIVE_FALLBACK_ENABLED = env_bool("SPECULATIVE_FALLBACK_ENABLED", False)
+SPECULATIVE_FALLBACK_MAX_COST = env("SPECULATIVE_FALLBACK_MAX_COST", "filtered")  # master | filtered | scan
+PLANNER_LATENCY_BUDGET_SECONDS = float(env("PLANNER_LATENCY_BUDGET_SECONDS", "8"))
+
+RESULT_CACHE_TTL_SECONDS = float(env("RESULT_CACHE_TTL_SECONDS", "300"))
+RESULT_CACHE_MAX_ENTRIES = int(env("RESULT_CACHE_MAX_ENTRIES", "256"))
+SQL_QUERY_CACHE_ENABLED = env_bool("SQL_QUERY_CACHE_ENABLED", False)
+SQL_QUERY_CACHE_TTL_SECONDS = int(env("SQL_QUERY_CACHE_TTL_SECONDS", "3600"))
+APPROX_SAMPLE_RATIO = float(env("APPROX_SAMPLE_RATIO", "0.1"))
+
+DIMENSION_CACHE_ENABLED = env_bool("DIMENSION_CACHE_ENABLED", False)
+DIMENSION_CACHE_REFRESH_SECONDS = float(env("DIMENSION_CACHE_REFRESH_SECONDS", "3600"))
+
+TOPN_REWRITE_ENABLED = env_bool("TOPN_REWRITE_ENABLED", False)
+
+NAME_DICTIONARIES_ENABLED = env_bool("NAME_DICTIONARIES_ENABLED", False)
+NAME_DICTIONARY_DATABASE = env("NAME_DICTIONARY_DATABASE", CLICKHOUSE_DATABASE)
+
+SQL_PREFLIGHT = env("SQL_PREFLIGHT", "off")  # off | syntax | plan
+SQL_PREFLIGHT_CACHE_MAX_ENTRIES = int(env("SQL_PREFLIGHT_CACHE_MAX_ENTRIES", "2048"))
+
+SCHEMA_SYNC_DATABASES = [
+    x.strip() for x in env("SCHEMA_SYNC_DATABASES", CLICKHOUSE_DATABASE).split(",") if x.strip()
+]
+
 
 MYSQL_HOST = os.getenv("MYSQL_HOST", "127.0.0.1")
 MYSQL_PORT = int(os.getenv("MYSQL_PORT", "3306"))
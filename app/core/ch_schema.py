@@ -1,4 +1,4 @@
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Tuple
 import clickhouse_connect
 
 from app.config import (
@@ -21,17 +21,22 @@ def ch_client():
     )
 
 
+def _quote(value: str) -> str:
+    return "'" + str(value).replace("\\", "\\\\").replace("'", "\\'") + "'"
+
+
 def list_tables(databases: List[str] | None = None) -> List[Dict[str, Any]]:
     client = ch_client()
 
     if databases:
-        db_list = ", ".join([f"'{db}'" for db in databases])
+        db_list = ", ".join([_quote(db) for db in databases])
         sql = f"""
         SELECT
             database,
             name AS table_name,
             engine,
-            comment
+            comment,
+            metadata_modification_time
         FROM system.tables
         WHERE database IN ({db_list})
         ORDER BY database, table_name
@@ -42,7 +47,8 @@ def list_tables(databases: List[str] | None = None) -> List[Dict[str, Any]]:
             database,
             name AS table_name,
             engine,
-            comment
+            comment,
+            metadata_modification_time
         FROM system.tables
         WHERE database NOT IN ('system', 'information_schema', 'INFORMATION_SCHEMA')
         ORDER BY database, table_name
@@ -57,16 +63,39 @@ def list_tables(databases: List[str] | None = None) -> List[Dict[str, Any]]:
                 "table": row[1],
                 "engine": row[2],
                 "comment": row[3],
+                "metadata_modification_time": row[4],
             }
         )
     return rows
 
 
-def list_columns(databases: List[str] | None = None) -> List[Dict[str, Any]]:
+def list_columns(
+        databases: List[str] | None = None,
+        tables: List[Tuple[str, str]] | None = None,
+) -> List[Dict[str, Any]]:
+    """
+    Read column metadata. When `tables` is given, only those (database, table)
+    pairs are read, which keeps incremental refreshes away from a full scan.
+    """
     client = ch_client()
 
-    if databases:
-        db_list = ", ".join([f"'{db}'" for db in databases])
+    if tables:
+        pairs = ", ".join([f"({_quote(db)}, {_quote(tbl)})" for db, tbl in tables])
+        sql = f"""
+        SELECT
+            database,
+            table,
+            name AS column_name,
+            type,
+            default_kind,
+            default_expression,
+            comment
+        FROM system.columns
+        WHERE (database, table) IN ({pairs})
+        ORDER BY database, table, position
+        """
+    elif databases:
+        db_list = ", ".join([_quote(db) for db in databases])
         sql = f"""
         SELECT
             database,
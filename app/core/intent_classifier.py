@@ -0,0 +1,170 @@
+"""
+Linear intent / domain classifier over hashed n-gram features.
+
+The model is trained offline (scripts/train_intent_classifier.py) and stored
+as a NumPy archive with one softmax head per task:
+
+    agent   text2sql / general / policy / research   (app.graph.nodes)
+    domain  sales / inventory / product_master / ... (query_router)
+
+Features are folded character 3/4-grams (shared with the semantic index, so
+"borluulalt" and "борлуулалт" overlap) plus word unigrams and bigrams, with
+digits collapsed so "cu520" and "cu013" look alike. Inference gathers the
+weight rows of the few active buckets, so it costs one small matrix-vector
+product per question.
+
+Predictions below INTENT_MIN_CONFIDENCE return None and callers keep their
+keyword rules.
+"""
+import logging
+import os
+import re
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import INTENT_CLASSIFIER_ENABLED, INTENT_MIN_CONFIDENCE, INTENT_MODEL_PATH
+from app.core.semantic_index import fold_text, hashed_ngrams
+
+logger = logging.getLogger(__name__)
+
+DIGIT_RE = re.compile(r"\d")
+
+_model: Optional["IntentClassifier"] = None
+_model_mtime: Optional[float] = None
+
+
+# ======================================================
+# Features
+# ======================================================
+
+def _bucket(gram: str, dim: int) -> int:
+    return zlib.crc32(gram.encode("utf-8")) % dim
+
+
+def text_features(text: str, dim: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Sparse (indices, values) of one question; values are L2-normalized log-tf."""
+    folded = DIGIT_RE.sub("0", fold_text(text))
+    counts = hashed_ngrams(folded, dim)
+
+    words = folded.split()
+    for i, word in enumerate(words):
+        b = _bucket(f"w:{word}", dim)
+        counts[b] = counts.get(b, 0) + 1
+        if i:
+            b = _bucket(f"b:{words[i - 1]} {word}", dim)
+            counts[b] = counts.get(b, 0) + 1
+
+    if not counts:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+    idx = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+    val = 1.0 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+    return idx, val / np.float32(np.linalg.norm(val))
+
+
+# ======================================================
+# Model
+# ======================================================
+
+class LinearHead:
+    """Softmax regression: weights is (dim, n_labels) so rows gather per bucket."""
+
+    def __init__(self, labels: List[str], weights: np.ndarray, bias: np.ndarray):
+        self.labels = labels
+        self.weights = weights
+        self.bias = bias
+
+    def probabilities(self, idx: np.ndarray, val: np.ndarray) -> np.ndarray:
+        z = val @ self.weights[idx] + self.bias
+        z = np.exp(z - z.max())
+        return z / z.sum()
+
+    def predict(self, idx: np.ndarray, val: np.ndarray) -> Tuple[str, float]:
+        p = self.probabilities(idx, val)
+        best = int(np.argmax(p))
+        return self.labels[best], float(p[best])
+
+
+class IntentClassifier:
+    def __init__(self, dim: int, heads: Dict[str, LinearHead]):
+        self.dim = dim
+        self.heads = heads
+
+    def predict(self, head: str, text: str) -> Optional[Tuple[str, float]]:
+        h = self.heads.get(head)
+        if h is None:
+            return None
+        idx, val = text_features(text, self.dim)
+        if not len(idx):
+            return None
+        return h.predict(idx, val)
+
+    # ---------------- persistence ----------------
+
+    def save(self, path: str = INTENT_MODEL_PATH) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        arrays = {
+            "dim": np.array([self.dim], dtype=np.int64),
+            "heads": np.array(list(self.heads), dtype=str),
+        }
+        for name, h in self.heads.items():
+            arrays[f"{name}_labels"] = np.array(h.labels, dtype=str)
+            arrays[f"{name}_weights"] = h.weights.astype(np.float32)
+            arrays[f"{name}_bias"] = h.bias.astype(np.float32)
+        np.savez_compressed(path, **arrays)
+
+    @classmethod
+    def load(cls, path: str = INTENT_MODEL_PATH) -> "IntentClassifier":
+        with np.load(path, allow_pickle=False) as z:
+            heads = {}
+            for name in [str(x) for x in z["heads"]]:
+                heads[name] = LinearHead(
+                    labels=[str(x) for x in z[f"{name}_labels"]],
+                    weights=z[f"{name}_weights"],
+                    bias=z[f"{name}_bias"],
+                )
+            return cls(dim=int(z["dim"][0]), heads=heads)
+
+
+# ======================================================
+# Shared model
+# ======================================================
+
+def get_intent_classifier() -> Optional[IntentClassifier]:
+    """The trained model, reloaded when the file changes; None when absent."""
+    global _model, _model_mtime
+
+    if not INTENT_CLASSIFIER_ENABLED or not INTENT_MODEL_PATH:
+        return None
+
+    try:
+        mtime = os.path.getmtime(INTENT_MODEL_PATH)
+    except OSError:
+        _model, _model_mtime = None, None
+        return None
+
+    if mtime != _model_mtime:
+        _model_mtime = mtime
+        try:
+            _model = IntentClassifier.load(INTENT_MODEL_PATH)
+            logger.info("Loaded intent classifier heads=%s from %s", list(_model.heads), INTENT_MODEL_PATH)
+        except Exception as e:
+            logger.warning("Failed to load intent classifier %s: %s", INTENT_MODEL_PATH, e)
+            _model = None
+    return _model
+
+
+def predict_intent(head: str, text: str) -> Optional[Tuple[str, float]]:
+    """(label, confidence) when the model is confident enough, else None."""
+    model = get_intent_classifier()
+    if model is None:
+        return None
+    pred = model.predict(head, text)
+    if pred is None or pred[1] < INTENT_MIN_CONFIDENCE:
+        return None
+    return pred
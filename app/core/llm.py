@@ -10,7 +10,8 @@ class LLMClient:
             self,
             messages: List[Dict[str, Any]],
             temperature: Optional[float] = None,
-            max_tokens: Optional[int] = None
+            max_tokens: Optional[int] = None,
+            stop_at_json: bool = False,
     ) -> str:
         system = None
         user = None
@@ -27,4 +28,5 @@ class LLMClient:
             system=system,
             temperature=temperature,
             max_tokens=max_tokens,
+            stop_at_json=stop_at_json,
         )
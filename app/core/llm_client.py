@@ -2,7 +2,8 @@
 import os
 import json
 import logging
-from typing import Optional, Dict, Any, List
+import time
+from typing import Optional, Dict, Any, List, Tuple
 
 import httpx
 
@@ -13,6 +14,13 @@ LLM_MODEL = os.getenv("LLM_MODEL", "").strip()
 LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
 LLM_MAX_TOKENS = int(os.getenv("LLM_MAX_TOKENS", "512"))
 LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0.2"))
+# stream JSON-only answers (planner) and close the stream after the first object
+LLM_JSON_EARLY_STOP = os.getenv("LLM_JSON_EARLY_STOP", "true").strip().lower() in {"1", "true", "yes", "on"}
+
+_stream_stats: Dict[str, float] = {
+    "streams": 0, "early_stops": 0, "finished": 0,
+    "chunks": 0, "chars_dropped": 0, "seconds": 0.0,
+}
 
 
 def _headers() -> Dict[str, str]:
@@ -58,6 +66,50 @@ async def _pick_model(client: httpx.AsyncClient) -> str:
     return "llama3-awq"
 
 
+class JsonObjectScanner:
+    """
+    Incremental brace-depth / string-state tracker: finds where the first
+    top-level JSON object of a streamed text ends.
+    """
+
+    def __init__(self) -> None:
+        self.text: List[str] = []
+        self.length = 0
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.end: Optional[int] = None
+
+    def feed(self, chunk: str) -> Optional[int]:
+        """Add a chunk; returns the end offset (exclusive) once the object is complete."""
+        if self.end is not None:
+            return self.end
+        for i, ch in enumerate(chunk):
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == "\\":
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"' and self.depth:
+                self.in_string = True
+            elif ch == "{":
+                self.depth += 1
+            elif ch == "}" and self.depth:
+                self.depth -= 1
+                if not self.depth:
+                    self.end = self.length + i + 1
+                    break
+        self.text.append(chunk)
+        self.length += len(chunk)
+        return self.end
+
+    def value(self) -> str:
+        text = "".join(self.text)
+        return text[:self.end] if self.end is not None else text
+
+
 def _truncate_text(value: str, max_len: int = 4000) -> str:
     if not isinstance(value, str):
         return str(value)
@@ -66,11 +118,69 @@ def _truncate_text(value: str, max_len: int = 4000) -> str:
     return value[:max_len] + "...[truncated]"
 
 
+async def _stream_json_object(client: httpx.AsyncClient, url: str, payload: Dict[str, Any]) -> Tuple[str, bool]:
+    """
+    Stream the completion and stop reading once the first top-level JSON
+    object is complete; leaving the stream closes the connection, so the
+    server stops generating. Returns (text, stopped_early).
+    """
+    scanner = JsonObjectScanner()
+    chunks = 0
+    t0 = time.perf_counter()
+    _stream_stats["streams"] += 1
+
+    async with client.stream("POST", url, headers=_headers(), json={**payload, "stream": True}) as r:
+        if r.status_code >= 400:
+            body = await r.aread()
+            logger.error("LLM stream request failed: %s %s", r.status_code, _truncate_text(body.decode("utf-8", "replace"), 8000))
+            r.raise_for_status()
+
+        async for line in r.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                break
+            try:
+                choices = json.loads(data).get("choices") or []
+            except ValueError:
+                continue
+            if not choices:
+                continue
+            delta = choices[0].get("delta") or {}
+            piece = delta.get("content") or choices[0].get("text") or ""
+            if not piece:
+                continue
+            chunks += 1
+            if scanner.feed(piece) is not None:
+                _stream_stats["early_stops"] += 1
+                _stream_stats["chars_dropped"] += scanner.length - scanner.end
+                break
+
+    if scanner.end is None:
+        _stream_stats["finished"] += 1
+    _stream_stats["chunks"] += chunks
+    _stream_stats["seconds"] += time.perf_counter() - t0
+    return scanner.value().strip(), scanner.end is not None
+
+
+def json_stream_stats() -> Dict[str, Any]:
+    streams = _stream_stats["streams"]
+    return {
+        "pid": os.getpid(),
+        "enabled": LLM_JSON_EARLY_STOP,
+        **{k: round(v, 3) if isinstance(v, float) else v for k, v in _stream_stats.items()},
+        "early_stop_rate": round(_stream_stats["early_stops"] / streams, 4) if streams else 0.0,
+        "chunks_per_stream": round(_stream_stats["chunks"] / streams, 1) if streams else 0.0,
+    }
+
+
 async def chat_completion(
     user_message: str,
     system: Optional[str] = None,
     temperature: Optional[float] = None,
     max_tokens: Optional[int] = None,
+    stop_at_json: bool = False,
 ) -> str:
     temp = LLM_TEMPERATURE if temperature is None else temperature
     mtok = LLM_MAX_TOKENS if max_tokens is None else max_tokens
@@ -92,6 +202,13 @@ async def chat_completion(
 
         url = f"{LLM_BASE_URL}/v1/chat/completions"
 
+        if stop_at_json and LLM_JSON_EARLY_STOP:
+            text, _ = await _stream_json_object(client, url, payload)
+            if text:
+                return text
+            logger.warning("LLM stream returned no usable content")
+            return "Хариу үүссэнгүй."
+
         try:
             r = await client.post(
                 url,
@@ -1,10 +1,35 @@
-from typing import Dict, List, Tuple, Any
-
-from app.config import SCHEMA_DICT_PATH
-from app.core.schema_registry import SchemaRegistry
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional, Tuple, Any
+
+from app.config import SCHEMA_PRUNE_ENABLED, SCHEMA_PRUNE_MIN_COLS, SCHEMA_PRUNE_TOP_K
+from app.core.schema_sync import get_registry
+from app.core.semantic_index import fold_text
+
+registry = get_registry()
+
+PROMPT_MAX_COLS = 120
+
+# tables whose prompt blocks are built at startup (node_run_text2sql + planner defaults)
+WARM_TABLES = (
+    "Cluster_Main_Sales",
+    "Dimension_IM",
+    "Dimension_SM",
+    "Dimension_LEM",
+    "Dimension_LEG",
+)
+
+# folded (Latin) query word prefixes -> semantic tag they ask for
+QUERY_TAG_HINTS = {
+    "metric": (
+        "borluulalt", "sale", "revenue", "amount", "dun", "orlogo", "hyamdral",
+        "discount", "ashig", "profit", "urtug", "cost", "tatvar", "tax", "vat",
+    ),
+    "quantity": ("too", "shirheg", "qty", "quantity", "count", "uldegdel", "stock"),
+    "name": ("ner", "name"),
+}
 
-registry = SchemaRegistry(SCHEMA_DICT_PATH)
-registry.load()
+# shown as names only once a table's detailed column list is pruned
+OTHER_COLUMNS_MAX = 60
 
 CANONICAL_TERMS = {
     "sales_fact": "BI_DB.Cluster_Main_Sales",
@@ -114,15 +139,16 @@ def infer_semantic_tags(column_name: str, dtype: str) -> List[str]:
     return tags
 
 
+@lru_cache(maxsize=8192)
+def _semantic_tags(column_name: str, dtype: str) -> Tuple[str, ...]:
+    return tuple(infer_semantic_tags(column_name, dtype))
+
+
 def _find_table(base_name: str):
-    base = (base_name or "").split(".")[-1]
-    for t in registry.tables:
-        if t.table == base:
-            return t
-    return None
+    return registry.find_table(base_name)
 
 
-def get_table_info(table_name: str) -> Dict[str, Any] | None:
+def get_table_info(table_name: str, max_cols: int = PROMPT_MAX_COLS) -> Dict[str, Any] | None:
     t = _find_table(table_name)
     if not t:
         return None
@@ -147,7 +173,7 @@ def get_table_info(table_name: str) -> Dict[str, Any] | None:
         "common_metrics": metrics,
         "joins": role_hint.get("recommended_joins", []),
         "avoid": role_hint.get("avoid", []),
-        "columns": [(c.name, c.attr or "", c.dtype or "") for c in t.columns[:120]],
+        "columns": [(c.name, c.attr or "", c.dtype or "") for c in t.columns[:max_cols]],
     }
 
     if t.table == "Cluster_Main_Sales":
@@ -185,19 +211,143 @@ def get_table_info(table_name: str) -> Dict[str, Any] | None:
     return info
 
 
-def to_prompt_block(table_name: str) -> str:
-    info = get_table_info(table_name)
+# =========================================================
+# Query-relevant column pruning
+# =========================================================
+
+def _query_terms(query: str) -> Tuple[FrozenSet[str], FrozenSet[str]]:
+    terms = frozenset([w for w in fold_text(query).split() if len(w) >= 2 and not w.isdigit()])
+    hints = frozenset(
+        [
+            tag
+            for tag, prefixes in QUERY_TAG_HINTS.items()
+            if any(w.startswith(p) for w in terms for p in prefixes)
+        ]
+    )
+    return terms, hints
+
+
+def _word_match(term: str, word: str) -> bool:
+    # agglutinative suffixes: "borluulaltiin" should still hit "borluulalt"
+    if term == word:
+        return True
+    if min(len(term), len(word)) < 4:
+        return False
+    return term.startswith(word) or word.startswith(term)
+
+
+@lru_cache(maxsize=1024)
+def _column_features(
+        table_name: str,
+        version: int,
+        max_cols: int,
+) -> Tuple[Tuple[str, str, FrozenSet[str], FrozenSet[str], Tuple[str, ...]], ...]:
+    t = _find_table(table_name)
+    if not t:
+        return ()
+    return tuple(
+        [
+            (
+                c.name,
+                c.name.lower(),
+                frozenset(fold_text(c.name).split()),
+                frozenset(fold_text(c.attr).split()),
+                _semantic_tags(c.name, c.dtype),
+            )
+            for c in t.columns[:max_cols]
+        ]
+    )
+
+
+def score_column(
+        terms: FrozenSet[str],
+        hints: FrozenSet[str],
+        lname: str,
+        name_words: FrozenSet[str],
+        attr_words: FrozenSet[str],
+        tags: Tuple[str, ...],
+) -> int:
+    score = 0
+    for term in terms:
+        if term == lname:
+            score += 5
+        elif any(_word_match(term, w) for w in name_words):
+            score += 3
+        if any(_word_match(term, w) for w in attr_words):
+            score += 2
+    score += len(hints.intersection(tags))
+    return score
+
+
+def select_prompt_columns(
+        table_name: str,
+        terms: FrozenSet[str],
+        hints: FrozenSet[str],
+        max_cols: int = PROMPT_MAX_COLS,
+        top_k: int = SCHEMA_PRUNE_TOP_K,
+) -> Optional[FrozenSet[str]]:
+    """
+    Columns to describe in full for this query, or None to keep them all.
+    Keys and dates are always kept, plus the top_k columns scoring > 0.
+    """
+    features = _column_features(table_name, registry.version, max_cols)
+    if len(features) < SCHEMA_PRUNE_MIN_COLS:
+        return None
+
+    keep = set()
+    scored: List[Tuple[int, int, str]] = []
+    for i, (name, lname, name_words, attr_words, tags) in enumerate(features):
+        if "key" in tags or "date" in tags:
+            keep.add(name)
+            continue
+        score = score_column(terms, hints, lname, name_words, attr_words, tags)
+        if score > 0:
+            scored.append((-score, i, name))
+
+    scored.sort()
+    keep.update([name for _, _, name in scored[:top_k]])
+
+    if len(keep) >= len(features):
+        return None
+    return frozenset(keep)
+
+
+# =========================================================
+# Prompt blocks (memoized per registry version)
+# =========================================================
+
+def to_prompt_block(table_name: str, max_cols: int = PROMPT_MAX_COLS) -> str:
+    return _prompt_block(table_name, registry.version, max_cols)
+
+
+@lru_cache(maxsize=1024)
+def _prompt_block(
+        table_name: str,
+        version: int,
+        max_cols: int,
+        keep: Optional[FrozenSet[str]] = None,
+) -> str:
+    # version is only part of the cache key: a registry reload/merge bumps it
+    info = get_table_info(table_name, max_cols)
     if not info:
         return ""
 
     cols = []
+    others: List[str] = []
     for col_name, desc, dtype in info.get("columns", []):
-        tags = infer_semantic_tags(col_name, dtype)
+        if keep is not None and col_name not in keep:
+            others.append(col_name)
+            continue
+        tags = _semantic_tags(col_name, dtype)
         tag_txt = f" [tags: {', '.join(tags)}]" if tags else ""
         desc_txt = desc if desc else "-"
         dtype_txt = dtype if dtype else "-"
         cols.append(f"- {col_name} ({dtype_txt}): {desc_txt}{tag_txt}")
 
+    if others:
+        more = f", ... (+{len(others) - OTHER_COLUMNS_MAX})" if len(others) > OTHER_COLUMNS_MAX else ""
+        cols.append(f"- OTHER_COLUMNS (names only): {', '.join(others[:OTHER_COLUMNS_MAX])}{more}")
+
     joins = info.get("joins", [])
     join_txt = "\n".join([f"- {j}" for j in joins]) if joins else "-"
 
@@ -227,17 +377,47 @@ def to_prompt_block(table_name: str) -> str:
     ).strip()
 
 
-def format_schema_for_prompt(table_names: List[str]) -> str:
+def format_schema_for_prompt(
+        table_names: List[str],
+        max_cols: int = PROMPT_MAX_COLS,
+        query: str = "",
+) -> str:
+    """
+    Schema text for the given tables. With a query, wide tables keep their
+    keys, dates and the columns most relevant to it in full; the remaining
+    columns are listed by name only.
+    """
     seen = set()
-    parts: List[str] = []
+    bases: List[str] = []
 
     for t in table_names:
         base = (t or "").split(".")[-1]
         if base in seen:
             continue
         seen.add(base)
+        bases.append(base)
+
+    version = registry.version
+    keeps: Tuple[Optional[FrozenSet[str]], ...] = tuple([None] * len(bases))
+    if query and SCHEMA_PRUNE_ENABLED:
+        terms, hints = _query_terms(query)
+        keeps = tuple(
+            [select_prompt_columns(b, terms, hints, max_cols=max_cols) for b in bases]
+        )
+
+    return _schema_prompt(tuple(bases), version, max_cols, keeps)
 
-        block = to_prompt_block(base)
+
+@lru_cache(maxsize=512)
+def _schema_prompt(
+        bases: Tuple[str, ...],
+        version: int,
+        max_cols: int,
+        keeps: Tuple[Optional[FrozenSet[str]], ...],
+) -> str:
+    parts: List[str] = []
+    for base, keep in zip(bases, keeps):
+        block = _prompt_block(base, version, max_cols, keep)
         if block:
             parts.append(block)
 
@@ -258,3 +438,12 @@ def format_schema_for_prompt(table_names: List[str]) -> str:
             "SCHEMA DETAILS:\n\n"
             + "\n\n".join(parts)
     ).strip()
+
+
+def warm_prompt_cache() -> None:
+    """Precompute prompt blocks for the canonical tables."""
+    for base in WARM_TABLES:
+        to_prompt_block(base)
+        _column_features(base, registry.version, PROMPT_MAX_COLS)
+    format_schema_for_prompt(["Cluster_Main_Sales"])
+    format_schema_for_prompt(list(WARM_TABLES))
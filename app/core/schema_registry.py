@@ -1,26 +1,143 @@
 import os
 import re
-from dataclasses import dataclass
-from typing import Dict, List, Tuple, Optional, Any
+import sys
+from array import array
+from typing import Dict, Iterable, Iterator, List, Tuple, Optional, Any, Sequence
 
 from openpyxl import load_workbook
 
 
-@dataclass
+class StringPool:
+    """Interned strings addressed by integer id; id 0 is the empty string."""
+
+    __slots__ = ("_ids", "_values")
+
+    def __init__(self):
+        self._values: List[str] = [""]
+        self._ids: Dict[str, int] = {"": 0}
+
+    def add(self, value: str) -> int:
+        sid = self._ids.get(value)
+        if sid is None:
+            value = sys.intern(value)
+            sid = len(self._values)
+            self._values.append(value)
+            self._ids[value] = sid
+        return sid
+
+    def __getitem__(self, sid: int) -> str:
+        return self._values[sid]
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+
+class ColumnStore:
+    """
+    Array-backed column table. Every column of every table is one row,
+    addressed by its integer column id; strings live once in the pool.
+    """
+
+    __slots__ = ("strings", "table_ids", "name_ids", "dtype_ids", "attr_ids")
+
+    def __init__(self):
+        self.strings = StringPool()
+        self.table_ids = array("I")
+        self.name_ids = array("I")
+        self.dtype_ids = array("I")
+        self.attr_ids = array("I")
+
+    def add(self, table_id: int, name: str, dtype: str, attr: str) -> int:
+        cid = len(self.name_ids)
+        self.table_ids.append(table_id)
+        self.name_ids.append(self.strings.add(name))
+        self.dtype_ids.append(self.strings.add(dtype))
+        self.attr_ids.append(self.strings.add(attr))
+        return cid
+
+    def __len__(self) -> int:
+        return len(self.name_ids)
+
+
 class ColumnInfo:
-    name: str
-    dtype: str
-    attr: str
+    """Flyweight view over one ColumnStore row."""
+
+    __slots__ = ("_store", "_cid")
+
+    def __init__(self, store: ColumnStore, cid: int):
+        self._store = store
+        self._cid = cid
+
+    @property
+    def name(self) -> str:
+        return self._store.strings[self._store.name_ids[self._cid]]
+
+    @property
+    def dtype(self) -> str:
+        return self._store.strings[self._store.dtype_ids[self._cid]]
+
+    @property
+    def attr(self) -> str:
+        return self._store.strings[self._store.attr_ids[self._cid]]
+
+    def __repr__(self) -> str:
+        return f"ColumnInfo(name={self.name!r}, dtype={self.dtype!r}, attr={self.attr!r})"
+
+
+class ColumnRange(Sequence):
+    """The contiguous slice of the ColumnStore that belongs to one table."""
+
+    __slots__ = ("_store", "_lo", "_hi")
+
+    def __init__(self, store: ColumnStore, lo: int, hi: int):
+        self._store = store
+        self._lo = lo
+        self._hi = hi
+
+    def __len__(self) -> int:
+        return self._hi - self._lo
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [ColumnInfo(self._store, cid) for cid in range(self._lo, self._hi)[i]]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return ColumnInfo(self._store, self._lo + i)
+
+    def __iter__(self) -> Iterator[ColumnInfo]:
+        store = self._store
+        for cid in range(self._lo, self._hi):
+            yield ColumnInfo(store, cid)
+
+    def names(self) -> List[str]:
+        strings = self._store.strings
+        return [strings[sid] for sid in self._store.name_ids[self._lo:self._hi]]
 
 
-@dataclass
 class TableInfo:
-    db: str
-    division: str
-    table: str
-    entity: str
-    description: str
-    columns: List[ColumnInfo]
+    __slots__ = ("db", "division", "table", "entity", "description", "columns", "_role")
+
+    def __init__(
+            self,
+            db: str,
+            division: str,
+            table: str,
+            entity: str,
+            description: str,
+            columns: ColumnRange,
+    ):
+        self.db = sys.intern(db)
+        self.division = sys.intern(division)
+        self.table = sys.intern(table)
+        self.entity = sys.intern(entity)
+        self.description = description
+        self.columns = columns
+        self._role: Optional[str] = None
+
+    def __repr__(self) -> str:
+        return f"TableInfo(db={self.db!r}, table={self.table!r}, columns={len(self.columns)})"
 
 
 def _norm(s: Optional[str]) -> str:
@@ -35,13 +152,18 @@ class SchemaRegistry:
     def __init__(self, xlsx_path: str):
         self.xlsx_path = xlsx_path
         self.tables: List[TableInfo] = []
+        self.columns = ColumnStore()
         self._index: List[Tuple[str, TableInfo]] = []
+        self._by_name: Dict[str, TableInfo] = {}
+        self._relationships: Optional[List[Dict[str, Any]]] = None
+        # bumped on every (re)load/merge so derived caches can invalidate
+        self.version = 0
 
     def load(self) -> None:
         if not os.path.exists(self.xlsx_path):
             raise FileNotFoundError(f"Dictionary xlsx not found: {self.xlsx_path}")
 
-        wb = load_workbook(self.xlsx_path, data_only=True)
+        wb = load_workbook(self.xlsx_path, data_only=True, read_only=True)
 
         sh_table = wb["Table"]
         sh_col = wb["Column"]
@@ -51,9 +173,10 @@ class SchemaRegistry:
 
         def v(row, key):
             idx = col_map.get(key)
-            return row[idx].value if idx is not None else None
+            return row[idx].value if idx is not None and idx < len(row) else None
 
         table_rows: Dict[str, Dict[str, Any]] = {}
+        key_by_table: Dict[str, str] = {}
         for row in sh_table.iter_rows(min_row=2):
             db = v(row, "DB")
             div = v(row, "Division of work")
@@ -74,13 +197,14 @@ class SchemaRegistry:
                 "description": _norm(desc),
                 "columns": [],
             }
+            key_by_table.setdefault(tns, key)
 
         header2 = [c.value for c in next(sh_col.iter_rows(min_row=1, max_row=1))]
         col_map2 = {name: i for i, name in enumerate(header2) if name}
 
         def v2(row, key):
             idx = col_map2.get(key)
-            return row[idx].value if idx is not None else None
+            return row[idx].value if idx is not None and idx < len(row) else None
 
         for row in sh_col.iter_rows(min_row=2):
             db = v2(row, "DB")
@@ -95,36 +219,144 @@ class SchemaRegistry:
             if db:
                 key = f"{_norm(db)}::{_norm(tname)}"
             else:
-                candidates = [k for k in table_rows.keys() if k.endswith(f"::{_norm(tname)}")]
-                key = candidates[0] if candidates else None
+                key = key_by_table.get(_norm(tname))
 
             if not key or key not in table_rows:
                 continue
 
-            table_rows[key]["columns"].append(
-                ColumnInfo(
-                    name=_norm(cname),
-                    dtype=_norm(dtype),
-                    attr=_norm(attr),
+            table_rows[key]["columns"].append((_norm(cname), _norm(dtype), _norm(attr)))
+
+        wb.close()
+        self.load_rows(table_rows.values())
+
+    def load_rows(self, rows: Iterable[Dict[str, Any]]) -> None:
+        """
+        Build the registry from plain rows:
+        {db, division, table, entity, description, columns: [(name, dtype, attr), ...]}
+        """
+        store = ColumnStore()
+        tables: List[TableInfo] = []
+
+        for r in rows:
+            table_id = len(tables)
+            lo = len(store)
+            for name, dtype, attr in r.get("columns") or []:
+                store.add(table_id, name, dtype, attr)
+
+            tables.append(
+                TableInfo(
+                    db=r.get("db") or "",
+                    division=r.get("division") or "",
+                    table=r.get("table") or "",
+                    entity=r.get("entity") or "",
+                    description=r.get("description") or "",
+                    columns=ColumnRange(store, lo, len(store)),
                 )
             )
 
-        self.tables = [TableInfo(**t) for t in table_rows.values()]
+        self.columns = store
+        self.tables = tables
+        self._rebuild_index()
+
+    def _rows(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "db": t.db,
+                "division": t.division,
+                "table": t.table,
+                "entity": t.entity,
+                "description": t.description,
+                "columns": [(c.name, c.dtype, c.attr) for c in t.columns],
+            }
+            for t in self.tables
+        ]
 
+    def _rebuild_index(self) -> None:
+        self.version += 1
+        self._relationships = None
+        self._by_name = {}
         self._index = []
+        strings = self.columns.strings
         for t in self.tables:
-            blob = " ".join(
-                [
-                    t.db,
-                    t.division,
-                    t.table,
-                    t.entity,
-                    t.description,
-                    " ".join([c.name for c in t.columns]),
-                    " ".join([c.attr for c in t.columns]),
-                ]
-            ).lower()
-            self._index.append((blob, t))
+            self._by_name.setdefault(t.table, t)
+
+            # search() only does substring checks on single tokens, so each
+            # distinct word is enough; repeated attr words are kept once
+            words: Dict[str, None] = {}
+            for part in (t.db, t.division, t.table, t.entity, t.description):
+                for w in part.lower().split():
+                    words[w] = None
+            lo, hi = t.columns._lo, t.columns._hi
+            for sid in self.columns.name_ids[lo:hi]:
+                for w in strings[sid].lower().split():
+                    words[w] = None
+            for sid in self.columns.attr_ids[lo:hi]:
+                for w in strings[sid].lower().split():
+                    words[w] = None
+
+            self._index.append((" ".join(words), t))
+
+    def find_table(self, table_name: str) -> Optional[TableInfo]:
+        return self._by_name.get((table_name or "").split(".")[-1])
+
+    def merge_live_tables(self, live_tables: Iterable[Dict[str, Any]]) -> None:
+        """
+        Merge live ClickHouse metadata (schema_sync snapshot entries) into the
+        dictionary-backed tables. Live column lists and types win, dictionary
+        descriptions and attr win over ClickHouse comments.
+        """
+        rows = self._rows()
+        by_key = {(r["db"], r["table"]): r for r in rows}
+
+        for lt in live_tables:
+            db = _norm(lt.get("db"))
+            tname = _norm(lt.get("table"))
+            if not db or not tname:
+                continue
+
+            live_cols = lt.get("columns") or []
+            r = by_key.get((db, tname))
+
+            if r is None:
+                r = {
+                    "db": db,
+                    "division": "",
+                    "table": tname,
+                    "entity": "",
+                    "description": _norm(lt.get("comment")),
+                    "columns": [
+                        (_norm(c.get("name")), _norm(c.get("type")), _norm(c.get("comment")))
+                        for c in live_cols
+                        if c.get("name")
+                    ],
+                }
+                rows.append(r)
+                by_key[(db, tname)] = r
+                continue
+
+            if not r["description"]:
+                r["description"] = _norm(lt.get("comment"))
+
+            if not live_cols:
+                continue
+
+            dict_cols = {name: (dtype, attr) for name, dtype, attr in r["columns"]}
+            merged: List[Tuple[str, str, str]] = []
+            for c in live_cols:
+                cname = _norm(c.get("name"))
+                if not cname:
+                    continue
+                d_dtype, d_attr = dict_cols.get(cname, ("", ""))
+                merged.append(
+                    (
+                        cname,
+                        _norm(c.get("type")) or d_dtype,
+                        d_attr or _norm(c.get("comment")),
+                    )
+                )
+            r["columns"] = merged
+
+        self.load_rows(rows)
 
     def search(self, query: str, top_k: int = 8) -> List[TableInfo]:
         q = (query or "").lower().strip()
@@ -165,7 +397,7 @@ class SchemaRegistry:
         return [t for s, t in scored if s > 0][:top_k]
 
     def highlights(self, t: TableInfo) -> Dict[str, List[str]]:
-        cols = [c.name for c in t.columns]
+        cols = t.columns.names()
         lc = [x.lower() for x in cols]
 
         date_cols = [
@@ -246,10 +478,16 @@ class SchemaRegistry:
         }
 
     def infer_table_role(self, t: TableInfo) -> str:
+        role = t._role
+        if role is None:
+            role = t._role = self._infer_table_role(t)
+        return role
+
+    def _infer_table_role(self, t: TableInfo) -> str:
         name = (t.table or "").lower()
         entity = (t.entity or "").lower()
         desc = (t.description or "").lower()
-        cols = {c.name.lower() for c in t.columns}
+        cols = {x.lower() for x in t.columns.names()}
 
         if name == "cluster_main_sales":
             return "sales_fact"
@@ -302,6 +540,11 @@ class SchemaRegistry:
         }
 
     def build_relationships(self) -> List[Dict[str, Any]]:
+        if self._relationships is None:
+            self._relationships = self._build_relationships()
+        return list(self._relationships)
+
+    def _build_relationships(self) -> List[Dict[str, Any]]:
         rel: List[Dict[str, Any]] = []
 
         # High-confidence manual joins
@@ -370,17 +613,6 @@ class SchemaRegistry:
             }
         )
 
-        tbl_cols: Dict[str, List[Dict[str, str]]] = {}
-        for t in self.tables:
-            tbl_cols[t.table] = [
-                {
-                    "name": c.name,
-                    "attr": (c.attr or "").lower(),
-                    "canon": _canon(c.name),
-                }
-                for c in t.columns
-            ]
-
         join_canon = {
             "product": {"gds_cd", "item_cd"},
             "store": {"storeid", "store_id", "bizloc_cd", "org_cd", "store_no"},
@@ -389,12 +621,24 @@ class SchemaRegistry:
             "promotion": {"promotionid", "evt_cd"},
         }
 
-        for group, canon_set in join_canon.items():
-            occ: List[Tuple[str, str]] = []
-            for tbl, cols in tbl_cols.items():
-                for c in cols:
-                    if c["canon"] in canon_set:
-                        occ.append((tbl, c["name"]))
+        # one pass over the column store: canon form per distinct name id
+        strings = self.columns.strings
+        canon_by_sid: Dict[int, str] = {}
+        occ_by_group: Dict[str, List[Tuple[str, str]]] = {g: [] for g in join_canon}
+        last_by_table: Dict[str, TableInfo] = {}
+        for t in self.tables:
+            last_by_table[t.table] = t
+        for t in last_by_table.values():
+            for sid in self.columns.name_ids[t.columns._lo:t.columns._hi]:
+                canon = canon_by_sid.get(sid)
+                if canon is None:
+                    canon = canon_by_sid[sid] = _canon(strings[sid])
+                for group, canon_set in join_canon.items():
+                    if canon in canon_set:
+                        occ_by_group[group].append((t.table, strings[sid]))
+
+        for group in join_canon:
+            occ = occ_by_group[group]
 
             for i in range(len(occ)):
                 for j in range(i + 1, len(occ)):
@@ -404,8 +648,8 @@ class SchemaRegistry:
                         continue
                     rel.append(
                         {
-                            "left": f"{lt}.{lc}",
-                            "right": f"{rt}.{rc}",
+                            "left": sys.intern(f"{lt}.{lc}"),
+                            "right": sys.intern(f"{rt}.{rc}"),
                             "type": "join_key",
                             "label": group,
                             "score": 120 if lc == rc else 80,
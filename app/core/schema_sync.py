@@ -0,0 +1,183 @@
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import (
+    SCHEMA_DICT_PATH,
+    SCHEMA_SNAPSHOT_PATH,
+    SCHEMA_SYNC_DATABASES,
+    SCHEMA_SYNC_ENABLED,
+)
+from app.core.ch_schema import list_columns, list_tables
+from app.core.schema_registry import SchemaRegistry
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+
+# system.columns is read in chunks so the (database, table) IN (...) list stays small
+COLUMN_FETCH_CHUNK = 200
+
+_registry: Optional[SchemaRegistry] = None
+
+
+# ======================================================
+# Snapshot persistence
+# ======================================================
+
+def _empty_snapshot() -> Dict[str, Any]:
+    return {"version": SNAPSHOT_VERSION, "tables": {}}
+
+
+def load_snapshot(path: str = SCHEMA_SNAPSHOT_PATH) -> Dict[str, Any]:
+    if not path or not os.path.exists(path):
+        return _empty_snapshot()
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except Exception as e:
+        logger.warning("Failed to read schema snapshot %s: %s", path, e)
+        return _empty_snapshot()
+
+    if not isinstance(data, dict) or data.get("version") != SNAPSHOT_VERSION:
+        return _empty_snapshot()
+
+    if not isinstance(data.get("tables"), dict):
+        data["tables"] = {}
+
+    return data
+
+
+def save_snapshot(snapshot: Dict[str, Any], path: str = SCHEMA_SNAPSHOT_PATH) -> None:
+    if not path:
+        return
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+# ======================================================
+# Incremental refresh
+# ======================================================
+
+def refresh_snapshot(
+        snapshot: Dict[str, Any],
+        databases: List[str] | None = None,
+        force: bool = False,
+) -> Dict[str, int]:
+    """
+    Bring the snapshot up to date with system.tables / system.columns.
+
+    Only tables whose metadata_modification_time differs from the snapshot
+    (or are new) get their columns re-read; dropped tables are removed.
+    """
+    cached: Dict[str, Any] = snapshot.setdefault("tables", {})
+    live = list_tables(databases=databases or None)
+
+    seen = set()
+    changed: List[Dict[str, Any]] = []
+
+    for row in live:
+        key = f"{row['database']}.{row['table']}"
+        seen.add(key)
+
+        mtime = str(row.get("metadata_modification_time") or "")
+        entry = cached.get(key)
+        if not force and entry and entry.get("mtime") == mtime:
+            continue
+
+        changed.append(row)
+
+    removed = [k for k in cached if k not in seen]
+    for k in removed:
+        del cached[k]
+
+    for i in range(0, len(changed), COLUMN_FETCH_CHUNK):
+        chunk = changed[i:i + COLUMN_FETCH_CHUNK]
+        pairs: List[Tuple[str, str]] = [(r["database"], r["table"]) for r in chunk]
+
+        grouped: Dict[str, List[Dict[str, Any]]] = {}
+        for col in list_columns(tables=pairs):
+            grouped.setdefault(f"{col['database']}.{col['table']}", []).append(
+                {
+                    "name": col["name"],
+                    "type": col["type"],
+                    "comment": col.get("comment") or "",
+                }
+            )
+
+        for r in chunk:
+            key = f"{r['database']}.{r['table']}"
+            cached[key] = {
+                "db": r["database"],
+                "table": r["table"],
+                "engine": r.get("engine") or "",
+                "comment": r.get("comment") or "",
+                "mtime": str(r.get("metadata_modification_time") or ""),
+                "columns": grouped.get(key, []),
+            }
+
+    return {
+        "live_tables": len(live),
+        "changed": len(changed),
+        "removed": len(removed),
+    }
+
+
+def sync_registry(
+        registry: SchemaRegistry,
+        databases: List[str] | None = None,
+        snapshot_path: str = SCHEMA_SNAPSHOT_PATH,
+        force: bool = False,
+) -> Dict[str, Any]:
+    """
+    Merge live ClickHouse metadata into the registry.
+
+    The compiled snapshot is always applied; when ClickHouse is unreachable the
+    last snapshot is used as-is so boot does not depend on the cluster.
+    """
+    snapshot = load_snapshot(snapshot_path)
+    stats: Dict[str, Any] = {"refreshed": False}
+
+    try:
+        stats.update(refresh_snapshot(snapshot, databases or SCHEMA_SYNC_DATABASES, force=force))
+        stats["refreshed"] = True
+        if stats["changed"] or stats["removed"]:
+            save_snapshot(snapshot, snapshot_path)
+    except Exception as e:
+        logger.warning("Schema sync refresh failed, using cached snapshot: %s", e)
+        stats["error"] = str(e)
+
+    registry.merge_live_tables(snapshot.get("tables", {}).values())
+    stats["snapshot_tables"] = len(snapshot.get("tables", {}))
+
+    logger.info("Schema sync: %s", stats)
+    return stats
+
+
+# ======================================================
+# Shared registry
+# ======================================================
+
+def get_registry() -> SchemaRegistry:
+    global _registry
+    if _registry is None:
+        reg = SchemaRegistry(SCHEMA_DICT_PATH)
+        reg.load()
+        if SCHEMA_SYNC_ENABLED:
+            sync_registry(reg)
+        _registry = reg
+    return _registry
+
+
+def registry_version() -> int:
+    """Version of the shared registry; 0 until something loaded it (never loads it)."""
+    return _registry.version if _registry is not None else 0
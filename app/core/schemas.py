@@ -7,6 +7,7 @@ from typing import Optional, Dict, Any
 class ChatRequest(BaseModel):
     message: str
     force_agent: Optional[str] = None
+    approx: bool = False
 
     session_id: Optional[str] = None
 
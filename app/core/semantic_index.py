@@ -0,0 +1,286 @@
+import hashlib
+import logging
+import os
+import re
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import SEMANTIC_INDEX_DIM, SEMANTIC_INDEX_PATH
+
+logger = logging.getLogger(__name__)
+
+NGRAM_SIZES = (3, 4)
+
+# Cyrillic -> Latin folding, so "borluulalt" and "борлуулалт" share n-grams
+CYRILLIC_FOLD = {
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "yo",
+    "ж": "j", "з": "z", "и": "i", "й": "i", "к": "k", "л": "l", "м": "m",
+    "н": "n", "о": "o", "ө": "u", "п": "p", "р": "r", "с": "s", "т": "t",
+    "у": "u", "ү": "u", "ф": "f", "х": "h", "ц": "ts", "ч": "ch", "ш": "sh",
+    "щ": "sh", "ъ": "", "ы": "ii", "ь": "i", "э": "e", "ю": "yu", "я": "ya",
+}
+
+_FOLD_TABLE = str.maketrans(CYRILLIC_FOLD)
+
+_index: Optional["SemanticIndex"] = None
+_index_version: Optional[int] = None
+
+
+# ======================================================
+# Text -> hashed n-gram features
+# ======================================================
+
+def fold_text(text: str) -> str:
+    """
+    Lowercase, split identifiers (NetSale, GDS_NM) into words and fold
+    Cyrillic into its Latin transliteration.
+    """
+    s = re.sub(r"([a-z0-9])([A-Z])", r"\1 \2", text or "")
+    s = s.lower().translate(_FOLD_TABLE)
+    s = re.sub(r"[^a-z0-9]+", " ", s)
+    return s.strip()
+
+
+def _bucket(gram: str, dim: int) -> int:
+    return zlib.crc32(gram.encode("utf-8")) % dim
+
+
+def hashed_ngrams(text: str, dim: int, sizes: Tuple[int, ...] = NGRAM_SIZES) -> Dict[int, int]:
+    counts: Dict[int, int] = {}
+    for word in fold_text(text).split():
+        padded = f" {word} "
+        for n in sizes:
+            if len(padded) < n:
+                continue
+            for i in range(len(padded) - n + 1):
+                b = _bucket(padded[i:i + n], dim)
+                counts[b] = counts.get(b, 0) + 1
+    return counts
+
+
+# ======================================================
+# CSR matrix kept as plain NumPy arrays
+# ======================================================
+
+class SemanticIndex:
+    def __init__(
+            self,
+            dim: int,
+            idf: np.ndarray,
+            table_keys: List[str],
+            table_csr: Tuple[np.ndarray, np.ndarray, np.ndarray],
+            column_keys: List[str],
+            column_csr: Tuple[np.ndarray, np.ndarray, np.ndarray],
+            fingerprint: str = "",
+    ):
+        self.dim = dim
+        self.idf = idf
+        self.table_keys = table_keys
+        self.table_csr = table_csr
+        self.column_keys = column_keys
+        self.column_csr = column_csr
+        self.fingerprint = fingerprint
+
+    # ---------------- build ----------------
+
+    @classmethod
+    def build(cls, registry: Any, dim: int = SEMANTIC_INDEX_DIM) -> "SemanticIndex":
+        table_docs: List[Dict[int, int]] = []
+        table_keys: List[str] = []
+        column_docs: List[Dict[int, int]] = []
+        column_keys: List[str] = []
+
+        for t in registry.tables:
+            key = f"{t.db}.{t.table}"
+            text = " ".join(
+                [
+                    t.table,
+                    t.table,
+                    t.entity or "",
+                    t.description or "",
+                    " ".join([c.name for c in t.columns]),
+                    " ".join([c.attr for c in t.columns if c.attr]),
+                ]
+            )
+            table_keys.append(key)
+            table_docs.append(hashed_ngrams(text, dim))
+
+            for c in t.columns:
+                column_keys.append(f"{key}.{c.name}")
+                column_docs.append(hashed_ngrams(f"{c.name} {c.name} {c.attr or ''}", dim))
+
+        df = np.zeros(dim, dtype=np.float32)
+        for doc in table_docs + column_docs:
+            if doc:
+                df[np.fromiter(doc.keys(), dtype=np.int64)] += 1.0
+
+        n_docs = max(len(table_docs) + len(column_docs), 1)
+        idf = (np.log((n_docs + 1.0) / (df + 1.0)) + 1.0).astype(np.float32)
+
+        return cls(
+            dim=dim,
+            idf=idf,
+            table_keys=table_keys,
+            table_csr=_to_csr(table_docs, idf),
+            column_keys=column_keys,
+            column_csr=_to_csr(column_docs, idf),
+            fingerprint=registry_fingerprint(registry),
+        )
+
+    # ---------------- persistence ----------------
+
+    def save(self, path: str = SEMANTIC_INDEX_PATH) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        np.savez_compressed(
+            path,
+            dim=np.array([self.dim], dtype=np.int64),
+            idf=self.idf,
+            table_keys=np.array(self.table_keys, dtype=str),
+            table_indptr=self.table_csr[0],
+            table_indices=self.table_csr[1],
+            table_data=self.table_csr[2],
+            column_keys=np.array(self.column_keys, dtype=str),
+            column_indptr=self.column_csr[0],
+            column_indices=self.column_csr[1],
+            column_data=self.column_csr[2],
+            fingerprint=np.array([self.fingerprint], dtype=str),
+        )
+
+    @classmethod
+    def load(cls, path: str = SEMANTIC_INDEX_PATH) -> "SemanticIndex":
+        with np.load(path, allow_pickle=False) as z:
+            return cls(
+                dim=int(z["dim"][0]),
+                idf=z["idf"],
+                table_keys=[str(x) for x in z["table_keys"]],
+                table_csr=(z["table_indptr"], z["table_indices"], z["table_data"]),
+                column_keys=[str(x) for x in z["column_keys"]],
+                column_csr=(z["column_indptr"], z["column_indices"], z["column_data"]),
+                fingerprint=str(z["fingerprint"][0]),
+            )
+
+    # ---------------- query ----------------
+
+    def query_vector(self, query: str) -> Optional[np.ndarray]:
+        counts = hashed_ngrams(query, self.dim)
+        if not counts:
+            return None
+
+        q = np.zeros(self.dim, dtype=np.float32)
+        idx = np.fromiter(counts.keys(), dtype=np.int64)
+        tf = np.fromiter(counts.values(), dtype=np.float32)
+        q[idx] = (1.0 + np.log(tf)) * self.idf[idx]
+
+        norm = float(np.linalg.norm(q))
+        if norm == 0.0:
+            return None
+        return q / norm
+
+    def search_tables(self, query: str, top_k: int = 8) -> List[Tuple[str, float]]:
+        return self._search(query, self.table_keys, self.table_csr, top_k)
+
+    def search_columns(self, query: str, top_k: int = 20) -> List[Tuple[str, float]]:
+        return self._search(query, self.column_keys, self.column_csr, top_k)
+
+    def _search(
+            self,
+            query: str,
+            keys: List[str],
+            csr: Tuple[np.ndarray, np.ndarray, np.ndarray],
+            top_k: int,
+    ) -> List[Tuple[str, float]]:
+        if not keys or top_k <= 0:
+            return []
+
+        q = self.query_vector(query)
+        if q is None:
+            return []
+
+        scores = _csr_matvec(csr, q)
+        k = min(top_k, len(keys))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        return [(keys[i], float(scores[i])) for i in top if scores[i] > 0.0]
+
+
+def _to_csr(
+        docs: List[Dict[int, int]],
+        idf: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    indptr = np.zeros(len(docs) + 1, dtype=np.int64)
+    nnz = sum(len(d) for d in docs)
+    indices = np.empty(nnz, dtype=np.int32)
+    data = np.empty(nnz, dtype=np.float32)
+
+    pos = 0
+    for i, doc in enumerate(docs):
+        n = len(doc)
+        if n:
+            idx = np.fromiter(doc.keys(), dtype=np.int32, count=n)
+            tf = np.fromiter(doc.values(), dtype=np.float32, count=n)
+            w = (1.0 + np.log(tf)) * idf[idx]
+            norm = float(np.linalg.norm(w)) or 1.0
+            indices[pos:pos + n] = idx
+            data[pos:pos + n] = w / norm
+            pos += n
+        indptr[i + 1] = pos
+
+    return indptr, indices, data
+
+
+def _csr_matvec(csr: Tuple[np.ndarray, np.ndarray, np.ndarray], q: np.ndarray) -> np.ndarray:
+    indptr, indices, data = csr
+    # trailing zero keeps reduceat valid for empty rows at the end
+    products = np.append(data * q[indices], np.float32(0.0))
+    scores = np.add.reduceat(products, indptr[:-1])
+    scores[indptr[1:] == indptr[:-1]] = 0.0
+    return scores
+
+
+def registry_fingerprint(registry: Any) -> str:
+    h = hashlib.sha1()
+    for t in registry.tables:
+        h.update(f"{t.db}.{t.table}:".encode("utf-8"))
+        h.update(",".join([f"{c.name}/{c.attr}" for c in t.columns]).encode("utf-8"))
+        h.update(f"|{t.entity}|{t.description}\n".encode("utf-8"))
+    return h.hexdigest()
+
+
+# ======================================================
+# Shared index
+# ======================================================
+
+def get_semantic_index(registry: Any) -> SemanticIndex:
+    """
+    Load the offline-built index when it matches the registry, otherwise build
+    it in-process. Rebuilt whenever the registry version changes.
+    """
+    global _index, _index_version
+
+    version = getattr(registry, "version", 0)
+    if _index is not None and _index_version == version:
+        return _index
+
+    index: Optional[SemanticIndex] = None
+    if SEMANTIC_INDEX_PATH and os.path.exists(SEMANTIC_INDEX_PATH):
+        try:
+            loaded = SemanticIndex.load(SEMANTIC_INDEX_PATH)
+            if loaded.fingerprint == registry_fingerprint(registry):
+                index = loaded
+            else:
+                logger.info("Semantic index at %s is stale, rebuilding in-process", SEMANTIC_INDEX_PATH)
+        except Exception as e:
+            logger.warning("Failed to load semantic index %s: %s", SEMANTIC_INDEX_PATH, e)
+
+    if index is None:
+        index = SemanticIndex.build(registry)
+
+    _index = index
+    _index_version = version
+    return index
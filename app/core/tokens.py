@@ -0,0 +1,12 @@
+import math
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap prompt-size estimate without a tokenizer: roughly 4 ASCII chars per
+    token, while Cyrillic text splits into about one token per 2 chars.
+    """
+    if not text:
+        return 0
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return math.ceil(ascii_chars / 4 + (len(text) - ascii_chars) / 2)
@@ -1,7 +1,7 @@
 # app/db/chat_history.py
 import json
 import logging
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
 import mysql.connector
 from mysql.connector import pooling
@@ -116,3 +116,47 @@ def save_chat_history(
                 conn.close()
             except Exception:
                 pass
+
+
+def fetch_chat_history(
+        *,
+        limit: int = 500,
+        agent_name: Optional[str] = "text2sql",
+) -> List[Dict[str, Any]]:
+    """Most recent recorded questions, newest first (for offline benchmarks)."""
+    conn = None
+    cur = None
+    try:
+        pool = get_mysql_pool()
+        conn = pool.get_connection()
+        cur = conn.cursor(dictionary=True)
+
+        sql = """
+        SELECT user_query, generated_sql, agent_name, mode, rule_name, error_code, meta_json
+        FROM llm_chat_history
+        """
+        params: List[Any] = []
+        if agent_name:
+            sql += " WHERE agent_name = %s"
+            params.append(agent_name)
+        sql += " ORDER BY id DESC LIMIT %s"
+        params.append(int(limit))
+
+        cur.execute(sql, tuple(params))
+        return list(cur.fetchall() or [])
+
+    except Exception as e:
+        logger.exception("Failed to fetch chat history: %s", e)
+        return []
+
+    finally:
+        if cur:
+            try:
+                cur.close()
+            except Exception:
+                pass
+        if conn:
+            try:
+                conn.close()
+            except Exception:
+                pass
@@ -1,7 +1,30 @@
 import re
 from app.core.schemas import OrchestratorState, ClassificationResult
 from app.core.llm_client import chat_completion
-from app.core.schema_catalog import format_schema_for_prompt
+from app.core.intent_classifier import predict_intent
+from app.agents.text2sql.intents import normalize_query
+from app.agents.text2sql.keyword_automaton import register_vocabularies, text_has
+
+DATA_QUERY_WORDS = [
+    "борлуул", "sales", "netsale", "gross", "татвар", "discount",
+    "тоо", "хэд", "тайлан", "дэлгүүр", "2025", "2024", "2023"
+]
+
+register_vocabularies("classify", globals())
+
+
+def classify_by_rules(q: str) -> ClassificationResult:
+    if text_has(q.lower(), DATA_QUERY_WORDS) or re.search(r"\bCU\d{3,4}\b", q.upper()):
+        return ClassificationResult(agent="text2sql", confidence=0.9, rationale="rule_data_query")
+    return ClassificationResult(agent="general", confidence=0.3, rationale="fallback_general")
+
+
+def classify_message(q: str) -> ClassificationResult:
+    """Trained agent head when it is confident, otherwise the keyword rules."""
+    pred = predict_intent("agent", normalize_query(q))
+    if pred:
+        return ClassificationResult(agent=pred[0], confidence=pred[1], rationale="intent_model")
+    return classify_by_rules(q)
 
 
 async def node_classify(state: OrchestratorState) -> OrchestratorState:
@@ -13,25 +36,11 @@ async def node_classify(state: OrchestratorState) -> OrchestratorState:
         return state
 
     q = (state.normalized_message or state.raw_message or "").strip()
-    q_low = q.lower()
-    q_up = q.upper()
 
-    data_keywords = [
-        "борлуул", "sales", "netsale", "gross", "татвар", "discount",
-        "тоо", "хэд", "тайлан", "дэлгүүр", "2025", "2024", "2023"
-    ]
-
-    if any(k in q_low for k in data_keywords) or re.search(r"\bCU\d{3,4}\b", q_up):
-        state.classification = ClassificationResult(
-            agent="text2sql", confidence=0.9, rationale="rule_data_query"
-        )
-        state.meta["agent"] = "text2sql"
-        return state
-
-    state.classification = ClassificationResult(
-        agent="general", confidence=0.3, rationale="fallback_general"
-    )
-    state.meta["agent"] = "general"
+    state.classification = classify_message(q)
+    state.meta["agent"] = state.classification.agent
+    state.meta["agent_confidence"] = round(state.classification.confidence, 4)
+    state.meta["agent_rationale"] = state.classification.rationale
     return state
 
 
@@ -43,7 +52,11 @@ async def node_run_llm_general(state: OrchestratorState) -> OrchestratorState:
 
 
 async def node_run_text2sql(state: OrchestratorState) -> OrchestratorState:
-    schema_txt = format_schema_for_prompt(["Cluster_Main_Sales"])
+    # loads the schema registry; kept out of module import so the keyword
+    # classifier above can be imported without the dictionary file
+    from app.core.schema_catalog import format_schema_for_prompt
+
+    schema_txt = format_schema_for_prompt(["Cluster_Main_Sales"], query=state.raw_message)
 
     system = f"""
 Та ClickHouse SQL бичдэг туслах.
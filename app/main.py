@@ -1,11 +1,23 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 
 from app.api.routes import router as api_router
 from app.api.ui import router as ui_router
+from app.agents.text2sql.dimension_cache import start_dimension_cache
+from app.core.schema_catalog import warm_prompt_cache
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warm_prompt_cache()
+    start_dimension_cache()
+    yield
+
 
-app = FastAPI(title="CU Orchestrator", version="1.0.0")
+app = FastAPI(title="CU Orchestrator", version="1.0.0", lifespan=lifespan)
 
 app.include_router(api_router, prefix="/api")
 app.include_router(ui_router)
@@ -0,0 +1,88 @@
+"""
+Planner output tokens / latency with and without the JSON early stop.
+
+    python -m scripts.bench_json_early_stop [--cases tests/cases.json] [--history 500] [--n 20]
+
+Plans the first N questions twice with the full planner prompt: a plain
+completion that runs until the model stops or max_tokens, and a streamed one
+closed after the first top-level JSON object. Reports estimated output
+tokens, tokens saved, wall time and whether both answers parse to the same
+plan.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import Dict, List
+
+from app.agents.planner import planner_system_prompt
+from app.agents.text2sql.intents import QueryContext
+from app.agents.text2sql.plan_utils import normalize_plan, safe_json_loads
+from app.core.llm_client import chat_completion, json_stream_stats
+from app.core.tokens import estimate_tokens
+from scripts.bench_planner_examples import payload_for
+from scripts.bench_schema_pruning import load_questions
+
+MODES = ("full", "early_stop")
+
+
+def p95(values: List[float]) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * 0.95))]
+
+
+async def run(questions: List[str]) -> Dict[str, Dict[str, List[float]]]:
+    stats: Dict[str, Dict[str, List[float]]] = {m: {"tokens": [], "s": []} for m in MODES}
+    stats["same_plan"] = {"n": []}
+
+    for query in questions:
+        user = json.dumps(payload_for(QueryContext.build(query), "retrieved"), ensure_ascii=False)
+        plans = {}
+        for mode in MODES:
+            t0 = time.perf_counter()
+            out = await chat_completion(
+                user,
+                system=planner_system_prompt(),
+                temperature=0.0,
+                max_tokens=1400,
+                stop_at_json=mode == "early_stop",
+            )
+            stats[mode]["s"].append(time.perf_counter() - t0)
+            stats[mode]["tokens"].append(estimate_tokens(out))
+            parsed = safe_json_loads(out)
+            plans[mode] = normalize_plan(parsed) if parsed else None
+        stats["same_plan"]["n"].append(float(plans["full"] == plans["early_stop"]))
+
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cases", default="tests/cases.json")
+    parser.add_argument("--history", type=int, default=0, help="recorded questions to include (MySQL)")
+    parser.add_argument("--n", type=int, default=20, help="questions to plan")
+    args = parser.parse_args()
+
+    questions = [item["query"] for item in load_questions(args.cases, args.history)][:args.n]
+    if not questions:
+        print("no questions")
+        return
+
+    stats = asyncio.run(run(questions))
+    print(f"questions={len(questions)}")
+    for mode in MODES:
+        s = stats[mode]
+        print(
+            f"{mode:<11} output_tokens mean={statistics.mean(s['tokens']):.0f} max={max(s['tokens']):.0f}  "
+            f"llm_s mean={statistics.mean(s['s']):.2f} p95={p95(s['s']):.2f}"
+        )
+    saved = statistics.mean(stats["full"]["tokens"]) - statistics.mean(stats["early_stop"]["tokens"])
+    faster = statistics.mean(stats["full"]["s"]) - statistics.mean(stats["early_stop"]["s"])
+    print(f"tokens saved per plan={saved:.0f}  seconds saved per plan={faster:.2f}")
+    print(f"same plan={sum(stats['same_plan']['n']):.0f}/{len(questions)}")
+    print(f"stream stats={json_stream_stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+LEFT JOIN vs dictGet name lookups: equivalence and latency.
+
+    python -m scripts.bench_name_dictionaries [--cases tests/cases.json] [--history 500] [--rounds 5]
+
+Collects the hard-rule SQL of the sample and recorded questions, keeps the
+queries rewrite_name_joins changes and runs both forms against ClickHouse
+(result cache bypassed). Reports whether both return the same rows (as a
+multiset) and the mean / best latency of each form. The dictionaries must
+exist (scripts/create_name_dictionaries.py --apply).
+"""
+import argparse
+import statistics
+import time
+from collections import Counter
+from typing import Any, Dict, List, Tuple
+
+from app.agents.text2sql.executor import run_query
+from app.agents.text2sql.hard_rules import run_hard_sql_rules
+from app.agents.text2sql.intents import QueryContext
+from app.agents.text2sql.name_dictionaries import rewrite_name_joins
+from app.agents.text2sql.sql_params import sql_params
+from scripts.bench_query_context import SAMPLE_QUERIES
+from scripts.bench_schema_pruning import load_questions
+
+
+def name_join_queries(questions: List[str]) -> List[Tuple[str, str, str, Dict[str, Any]]]:
+    """(rule, join sql, dictGet sql, bound values), one per distinct SQL and values."""
+    out: Dict[Tuple[str, str], Tuple[str, str, str, Dict[str, Any]]] = {}
+    for query in questions:
+        hit = run_hard_sql_rules(QueryContext.build(query))
+        if not hit:
+            continue
+        rule, sql = hit
+        rewritten = rewrite_name_joins(sql)
+        if rewritten != sql:
+            params = sql_params(sql)
+            out[(sql, repr(sorted(params.items())))] = (rule, sql, rewritten, params)
+    return list(out.values())
+
+
+def timed(sql: str, params: Dict[str, Any], rounds: int) -> Tuple[Counter, List[float]]:
+    took = []
+    rows: Counter = Counter()
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        data = run_query(sql, params)
+        took.append(time.perf_counter() - t0)
+        rows = Counter(tuple(r) for r in data["rows"])
+    return rows, took
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cases", default="tests/cases.json")
+    parser.add_argument("--history", type=int, default=0, help="recorded questions to include (MySQL)")
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    questions = SAMPLE_QUERIES + [item["query"] for item in load_questions(args.cases, args.history)]
+    queries = name_join_queries(questions)
+    print(f"questions={len(questions)} name-join queries={len(queries)}")
+
+    same = 0
+    for rule, join_sql, dict_sql, params in queries:
+        join_rows, join_s = timed(join_sql, params, args.rounds)
+        dict_rows, dict_s = timed(dict_sql, params, args.rounds)
+        equal = join_rows == dict_rows
+        same += equal
+        print(
+            f"{rule:<42} join mean={statistics.mean(join_s):.3f}s best={min(join_s):.3f}s  "
+            f"dictGet mean={statistics.mean(dict_s):.3f}s best={min(dict_s):.3f}s  "
+            f"rows={sum(join_rows.values())} same={equal}"
+        )
+    print(f"equivalent={same}/{len(queries)}")
+
+
+if __name__ == "__main__":
+    main()
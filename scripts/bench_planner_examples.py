@@ -0,0 +1,106 @@
+"""
+Prompt-size / latency benchmark for retrieved vs static planner examples.
+
+    python -m scripts.bench_planner_examples [--cases tests/cases.json] [--history 500] [--llm 0]
+
+Builds the planner user payload for every question twice, with all static
+examples and with the examples retrieved from the example store, and reports
+estimated prompt tokens and payload build time. With --llm N the first N
+questions are also planned by the LLM in both modes to compare wall time.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import Any, Dict, List
+
+from app.agents.planner import build_user_payload, planner_system_prompt
+from app.agents.text2sql.intents import QueryContext
+from app.agents.text2sql.registry_utils import (
+    build_allowed_tables,
+    filter_relationships,
+    merge_candidates,
+    registry,
+    semantic_candidates,
+)
+from app.core.llm import LLMClient
+from app.core.tokens import estimate_tokens
+from scripts.bench_schema_pruning import load_questions
+
+MODES = ("static", "retrieved")
+
+
+def payload_for(ctx: QueryContext, mode: str) -> Dict[str, Any]:
+    candidates = registry.search(ctx.normalized, top_k=20) or registry.search(ctx.raw, top_k=20)
+    candidates = merge_candidates(candidates, semantic_candidates(ctx.raw, top_k=8), top_k=20)
+    return build_user_payload(
+        query=ctx,
+        candidates=candidates,
+        rel_filtered=filter_relationships(candidates, registry.build_relationships()),
+        allowed_tables=build_allowed_tables(candidates),
+        registry=registry,
+        examples_mode=mode,
+    )
+
+
+async def time_llm(payloads: List[Dict[str, Any]]) -> List[float]:
+    llm = LLMClient()
+    out = []
+    for payload in payloads:
+        t0 = time.perf_counter()
+        await llm.chat(
+            [
+                {"role": "system", "content": planner_system_prompt()},
+                {"role": "user", "content": json.dumps(payload, ensure_ascii=False)},
+            ],
+            temperature=0.0,
+            max_tokens=1400,
+        )
+        out.append(time.perf_counter() - t0)
+    return out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cases", default="tests/cases.json")
+    parser.add_argument("--history", type=int, default=0, help="recorded questions to include (MySQL)")
+    parser.add_argument("--llm", type=int, default=0, help="questions to also plan with the LLM per mode")
+    args = parser.parse_args()
+
+    items = load_questions(args.cases, args.history)
+    if not items:
+        print("no questions")
+        return
+
+    stats: Dict[str, Dict[str, List[float]]] = {m: {"prompt": [], "examples": [], "ms": []} for m in MODES}
+    payloads: Dict[str, List[Dict[str, Any]]] = {m: [] for m in MODES}
+
+    for item in items:
+        ctx = QueryContext.build(item["query"])
+        for mode in MODES:
+            t0 = time.perf_counter()
+            payload = payload_for(ctx, mode)
+            stats[mode]["ms"].append((time.perf_counter() - t0) * 1000)
+            stats[mode]["prompt"].append(estimate_tokens(json.dumps(payload, ensure_ascii=False)))
+            stats[mode]["examples"].append(estimate_tokens(json.dumps(payload["examples"], ensure_ascii=False)))
+            payloads[mode].append(payload)
+
+    print(f"questions={len(items)}")
+    for mode in MODES:
+        s = stats[mode]
+        print(
+            f"{mode:<10} prompt_tokens={statistics.mean(s['prompt']):.0f}  "
+            f"example_tokens={statistics.mean(s['examples']):.0f}  payload_ms={statistics.mean(s['ms']):.2f}"
+        )
+    static, retrieved = statistics.mean(stats["static"]["prompt"]), statistics.mean(stats["retrieved"]["prompt"])
+    print(f"prompt reduction={(1 - retrieved / static) * 100:.1f}%")
+
+    if args.llm > 0:
+        for mode in MODES:
+            took = asyncio.run(time_llm(payloads[mode][:args.llm]))
+            print(f"{mode:<10} llm_s mean={statistics.mean(took):.2f} max={max(took):.2f}")
+
+
+if __name__ == "__main__":
+    main()
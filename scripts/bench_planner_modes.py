@@ -0,0 +1,146 @@
+"""
+Skeleton-first vs full planning benchmark.
+
+    python -m scripts.bench_planner_modes [--cases tests/cases.json] [--history 500] [--llm 0]
+
+For every sales question reports whether the intents build a skeleton, how
+many skeletons are complete (no LLM call at all) and the estimated prompt
+tokens of the skeleton completion vs the full planner prompt. With --llm N
+the first N skeleton questions are planned both ways: wall time, output
+tokens, and how often both plans agree on tables, grouping, filters and limit.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.agents.planner import (
+    build_skeleton_payload,
+    planner_system_prompt,
+    skeleton_system_prompt,
+)
+from app.agents.text2sql.intents import QueryContext
+from app.agents.text2sql.plan_skeleton import build_plan_skeleton, merge_skeleton
+from app.agents.text2sql.plan_utils import normalize_plan, safe_json_loads
+from app.agents.text2sql.query_router import classify_query_domain
+from app.core.llm import LLMClient
+from app.core.tokens import estimate_tokens
+from scripts.bench_planner_examples import payload_for
+from scripts.bench_schema_pruning import load_questions
+
+
+def shape(plan: Optional[Dict[str, Any]]) -> Tuple[Any, ...]:
+    """What the two planners must agree on; aliases and expression spelling may differ."""
+    if not plan:
+        return ()
+    tables = {plan.get("fact_table")} | {j.get("table") for j in plan.get("joins", [])}
+    return tuple(sorted(tables)), len(plan.get("group_by", [])), len(plan.get("where", [])), plan.get("limit")
+
+
+async def run_llm(ctx: QueryContext, domain: str) -> Dict[str, Any]:
+    llm = LLMClient()
+    out: Dict[str, Any] = {}
+
+    skeleton = build_plan_skeleton(ctx, domain)
+    t0 = time.perf_counter()
+    plan = None
+    if skeleton.complete:
+        plan, text = normalize_plan(skeleton.plan), ""
+    else:
+        text = await llm.chat(
+            [
+                {"role": "system", "content": skeleton_system_prompt()},
+                {"role": "user", "content": json.dumps(build_skeleton_payload(ctx, skeleton), ensure_ascii=False)},
+            ],
+            temperature=0.0,
+            max_tokens=200,
+        )
+        filled = safe_json_loads(text)
+        merged = merge_skeleton(skeleton, filled) if isinstance(filled, dict) else None
+        plan = normalize_plan(merged.plan) if merged else None
+    out["skeleton"] = (time.perf_counter() - t0, estimate_tokens(text or ""), plan)
+
+    payload = payload_for(ctx, "retrieved")
+    t0 = time.perf_counter()
+    text = await llm.chat(
+        [
+            {"role": "system", "content": planner_system_prompt()},
+            {"role": "user", "content": json.dumps(payload, ensure_ascii=False)},
+        ],
+        temperature=0.0,
+        max_tokens=1400,
+    )
+    full = safe_json_loads(text)
+    out["full"] = (time.perf_counter() - t0, estimate_tokens(text or ""), normalize_plan(full) if full else None)
+    return out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cases", default="tests/cases.json")
+    parser.add_argument("--history", type=int, default=0, help="recorded questions to include (MySQL)")
+    parser.add_argument("--llm", type=int, default=0, help="skeleton questions to also plan with the LLM both ways")
+    args = parser.parse_args()
+
+    items = load_questions(args.cases, args.history)
+    counts: Counter = Counter()
+    missing: Counter = Counter()
+    prompt: Dict[str, List[int]] = {"skeleton": [], "full": []}
+    build_us: List[float] = []
+    planned: List[Tuple[QueryContext, str]] = []
+
+    for item in items:
+        ctx = QueryContext.build(item["query"])
+        domain = classify_query_domain(ctx)["domain"]
+        if domain != "sales":
+            counts["not_sales"] += 1
+            continue
+
+        t0 = time.perf_counter()
+        skeleton = build_plan_skeleton(ctx, domain)
+        build_us.append((time.perf_counter() - t0) * 1e6)
+        if skeleton is None:
+            counts["no_skeleton"] += 1
+            continue
+
+        counts["complete" if skeleton.complete else "partial"] += 1
+        missing.update(skeleton.missing)
+        planned.append((ctx, domain))
+
+        full = estimate_tokens(planner_system_prompt()) + estimate_tokens(
+            json.dumps(payload_for(ctx, "retrieved"), ensure_ascii=False)
+        )
+        prompt["full"].append(full)
+        prompt["skeleton"].append(
+            0 if skeleton.complete else estimate_tokens(skeleton_system_prompt()) + estimate_tokens(
+                json.dumps(build_skeleton_payload(ctx, skeleton), ensure_ascii=False)
+            )
+        )
+
+    sales = counts["complete"] + counts["partial"] + counts["no_skeleton"]
+    print(f"questions={len(items)} sales={sales} " + " ".join(f"{k}={v}" for k, v in sorted(counts.items())))
+    if not planned:
+        return
+
+    print(f"skeleton coverage={len(planned) / max(sales, 1) * 100:.1f}%  "
+          f"complete={counts['complete'] / len(planned) * 100:.1f}%  missing={dict(missing)}")
+    print(f"skeleton build mean={statistics.mean(build_us):.0f}us")
+    print(f"prompt tokens  full={statistics.mean(prompt['full']):.0f}  skeleton={statistics.mean(prompt['skeleton']):.0f}")
+
+    if args.llm > 0:
+        runs = [asyncio.run(run_llm(ctx, domain)) for ctx, domain in planned[:args.llm]]
+        for mode in ("skeleton", "full"):
+            took = [r[mode][0] for r in runs]
+            out_tokens = [r[mode][1] for r in runs]
+            failed = sum(1 for r in runs if not r[mode][2])
+            print(f"{mode:<9} llm_s mean={statistics.mean(took):.2f} max={max(took):.2f}  "
+                  f"output_tokens={statistics.mean(out_tokens):.0f}  no_plan={failed}")
+        agree = sum(1 for r in runs if r["full"][2] and shape(r["skeleton"][2]) == shape(r["full"][2]))
+        print(f"plan shape agreement={agree}/{len(runs)}")
+
+
+if __name__ == "__main__":
+    main()
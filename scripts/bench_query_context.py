@@ -0,0 +1,163 @@
+"""
+Per-request CPU of the rule / intent pass, before and after QueryContext.
+
+    python -m scripts.bench_query_context [--baseline REV] [--rounds 200]
+
+"Before" runs the rule pass from git revision REV (default: the repository's
+root commit), which re-normalizes the question inside every predicate. "After"
+builds one QueryContext per question and threads it through. Outputs of the
+two passes are compared for every sample question. The current pass goes through
+the indexed hard-rule dispatch. Questions in INTENDED_CHANGES are expected to
+route to a different rule than the baseline and are reported, not counted as
+mismatches.
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+import types
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.agents.text2sql.hard_rules import hard_rule_out_of_domain_text, run_hard_sql_rules
+from app.agents.text2sql.intents import Intent, QueryContext
+from app.agents.text2sql.query_router import classify_query_domain
+from app.agents.text2sql.sql_params import inline_params
+
+SAMPLE_QUERIES = [
+    "2024 оны нийт борлуулалт",
+    "2025 онд хамгийн их борлуулалттай 10 дэлгүүр",
+    "2025 онд хамгийн их борлуулалттай 5 салбарын нэр",
+    "2024 оны 2-р улирлын борлуулалт",
+    "2024 q1 vs q3 борлуулалт харьцуулах",
+    "2023 болон 2024 оны сарын борлуулалт харьцуулах",
+    "2024 оноос 2025 онд борлуулалт хэдэн хувь өссөн бэ",
+    "өнөөдрийн борлуулалт",
+    "өчигдөр sales хэд вэ",
+    "сүүлийн 7 хоногийн борлуулалтын тренд",
+    "2024 онд хамгийн их зарагдсан барааны нэр",
+    "барааны үлдэгдэл нэрээр",
+    "brand list",
+    "2024 onii niit borluulalt",
+    "store list",
+    "сайн уу",
+    "Cluster_Main_Sales ямар багана байдаг вэ",
+    "ямар table дээр sales байдаг вэ",
+]
+
+# question -> rule the current pass picks on purpose (baseline differs)
+INTENDED_CHANGES = {
+    # period rules (sql_rules.json); the baseline had no rule for today's total
+    "өнөөдрийн борлуулалт": "sales_total_in_period",
+}
+
+LEGACY_MODULES = [
+    ("legacy_intents", "app/agents/text2sql/intents.py"),
+    ("legacy_hard_rules", "app/agents/text2sql/hard_rules.py"),
+    ("legacy_query_router", "app/agents/text2sql/query_router.py"),
+]
+
+
+def root_commit() -> str:
+    out = subprocess.check_output(["git", "rev-list", "--max-parents=0", "HEAD"], text=True)
+    return out.split()[0]
+
+
+def load_legacy(rev: str) -> Dict[str, types.ModuleType]:
+    mods: Dict[str, types.ModuleType] = {}
+    for name, path in LEGACY_MODULES:
+        src = subprocess.check_output(["git", "show", f"{rev}:{path}"], text=True)
+        src = src.replace("from app.agents.text2sql.intents import", "from legacy_intents import")
+        mod = types.ModuleType(name)
+        sys.modules[name] = mod
+        exec(compile(src, f"{rev}:{path}", "exec"), mod.__dict__)
+        mods[name] = mod
+    return mods
+
+
+def first_rule(query: Any, rules: List) -> Optional[Tuple[str, str]]:
+    for rule_name, rule_fn in rules:
+        try:
+            sql = rule_fn(query)
+        except Exception:
+            sql = None
+        if sql:
+            return rule_name, sql
+    return None
+
+
+def inlined_rule(query: Any) -> Optional[Tuple[str, str]]:
+    """Current rule match with bound values written in, comparable to the literal legacy SQL."""
+    matched = run_hard_sql_rules(query)
+    if not matched:
+        return None
+    rule_name, sql = matched
+    return rule_name, inline_params(sql)
+
+
+def run_pass(query: Any, match_rule, out_of_domain, classify, infer_domain) -> Dict[str, Any]:
+    return {
+        "out_of_domain": out_of_domain(query),
+        "rule": match_rule(query),
+        "domain": classify(query)["domain"],
+        "intent_domain": infer_domain(query),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--baseline", default="")
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--cases", default="tests/cases.json")
+    args = parser.parse_args()
+
+    queries = list(SAMPLE_QUERIES)
+    with open(args.cases, "r", encoding="utf-8") as f:
+        queries.extend([c["input"] for c in json.load(f)])
+
+    legacy = load_legacy(args.baseline or root_commit())
+    l_rules = legacy["legacy_hard_rules"]
+    l_intent = legacy["legacy_intents"].Intent
+
+    def before(q: str) -> Dict[str, Any]:
+        return run_pass(
+            q,
+            lambda x: first_rule(x, l_rules.HARD_SQL_RULES),
+            l_rules.hard_rule_out_of_domain_text,
+            legacy["legacy_query_router"].classify_query_domain,
+            l_intent.infer_domain,
+        )
+
+    def after(q: str) -> Dict[str, Any]:
+        # fresh context per request, as text2sql_answer does
+        ctx = QueryContext.build(q)
+        return run_pass(ctx, inlined_rule, hard_rule_out_of_domain_text, classify_query_domain, Intent.infer_domain)
+
+    mismatches = 0
+    changed = 0
+    for q in queries:
+        b = before(q)
+        a = after(q)
+        if a == b:
+            continue
+        intended = INTENDED_CHANGES.get(q)
+        if intended and a["rule"] and a["rule"][0] == intended and {**a, "rule": b["rule"]} == b:
+            changed += 1
+            print(f"CHANGED  {q!r}: {b['rule'] and b['rule'][0]} -> {intended}")
+            continue
+        mismatches += 1
+        print(f"MISMATCH {q!r}\n  before={b}\n  after={a}")
+
+    for label, fn in (("before", before), ("after", after)):
+        t0 = time.process_time()
+        for _ in range(args.rounds):
+            for q in queries:
+                fn(q)
+        per_req_us = (time.process_time() - t0) / (args.rounds * len(queries)) * 1e6
+        print(f"{label:<7} {per_req_us:8.1f} us CPU / request")
+
+    print(f"questions={len(queries)} mismatches={mismatches} intended_changes={changed}")
+
+
+if __name__ == "__main__":
+    main()
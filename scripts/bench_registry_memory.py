@@ -0,0 +1,200 @@
+"""
+Memory benchmark for the schema registry at warehouse scale.
+
+    python -m scripts.bench_registry_memory [--tables 5000] [--cols 40] [--rel-tables 200]
+
+Loads a synthetic dictionary (default 5k tables x 40 columns = 200k columns)
+into the array-backed SchemaRegistry and into the previous dataclass layout,
+and reports traced Python allocations for each, including the derived search
+index. The relationship list pairs every two tables sharing a join key, so it
+grows with the square of the table count; it is built and traced for both
+layouts in a second run over the first --rel-tables tables.
+"""
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Any, Dict, List
+
+from app.core.schema_registry import SchemaRegistry, _canon
+
+COLUMN_NAMES = [
+    "GDS_CD", "GDS_NM", "StoreID", "BIZLOC_CD", "BIZLOC_NM", "SalesDate", "NetSale",
+    "GrossSale", "SoldQty", "Discount", "ActualCost", "PromotionID", "EVT_CD", "CATE_CD",
+    "CATE_NM", "BRAND_NM", "ReceiptNo", "StockQty", "StockAmt", "REG_DTM", "UPD_DTM",
+]
+DTYPES = ["String", "UInt32", "Int64", "Float64", "Date", "DateTime", "Decimal(18, 2)"]
+ATTRS = [
+    "Барааны код", "Барааны нэр", "Салбарын код", "Салбарын нэр", "Борлуулалтын огноо",
+    "Цэвэр борлуулалт", "Нийт борлуулалт", "Тоо ширхэг", "Хөнгөлөлт", "Өртөг",
+]
+
+
+def synthetic_rows(n_tables: int, n_cols: int, seed: int = 7) -> List[Dict[str, Any]]:
+    rnd = random.Random(seed)
+    rows = []
+    for i in range(n_tables):
+        cols = []
+        for j in range(n_cols):
+            base = COLUMN_NAMES[(i + j) % len(COLUMN_NAMES)]
+            # mostly shared names (as in the real warehouse) plus some unique ones
+            name = base if j < len(COLUMN_NAMES) else f"{base}_{j}"
+            cols.append((name, rnd.choice(DTYPES), rnd.choice(ATTRS)))
+        rows.append(
+            {
+                "db": "BI_DB",
+                "division": f"Division {i % 12}",
+                "table": f"Synthetic_{'Sales' if i % 5 == 0 else 'Dim'}_{i:05d}",
+                "entity": f"Synthetic entity {i % 50}",
+                "description": f"Synthetic table {i} for registry memory benchmark",
+                "columns": cols,
+            }
+        )
+    return rows
+
+
+# ---------------- previous layout, for comparison ----------------
+
+@dataclass
+class _LegacyColumn:
+    name: str
+    dtype: str
+    attr: str
+
+
+@dataclass
+class _LegacyTable:
+    db: str
+    division: str
+    table: str
+    entity: str
+    description: str
+    columns: List[_LegacyColumn]
+
+
+def load_legacy(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    # strings are copied as openpyxl hands out a fresh str per cell
+    tables = [
+        _LegacyTable(
+            db="".join(r["db"]),
+            division="".join(r["division"]),
+            table="".join(r["table"]),
+            entity="".join(r["entity"]),
+            description="".join(r["description"]),
+            columns=[_LegacyColumn("".join(n), "".join(d), "".join(a)) for n, d, a in r["columns"]],
+        )
+        for r in rows
+    ]
+    index = []
+    for t in tables:
+        blob = " ".join(
+            [t.db, t.division, t.table, t.entity, t.description]
+            + [c.name for c in t.columns]
+            + [c.attr for c in t.columns if c.attr]
+        ).lower()
+        index.append((blob, t))
+    return {"tables": tables, "index": index}
+
+
+def legacy_relationships(tables: List[_LegacyTable]) -> List[Dict[str, Any]]:
+    """Join-key pairs as the previous build_relationships() made them, one dict per pair (fixed entries left out)."""
+    join_canon = {
+        "product": {"gds_cd", "item_cd"},
+        "store": {"storeid", "store_id", "bizloc_cd", "org_cd", "store_no"},
+        "category": {"cate_cd"},
+        "receipt": {"receiptno"},
+        "promotion": {"promotionid", "evt_cd"},
+    }
+    tbl_cols = {
+        t.table: [{"name": c.name, "attr": (c.attr or "").lower(), "canon": _canon(c.name)} for c in t.columns]
+        for t in tables
+    }
+
+    rel: List[Dict[str, Any]] = []
+    for group, canon_set in join_canon.items():
+        occ = [(tbl, c["name"]) for tbl, cols in tbl_cols.items() for c in cols if c["canon"] in canon_set]
+        for i in range(len(occ)):
+            for j in range(i + 1, len(occ)):
+                lt, lc = occ[i]
+                rt, rc = occ[j]
+                if lt == rt:
+                    continue
+                rel.append(
+                    {
+                        "left": f"{lt}.{lc}",
+                        "right": f"{rt}.{rc}",
+                        "type": "join_key",
+                        "label": group,
+                        "score": 120 if lc == rc else 80,
+                    }
+                )
+
+    rel.sort(key=lambda x: x.get("score", 0), reverse=True)
+    dedup = []
+    seen = set()
+    for r in rel:
+        key = tuple(sorted([(k, str(v)) for k, v in r.items()]))
+        if key in seen:
+            continue
+        seen.add(key)
+        dedup.append(r)
+    return dedup
+
+
+def measure(label: str, fn) -> Any:
+    gc.collect()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    obj = fn()
+    took = time.perf_counter() - t0
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<28} retained={current / 2**20:8.1f} MiB  peak={peak / 2**20:8.1f} MiB  load={took:6.2f}s")
+    return obj
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tables", type=int, default=5000)
+    parser.add_argument("--cols", type=int, default=40)
+    parser.add_argument("--rel-tables", type=int, default=200)
+    args = parser.parse_args()
+
+    rows = synthetic_rows(args.tables, args.cols)
+    print(f"tables={args.tables} columns={args.tables * args.cols}")
+
+    def _legacy(rows: List[Dict[str, Any]], relationships: bool) -> Dict[str, Any]:
+        out = load_legacy(rows)
+        if relationships:
+            out["relationships"] = legacy_relationships(out["tables"])
+        return out
+
+    def _compact(rows: List[Dict[str, Any]], relationships: bool) -> SchemaRegistry:
+        reg = SchemaRegistry("")
+        reg.load_rows(rows)
+        if relationships:
+            reg.build_relationships()
+        return reg
+
+    measure("legacy dataclasses", lambda: _legacy(rows, False))
+    reg = measure("compact registry", lambda: _compact(rows, False))
+    print(f"distinct strings in pool: {len(reg.columns.strings)}")
+
+    t0 = time.perf_counter()
+    reg.search("sales netsale store", top_k=20)
+    print(f"search over {len(reg.tables)} tables: {(time.perf_counter() - t0) * 1000:.1f} ms")
+    del reg
+
+    rel_rows = rows[:args.rel_tables]
+    print(f"\nwith relationships, tables={len(rel_rows)}")
+    legacy = measure("legacy dataclasses", lambda: _legacy(rel_rows, True))
+    print(f"relationships: {len(legacy['relationships'])}")
+    del legacy
+    reg = measure("compact registry", lambda: _compact(rel_rows, True))
+    print(f"relationships: {len(reg.build_relationships())}")
+
+
+if __name__ == "__main__":
+    main()
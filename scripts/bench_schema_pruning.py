@@ -0,0 +1,97 @@
+"""
+Prompt-size / column-recall benchmark for query-relevant schema pruning.
+
+    python -m scripts.bench_schema_pruning [--cases tests/cases.json] [--history 500]
+
+For each question the planner's candidate tables are rendered twice: with
+every column described (previous behaviour) and pruned to the query. Reports
+estimated prompt tokens for both, and for recorded history rows that have
+generated SQL, the share of SQL-referenced columns still described in full.
+"""
+import argparse
+import json
+import re
+import statistics
+from typing import Any, Dict, List, Set
+
+from app.agents.planner import select_candidate_names
+from app.agents.text2sql.intents import normalize_query
+from app.core.schema_catalog import format_schema_for_prompt, registry
+from app.core.tokens import estimate_tokens
+
+
+def load_questions(cases_path: str, history_limit: int) -> List[Dict[str, Any]]:
+    items: List[Dict[str, Any]] = []
+
+    with open(cases_path, "r", encoding="utf-8") as f:
+        for case in json.load(f):
+            items.append({"query": case["input"], "sql": None, "source": "cases"})
+
+    if history_limit > 0:
+        from app.db.chat_history import fetch_chat_history
+
+        for row in fetch_chat_history(limit=history_limit):
+            if row.get("user_query"):
+                items.append({"query": row["user_query"], "sql": row.get("generated_sql"), "source": "history"})
+
+    return items
+
+
+def detailed_columns(prompt: str) -> Set[str]:
+    return set(re.findall(r"^- (\w+) \(", prompt, flags=re.MULTILINE))
+
+
+def referenced_columns(sql: str, table_names: List[str]) -> Set[str]:
+    idents = set(re.findall(r"\b[A-Za-z_]\w*\b", sql or ""))
+    cols: Set[str] = set()
+    for name in table_names:
+        t = registry.find_table(name)
+        if t:
+            cols.update(idents.intersection(t.columns.names()))
+    return cols
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cases", default="tests/cases.json")
+    parser.add_argument("--history", type=int, default=0, help="recorded questions to include (MySQL)")
+    args = parser.parse_args()
+
+    items = load_questions(args.cases, args.history)
+
+    full_tokens: List[int] = []
+    pruned_tokens: List[int] = []
+    recalls: List[float] = []
+
+    for item in items:
+        query = item["query"]
+        normalized = normalize_query(query)
+        candidates = registry.search(normalized, top_k=20) or registry.search(query, top_k=20)
+        names = select_candidate_names(query, candidates)
+
+        full = format_schema_for_prompt(names)
+        pruned = format_schema_for_prompt(names, query=f"{query} {normalized}")
+        full_tokens.append(estimate_tokens(full))
+        pruned_tokens.append(estimate_tokens(pruned))
+
+        if item["sql"]:
+            refs = referenced_columns(item["sql"], names)
+            if refs:
+                recalls.append(len(refs & detailed_columns(pruned)) / len(refs))
+
+    if not items:
+        print("no questions")
+        return
+
+    full_mean = statistics.mean(full_tokens)
+    pruned_mean = statistics.mean(pruned_tokens)
+    print(f"questions={len(items)} (with sql: {len(recalls)})")
+    print(f"schema_text tokens  full={full_mean:.0f}  pruned={pruned_mean:.0f}  "
+          f"reduction={(1 - pruned_mean / full_mean) * 100 if full_mean else 0:.1f}%")
+    print(f"max tokens          full={max(full_tokens)}  pruned={max(pruned_tokens)}")
+    if recalls:
+        print(f"referenced-column recall (described in full): {statistics.mean(recalls) * 100:.1f}%")
+
+
+if __name__ == "__main__":
+    main()
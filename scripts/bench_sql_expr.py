@@ -0,0 +1,90 @@
+"""
+Plan post-processing cost with the shared expression parser.
+
+    python -m scripts.bench_sql_expr [--cases tests/cases.json] [--history 500] [--rounds 20]
+
+Builds the deterministic skeleton plan of every sales question (metrics
+filled with net sales where the skeleton leaves them to the LLM) and times
+canonical repair + validation + SQL building per plan, with a cold
+expression cache (every string parsed) and a warm one (plan strings seen
+before, as with repeated questions in one worker).
+"""
+import argparse
+import copy
+import statistics
+import time
+from typing import Any, Dict, List, Tuple
+
+from app.agents.text2sql.intents import QueryContext
+from app.agents.text2sql.plan_skeleton import build_plan_skeleton, merge_skeleton
+from app.agents.text2sql.postprocess import repair_canonical_columns
+from app.agents.text2sql.query_router import classify_query_domain
+from app.agents.text2sql.registry_utils import build_allowed_tables, registry
+from app.agents.text2sql.sql_builder import build_sql_from_plan
+from app.agents.text2sql.sql_expr import parse_expr
+from app.agents.text2sql.validator import validate_and_repair_plan
+from app.config import CLICKHOUSE_DATABASE
+from scripts.bench_schema_pruning import load_questions
+
+
+def sample_plans(questions: List[str]) -> List[Tuple[QueryContext, Dict[str, Any], List[Any]]]:
+    out = []
+    for query in questions:
+        ctx = QueryContext.build(query)
+        if classify_query_domain(ctx)["domain"] != "sales":
+            continue
+        skeleton = build_plan_skeleton(ctx, "sales")
+        if skeleton is None:
+            continue
+        if not skeleton.complete:
+            skeleton = merge_skeleton(skeleton, {"metrics": [{"expr": "sum(f.NetSale)", "as": "total_net_sales"}]})
+            if skeleton is None:
+                continue
+        tables = [skeleton.plan["fact_table"]] + [j["table"] for j in skeleton.plan["joins"]]
+        candidates = [t for t in (registry.find_table(name) for name in tables) if t]
+        out.append((ctx, skeleton.plan, candidates))
+    return out
+
+
+def postprocess(ctx: QueryContext, plan: Dict[str, Any], candidates: List[Any]) -> str:
+    allowed = build_allowed_tables(candidates)
+    plan = repair_canonical_columns(copy.deepcopy(plan))
+    plan = validate_and_repair_plan(plan, candidates, allowed, ctx)
+    built = build_sql_from_plan(plan, allowed, plan["fact_table"], CLICKHOUSE_DATABASE)
+    return built.get("sql", "")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cases", default="tests/cases.json")
+    parser.add_argument("--history", type=int, default=0, help="recorded questions to include (MySQL)")
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    plans = sample_plans([item["query"] for item in load_questions(args.cases, args.history)])
+    if not plans:
+        print("no sales skeleton plans")
+        return
+
+    timings: Dict[str, List[float]] = {"cold": [], "warm": []}
+    for _ in range(args.rounds):
+        for ctx, plan, candidates in plans:
+            parse_expr.cache_clear()
+            t0 = time.perf_counter()
+            postprocess(ctx, plan, candidates)
+            timings["cold"].append((time.perf_counter() - t0) * 1e6)
+
+            t0 = time.perf_counter()
+            postprocess(ctx, plan, candidates)
+            timings["warm"].append((time.perf_counter() - t0) * 1e6)
+
+    print(f"plans={len(plans)} rounds={args.rounds}")
+    for mode, values in timings.items():
+        print(f"{mode:<5} mean={statistics.mean(values):.0f}us median={statistics.median(values):.0f}us")
+    print(f"parse cache={parse_expr.cache_info()}")
+    ctx, plan, candidates = plans[0]
+    print(f"\nexample ({ctx.raw}):\n{postprocess(ctx, plan, candidates)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Build the planner few-shot example file from recorded history.
+
+    python -m scripts.build_example_store [--history 20000] [--out PATH]
+
+Keeps text2sql rows answered by an LLM plan ("llm_plan") that executed
+without error and carry the plan in meta_json; the newest row wins per
+normalized question. The API loads the file on top of the built-in seed
+examples (app.agents.planner.planning_examples).
+"""
+import argparse
+import json
+
+from app.agents.planner import planning_examples
+from app.agents.text2sql.example_store import ExampleStore
+from app.config import EXAMPLE_STORE_PATH
+from app.db.chat_history import fetch_chat_history
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--history", type=int, default=20000)
+    parser.add_argument("--out", default=EXAMPLE_STORE_PATH)
+    args = parser.parse_args()
+
+    store = ExampleStore(max_entries=10 ** 9)
+    for ex in planning_examples():
+        store.add(ex["question"], ex["plan"], source="seed")
+
+    rows = fetch_chat_history(limit=args.history)
+    # oldest first, so newer plans replace older ones for the same question
+    for row in reversed(rows):
+        if row.get("rule_name") != "llm_plan" or row.get("error_code"):
+            continue
+        try:
+            meta = json.loads(row.get("meta_json") or "{}")
+        except ValueError:
+            continue
+        plan = meta.get("plan") if isinstance(meta, dict) else None
+        if isinstance(plan, dict) and plan.get("fact_table"):
+            store.add(row.get("user_query") or "", plan, source="history")
+
+    written = store.save(args.out, sources=("history",))
+    print(f"history_rows={len(rows)} examples={written} (+{len(planning_examples())} seed) -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Build the local semantic table/column index offline.
+
+    python -m scripts.build_semantic_index [--out PATH] [--query "borluulalt delguur"]
+
+Runs fully locally: reads the dictionary (plus the cached schema snapshot when
+schema sync is enabled) and writes a compressed NumPy archive that the API
+loads at boot instead of rebuilding.
+"""
+import argparse
+import time
+
+from app.config import SEMANTIC_INDEX_PATH
+from app.core.schema_sync import get_registry
+from app.core.semantic_index import SemanticIndex
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--out", default=SEMANTIC_INDEX_PATH)
+    parser.add_argument("--query", action="append", default=[])
+    args = parser.parse_args()
+
+    registry = get_registry()
+
+    t0 = time.perf_counter()
+    index = SemanticIndex.build(registry)
+    build_ms = (time.perf_counter() - t0) * 1000
+
+    index.save(args.out)
+    print(
+        f"tables={len(index.table_keys)} columns={len(index.column_keys)} "
+        f"nnz={len(index.table_csr[2]) + len(index.column_csr[2])} "
+        f"build_ms={build_ms:.1f} -> {args.out}"
+    )
+
+    for q in args.query:
+        t0 = time.perf_counter()
+        tables = index.search_tables(q, top_k=5)
+        columns = index.search_columns(q, top_k=5)
+        took_ms = (time.perf_counter() - t0) * 1000
+        print(f"\n{q!r} ({took_ms:.2f} ms)")
+        for key, score in tables:
+            print(f"  table  {score:.3f} {key}")
+        for key, score in columns:
+            print(f"  column {score:.3f} {key}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""
+DDL for the name-lookup dictionaries (NAME_DICTIONARIES_ENABLED).
+
+    python -m scripts.create_name_dictionaries [--source-db BI_DB] [--lifetime 300 900] [--apply]
+
+Prints one CREATE DICTIONARY per dimension in NAME_DICTIONARIES; --apply runs
+them against CLICKHOUSE_*. The dictionaries are created in
+NAME_DICTIONARY_DATABASE and read the dimension tables of --source-db with
+the server's default user; add USER / PASSWORD to the SOURCE clause by hand
+where access control requires it.
+"""
+import argparse
+
+from app.agents.text2sql.executor import ch_client
+from app.agents.text2sql.name_dictionaries import dictionary_ddl
+from app.config import CLICKHOUSE_DATABASE
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--source-db", default=CLICKHOUSE_DATABASE)
+    parser.add_argument("--lifetime", type=int, nargs=2, default=[300, 900], metavar=("MIN", "MAX"))
+    parser.add_argument("--apply", action="store_true", help="execute the DDL instead of printing it")
+    args = parser.parse_args()
+
+    statements = dictionary_ddl(args.source_db, tuple(args.lifetime))
+    if not args.apply:
+        print(";\n\n".join(statements) + ";")
+        return
+
+    client = ch_client()
+    for ddl in statements:
+        client.command(ddl)
+        print(ddl.splitlines()[0])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+"""
+Train the agent / domain intent classifier offline.
+
+    python -m scripts.train_intent_classifier [--cases tests/cases.json] [--history 20000]
+                                              [--heads agent,domain] [--rule-labels]
+                                              [--out PATH] [--dim 65536] [--epochs 300]
+
+Labels come from tests/cases.json (`expect_agent`, optional `expect_domain`)
+and recorded llm_chat_history rows:
+
+- agent: history rows are written by persist_result on the forced text2sql
+  path only, so their agent is the caller's choice, never the router's;
+  rows answered as out of domain count as "general".
+- domain: recorded domains come from the router itself, so they are only
+  used with --rule-labels, which also labels text2sql rows without one by
+  the keyword cascade. Domains the model predicted (reason intent_model)
+  are never used.
+
+The label sources are printed per head. With rule labels the holdout
+accuracy of "rules" is measured against rule output and says nothing
+about misroutes. A head in --heads with fewer than two labels is an
+error: tests/cases.json has no `expect_domain` yet, so the domain head
+needs --rule-labels (with --history) or `--heads agent`.
+
+A fifth of the questions (by hash) is held out to report accuracy of the
+model, the keyword rules, and model-with-rule-fallback at the serving
+threshold, plus inference latency. The final model is refit on everything
+and written as a NumPy archive.
+"""
+import argparse
+import json
+import statistics
+import time
+import zlib
+from collections import Counter
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+from app.agents.text2sql.intents import normalize_query
+from app.agents.text2sql.query_router import classify_query_domain_by_rules
+from app.config import INTENT_MIN_CONFIDENCE, INTENT_MODEL_PATH
+from app.core.intent_classifier import IntentClassifier, LinearHead, text_features
+from app.graph.nodes import classify_by_rules
+
+OUT_OF_DOMAIN_RULES = {"out_of_domain", "planner_out_of_domain"}
+
+Csr = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+# ======================================================
+# Labelled questions
+# ======================================================
+
+def load_examples(
+        cases_path: str,
+        history_limit: int,
+        rule_labels: bool,
+) -> Tuple[Dict[str, Dict[str, str]], Dict[str, Counter]]:
+    """(head -> {question: label}, head -> label source counts); earlier sources (cases, newest history) win."""
+    examples: Dict[str, Dict[str, str]] = {"agent": {}, "domain": {}}
+    sources: Dict[str, Counter] = {"agent": Counter(), "domain": Counter()}
+
+    def add(head: str, query: str, label: str, source: str) -> None:
+        query = (query or "").strip()
+        if query and label and label != "unknown" and query not in examples[head]:
+            examples[head][query] = label
+            sources[head][source] += 1
+
+    with open(cases_path, "r", encoding="utf-8") as f:
+        for case in json.load(f):
+            add("agent", case.get("input"), case.get("expect_agent"), "cases")
+            add("domain", case.get("input"), case.get("expect_domain"), "cases")
+
+    if history_limit > 0:
+        from app.db.chat_history import fetch_chat_history
+
+        for row in fetch_chat_history(limit=history_limit, agent_name=None):
+            query = row.get("user_query")
+            try:
+                meta = json.loads(row.get("meta_json") or "{}")
+            except ValueError:
+                meta = {}
+            if not isinstance(meta, dict):
+                meta = {}
+
+            agent = row.get("agent_name") or "text2sql"
+            if agent == "text2sql" and row.get("rule_name") in OUT_OF_DOMAIN_RULES:
+                add("agent", query, "general", "history_out_of_domain")
+                continue
+            add("agent", query, agent, "history_caller_agent")
+
+            if agent != "text2sql" or not rule_labels:
+                continue
+            domain = meta.get("domain") or {}
+            if domain.get("reason") == "intent_model":
+                continue
+            if domain.get("domain"):
+                add("domain", query, domain["domain"], "history_rule_domain")
+            else:
+                add("domain", query, classify_query_domain_by_rules(query)["domain"], "rule_cascade")
+
+    return examples, sources
+
+
+def to_csr(texts: List[str], dim: int) -> Csr:
+    rows = [text_features(t, dim) for t in texts]
+    indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(idx) for idx, _ in rows])
+    indices = np.concatenate([idx for idx, _ in rows]) if rows else np.empty(0, dtype=np.int64)
+    data = np.concatenate([val for _, val in rows]) if rows else np.empty(0, dtype=np.float32)
+    return indptr, indices, data
+
+
+# ======================================================
+# Softmax regression (full batch, Adam)
+# ======================================================
+
+def _logits(csr: Csr, weights: np.ndarray, bias: np.ndarray) -> np.ndarray:
+    indptr, indices, data = csr
+    # trailing zero row keeps reduceat valid for empty rows at the end
+    products = np.vstack([data[:, None] * weights[indices], np.zeros((1, weights.shape[1]), dtype=np.float32)])
+    z = np.add.reduceat(products, indptr[:-1], axis=0)
+    z[indptr[1:] == indptr[:-1]] = 0.0
+    return z + bias
+
+
+def _softmax(z: np.ndarray) -> np.ndarray:
+    z = np.exp(z - z.max(axis=1, keepdims=True))
+    return z / z.sum(axis=1, keepdims=True)
+
+
+def train_head(
+        csr: Csr,
+        y: np.ndarray,
+        labels: List[str],
+        dim: int,
+        epochs: int,
+        lr: float,
+        l2: float,
+) -> LinearHead:
+    indptr, indices, data = csr
+    n, c = len(y), len(labels)
+    rows = np.repeat(np.arange(n), np.diff(indptr))
+
+    # balanced class weights, so rare agents are not drowned out by text2sql
+    counts = np.bincount(y, minlength=c).astype(np.float32)
+    sample_w = (n / (c * np.maximum(counts, 1.0)))[y]
+    sample_w /= sample_w.sum()
+
+    onehot = np.zeros((n, c), dtype=np.float32)
+    onehot[np.arange(n), y] = 1.0
+
+    weights = np.zeros((dim, c), dtype=np.float32)
+    bias = np.zeros(c, dtype=np.float32)
+    m_w, v_w = np.zeros_like(weights), np.zeros_like(weights)
+    m_b, v_b = np.zeros_like(bias), np.zeros_like(bias)
+    beta1, beta2, eps = 0.9, 0.999, 1e-8
+
+    for t in range(1, epochs + 1):
+        g = (_softmax(_logits(csr, weights, bias)) - onehot) * sample_w[:, None]
+
+        grad_w = l2 * weights
+        np.add.at(grad_w, indices, data[:, None] * g[rows])
+        grad_b = g.sum(axis=0)
+
+        for param, grad, m, v in ((weights, grad_w, m_w, v_w), (bias, grad_b, m_b, v_b)):
+            m *= beta1
+            m += (1 - beta1) * grad
+            v *= beta2
+            v += (1 - beta2) * grad * grad
+            param -= lr * (m / (1 - beta1 ** t)) / (np.sqrt(v / (1 - beta2 ** t)) + eps)
+
+    return LinearHead(labels=labels, weights=weights, bias=bias)
+
+
+# ======================================================
+# Evaluation
+# ======================================================
+
+def is_holdout(text: str) -> bool:
+    return zlib.crc32(text.encode("utf-8")) % 5 == 0
+
+
+def evaluate(
+        head: LinearHead,
+        dim: int,
+        queries: List[str],
+        texts: List[str],
+        labels: List[str],
+        rule_fn: Callable[[str], str],
+        threshold: float,
+) -> Dict[str, float]:
+    """Model on normalized text vs the keyword rules on the raw question."""
+    model_ok = rule_ok = hybrid_ok = confident = confident_ok = 0
+    for query, text, gold in zip(queries, texts, labels):
+        pred, conf = head.predict(*text_features(text, dim))
+        rule = rule_fn(query)
+        model_ok += pred == gold
+        rule_ok += rule == gold
+        if conf >= threshold:
+            confident += 1
+            confident_ok += pred == gold
+            hybrid_ok += pred == gold
+        else:
+            hybrid_ok += rule == gold
+
+    n = max(len(texts), 1)
+    return {
+        "model": model_ok / n,
+        "rules": rule_ok / n,
+        "hybrid": hybrid_ok / n,
+        "coverage": confident / n,
+        "confident_acc": confident_ok / confident if confident else 0.0,
+    }
+
+
+def latency_us(model: IntentClassifier, head: str, texts: List[str], rounds: int = 5) -> Tuple[float, float]:
+    samples: List[float] = []
+    for _ in range(rounds):
+        for text in texts:
+            t0 = time.perf_counter()
+            model.predict(head, text)
+            samples.append((time.perf_counter() - t0) * 1e6)
+    samples.sort()
+    return statistics.mean(samples), samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+
+
+RULES: Dict[str, Callable[[str], str]] = {
+    "agent": lambda text: classify_by_rules(text).agent,
+    "domain": lambda text: classify_query_domain_by_rules(text)["domain"],
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cases", default="tests/cases.json")
+    parser.add_argument("--history", type=int, default=0, help="recorded questions to include (MySQL)")
+    parser.add_argument("--heads", default="agent,domain", help="heads that must be trained")
+    parser.add_argument("--rule-labels", action="store_true",
+                        help="label history domains by the keyword cascade (recorded or recomputed)")
+    parser.add_argument("--out", default=INTENT_MODEL_PATH)
+    parser.add_argument("--dim", type=int, default=65536)
+    parser.add_argument("--epochs", type=int, default=300)
+    parser.add_argument("--lr", type=float, default=0.05)
+    parser.add_argument("--l2", type=float, default=1e-4)
+    parser.add_argument("--threshold", type=float, default=INTENT_MIN_CONFIDENCE)
+    args = parser.parse_args()
+
+    wanted = [h.strip() for h in args.heads.split(",") if h.strip()]
+    unknown = [h for h in wanted if h not in RULES]
+    if not wanted or unknown:
+        parser.error(f"--heads: unknown head(s) {unknown}, expected some of {sorted(RULES)}")
+
+    examples, sources = load_examples(args.cases, args.history, args.rule_labels)
+    for name in wanted:
+        used = ", ".join(f"{k}={v}" for k, v in sorted(sources[name].items())) or "none"
+        print(f"[{name}] label sources: {used}")
+
+    for name in wanted:
+        labels = sorted(set(examples[name].values()))
+        if len(labels) < 2:
+            raise SystemExit(
+                f"[{name}] cannot train: {len(examples[name])} questions, labels={labels}; "
+                f"add labelled cases, use --history / --rule-labels, or leave it out of --heads"
+            )
+
+    heads: Dict[str, LinearHead] = {}
+    for name in wanted:
+        items = sorted(examples[name].items())
+        labels = sorted({label for _, label in items})
+
+        texts = [normalize_query(q) for q, _ in items]
+        gold = [label for _, label in items]
+        y = np.array([labels.index(label) for label in gold], dtype=np.int64)
+        hold = np.array([is_holdout(q) for q, _ in items])
+
+        print(f"\n[{name}] questions={len(items)} labels={labels} holdout={int(hold.sum())}")
+        if hold.any() and (~hold).any() and len(set(y[~hold])) > 1:
+            train_idx = np.flatnonzero(~hold)
+            t0 = time.perf_counter()
+            head = train_head(
+                to_csr([texts[i] for i in train_idx], args.dim), y[train_idx], labels,
+                args.dim, args.epochs, args.lr, args.l2,
+            )
+            train_s = time.perf_counter() - t0
+
+            hold_idx = np.flatnonzero(hold)
+            scores = evaluate(
+                head, args.dim,
+                [items[i][0] for i in hold_idx], [texts[i] for i in hold_idx], [gold[i] for i in hold_idx],
+                RULES[name], args.threshold,
+            )
+            print(
+                f"  holdout accuracy  model={scores['model'] * 100:.1f}%  rules={scores['rules'] * 100:.1f}%  "
+                f"model+fallback@{args.threshold}={scores['hybrid'] * 100:.1f}%"
+            )
+            if sources[name]["history_rule_domain"] or sources[name]["rule_cascade"]:
+                print("  (rule labels included: rules accuracy is measured against rule output)")
+            print(
+                f"  confident share={scores['coverage'] * 100:.1f}%  "
+                f"confident accuracy={scores['confident_acc'] * 100:.1f}%  train_s={train_s:.1f}"
+            )
+
+        heads[name] = train_head(to_csr(texts, args.dim), y, labels, args.dim, args.epochs, args.lr, args.l2)
+
+    model = IntentClassifier(dim=args.dim, heads=heads)
+    model.save(args.out)
+
+    for name in heads:
+        mean_us, p99_us = latency_us(model, name, [normalize_query(q) for q in examples[name]])
+        print(f"[{name}] inference mean={mean_us:.0f}us p99={p99_us:.0f}us")
+    print(f"-> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
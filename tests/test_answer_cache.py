@@ -0,0 +1,70 @@
+import pytest
+
+from app.agents.text2sql.answer_cache import AnswerCache, canonical_tokens, stem_variants
+from app.agents.text2sql.intents import QueryContext
+
+SQL = "SELECT 1"
+
+
+def cache(**kwargs) -> AnswerCache:
+    # the similarity floor is lowered so the stem check alone decides
+    opts = {"enabled": True, "similar": True, "min_similarity": 0.5, "audit_rate": 0.0}
+    return AnswerCache(**{**opts, **kwargs})
+
+
+def test_exact_match_ignores_order_and_filler():
+    c = cache(similar=False)
+    c.store(QueryContext.build("2025 оны нийт борлуулалт"), SQL, "llm_plan", 1)
+    hit = c.lookup(QueryContext.build("нийт борлуулалт 2025 он"), 1)
+    assert hit is not None and hit.match == "exact"
+
+
+def test_similar_matches_are_opt_in():
+    c = cache(similar=False)
+    c.store(QueryContext.build("2024 нийт борлуулалтын дүн"), SQL, "llm_plan", 1)
+    assert c.lookup(QueryContext.build("2024 нийт борлуулалтын дүнг"), 1) is None
+
+
+def test_stem_variant_is_a_similar_hit():
+    c = cache()
+    c.store(QueryContext.build("2024 нийт борлуулалтын дүн"), SQL, "llm_plan", 1)
+    hit = c.lookup(QueryContext.build("2024 нийт борлуулалтын дүнг"), 1)
+    assert hit is not None and hit.match == "similar"
+
+
+@pytest.mark.parametrize(
+    "stored, asked",
+    [
+        (
+            "show me the total net sales amount for all stores in 2024 excluding returns",
+            "show me the total net sales amount for all stores in 2024 including returns",
+        ),
+        (
+            "show me the total net sales amount for all stores in 2024 excluding promotions and returns",
+            "show me the total net sales amount for all stores in 2024 including promotions and returns",
+        ),
+        (
+            "2024 онд кока кола брэндийн бүх салбарын нийт борлуулалтын дүнг сараар харуулаач",
+            "2024 онд пепси брэндийн бүх салбарын нийт борлуулалтын дүнг сараар харуулаач",
+        ),
+        ("2024 оны хамгийн их борлуулалт", "2025 оны хамгийн их борлуулалт"),
+    ],
+)
+def test_different_questions_do_not_share_sql(stored, asked):
+    c = cache()
+    c.store(QueryContext.build(stored), SQL, "llm_plan", 1)
+    assert c.lookup(QueryContext.build(asked), 1) is None
+
+
+def test_stem_variants():
+    assert stem_variants("2024 borlu dun nit", "2024 borlu dung nit")
+    assert not stem_variants("exclu net retur", "inclu net retur")
+    assert not stem_variants("borlu", "borlu kola")
+
+
+def test_stale_version_is_dropped():
+    c = cache()
+    ctx = QueryContext.build("2025 оны нийт борлуулалт")
+    c.store(ctx, SQL, "llm_plan", 1)
+    assert c.lookup(ctx, 2) is None
+    assert canonical_tokens(ctx.normalized) == "2025 borlu nit"
@@ -0,0 +1,66 @@
+import time
+
+import pytest
+
+from app.agents.text2sql import approx
+from app.agents.text2sql.approx import ROWS_COLUMN, finish_approx, rewrite_approx
+
+SALES_BY_PRODUCT = """
+SELECT
+  f.GDS_CD AS product,
+  sum(f.NetSale) AS total_net_sales,
+  avg(f.NetSale) AS avg_net_sale
+FROM BI_DB.Cluster_Main_Sales f
+WHERE toYear(f.SalesDate) = {year:UInt16}
+GROUP BY f.GDS_CD
+ORDER BY total_net_sales DESC
+LIMIT 10
+""".strip()
+
+
+@pytest.fixture(autouse=True)
+def sampling_keys(monkeypatch):
+    monkeypatch.setattr(approx, "_sampling_keys", {"BI_DB.Cluster_Main_Sales": "intHash32(ReceiptNo)"})
+    monkeypatch.setattr(approx, "_sampling_keys_loaded_at", time.monotonic())
+
+
+def test_sum_is_sampled_and_scaled():
+    sql, plan = rewrite_approx(SALES_BY_PRODUCT, 0.1)
+    assert plan.sample == 0.1
+    assert "FROM BI_DB.Cluster_Main_Sales f SAMPLE 0.1" in sql
+    assert "(sum(f.NetSale) * 10) AS total_net_sales" in sql
+    assert "avg(f.NetSale) AS avg_net_sale" in sql
+    assert f"count() AS {ROWS_COLUMN}" in sql
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        SALES_BY_PRODUCT.replace("avg(f.NetSale)", "max(f.NetSale)"),
+        SALES_BY_PRODUCT.replace("SELECT", "SELECT DISTINCT"),
+        SALES_BY_PRODUCT.replace("Cluster_Main_Sales f", "Dimension_IM f"),
+        SALES_BY_PRODUCT.replace("LIMIT 10", "HAVING total_net_sales > 0 LIMIT 10"),
+    ],
+)
+def test_other_shapes_not_sampled(sql):
+    out, plan = rewrite_approx(sql, 0.1)
+    assert plan.sample is None and out == sql
+
+
+def test_exact_functions_become_approximate():
+    sql, plan = rewrite_approx(
+        "SELECT count(DISTINCT f.ReceiptNo) AS receipts, quantileExact(0.9)(f.NetSale) AS p90 "
+        "FROM BI_DB.Dimension_IM f",
+        0.1,
+    )
+    assert sql == "SELECT uniq(f.ReceiptNo) AS receipts, quantileTDigest(0.9)(f.NetSale) AS p90 FROM BI_DB.Dimension_IM f"
+    assert plan.functions == ["uniq", "quantileTDigest"] and plan.sample is None
+
+
+def test_finish_drops_rows_column_and_bounds_error():
+    _, plan = rewrite_approx(SALES_BY_PRODUCT, 0.1)
+    data = {"columns": ["product", "total", ROWS_COLUMN], "rows": [("a", 100.0, 400), ("b", 50.0, 250)]}
+    out, meta = finish_approx(data, plan)
+    assert out["columns"] == ["product", "total"] and out["rows"] == [("a", 100.0), ("b", 50.0)]
+    assert meta["sampled_rows_min"] == 250
+    assert 0.1 < meta["error_bound"]["relative"] < 0.2
@@ -0,0 +1,49 @@
+from datetime import date
+
+import pytest
+
+from app.agents.text2sql.date_parser import parse_date_range
+
+TODAY = date(2026, 10, 19)
+
+
+@pytest.mark.parametrize(
+    "text, start, end, grain",
+    [
+        ("өнгөрсөн сар", date(2026, 9, 1), date(2026, 10, 1), "month"),
+        ("last month", date(2026, 9, 1), date(2026, 10, 1), "month"),
+        ("сүүлийн 30 хоног", date(2026, 9, 20), date(2026, 10, 20), "custom"),
+        ("сүүлийн гучин хоног", date(2026, 9, 20), date(2026, 10, 20), "custom"),
+        ("энэ оны эхнээс", date(2026, 1, 1), date(2026, 10, 20), "custom"),
+        ("2024 оны 3-5 сар", date(2024, 3, 1), date(2024, 6, 1), "custom"),
+        ("last week", date(2026, 10, 12), date(2026, 10, 19), "week"),
+        ("2024 оны 2-р улирлын", date(2024, 4, 1), date(2024, 7, 1), "quarter"),
+        ("may 2024", date(2024, 5, 1), date(2024, 6, 1), "month"),
+        ("2024 dec", date(2024, 12, 1), date(2025, 1, 1), "month"),
+        ("sales in march", date(2026, 3, 1), date(2026, 4, 1), "month"),
+        ("december month sales", date(2025, 12, 1), date(2026, 1, 1), "month"),
+    ],
+)
+def test_expressions(text, start, end, grain):
+    r = parse_date_range(text, today=TODAY)
+    assert r is not None
+    assert (r.start, r.end, r.grain) == (start, end, grain)
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "may i see the sales",
+        "sales by brand may i",
+        "total sales dec",
+        "борлуулалт jan",
+        "sales in may",
+        "march the sales report",
+    ],
+)
+def test_month_words_without_a_cue(text):
+    assert parse_date_range(text, today=TODAY) is None
+
+
+def test_two_years_are_a_comparison():
+    assert parse_date_range("2023 vs 2024 sales", today=TODAY) is None
@@ -0,0 +1,59 @@
+import pytest
+
+from app.agents.text2sql.dimension_cache import DIMENSIONS, DimensionCache, DimensionNames
+
+JOIN = "LEFT JOIN BI_DB.Dimension_IM d1 ON f.GDS_CD = d1.GDS_CD"
+
+
+@pytest.fixture
+def cache():
+    c = DimensionCache(DIMENSIONS)
+    c.tables["Dimension_IM"] = DimensionNames([("1", "Cola"), ("2", "Pepsi"), ("1", "dup"), (3, None)])
+    return c
+
+
+def test_dimension_names():
+    names = DimensionNames([("1", "Cola"), ("2", ""), ("1", "dup"), (3, None)])
+    assert len(names) == 3
+    assert (names.name("1"), names.name("2"), names.name(3), names.name("9")) == ("Cola", "", "", None)
+
+
+def test_name_join_runs_code_only(cache):
+    sql = (
+        "SELECT d1.GDS_NM AS product_name, sum(f.NetSale) AS total FROM BI_DB.Cluster_Main_Sales f "
+        f"{JOIN} GROUP BY d1.GDS_NM ORDER BY total DESC LIMIT 10"
+    )
+    assert cache.rewrite(sql) == (
+        "SELECT f.GDS_CD AS product_name, sum(f.NetSale) AS total FROM BI_DB.Cluster_Main_Sales f "
+        "GROUP BY f.GDS_CD ORDER BY total DESC LIMIT 10",
+        {"product_name": "Dimension_IM"},
+    )
+
+
+def test_selected_code_is_named(cache):
+    assert cache.rewrite("SELECT f.GDS_CD AS product_name FROM t f") == (
+        "SELECT f.GDS_CD AS product_name FROM t f",
+        {"product_name": "Dimension_IM"},
+    )
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        f"SELECT d1.GDS_NM AS product_name FROM t f {JOIN} ORDER BY d1.GDS_NM",
+        f"SELECT d1.GDS_NM AS product_name FROM t f {JOIN} WHERE d1.GDS_NM = 'Cola'",
+        f"SELECT d1.GDS_NM FROM t f {JOIN}",
+        # not loaded
+        "SELECT d2.BIZLOC_NM AS store_name FROM t f LEFT JOIN BI_DB.Dimension_SM d2 ON f.BIZLOC_CD = d2.BIZLOC_CD",
+    ],
+)
+def test_joins_that_need_names_stay(cache, sql):
+    assert cache.rewrite(sql) == (sql, {})
+
+
+def test_attach_names(cache):
+    data = {"columns": ["product_name", "total"], "rows": [("1", 5), ("2", 4), ("9", 1)]}
+    named = cache.attach_names(data, {"product_name": "Dimension_IM", "store_name": "Dimension_SM"})
+    assert named["rows"] == [("Cola", 5), ("Pepsi", 4), ("", 1)]
+    assert data["rows"][0] == ("1", 5)
+    assert cache.stats["misses"] == 1
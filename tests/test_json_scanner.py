@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+from app.core.llm_client import JsonObjectScanner
+
+PLAN = '{"fact_table": "Cluster_Main_Sales", "where": ["f.Note = \'a {b}\'"], "say": "he said \\"}\\" \\\\"}'
+
+
+def scan(chunks):
+    scanner = JsonObjectScanner()
+    end = None
+    for chunk in chunks:
+        end = scanner.feed(chunk)
+    return end, scanner.value()
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, len(PLAN)])
+def test_object_end_across_chunk_sizes(size):
+    text = "Here is the plan:\n" + PLAN + "\n\nHope this helps {not json}"
+    end, value = scan([text[i:i + size] for i in range(0, len(text), size)])
+    assert end == len("Here is the plan:\n" + PLAN)
+    assert json.loads(value[value.index("{"):]) == json.loads(PLAN)
+
+
+def test_escaped_quote_split_between_chunks():
+    end, value = scan(['{"a": "x\\', '"}', '"}', " tail"])
+    assert end is not None and value == '{"a": "x\\"}"}'
+
+
+def test_escaped_backslash_before_closing_quote():
+    end, value = scan(['{"a": "x\\\\', '"', "}", "}"])
+    assert value == '{"a": "x\\\\"}'
+
+
+def test_incomplete_object_has_no_end():
+    end, value = scan(['{"a": {"b": 1}', ', "c": "}"'])
+    assert end is None and value == '{"a": {"b": 1}, "c": "}"'
+
+
+def test_feed_after_end_keeps_first_object():
+    scanner = JsonObjectScanner()
+    assert scanner.feed('{"a": 1}') == 8
+    assert scanner.feed('{"b": 2}') == 8
+    assert scanner.value() == '{"a": 1}'
+
+
+def test_quotes_before_the_object_are_prose():
+    end, value = scan(['He said "ok" then ', '{"a": "}"}'])
+    assert value.endswith('{"a": "}"}') and end == len(value)
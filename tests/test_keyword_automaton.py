@@ -0,0 +1,60 @@
+import random
+
+import pytest
+
+import app.agents.text2sql.hard_rules  # noqa: F401  registers rules.* vocabularies
+import app.agents.text2sql.intents  # noqa: F401  registers intent.* vocabularies
+from app.agents.text2sql.keyword_automaton import KEYWORDS, KeywordAutomaton, text_has
+
+QUESTIONS = [
+    "2024 оны нийт борлуулалт",
+    "өнгөрсөн сарын топ 10 дэлгүүр",
+    "2024 онд most борлуулалттай 10 дэлгүүр",
+    "average basket size by store last month",
+    "кока кола брэндийн сарын борлуулалт",
+    "хамгийн бага борлуулалттай салбар",
+    "cu520 салбарын өнөөдрийн орлого",
+    "show goods sold last quarter",
+    "",
+]
+
+
+def has_any(text, words):
+    return any(k in text for k in words)
+
+
+@pytest.mark.parametrize("text", QUESTIONS)
+def test_scan_matches_has_any_for_every_vocabulary(text):
+    mask = KEYWORDS.scan(text)
+    assert KEYWORDS._lists
+    for name, words in KEYWORDS._lists.items():
+        assert bool(mask & KEYWORDS.bit_of(words)) == has_any(text, words), name
+        assert text_has(text, words) == has_any(text, words)
+
+
+def test_overlapping_keywords_randomized():
+    rng = random.Random(7)
+    vocabularies = {f"v{i}": ["".join(rng.choice("abc") for _ in range(rng.randint(1, 4))) for _ in range(3)] for i in range(12)}
+    automaton = KeywordAutomaton()
+    for name, words in vocabularies.items():
+        automaton.register(name, words)
+    automaton.compile()
+
+    for _ in range(300):
+        text = "".join(rng.choice("abcd") for _ in range(rng.randint(0, 12)))
+        mask = automaton._scan(text)
+        for name, words in vocabularies.items():
+            assert bool(mask & automaton.bit(name)) == has_any(text, words), (text, name)
+
+
+def test_reregistering_recompiles():
+    automaton = KeywordAutomaton()
+    automaton.register("x", ["foo"])
+    automaton.compile()
+    generation = automaton.generation
+    assert automaton._scan("food") == automaton.bit("x")
+
+    automaton.register("x", ["bar", ""])
+    automaton.compile()
+    assert automaton.generation == generation + 1
+    assert automaton._scan("food") == 0 and automaton._scan("rebar") == automaton.bit("x")
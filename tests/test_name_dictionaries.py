@@ -0,0 +1,50 @@
+import pytest
+
+from app.agents.text2sql.name_dictionaries import dictionary_ddl, rewrite_name_joins
+
+PRODUCT_NAME = "dictGet('BI_DB.dict_product_name', 'GDS_NM', tuple(toString(f.GDS_CD)))"
+
+
+def test_name_only_join_becomes_dict_get():
+    sql = (
+        "SELECT d1.GDS_NM AS product_name, sum(f.NetSale) AS total FROM BI_DB.Cluster_Main_Sales f "
+        "LEFT JOIN BI_DB.Dimension_IM d1 ON f.GDS_CD = d1.GDS_CD GROUP BY d1.GDS_NM ORDER BY total DESC LIMIT 10"
+    )
+    assert rewrite_name_joins(sql) == (
+        f"SELECT {PRODUCT_NAME} AS product_name, sum(f.NetSale) AS total FROM BI_DB.Cluster_Main_Sales f "
+        f"GROUP BY {PRODUCT_NAME} ORDER BY total DESC LIMIT 10"
+    )
+
+
+def test_key_column_and_several_joins():
+    sql = (
+        "SELECT d1.GDS_CD, d2.BIZLOC_NM FROM t f "
+        "LEFT JOIN BI_DB.Dimension_IM d1 ON d1.GDS_CD = f.GDS_CD "
+        "LEFT JOIN BI_DB.Dimension_SM d2 ON f.BIZLOC_CD = d2.BIZLOC_CD"
+    )
+    assert rewrite_name_joins(sql) == (
+        "SELECT if(dictHas('BI_DB.dict_product_name', tuple(toString(f.GDS_CD))), toString(f.GDS_CD), ''), "
+        "dictGet('BI_DB.dict_store_name', 'BIZLOC_NM', tuple(toString(f.BIZLOC_CD))) FROM t f"
+    )
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        # alias read for a column the dictionary does not hold
+        "SELECT d1.GDS_NM FROM t f LEFT JOIN BI_DB.Dimension_IM d1 ON f.GDS_CD = d1.GDS_CD WHERE d1.Other = 1",
+        "SELECT d1.GDS_NM FROM t f INNER JOIN BI_DB.Dimension_IM d1 ON f.GDS_CD = d1.GDS_CD",
+        "SELECT d1.GDS_NM FROM t f LEFT JOIN BI_DB.Dimension_IM d1 ON f.GDS_CD = d1.GDS_CD AND d1.X = 1",
+        "SELECT d1.EVT_NM FROM t f LEFT JOIN BI_DB.Dimension_LEM d1 ON f.EVT_CD = d1.EVT_CD",
+        "SELECT 1 FROM (",
+    ],
+)
+def test_other_joins_are_left_alone(sql):
+    assert rewrite_name_joins(sql) == sql
+
+
+def test_dictionary_ddl_uses_complex_keys():
+    ddl = dictionary_ddl(source_db="SRC")
+    assert len(ddl) == 2
+    assert "PRIMARY KEY GDS_CD" in ddl[0] and "SOURCE(CLICKHOUSE(DB 'SRC' TABLE 'Dimension_IM'))" in ddl[0]
+    assert all(s.endswith("LAYOUT(COMPLEX_KEY_HASHED())") for s in ddl)
@@ -0,0 +1,65 @@
+from app.agents.text2sql.intents import QueryContext
+from app.agents.text2sql.plan_cache import (
+    PlanCache,
+    derived_slots,
+    instantiate,
+    plan_template,
+    question_template,
+)
+
+TOP_STORES = {
+    "fact_table": "Cluster_Main_Sales",
+    "where": ["f.SalesDate >= '2024-01-01'", "f.SalesDate < '2025-01-01'"],
+    "order_by": ["total DESC"],
+    "limit": 10,
+}
+
+
+def cache() -> PlanCache:
+    return PlanCache(enabled=True, ttl_seconds=0)
+
+
+def test_question_template_slots():
+    assert question_template("2024 оны топ 10 дэлгүүр") == ("{y0} оны топ {n1} дэлгүүр", {"y0": "2024", "n1": "10"})
+    assert question_template("cu520 2024 2024") == ("{c0} {y1} {y1}", {"c0": "cu520", "y1": "2024"})
+
+
+def test_template_round_trip():
+    ctx = QueryContext.build("2024 оны топ 10 дэлгүүр")
+    _, slots = question_template(ctx.normalized)
+    derived = derived_slots(ctx)
+    template = plan_template(TOP_STORES, slots, derived)
+    assert "2024" not in template and "§n1§" in template
+    assert instantiate(template, slots, derived) == TOP_STORES
+
+
+def test_store_code_keeps_its_case():
+    plan = {"where": ["f.StoreID = 'CU520'"], "note": "cu520"}
+    template = plan_template(plan, {"c0": "cu520"}, {})
+    assert instantiate(template, {"c0": "cu777"}, {}) == {"where": ["f.StoreID = 'CU777'"], "note": "cu777"}
+
+
+def test_small_numbers_only_in_value_positions():
+    template = plan_template({"where": ["toQuarter(f.SalesDate) = 2"], "limit": 2}, {"n0": "2"}, {})
+    assert instantiate(template, {"n0": "3"}, {}) == {"where": ["toQuarter(f.SalesDate) = 3"], "limit": 3}
+    # the same digits elsewhere make the plan unsafe to replay
+    assert plan_template({"select": ["round(sum(f.NetSale), 2)"], "limit": 2}, {"n0": "2"}, {}) is None
+
+
+def test_leftover_literal_is_not_cacheable():
+    plan = {"where": ["toYYYYMM(f.SalesDate) = 202403"]}
+    assert plan_template(plan, {"y0": "2024", "n1": "3"}, {}) is None
+
+
+def test_missing_slot_does_not_instantiate():
+    template = plan_template(TOP_STORES, {"y0": "2024"}, derived_slots(QueryContext.build("2024 оны топ 10 дэлгүүр")))
+    assert instantiate(template, {"y0": "2025"}, {}) is None
+
+
+def test_cached_plan_follows_new_literals():
+    c = cache()
+    assert c.store(QueryContext.build("2024 оны топ 10 дэлгүүр"), TOP_STORES, 1)
+    plan = c.lookup(QueryContext.build("2025 оны топ 5 дэлгүүр"), 1)
+    assert plan["limit"] == 5
+    assert plan["where"] == ["f.SalesDate >= '2025-01-01'", "f.SalesDate < '2026-01-01'"]
+    assert c.lookup(QueryContext.build("2025 оны топ 5 дэлгүүр"), 2) is None
@@ -0,0 +1,70 @@
+from collections import OrderedDict
+
+import pytest
+
+from app.agents.text2sql import executor
+from app.agents.text2sql.executor import preflight_sql, sql_fingerprint
+
+UNKNOWN_COLUMN = "Code: 47. DB::Exception: Missing columns: 'Foo'. (UNKNOWN_IDENTIFIER)"
+BAD_LITERAL = "Code: 43. DB::Exception: Illegal types of arguments. (ILLEGAL_TYPE_OF_ARGUMENT)"
+
+
+class FakeClient:
+    def __init__(self, errors):
+        self.errors = errors
+        self.queries = []
+
+    def query(self, sql, parameters=None):
+        self.queries.append(sql)
+        for needle, error in self.errors.items():
+            if needle in sql:
+                raise Exception(error)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    fake = FakeClient({})
+    monkeypatch.setattr(executor, "SQL_PREFLIGHT", "syntax")
+    monkeypatch.setattr(executor, "ch_client", lambda: fake)
+    monkeypatch.setattr(executor, "_preflight_cache", OrderedDict())
+    monkeypatch.setattr(executor, "_preflight_version", 0)
+    monkeypatch.setattr(executor, "registry_version", lambda: 0)
+    return fake
+
+
+def test_fingerprint_keeps_literal_kinds():
+    assert sql_fingerprint("SELECT 1 WHERE StoreID = 'cu520'") != sql_fingerprint("SELECT 1 WHERE StoreID = 520")
+    assert sql_fingerprint("SELECT 1 WHERE StoreID = 'cu520'") == sql_fingerprint("SELECT 1  WHERE StoreID = 'x'")
+    assert sql_fingerprint("WHERE y = {year:UInt16}") == "WHERE y = {year:UInt16}"
+
+
+def test_structural_error_is_cached_per_shape(client):
+    client.errors["Foo"] = UNKNOWN_COLUMN
+    assert preflight_sql("SELECT Foo FROM t WHERE x = 1") == UNKNOWN_COLUMN
+    assert preflight_sql("SELECT Foo FROM t WHERE x = 2") == UNKNOWN_COLUMN
+    assert len(client.queries) == 1
+
+
+def test_literal_type_error_is_not_cached(client):
+    client.errors["'cu520'"] = BAD_LITERAL
+    assert preflight_sql("SELECT 1 FROM t WHERE StoreID = 'cu520'") == BAD_LITERAL
+    assert preflight_sql("SELECT 1 FROM t WHERE StoreID = 520") is None
+    assert preflight_sql("SELECT 1 FROM t WHERE StoreID = 'cu520'") == BAD_LITERAL
+    assert len(client.queries) == 3
+
+
+def test_schema_change_clears_verdicts(client, monkeypatch):
+    client.errors["Foo"] = UNKNOWN_COLUMN
+    assert preflight_sql("SELECT Foo FROM t") == UNKNOWN_COLUMN
+
+    del client.errors["Foo"]
+    monkeypatch.setattr(executor, "registry_version", lambda: 1)
+    assert preflight_sql("SELECT Foo FROM t") is None
+    assert len(client.queries) == 2
+
+
+def test_unavailable_check_is_not_a_verdict(client):
+    client.errors["SELECT"] = "Code: 159. DB::Exception: Timeout exceeded. (TIMEOUT_EXCEEDED)"
+    assert preflight_sql("SELECT 1 FROM t") is None
+    assert preflight_sql("SELECT 1 FROM t") is None
+    assert len(client.queries) == 2
@@ -0,0 +1,73 @@
+import pytest
+
+from app.agents.text2sql.hard_rules import run_hard_sql_rules
+from app.agents.text2sql.intents import QueryContext, normalize_query_with_corrections
+from app.agents.text2sql.spelling import SymSpellIndex, fold, split_letter_digits
+
+
+def corrected(question: str):
+    return [(c.source, c.target, c.kind) for c in normalize_query_with_corrections(question)[1]]
+
+
+def test_fold_merges_scripts_and_doubled_letters():
+    assert fold("borluulaltiin") == fold("борлуулалтын") == fold("борлулалтын")
+
+
+def test_split_letter_digits():
+    assert split_letter_digits("borluulalt2025") == ["borluulalt", "2025"]
+    assert split_letter_digits("q1") == ["q1"]
+    assert split_letter_digits("cu012") == ["cu012"]
+
+
+@pytest.mark.parametrize(
+    "question, fix",
+    [
+        ("salbariin borluulalt", ("salbariin", "салбарын", "transliteration")),
+        ("борлуулат 2024", ("борлуулат", "борлуулалт", "spelling")),
+        ("дэлгүрийн борлуулалт", ("дэлгүрийн", "дэлгүүрийн", "spelling")),
+        ("borluulalt2025 niit", ("borluulalt2025", "borluulalt 2025", "split")),
+    ],
+)
+def test_corrections(question, fix):
+    assert fix in corrected(question)
+
+
+@pytest.mark.parametrize(
+    "question",
+    [
+        "show goods sold last month",
+        "which stores had the highest sales",
+        "2024 onii niit borluulalt",
+        "customer orders",
+    ],
+)
+def test_known_and_short_words_are_not_corrected(question):
+    assert [c for c in corrected(question) if c[2] != "split"] == []
+
+
+def test_ambiguous_candidates_are_left_alone():
+    assert SymSpellIndex(["салбарын", "салбурын"]).correct("салбрын") is None
+    assert SymSpellIndex(["салбарын", "салбарын", "салбурын"]).correct("салбрын") == ("салбарын", 1)
+
+
+def test_raw_text_is_not_rewritten():
+    ctx = QueryContext.build("2024 onii niit borluulalt")
+    assert ctx.lowered == "2024 onii niit borluulalt"
+    assert ctx.normalized == "2024 оны нийт борлуулалт"
+    assert QueryContext.build("borluulalt2025 niit").years == (2025,)
+
+
+@pytest.mark.parametrize(
+    "question, rule",
+    [
+        ("2024 onii niit borluulalt", "total_sales"),
+        ("2024 niit orlogo", "total_sales_year_only"),
+        ("2024 онд most борлуулалттай 10 дэлгүүр", "top_n_store_sales"),
+        ("2024 highest борлуулалттай 5 салбар", "top_store_sales"),
+        ("2024 оны worst салбар борлуулалт", "bottom_store_sales"),
+        ("2024 lowest store sales", "bottom_store_sales"),
+    ],
+)
+def test_routing_matches_uncorrected_rules(question, rule):
+    matched = run_hard_sql_rules(QueryContext.build(question))
+    assert matched and matched[0] == rule
@@ -0,0 +1,107 @@
+import pytest
+
+from app.agents.text2sql.executor import normalize_sql
+from app.agents.text2sql.sql_expr import (
+    Call,
+    Ident,
+    Literal,
+    Word,
+    bare_identifiers,
+    column_refs,
+    parse_expr,
+    render,
+    render_text,
+    rewrite,
+    select_clauses,
+    split_top_level,
+    strip_ordering,
+    tokenize,
+)
+
+
+def test_tokenize_is_lossless():
+    sql = "SELECT sum(f.NetSale) AS s, 'it''s' FROM t WHERE y = {year:UInt16} AND x::Int32 >= 1.5e3"
+    tokens = tokenize(sql)
+    assert "".join(t.text for t in tokens) == sql
+    kinds = {t.text: t.kind for t in tokens}
+    assert kinds["'it''s'"] == "string"
+    assert kinds["{year:UInt16}"] == "param"
+    assert kinds["f.NetSale"] == "ident"
+    assert kinds["1.5e3"] == "number"
+    assert kinds["::"] == "op"
+
+
+def test_parse_expr_tree():
+    expr = parse_expr("toYear(f.SalesDate) = 2024 AND f.StoreID IN ('CU520', 'CU521')")
+    assert isinstance(expr.nodes[0], Call) and expr.nodes[0].name == "toYear"
+    assert Literal("2024") in expr.nodes
+    assert Word("AND") in expr.nodes and Word("IN") in expr.nodes
+    assert column_refs(expr) == [("f", "SalesDate"), ("f", "StoreID")]
+
+
+@pytest.mark.parametrize("text", ["sum(f.NetSale", "a)", "x ; y", ""])
+def test_unparseable_text_is_none(text):
+    assert parse_expr(text) is None
+
+
+def test_bare_identifiers_skip_aliases_and_types():
+    expr = parse_expr("sum(NetSale) AS total_net_sales")
+    assert bare_identifiers(expr) == ["NetSale"]
+    assert bare_identifiers(parse_expr("x::Int32")) == ["x"]
+
+
+def test_rewrite_only_touches_identifiers():
+    expr = parse_expr("f.GDS_CD = 'f.GDS_CD' AND f.GDS_CD_OLD = 1")
+    out = rewrite(expr, lambda i: Ident(("f", "GoodsID")) if i.text == "f.GDS_CD" else i)
+    assert render(out) == "f.GoodsID = 'f.GDS_CD' AND f.GDS_CD_OLD = 1"
+
+
+def test_render_text_canonical_and_fallback():
+    assert render_text("sum( f.NetSale )  DESC") == "sum(f.NetSale) DESC"
+    assert render_text("x::Int32") == "x::Int32"
+    assert render_text("sum(") == "sum("
+
+
+def test_strip_ordering():
+    expr, direction = strip_ordering(parse_expr("total DESC NULLS LAST"))
+    assert render(expr) == "total" and direction == "DESC"
+
+
+def test_split_top_level_and_select_clauses():
+    assert split_top_level("a, if(b, c, d) AS x, [1, 2]") == ["a", "if(b, c, d) AS x", "[1, 2]"]
+    clauses = select_clauses("SELECT a, b FROM t f LEFT JOIN d ON f.x = d.x WHERE a > 1 GROUP BY a ORDER BY b LIMIT 5")
+    assert clauses == {
+        "select": "a, b", "from": "t f", "join": "d ON f.x = d.x", "where": "a > 1",
+        "group": "a", "order": "b", "limit": "5",
+    }
+    assert select_clauses("SELECT a FROM t UNION ALL SELECT a FROM u") is None
+    assert select_clauses("SELECT a FROM (SELECT a FROM t) WHERE a > 1")["from"] == "(SELECT a FROM t)"
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "DROP TABLE t",
+        "SELECT 1; DELETE FROM t",
+        "ALTER TABLE t DELETE WHERE 1",
+    ],
+)
+def test_normalize_sql_rejects_statements(sql):
+    with pytest.raises(ValueError):
+        normalize_sql(sql)
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "SELECT 'drop table' AS note FROM t",
+        "SELECT LastUpdated, DeletedFlag FROM t",
+    ],
+)
+def test_normalize_sql_allows_forbidden_words_in_literals_and_names(sql):
+    assert normalize_sql(sql) == sql
+
+
+def test_normalize_sql_rewrites_date_functions():
+    assert normalize_sql("SELECT CURRENT_DATE, NOW() FROM t;") == "SELECT today(), now() FROM t"
+    assert normalize_sql("SELECT now_col FROM t") == "SELECT now_col FROM t"
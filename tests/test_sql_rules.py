@@ -0,0 +1,147 @@
+import json
+
+import pytest
+
+from app.agents.text2sql.hard_rules import CANONICAL_TABLES, active_hard_rules, run_hard_sql_rules
+from app.agents.text2sql.intents import QueryContext
+from app.agents.text2sql.keyword_automaton import KEYWORDS
+from app.agents.text2sql.rule_templates import TemplateRuleSet
+
+
+def matched_rule(question: str):
+    matched = run_hard_sql_rules(QueryContext.build(question))
+    return matched and matched[0]
+
+
+# =========================================================
+# Dispatch
+# =========================================================
+
+@pytest.mark.parametrize(
+    "question",
+    [
+        "2024 оны нийт борлуулалт",
+        "2024 onii niit borluulalt",
+        "2024 онд most борлуулалттай 10 дэлгүүр",
+        "2024 оны worst салбар борлуулалт",
+        "2023 болон 2024 оны 1-р улирлын борлуулалт харьцуулах",
+        "2024 оны сар бүрийн борлуулалт",
+        "хамгийн их зарагдсан барааны нэр",
+        "үлдэгдэл барааны нэртэй",
+        "өнгөрсөн сарын борлуулалт",
+        "дэлгүүрүүдийн жагсаалт",
+        "цаг агаар ямар байна",
+    ],
+)
+def test_indexed_dispatch_matches_evaluating_every_rule(question):
+    ctx = QueryContext.build(question)
+    expected = None
+    for r in active_hard_rules():
+        # the feature gates, checked the way they were before the index
+        if not all(any(k in ctx.lowered for k in words) for words in r.raw):
+            continue
+        if not all(any(k in ctx.normalized for k in words) for words in r.norm):
+            continue
+        try:
+            sql = r.fn(ctx)
+        except Exception:
+            sql = None
+        if sql:
+            expected = (r.name, sql)
+            break
+    assert run_hard_sql_rules(ctx) == expected
+
+
+# =========================================================
+# Store rules
+# =========================================================
+
+def test_store_quarter_keeps_the_quarter():
+    matched = run_hard_sql_rules(QueryContext.build("2024 оны 2-р улирлын 520 салбарын борлуулалт"))
+    assert matched is not None
+    rule, sql = matched
+    assert rule == "store_quarter_sales_by_code"
+    assert sql.params == {"year": 2024, "quarter": 2, "store_code": "520"}
+
+
+@pytest.mark.parametrize(
+    "question",
+    [
+        "2024 оны улирлын 520 салбарын борлуулалт",
+        "2024 оны сарын 520 салбарын борлуулалт",
+    ],
+)
+def test_store_year_rule_leaves_periods_to_other_rules(question):
+    assert matched_rule(question) != "store_sales_year_by_code"
+
+
+def test_store_year_rule_without_period():
+    assert matched_rule("2024 оны 520 салбарын борлуулалт") == "store_sales_year_by_code"
+
+
+# =========================================================
+# Period rules
+# =========================================================
+
+@pytest.mark.parametrize(
+    "question",
+    [
+        "last month sales by brand",
+        "last month sales by category",
+        "өнгөрсөн сарын брэндээр борлуулалт",
+        "өнгөрсөн сарын ангилал тус бүрийн борлуулалт",
+        "өнгөрсөн сарын брэндийн өдөр бүрийн борлуулалт",
+        "may i see the sales",
+        "sales by brand, may I?",
+        "total sales dec",
+        "борлуулалт jan",
+        "сүүлийн 30 хоногийн дундаж борлуулалт",
+        "last month sales quantity",
+        "өнгөрсөн сарын борлуулалтын тоо ширхэг",
+        "last month gross sales",
+        "өнгөрсөн сарын хямдралтай борлуулалт",
+        "өнгөрсөн сарын дундаж борлуулалтын тренд",
+        "last month daily sales quantity",
+    ],
+)
+def test_period_rules_leave_breakdowns_to_the_planner(question):
+    assert matched_rule(question) is None
+
+
+@pytest.mark.parametrize(
+    "question, rule",
+    [
+        ("last month sales", "sales_total_in_period"),
+        ("сүүлийн 30 хоногийн борлуулалт", "sales_total_in_period"),
+        ("өнгөрсөн сарын борлуулалтын тренд", "sales_daily_trend_in_period"),
+        # went to the planner before the period rules existed
+        ("өнөөдрийн борлуулалт", "sales_total_in_period"),
+    ],
+)
+def test_period_rules(question, rule):
+    assert matched_rule(question) == rule
+
+
+# =========================================================
+# Template loading
+# =========================================================
+
+def write_rules(path, when, extra=()):
+    rule = {"name": "reload_probe", "when": [when], "sql": "SELECT 1"}
+    path.write_text(json.dumps({"rules": [rule, *extra]}), encoding="utf-8")
+
+
+def test_failed_reload_keeps_live_vocabularies(tmp_path):
+    path = tmp_path / "rules.json"
+    rules = TemplateRuleSet(str(path), CANONICAL_TABLES)
+
+    write_rules(path, ["alpha probe"])
+    assert rules.load()
+    assert KEYWORDS.registered_list("json.reload_probe.when.0") == ["alpha probe"]
+
+    broken = {"name": "broken_probe", "when": ["rules.no_such_words"], "sql": "SELECT 1"}
+    write_rules(path, ["beta probe"], [broken])
+    assert not rules.load()
+    assert KEYWORDS.registered_list("json.reload_probe.when.0") == ["alpha probe"]
+    assert [r.name for r in rules.rules] == ["reload_probe"]
+    assert QueryContext.build("alpha probe").raw_features & KEYWORDS.bit_of(rules.rules[0].raw[0])
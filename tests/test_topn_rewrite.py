@@ -0,0 +1,155 @@
+import pytest
+
+from app.agents.text2sql.topn_rewrite import rewrite_topn_before_join
+
+DB = "t2s_topn_test"
+
+STORE_TOP_BY_FACT_KEY = f"""
+SELECT
+  f.StoreID AS store_id,
+  s.BIZLOC_NM AS store_name,
+  sum(f.NetSale) AS total_net_sales
+FROM {DB}.Cluster_Main_Sales f
+LEFT JOIN {DB}.Dimension_SM s
+  ON f.StoreID = s.BIZLOC_CD
+GROUP BY f.StoreID, s.BIZLOC_NM
+ORDER BY total_net_sales DESC
+LIMIT 3
+""".strip()
+
+STORE_TOP_BY_DIM_KEY = f"""
+SELECT
+  s.BIZLOC_CD AS store_id,
+  s.BIZLOC_NM AS store_name,
+  sum(f.NetSale) AS total_net_sales
+FROM {DB}.Cluster_Main_Sales f
+LEFT JOIN {DB}.Dimension_SM s
+  ON f.StoreID = s.BIZLOC_CD
+GROUP BY s.BIZLOC_CD, s.BIZLOC_NM
+ORDER BY total_net_sales DESC
+LIMIT 3
+""".strip()
+
+PRODUCT_TOP_BY_NAME = f"""
+SELECT
+  d1.GDS_NM AS product_name,
+  sum(f.SoldQty) AS total_qty,
+  sum(f.NetSale) AS total_net_sales
+FROM {DB}.Cluster_Main_Sales f
+LEFT JOIN {DB}.Dimension_IM d1
+  ON f.GDS_CD = d1.GDS_CD
+WHERE f.NetSale > 0
+GROUP BY d1.GDS_NM
+ORDER BY total_qty DESC, total_net_sales DESC
+LIMIT 2
+""".strip()
+
+PRODUCT_COUNT_BY_NAME = f"""
+SELECT d1.GDS_NM AS product_name, count() AS receipts, max(f.NetSale) AS biggest
+FROM {DB}.Cluster_Main_Sales f
+LEFT JOIN {DB}.Dimension_IM d1 ON f.GDS_CD = d1.GDS_CD
+GROUP BY d1.GDS_NM
+ORDER BY receipts DESC
+LIMIT 3
+""".strip()
+
+EQUIVALENCE_QUERIES = [STORE_TOP_BY_FACT_KEY, STORE_TOP_BY_DIM_KEY, PRODUCT_TOP_BY_NAME, PRODUCT_COUNT_BY_NAME]
+
+
+# =========================================================
+# Shapes
+# =========================================================
+
+def test_fact_key_grouping_limits_before_join():
+    sql = rewrite_topn_before_join(STORE_TOP_BY_FACT_KEY)
+    inner, outer = sql.split(") agg")
+    assert "LIMIT 3" in inner and "Dimension_SM" not in inner
+    assert "LEFT JOIN" in outer and "GROUP BY" not in outer
+
+
+def test_name_grouping_reaggregates_every_key():
+    sql = rewrite_topn_before_join(PRODUCT_TOP_BY_NAME)
+    head, rest = sql.split("FROM (", 1)
+    inner, outer = rest.split(") agg")
+    # keys sharing a name must all reach the outer aggregate
+    assert "LIMIT" not in inner and "WHERE f.NetSale > 0" in inner
+    assert "sum(agg.__a0) AS total_qty" in head and "GROUP BY d1.GDS_NM" in outer
+
+
+def test_dim_key_grouping_reaggregates():
+    # unmatched fact keys all fall into the '' group of s.BIZLOC_CD
+    sql = rewrite_topn_before_join(STORE_TOP_BY_DIM_KEY)
+    assert "GROUP BY s.BIZLOC_CD, s.BIZLOC_NM" in sql.split(") agg")[1]
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        PRODUCT_TOP_BY_NAME.replace("sum(f.SoldQty)", "avg(f.SoldQty)"),
+        PRODUCT_TOP_BY_NAME.replace("sum(f.SoldQty)", "count(DISTINCT f.ReceiptNo)"),
+        PRODUCT_TOP_BY_NAME.replace("WHERE f.NetSale > 0", "WHERE d1.GDS_NM != ''"),
+        PRODUCT_TOP_BY_NAME.replace("ORDER BY total_qty DESC, total_net_sales DESC", "ORDER BY product_name"),
+        PRODUCT_TOP_BY_NAME.replace("LIMIT 2", ""),
+        PRODUCT_TOP_BY_NAME.replace("LEFT JOIN", "INNER JOIN"),
+        STORE_TOP_BY_FACT_KEY.replace("LIMIT 3", "HAVING total_net_sales > 1 LIMIT 3"),
+    ],
+)
+def test_other_shapes_unchanged(sql):
+    assert rewrite_topn_before_join(sql) == sql
+
+
+# =========================================================
+# Equivalence on ClickHouse (skipped without a server)
+# =========================================================
+
+# two products share a name, two fact products and two stores have no
+# dimension row; totals are distinct so ORDER BY ... LIMIT is deterministic
+FACT_ROWS = [
+    ("S1", "A1", 5.0, 1), ("S1", "A1", 5.5, 1), ("S2", "A2", 8.0, 4),
+    ("S2", "A3", 15.0, 3), ("S3", "A4", 3.0, 1), ("S4", "A5", 7.0, 2),
+    ("S4", "A6", 6.25, 2), ("S1", "A3", 1.0, 1),
+]
+PRODUCTS = [("A1", "Cola"), ("A2", "Cola"), ("A3", "Fanta"), ("A4", "Sprite")]
+STORES = [("S1", "North"), ("S2", "South")]
+
+
+@pytest.fixture(scope="module")
+def clickhouse():
+    clickhouse_connect = pytest.importorskip("clickhouse_connect")
+    from app.config import CLICKHOUSE_HOST, CLICKHOUSE_PASSWORD, CLICKHOUSE_PORT, CLICKHOUSE_USER
+
+    try:
+        client = clickhouse_connect.get_client(
+            host=CLICKHOUSE_HOST or "localhost",
+            port=CLICKHOUSE_PORT,
+            username=CLICKHOUSE_USER,
+            password=CLICKHOUSE_PASSWORD,
+        )
+        client.command(f"CREATE DATABASE IF NOT EXISTS {DB}")
+    except Exception as e:
+        pytest.skip(f"ClickHouse not reachable: {e}")
+
+    client.command(
+        f"CREATE TABLE {DB}.Cluster_Main_Sales "
+        "(StoreID String, GDS_CD String, NetSale Float64, SoldQty Int64) ENGINE = Memory"
+    )
+    client.command(f"CREATE TABLE {DB}.Dimension_IM (GDS_CD String, GDS_NM String) ENGINE = Memory")
+    client.command(f"CREATE TABLE {DB}.Dimension_SM (BIZLOC_CD String, BIZLOC_NM String) ENGINE = Memory")
+    client.insert(f"{DB}.Cluster_Main_Sales", FACT_ROWS, column_names=["StoreID", "GDS_CD", "NetSale", "SoldQty"])
+    client.insert(f"{DB}.Dimension_IM", PRODUCTS, column_names=["GDS_CD", "GDS_NM"])
+    client.insert(f"{DB}.Dimension_SM", STORES, column_names=["BIZLOC_CD", "BIZLOC_NM"])
+    try:
+        yield client
+    finally:
+        client.command(f"DROP DATABASE IF EXISTS {DB}")
+
+
+@pytest.mark.parametrize("sql", EQUIVALENCE_QUERIES)
+def test_rewrite_returns_the_same_rows(clickhouse, sql):
+    rewritten = rewrite_topn_before_join(sql)
+    assert rewritten != sql
+
+    expected = clickhouse.query(sql)
+    actual = clickhouse.query(rewritten)
+    assert actual.column_names == expected.column_names
+    assert actual.result_rows == expected.result_rows